@@ -0,0 +1,27 @@
+"""Claims: digest of the last ingested external payload
+
+Revision ID: claim_external_digest_v1
+Revises: claim_line_external_ids_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "claim_external_digest_v1"
+down_revision = "claim_line_external_ids_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("claims", sa.Column("external_digest", sa.String(32), nullable=True))
+    # Sync reads (external_claim_id, digest) per practice with an index-only scan.
+    op.create_index(
+        "idx_claims_practice_external_digest", "claims", ["practice_id", "external_claim_id", "external_digest"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_claims_practice_external_digest", table_name="claims")
+    op.drop_column("claims", "external_digest")
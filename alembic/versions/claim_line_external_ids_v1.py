@@ -0,0 +1,27 @@
+"""Claim lines: external line id for ingested lines
+
+Revision ID: claim_line_external_ids_v1
+Revises: ingestion_jobs_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "claim_line_external_ids_v1"
+down_revision = "ingestion_jobs_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("claim_lines", sa.Column("external_line_id", sa.String(255), nullable=True))
+    # Ingestion upserts lines by (claim, external line id); NULLs (manual lines) never collide.
+    op.create_index(
+        "uq_claim_lines_claim_external_line", "claim_lines", ["claim_id", "external_line_id"], unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_claim_lines_claim_external_line", table_name="claim_lines")
+    op.drop_column("claim_lines", "external_line_id")
@@ -0,0 +1,27 @@
+"""Integration connections: schedule of the next API sync
+
+Revision ID: connection_sync_schedule_v1
+Revises: claim_external_digest_v1
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "connection_sync_schedule_v1"
+down_revision = "claim_external_digest_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("integration_connections", sa.Column("next_sync_at", sa.DateTime(), nullable=True))
+    op.add_column(
+        "integration_connections",
+        sa.Column("consecutive_failures", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("integration_connections", "consecutive_failures")
+    op.drop_column("integration_connections", "next_sync_at")
@@ -0,0 +1,38 @@
+"""Ingestion jobs: checkpoint and heartbeat columns for background sync runs
+
+Revision ID: ingestion_jobs_v1
+Revises: sync_run_progress_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "ingestion_jobs_v1"
+down_revision = "sync_run_progress_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("integration_sync_runs", sa.Column("rows_total", sa.Integer(), nullable=True))
+    op.add_column("integration_sync_runs", sa.Column("triggered_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True))
+    op.add_column("integration_sync_runs", sa.Column("payload_path", sa.String(500), nullable=True))
+    op.add_column("integration_sync_runs", sa.Column("checkpoint_json", sa.Text(), nullable=True))
+    op.add_column("integration_sync_runs", sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+    op.add_column("integration_sync_runs", sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"))
+    # Stale-job scan: unfinished runs by heartbeat.
+    op.execute(
+        "CREATE INDEX ix_integration_sync_runs_unfinished ON integration_sync_runs (heartbeat_at) "
+        "WHERE status IN ('QUEUED', 'RUNNING')"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_integration_sync_runs_unfinished", table_name="integration_sync_runs")
+    op.drop_column("integration_sync_runs", "attempts")
+    op.drop_column("integration_sync_runs", "heartbeat_at")
+    op.drop_column("integration_sync_runs", "checkpoint_json")
+    op.drop_column("integration_sync_runs", "payload_path")
+    op.drop_column("integration_sync_runs", "triggered_by_user_id")
+    op.drop_column("integration_sync_runs", "rows_total")
@@ -0,0 +1,111 @@
+"""Insight rollups: per-practice payer and procedure totals
+
+Revision ID: insight_rollups_v1
+Revises: portfolio_risks_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "insight_rollups_v1"
+down_revision = "portfolio_risks_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "payer_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("practice_id", sa.Integer(), sa.ForeignKey("practices.id"), nullable=False),
+        sa.Column("payer", sa.String(255), nullable=False),
+        sa.Column("first_claim_id", sa.Integer(), nullable=True),
+        sa.Column("claim_count", sa.BigInteger(), nullable=False),
+        sa.Column("denied_count", sa.BigInteger(), nullable=False),
+        sa.Column("billed_cents", sa.BigInteger(), nullable=False),
+        sa.Column("paid_cents", sa.BigInteger(), nullable=False),
+        sa.Column("decision_count", sa.BigInteger(), nullable=False),
+        sa.Column("approve_count", sa.BigInteger(), nullable=False),
+        sa.Column("deny_count", sa.BigInteger(), nullable=False),
+        sa.Column("needs_review_count", sa.BigInteger(), nullable=False),
+        sa.Column("risk_score_sum", sa.Float(), nullable=False),
+        sa.Column("risk_score_count", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("practice_id", "payer", name="uq_payer_rollups_practice_payer"),
+    )
+    op.create_index("ix_payer_rollups_id", "payer_rollups", ["id"])
+
+    op.create_table(
+        "procedure_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("practice_id", sa.Integer(), sa.ForeignKey("practices.id"), nullable=False),
+        sa.Column("cdt_code", sa.String(10), nullable=False),
+        sa.Column("line_count", sa.BigInteger(), nullable=False),
+        sa.Column("denied_count", sa.BigInteger(), nullable=False),
+        sa.Column("billed_cents", sa.BigInteger(), nullable=False),
+        sa.Column("allowed_cents", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("practice_id", "cdt_code", name="uq_procedure_rollups_practice_code"),
+    )
+    op.create_index("ix_procedure_rollups_id", "procedure_rollups", ["id"])
+
+    # Backfill with the same aggregation as rebuild_insight_rollups.
+    op.execute("""
+        WITH claim_totals AS (
+            SELECT practice_id, coalesce(nullif(payer, ''), 'Unknown') AS payer,
+                   count(*) AS claim_count,
+                   count(*) FILTER (WHERE status = 'DECLINED') AS denied_count,
+                   coalesce(sum(amount_cents), 0) AS billed_cents,
+                   min(id) AS first_claim_id
+            FROM claims
+            GROUP BY 1, 2
+        ),
+        paid AS (
+            SELECT c.practice_id, coalesce(nullif(c.payer, ''), 'Unknown') AS payer, sum(p.amount_cents) AS paid_cents
+            FROM payment_intents p
+            JOIN claims c ON c.id = p.claim_id AND c.practice_id = p.practice_id
+            WHERE p.status = 'CONFIRMED'
+            GROUP BY 1, 2
+        ),
+        decisions AS (
+            SELECT c.practice_id, coalesce(nullif(c.payer, ''), 'Unknown') AS payer,
+                   count(*) AS decision_count,
+                   count(*) FILTER (WHERE d.decision = 'APPROVE') AS approve_count,
+                   count(*) FILTER (WHERE d.decision = 'DENY') AS deny_count,
+                   count(*) FILTER (WHERE d.decision = 'NEEDS_REVIEW') AS needs_review_count,
+                   coalesce(sum(d.risk_score), 0.0) AS risk_score_sum,
+                   count(d.risk_score) AS risk_score_count
+            FROM funding_decisions d
+            JOIN claims c ON c.id = d.claim_id
+            GROUP BY 1, 2
+        )
+        INSERT INTO payer_rollups (
+            practice_id, payer, first_claim_id, claim_count, denied_count, billed_cents, paid_cents,
+            decision_count, approve_count, deny_count, needs_review_count, risk_score_sum, risk_score_count, updated_at
+        )
+        SELECT t.practice_id, t.payer, t.first_claim_id, t.claim_count, t.denied_count, t.billed_cents,
+               coalesce(p.paid_cents, 0), coalesce(d.decision_count, 0), coalesce(d.approve_count, 0),
+               coalesce(d.deny_count, 0), coalesce(d.needs_review_count, 0), coalesce(d.risk_score_sum, 0.0),
+               coalesce(d.risk_score_count, 0), now() AT TIME ZONE 'utc'
+        FROM claim_totals t
+        LEFT JOIN paid p USING (practice_id, payer)
+        LEFT JOIN decisions d USING (practice_id, payer)
+    """)
+    op.execute("""
+        INSERT INTO procedure_rollups (practice_id, cdt_code, line_count, denied_count, billed_cents, allowed_cents, updated_at)
+        SELECT c.practice_id, coalesce(nullif(l.cdt_code, ''), 'UNKNOWN'),
+               count(*), count(*) FILTER (WHERE c.status = 'DECLINED'),
+               coalesce(sum(l.billed_fee_cents), 0), coalesce(sum(l.allowed_fee_cents), 0),
+               now() AT TIME ZONE 'utc'
+        FROM claim_lines l
+        JOIN claims c ON c.id = l.claim_id
+        GROUP BY 1, 2
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_procedure_rollups_id", table_name="procedure_rollups")
+    op.drop_table("procedure_rollups")
+    op.drop_index("ix_payer_rollups_id", table_name="payer_rollups")
+    op.drop_table("payer_rollups")
@@ -0,0 +1,72 @@
+"""Metric sketches: per-practice, per-payer quantile sketches of payment timings
+
+Revision ID: metric_sketches_v1
+Revises: patient_dimensions_recall_index_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "metric_sketches_v1"
+down_revision = "patient_dimensions_recall_index_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "metric_sketches",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("practice_id", sa.Integer(), sa.ForeignKey("practices.id"), nullable=False),
+        sa.Column("metric", sa.String(50), nullable=False),
+        sa.Column("payer", sa.String(255), nullable=False),
+        sa.Column("sample_count", sa.BigInteger(), nullable=False),
+        sa.Column("sketch", postgresql.JSONB(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("practice_id", "metric", "payer", name="uq_metric_sketches_practice_metric_payer"),
+    )
+    op.create_index("ix_metric_sketches_id", "metric_sketches", ["id"])
+
+    # Backfill with the same bucketing as QuantileSketch(alpha=0.01): bucket
+    # ceil(ln|days| / ln(1.01 / 0.99)), |days| <= 1e-9 counted as zero.
+    op.execute("""
+        WITH samples AS (
+            SELECT p.practice_id, coalesce(nullif(c.payer, ''), 'Unknown') AS payer, m.metric, m.days
+            FROM payment_intents p
+            JOIN claims c ON c.id = p.claim_id
+            CROSS JOIN LATERAL (VALUES
+                ('reimbursement_lag_days', extract(epoch FROM p.confirmed_at - p.sent_at)::float8 / 86400.0),
+                ('payment_cycle_days', extract(epoch FROM p.confirmed_at - p.created_at)::float8 / 86400.0),
+                ('claim_cycle_days', extract(epoch FROM p.confirmed_at - c.created_at)::float8 / 86400.0)
+            ) AS m (metric, days)
+            WHERE p.confirmed_at IS NOT NULL AND m.days IS NOT NULL
+        ),
+        binned AS (
+            SELECT
+                practice_id, metric, payer,
+                CASE WHEN days > 1e-9 THEN 'pos' WHEN days < -1e-9 THEN 'neg' ELSE 'zero' END AS side,
+                CASE WHEN abs(days) > 1e-9 THEN ceil(ln(abs(days)) / ln(1.01::float8 / 0.99::float8))::int END AS idx,
+                count(*) AS n, sum(days) AS total, min(days) AS lo, max(days) AS hi
+            FROM samples
+            GROUP BY 1, 2, 3, 4, 5
+        )
+        INSERT INTO metric_sketches (practice_id, metric, payer, sample_count, sketch, updated_at)
+        SELECT
+            practice_id, metric, payer, sum(n),
+            jsonb_build_object(
+                'alpha', 0.01, 'count', sum(n), 'sum', sum(total), 'min', min(lo), 'max', max(hi),
+                'zero', coalesce(sum(n) FILTER (WHERE side = 'zero'), 0),
+                'pos', coalesce(jsonb_object_agg(idx::text, n) FILTER (WHERE side = 'pos'), '{}'::jsonb),
+                'neg', coalesce(jsonb_object_agg(idx::text, n) FILTER (WHERE side = 'neg'), '{}'::jsonb)
+            ),
+            now() AT TIME ZONE 'utc'
+        FROM binned
+        GROUP BY practice_id, metric, payer
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_metric_sketches_id", table_name="metric_sketches")
+    op.drop_table("metric_sketches")
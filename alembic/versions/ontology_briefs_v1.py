@@ -0,0 +1,33 @@
+"""Ontology briefs: latest generated brief per practice, keyed by context hash
+
+Revision ID: ontology_briefs_v1
+Revises: insight_rollups_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "ontology_briefs_v1"
+down_revision = "insight_rollups_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ontology_briefs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("practice_id", sa.Integer(), sa.ForeignKey("practices.id"), nullable=False, unique=True),
+        sa.Column("context_hash", sa.String(64), nullable=False),
+        sa.Column("source", sa.String(20), nullable=False),
+        sa.Column("brief_json", postgresql.JSONB(), nullable=False),
+        sa.Column("generated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_ontology_briefs_id", "ontology_briefs", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ontology_briefs_id", table_name="ontology_briefs")
+    op.drop_table("ontology_briefs")
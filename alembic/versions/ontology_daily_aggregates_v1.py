@@ -0,0 +1,35 @@
+"""Ontology: practice_daily_aggregates table for prefix-sum timeseries
+
+Revision ID: ontology_daily_aggregates_v1
+Revises: ontology_expansion_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "ontology_daily_aggregates_v1"
+down_revision = "ontology_expansion_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "practice_daily_aggregates",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("practice_id", sa.Integer(), sa.ForeignKey("practices.id"), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("claim_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("declined_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("billed_cents", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("funded_cents", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("confirmed_cents", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.UniqueConstraint("practice_id", "date", name="uq_daily_agg_practice_date"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("practice_daily_aggregates")
@@ -0,0 +1,58 @@
+"""Ontology: typed, indexed columns for hot object properties
+
+Revision ID: ontology_typed_columns_v1
+Revises: ontology_daily_aggregates_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "ontology_typed_columns_v1"
+down_revision = "ontology_daily_aggregates_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ontology_objects", sa.Column("event_date", sa.Date(), nullable=True))
+    op.add_column("ontology_objects", sa.Column("payer_key", sa.String(255), nullable=True))
+    op.add_column("ontology_objects", sa.Column("status", sa.String(50), nullable=True))
+    op.add_column("ontology_objects", sa.Column("amount_cents", sa.BigInteger(), nullable=True))
+
+    # Backfill from properties_json for objects built before this revision.
+    op.execute("""
+        UPDATE ontology_objects SET
+            event_date = CASE
+                WHEN properties_json->>'created_at' ~ '^\\d{4}-\\d{2}-\\d{2}'
+                THEN substr(properties_json->>'created_at', 1, 10)::date
+            END,
+            payer_key = lower(CASE object_type
+                WHEN 'Payer' THEN properties_json->>'name'
+                WHEN 'Claim' THEN properties_json->>'payer'
+            END),
+            status = left(properties_json->>'status', 50),
+            amount_cents = CASE
+                WHEN object_type = 'Patient' AND jsonb_typeof(properties_json->'lifetime_billed_cents') = 'number'
+                THEN (properties_json->>'lifetime_billed_cents')::bigint
+                WHEN object_type <> 'Patient' AND jsonb_typeof(properties_json->'amount_cents') = 'number'
+                THEN (properties_json->>'amount_cents')::bigint
+            END
+        WHERE properties_json IS NOT NULL
+    """)
+
+    op.create_index("idx_ontology_objects_practice_event_date", "ontology_objects", ["practice_id", "event_date"])
+    op.create_index("idx_ontology_objects_practice_payer_key", "ontology_objects", ["practice_id", "payer_key"])
+    op.create_index("idx_ontology_objects_practice_type_status", "ontology_objects", ["practice_id", "object_type", "status"])
+    op.create_index("idx_ontology_objects_practice_type_amount", "ontology_objects", ["practice_id", "object_type", "amount_cents"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_ontology_objects_practice_type_amount", table_name="ontology_objects")
+    op.drop_index("idx_ontology_objects_practice_type_status", table_name="ontology_objects")
+    op.drop_index("idx_ontology_objects_practice_payer_key", table_name="ontology_objects")
+    op.drop_index("idx_ontology_objects_practice_event_date", table_name="ontology_objects")
+    op.drop_column("ontology_objects", "amount_cents")
+    op.drop_column("ontology_objects", "status")
+    op.drop_column("ontology_objects", "payer_key")
+    op.drop_column("ontology_objects", "event_date")
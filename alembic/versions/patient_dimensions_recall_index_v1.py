@@ -0,0 +1,23 @@
+"""Patient dimensions: index for patient-ordered recall lists
+
+Revision ID: patient_dimensions_recall_index_v1
+Revises: patient_dimensions_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = "patient_dimensions_recall_index_v1"
+down_revision = "patient_dimensions_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "idx_patient_dimensions_practice_first_claim", "patient_dimensions", ["practice_id", "first_claim_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_patient_dimensions_practice_first_claim", table_name="patient_dimensions")
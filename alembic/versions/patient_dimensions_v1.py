@@ -0,0 +1,89 @@
+"""Claims: persisted patient_hash; patient_dimensions rollup table
+
+Revision ID: patient_dimensions_v1
+Revises: practice_data_version_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "patient_dimensions_v1"
+down_revision = "practice_data_version_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("claims", sa.Column("patient_hash", sa.String(16), nullable=True))
+    # Same key as Claim.compute_patient_hash: sha256 of lower("<practice_id>:<name or 'unknown'>"),
+    # trailing whitespace stripped, first 16 hex chars.
+    op.execute("""
+        UPDATE claims SET patient_hash = left(encode(sha256(convert_to(
+            rtrim(lower(practice_id::text || ':' || coalesce(nullif(patient_name, ''), 'unknown')), E' \\t\\n\\r\\f' || chr(11)),
+            'UTF8')), 'hex'), 16)
+    """)
+    op.create_index("idx_claims_practice_patient_hash", "claims", ["practice_id", "patient_hash"])
+
+    op.create_table(
+        "patient_dimensions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("practice_id", sa.Integer(), sa.ForeignKey("practices.id"), nullable=False),
+        sa.Column("patient_hash", sa.String(16), nullable=False),
+        sa.Column("age_bucket", sa.String(10), nullable=False),
+        sa.Column("first_claim_id", sa.Integer(), nullable=False),
+        sa.Column("first_seen", sa.Date(), nullable=False),
+        sa.Column("previous_seen", sa.Date(), nullable=True),
+        sa.Column("last_seen", sa.Date(), nullable=False),
+        sa.Column("claim_count", sa.Integer(), nullable=False),
+        sa.Column("lifetime_billed_cents", sa.BigInteger(), nullable=False),
+        sa.Column("lifetime_reimbursed_cents", sa.BigInteger(), nullable=False),
+        sa.Column("last_preventive_date", sa.Date(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("practice_id", "patient_hash", name="uq_patient_dimensions_practice_hash"),
+    )
+    op.create_index("ix_patient_dimensions_id", "patient_dimensions", ["id"])
+    op.create_index("idx_patient_dimensions_practice_last_seen", "patient_dimensions", ["practice_id", "last_seen"])
+
+    # Backfill with the same aggregation as refresh_patient_dimensions. The
+    # age bucket is md5(name of the first claim) mod 4; preventive codes are
+    # the "Preventive" family of app/services/cdt_families.py at this revision.
+    op.execute(r"""
+        INSERT INTO patient_dimensions (
+            practice_id, patient_hash, age_bucket, first_claim_id, first_seen, previous_seen,
+            last_seen, claim_count, lifetime_billed_cents, lifetime_reimbursed_cents,
+            last_preventive_date, updated_at
+        )
+        SELECT
+            practice_id, patient_hash,
+            CASE WHEN coalesce(first_name, '') = '' THEN 'unknown'
+                 ELSE (ARRAY['0-18', '18-35', '35-55', '55+'])[(('x' || left(md5(first_name), 8))::bit(32)::bigint % 4) + 1]
+            END,
+            first_claim_id, first_seen, previous_seen, last_seen, claim_count,
+            billed, reimbursed, last_preventive, now() AT TIME ZONE 'utc'
+        FROM (
+            SELECT
+                c.practice_id, c.patient_hash,
+                min(c.id) AS first_claim_id,
+                (array_agg(c.patient_name ORDER BY c.id))[1] AS first_name,
+                min(c.created_at::date) AS first_seen,
+                (array_agg(c.created_at::date ORDER BY c.created_at DESC))[2] AS previous_seen,
+                max(c.created_at::date) AS last_seen,
+                count(c.id) AS claim_count,
+                coalesce(sum(c.amount_cents), 0) AS billed,
+                coalesce(sum(p.amount_cents) FILTER (WHERE p.status = 'CONFIRMED'), 0) AS reimbursed,
+                max(c.created_at::date) FILTER (WHERE c.procedure_codes ~* '(^|,)\s*(D0100|D0110|D0120|D0140|D0150|D0160|D0170|D0180|D0210|D0220|D0230|D0240|D0250|D0270|D0272|D0274|D0277|D0330|D0340|D0350|D0470|D0999|D1110|D1120|D1206|D1208|D1310|D1320|D1330|D1351|D1352|D1353|D1354|D1510|D1515|D1520|D1525|D1550|D1555|D1575)\s*(,|$)') AS last_preventive
+            FROM claims c
+            LEFT JOIN payment_intents p ON p.claim_id = c.id
+            WHERE c.patient_hash IS NOT NULL
+            GROUP BY c.practice_id, c.patient_hash
+        ) agg
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index("idx_patient_dimensions_practice_last_seen", table_name="patient_dimensions")
+    op.drop_index("ix_patient_dimensions_id", table_name="patient_dimensions")
+    op.drop_table("patient_dimensions")
+    op.drop_index("idx_claims_practice_patient_hash", table_name="claims")
+    op.drop_column("claims", "patient_hash")
@@ -0,0 +1,54 @@
+"""Portfolio risk runs and their ranked per-practice risks
+
+Revision ID: portfolio_risks_v1
+Revises: metric_sketches_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "portfolio_risks_v1"
+down_revision = "metric_sketches_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "portfolio_risk_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("status", sa.String(50), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("ended_at", sa.DateTime(), nullable=True),
+        sa.Column("workers", sa.Integer(), nullable=False),
+        sa.Column("practice_count", sa.Integer(), nullable=False),
+        sa.Column("failed_practice_count", sa.Integer(), nullable=False),
+        sa.Column("risk_count", sa.Integer(), nullable=False),
+        sa.Column("error_json", sa.Text(), nullable=True),
+        sa.Column("triggered_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+    )
+    op.create_index("ix_portfolio_risk_runs_id", "portfolio_risk_runs", ["id"])
+
+    op.create_table(
+        "portfolio_risks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("run_id", sa.Integer(), sa.ForeignKey("portfolio_risk_runs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("practice_id", sa.Integer(), sa.ForeignKey("practices.id"), nullable=False),
+        sa.Column("risk_type", sa.String(50), nullable=False),
+        sa.Column("severity", sa.String(20), nullable=False),
+        sa.Column("severity_rank", sa.Integer(), nullable=False),
+        sa.Column("metric", sa.String(100), nullable=True),
+        sa.Column("value", sa.Float(), nullable=True),
+        sa.Column("explanation", sa.Text(), nullable=True),
+    )
+    op.create_index("ix_portfolio_risks_id", "portfolio_risks", ["id"])
+    op.create_index("idx_portfolio_risks_run_rank", "portfolio_risks", ["run_id", "severity_rank", "practice_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_portfolio_risks_run_rank", table_name="portfolio_risks")
+    op.drop_index("ix_portfolio_risks_id", table_name="portfolio_risks")
+    op.drop_table("portfolio_risks")
+    op.drop_index("ix_portfolio_risk_runs_id", table_name="portfolio_risk_runs")
+    op.drop_table("portfolio_risk_runs")
@@ -0,0 +1,28 @@
+"""Practices: data_version sequence and ontology build markers
+
+Revision ID: practice_data_version_v1
+Revises: ontology_typed_columns_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "practice_data_version_v1"
+down_revision = "ontology_typed_columns_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS practice_data_version_seq")
+    op.add_column("practices", sa.Column("data_version", sa.BigInteger(), nullable=False, server_default="0"))
+    op.add_column("practices", sa.Column("ontology_version", sa.BigInteger(), nullable=True))
+    op.add_column("practices", sa.Column("ontology_built_on", sa.Date(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("practices", "ontology_built_on")
+    op.drop_column("practices", "ontology_version")
+    op.drop_column("practices", "data_version")
+    op.execute("DROP SEQUENCE IF EXISTS practice_data_version_seq")
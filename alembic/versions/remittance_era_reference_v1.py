@@ -0,0 +1,22 @@
+"""Remittances: index ERA references per practice
+
+Revision ID: remittance_era_reference_v1
+Revises: connection_sync_schedule_v1
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+revision = "remittance_era_reference_v1"
+down_revision = "connection_sync_schedule_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Bulk ERA ingestion skips payments the practice already has by era_reference.
+    op.create_index("idx_remittances_practice_era", "remittances", ["practice_id", "era_reference"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_remittances_practice_era", table_name="remittances")
@@ -0,0 +1,24 @@
+"""Sync run progress: bytes read so far for streamed CSV uploads
+
+Revision ID: sync_run_progress_v1
+Revises: ontology_briefs_v1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "sync_run_progress_v1"
+down_revision = "ontology_briefs_v1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("integration_sync_runs", sa.Column("bytes_total", sa.BigInteger(), nullable=True))
+    op.add_column("integration_sync_runs", sa.Column("bytes_processed", sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("integration_sync_runs", "bytes_processed")
+    op.drop_column("integration_sync_runs", "bytes_total")
@@ -37,9 +37,33 @@ class Settings(BaseSettings):
 
     # LLM (OpenAI) for ontology briefs
     openai_api_key: str = ""
+    openai_base_url: str = "https://api.openai.com/v1"
+    # Total time budget per brief (queueing + retries) before the template fallback
+    brief_llm_timeout_seconds: float = 20.0
+    # Concurrent LLM requests per process (also the pooled connection limit)
+    brief_llm_concurrency: int = 4
 
     # Auto-run alembic migrations on startup (set to "true" in staging)
     run_migrations_on_startup: str = ""
+
+    # Worker processes for the portfolio risk job (0 = one per CPU)
+    portfolio_risk_workers: int = 0
+
+    # Background ingestion jobs: where uploads are spooled until ingested
+    # (default: <tmp>/spoonbill-ingestion), and how long a RUNNING job may go
+    # without a checkpoint before another worker resumes it
+    ingestion_spool_dir: str = ""
+    ingestion_stale_after_seconds: int = 300
+    # Worker processes parsing large uploads (0 = one per CPU; 1 = serial)
+    ingestion_parse_workers: int = 0
+    # Scheduled Open Dental API syncs: run the scheduler in the API process
+    # (otherwise run scripts/run_sync_scheduler.py), how often each connection
+    # syncs, how many runs may be RUNNING at once across all practices, and
+    # how often the scheduler looks for due work
+    sync_scheduler_enabled: bool = False
+    sync_interval_minutes: int = 60
+    sync_max_concurrency: int = 4
+    sync_scheduler_poll_seconds: int = 30
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,225 @@
+"""Parallel parse and validation of large Open Dental CSV exports.
+
+The files are cut into byte spans on row boundaries (a newline outside a
+quoted field), and the spans are parsed and validated in a pool of worker
+processes. Workers return compact tuples, not Pydantic objects, so results
+are cheap to pickle. The parent hash-joins claims to lines on
+``external_claim_id`` and yields the same ``(claims, row errors)`` chunks as
+``csv_parser.iter_external_claim_chunks``, in file order. Claims are
+``ClaimRecord`` / ``LineRecord`` named tuples with the attributes of
+``ExternalClaim`` / ``ExternalClaimLine``.
+
+The lines side of the join is held in memory as tuples, so memory grows with
+the lines file. Small files are faster on the serial streaming path; see
+``PARALLEL_PARSE_MIN_BYTES``.
+"""
+import csv
+import io
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .csv_parser import (
+    ByteProgress,
+    REQUIRED_CLAIM_FIELDS,
+    REQUIRED_LINE_FIELDS,
+    _dict_rows,
+    _external_claim,
+    _external_line,
+    _row_error,
+)
+
+# Below this, spawning workers costs more than it saves.
+PARALLEL_PARSE_MIN_BYTES = 16 * 1024 * 1024
+SPAN_BYTES = 4 * 1024 * 1024
+_SCAN_BLOCK_BYTES = 1024 * 1024
+
+
+class LineRecord(NamedTuple):
+    external_line_id: str
+    cdt_code: str
+    description: Optional[str]
+    line_amount_cents: int
+    tooth_number: Optional[str]
+    surface: Optional[str]
+
+
+class ClaimRecord(NamedTuple):
+    external_claim_id: str
+    external_patient_id: Optional[str]
+    payer: str
+    total_billed_cents: int
+    procedure_date: Optional[object]
+    submitted_date: Optional[object]
+    procedure_codes: Optional[str]
+    lines: Tuple[LineRecord, ...] = ()
+
+
+def csv_row_spans(path: str, span_bytes: int = SPAN_BYTES) -> Tuple[int, List[Tuple[int, int]]]:
+    """``(header end, [(start, end), ...])``: byte spans of about ``span_bytes`` cut at row boundaries.
+
+    A newline is a row boundary when an even number of quote characters
+    precede it (``""`` escapes keep the parity), so quoted newlines never
+    split a row.
+    """
+    spans: List[Tuple[int, int]] = []
+    header_end = None
+    start = None
+    quoted = False
+    target = 0  # cut at the first row boundary at or after this offset
+    offset = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(_SCAN_BLOCK_BYTES)
+            if not block:
+                break
+            i = 0
+            while i < len(block):
+                cut_from = max(i, target - offset)
+                if cut_from >= len(block):
+                    quoted ^= bool(block.count(b'"', i) & 1)
+                    break
+                nl = block.find(b"\n", cut_from)
+                if nl < 0:
+                    quoted ^= bool(block.count(b'"', i) & 1)
+                    break
+                quoted ^= bool(block.count(b'"', i, nl) & 1)
+                i = nl + 1
+                if quoted:
+                    target = offset + i
+                    continue
+                boundary = offset + i
+                if header_end is None:
+                    header_end = boundary
+                else:
+                    spans.append((start, boundary))
+                start = boundary
+                target = boundary + span_bytes
+            offset += len(block)
+    if header_end is None:
+        return offset, []
+    if start < offset:
+        spans.append((start, offset))
+    return header_end, spans
+
+
+def _read_span(path: str, header_end: int, start: int, end: int, required: set, label: str):
+    with open(path, "rb") as f:
+        header = f.read(header_end)
+        f.seek(start)
+        body = f.read(end - start)
+    # Spans end on b"\n", which never occurs inside a multi-byte UTF-8 sequence.
+    return _dict_rows(io.StringIO((header + body).decode("utf-8"), newline=""), required, label)
+
+
+def _check_header(path: str, required: set, label: str) -> None:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        _dict_rows(f, required, label)
+
+
+def _parse_claims_span(args) -> Tuple[int, list, list]:
+    """Worker: ``(row count, [(index, claim tuple)], [(index, claim id, error)])``."""
+    path, header_end, start, end = args
+    records, errors = [], []
+    count = 0
+    for count, row in enumerate(_read_span(path, header_end, start, end, REQUIRED_CLAIM_FIELDS, "Claims"), start=1):
+        try:
+            claim = _external_claim(row, [])
+            records.append((count - 1, (
+                claim.external_claim_id, claim.external_patient_id, claim.payer, claim.total_billed_cents,
+                claim.procedure_date, claim.submitted_date, claim.procedure_codes,
+            )))
+        except (ValueError, AttributeError) as e:
+            errors.append((count - 1, (row.get("external_claim_id") or "").strip(), _row_error(e)))
+    return count, records, errors
+
+
+def _parse_lines_span(args) -> Tuple[list, list]:
+    """Worker: ``([(claim id, line tuple)], [(claim id, error)])``."""
+    path, header_end, start, end = args
+    records, errors = [], []
+    for row in _read_span(path, header_end, start, end, REQUIRED_LINE_FIELDS, "Claim lines"):
+        claim_id = (row.get("external_claim_id") or "").strip()
+        try:
+            line = _external_line(row)
+            records.append((claim_id, tuple(line.model_dump().values())))
+        except (ValueError, AttributeError) as e:
+            errors.append((claim_id, _row_error(e)))
+    return records, errors
+
+
+def _ordered(pool: ProcessPoolExecutor, fn, path: str, window: int) -> Iterator[Tuple[Tuple[int, int], object]]:
+    """``(span, result)`` in file order, with at most ``window`` spans in flight."""
+    header_end, spans = csv_row_spans(path, SPAN_BYTES)
+    pending = deque()
+    for span in spans:
+        pending.append((span, pool.submit(fn, (path, header_end, *span))))
+        if len(pending) >= window:
+            span_done, future = pending.popleft()
+            yield span_done, future.result()
+    while pending:
+        span_done, future = pending.popleft()
+        yield span_done, future.result()
+
+
+def _hash_lines(pool: ProcessPoolExecutor, lines_path: str, window: int):
+    lines_by_claim: Dict[str, List[LineRecord]] = {}
+    line_errors: Dict[str, str] = {}
+    for _, (records, errors) in _ordered(pool, _parse_lines_span, lines_path, window):
+        for claim_id, values in records:
+            lines_by_claim.setdefault(claim_id, []).append(LineRecord(*values))
+        for claim_id, error in errors:
+            line_errors.setdefault(claim_id, error)
+    return lines_by_claim, line_errors
+
+
+def iter_parallel_claim_chunks(
+    claims_path: str,
+    lines_path: Optional[str] = None,
+    chunk_size: int = 1000,
+    skip: int = 0,
+    workers: Optional[int] = None,
+    progress: Optional[ByteProgress] = None,
+) -> Iterator[Tuple[List[ClaimRecord], List[str]]]:
+    """Parallel counterpart of ``iter_external_claim_chunks`` for files on disk.
+
+    Raises ValueError for a missing required column, like the serial parser.
+    """
+    _check_header(claims_path, REQUIRED_CLAIM_FIELDS, "Claims")
+    if lines_path:
+        _check_header(lines_path, REQUIRED_LINE_FIELDS, "Claim lines")
+    workers = workers or os.cpu_count() or 1
+    window = workers * 2
+    # spawn: workers must not inherit the parent's pooled connections.
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        lines_by_claim, line_errors = _hash_lines(pool, lines_path, window) if lines_path else ({}, {})
+
+        claims: List[ClaimRecord] = []
+        errors: List[str] = []
+        seen = 0
+        for (_, end), (count, records, row_errors) in _ordered(pool, _parse_claims_span, claims_path, window):
+            failed = {i: (claim_id, error) for i, claim_id, error in row_errors}
+            valid = dict(records)
+            for i in range(max(skip - seen, 0), count):
+                row_number = seen + i + 2  # CSV record number; line 1 is the header
+                if i in valid:
+                    values = valid[i]
+                    claim_id = values[0]
+                    if claim_id not in line_errors:
+                        claims.append(ClaimRecord(*values, lines=tuple(lines_by_claim.get(claim_id, ()))))
+                    else:
+                        errors.append(f"row {row_number} ({claim_id}): {line_errors[claim_id]}")
+                else:
+                    claim_id, error = failed[i]
+                    # Lines are validated first on the serial path too.
+                    errors.append(f"row {row_number} ({claim_id}): {line_errors.get(claim_id, error)}")
+                if len(claims) + len(errors) >= chunk_size:
+                    yield claims, errors
+                    claims, errors = [], []
+            seen += count
+            if progress is not None:
+                progress.read = end
+        if claims or errors:
+            yield claims, errors
@@ -1,7 +1,12 @@
+import codecs
 import csv
 import io
+import itertools
 import logging
-from typing import List, Dict
+import sqlite3
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
 
 from ..schemas.integration import ExternalClaim, ExternalClaimLine
 
@@ -10,23 +15,170 @@ logger = logging.getLogger(__name__)
 REQUIRED_CLAIM_FIELDS = {"external_claim_id", "payer", "total_billed_cents"}
 REQUIRED_LINE_FIELDS = {"external_claim_id", "external_line_id", "cdt_code", "line_amount_cents"}
 
+READ_CHUNK_BYTES = 64 * 1024
+
 
 def parse_claims_csv(content: str) -> List[Dict]:
-    reader = csv.DictReader(io.StringIO(content))
-    fieldnames = set(reader.fieldnames or [])
-    missing = REQUIRED_CLAIM_FIELDS - fieldnames
-    if missing:
-        raise ValueError(f"Claims CSV missing required columns: {', '.join(sorted(missing))}")
-    return list(reader)
+    return list(iter_claims_csv(io.StringIO(content)))
 
 
 def parse_lines_csv(content: str) -> List[Dict]:
-    reader = csv.DictReader(io.StringIO(content))
-    fieldnames = set(reader.fieldnames or [])
-    missing = REQUIRED_LINE_FIELDS - fieldnames
+    return list(iter_lines_csv(io.StringIO(content)))
+
+
+class ByteProgress:
+    """Bytes handed out so far by ``read_chunks``."""
+
+    def __init__(self, total: Optional[int] = None):
+        self.total = total
+        self.read = 0
+
+
+def read_chunks(fileobj: BinaryIO, progress: Optional[ByteProgress] = None, size: int = READ_CHUNK_BYTES) -> Iterator[bytes]:
+    while True:
+        chunk = fileobj.read(size)
+        if not chunk:
+            return
+        if progress is not None:
+            progress.read += len(chunk)
+        yield chunk
+
+
+def iter_text_lines(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """Incrementally decode byte chunks into newline-terminated lines (the csv module joins quoted newlines)."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _dict_rows(lines: Iterable[str], required: set, label: str) -> Iterator[Dict]:
+    reader = csv.DictReader(lines)
+    missing = required - set(reader.fieldnames or [])
     if missing:
-        raise ValueError(f"Claim lines CSV missing required columns: {', '.join(sorted(missing))}")
-    return list(reader)
+        raise ValueError(f"{label} CSV missing required columns: {', '.join(sorted(missing))}")
+    return iter(reader)
+
+
+def iter_claims_csv(lines: Iterable[str]) -> Iterator[Dict]:
+    """Claim rows of a claims CSV; the header is checked eagerly (ValueError)."""
+    return _dict_rows(lines, REQUIRED_CLAIM_FIELDS, "Claims")
+
+
+def iter_lines_csv(lines: Iterable[str]) -> Iterator[Dict]:
+    """Line rows of a claim lines CSV; the header is checked eagerly (ValueError)."""
+    return _dict_rows(lines, REQUIRED_LINE_FIELDS, "Claim lines")
+
+
+_LINE_COLUMNS = ("external_line_id", "cdt_code", "description", "line_amount_cents", "tooth_number", "surface")
+
+
+class LineIndex:
+    """Claim lines CSV rows spooled to a temporary on-disk SQLite database.
+
+    Lets claims be joined to their lines one chunk at a time without holding
+    the whole lines file in memory.
+    """
+
+    def __init__(self, rows: Iterable[Dict]):
+        self._db = sqlite3.connect("")  # private temporary file, removed on close
+        self._db.execute(
+            "CREATE TABLE lines (claim_id TEXT, seq INTEGER, external_line_id TEXT, cdt_code TEXT,"
+            " description TEXT, line_amount_cents TEXT, tooth_number TEXT, surface TEXT)"
+        )
+        self._db.executemany(
+            "INSERT INTO lines VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (row["external_claim_id"].strip(), seq, *((row.get(c) or "") for c in _LINE_COLUMNS))
+                for seq, row in enumerate(rows)
+            ),
+        )
+        self._db.execute("CREATE INDEX lines_claim ON lines (claim_id, seq)")
+
+    def rows_for(self, claim_ids: List[str]) -> Dict[str, List[Dict]]:
+        found: Dict[str, List[Dict]] = {}
+        if not claim_ids:
+            return found
+        placeholders = ",".join("?" * len(claim_ids))
+        for claim_id, *values in self._db.execute(
+            f"SELECT claim_id, {', '.join(_LINE_COLUMNS)} FROM lines WHERE claim_id IN ({placeholders}) ORDER BY seq",
+            claim_ids,
+        ):
+            found.setdefault(claim_id, []).append(dict(zip(_LINE_COLUMNS, values)))
+        return found
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def _external_line(row: Dict) -> ExternalClaimLine:
+    return ExternalClaimLine(
+        external_line_id=row["external_line_id"].strip(),
+        cdt_code=row["cdt_code"].strip(),
+        description=(row.get("description") or "").strip() or None,
+        line_amount_cents=int(row["line_amount_cents"]),
+        tooth_number=(row.get("tooth_number") or "").strip() or None,
+        surface=(row.get("surface") or "").strip() or None,
+    )
+
+
+def _external_claim(row: Dict, lines: List[ExternalClaimLine]) -> ExternalClaim:
+    return ExternalClaim(
+        external_claim_id=row["external_claim_id"].strip(),
+        external_patient_id=(row.get("external_patient_id") or "").strip() or None,
+        payer=row["payer"].strip(),
+        total_billed_cents=int(row["total_billed_cents"]),
+        procedure_date=(row.get("procedure_date") or "").strip() or None,
+        submitted_date=(row.get("submitted_date") or "").strip() or None,
+        procedure_codes=(row.get("procedure_codes") or "").strip() or None,
+        lines=lines,
+    )
+
+
+def _row_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(e["msg"] for e in error.errors())
+    return str(error)
+
+
+def iter_external_claim_chunks(
+    claim_rows: Iterable[Dict],
+    line_index: Optional[LineIndex] = None,
+    chunk_size: int = 1000,
+    skip: int = 0,
+) -> Iterator[Tuple[List[ExternalClaim], List[str]]]:
+    """Validate claim rows into ``ExternalClaim`` chunks: ``(claims, row errors)`` per chunk.
+
+    A row that fails validation is reported (with its CSV line number) and
+    skipped; it does not fail the rest of the file. ``skip`` passes over rows
+    already ingested by an earlier attempt.
+    """
+    def flush(rows):
+        lines_by_claim = line_index.rows_for(sorted({r["external_claim_id"].strip() for _, r in rows})) if line_index else {}
+        claims, errors = [], []
+        for row_number, row in rows:
+            try:
+                lines = [_external_line(line) for line in lines_by_claim.get(row["external_claim_id"].strip(), [])]
+                claims.append(_external_claim(row, lines))
+            except (ValueError, AttributeError) as e:
+                errors.append(f"row {row_number} ({(row.get('external_claim_id') or '').strip()}): {_row_error(e)}")
+        return claims, errors
+
+    pending = []
+    numbered = enumerate(claim_rows, start=2)  # line 1 is the header
+    for row_number, row in itertools.islice(numbered, skip, None):
+        pending.append((row_number, row))
+        if len(pending) >= chunk_size:
+            yield flush(pending)
+            pending = []
+    if pending:
+        yield flush(pending)
 
 
 def build_external_claims(
@@ -34,32 +186,10 @@ def build_external_claims(
     line_rows: List[Dict] = None,
 ) -> List[ExternalClaim]:
     lines_by_claim: Dict[str, List[ExternalClaimLine]] = {}
-    if line_rows:
-        for row in line_rows:
-            claim_id = row["external_claim_id"].strip()
-            line = ExternalClaimLine(
-                external_line_id=row["external_line_id"].strip(),
-                cdt_code=row["cdt_code"].strip(),
-                description=row.get("description", "").strip() or None,
-                line_amount_cents=int(row["line_amount_cents"]),
-                tooth_number=row.get("tooth_number", "").strip() or None,
-                surface=row.get("surface", "").strip() or None,
-            )
-            lines_by_claim.setdefault(claim_id, []).append(line)
-
-    claims = []
-    for row in claim_rows:
-        ext_id = row["external_claim_id"].strip()
-        claim = ExternalClaim(
-            external_claim_id=ext_id,
-            external_patient_id=row.get("external_patient_id", "").strip() or None,
-            payer=row["payer"].strip(),
-            total_billed_cents=int(row["total_billed_cents"]),
-            procedure_date=row.get("procedure_date", "").strip() or None,
-            submitted_date=row.get("submitted_date", "").strip() or None,
-            procedure_codes=row.get("procedure_codes", "").strip() or None,
-            lines=lines_by_claim.get(ext_id, []),
-        )
-        claims.append(claim)
+    for row in line_rows or []:
+        lines_by_claim.setdefault(row["external_claim_id"].strip(), []).append(_external_line(row))
 
-    return claims
+    return [
+        _external_claim(row, lines_by_claim.get(row["external_claim_id"].strip(), []))
+        for row in claim_rows
+    ]
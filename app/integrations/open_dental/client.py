@@ -0,0 +1,183 @@
+"""Async, paginated client for the Open Dental API claims endpoint.
+
+``GET {base_url}/claims?DateTStamp=<since>&Offset=<n>&Limit=<page size>``
+returns claims changed at or after ``since`` in ``ClaimNum`` order, each with
+its ``procedures``; a page shorter than the page size is the last one.
+Ordering by the immutable ``ClaimNum`` keeps offsets stable while the
+practice keeps editing: a claim edited mid-sync can only enter the result
+set (a duplicate, skipped downstream by its digest), never drop out of it.
+
+Pages are fetched through one pooled ``httpx.AsyncClient`` with up to
+``concurrency`` requests in flight and at most ``requests_per_second``
+requests started, and are delivered in order. 429 and 5xx responses and
+transport errors are retried with backoff (honouring ``Retry-After``).
+``stream_pages`` runs the fetch loop in a thread and hands pages to
+synchronous code through a bounded queue, so at most a few pages are ever
+buffered.
+"""
+import asyncio
+import queue
+import threading
+from collections import deque
+from typing import AsyncIterator, Iterator, List, Optional
+
+import httpx
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 0.5
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class OpenDentalAPIError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code  # None for transport errors and malformed responses
+
+
+class RateLimiter:
+    """Spaces request starts at least ``1 / rate`` seconds apart."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class OpenDentalClient:
+    def __init__(
+        self,
+        base_url: str,
+        developer_key: str,
+        customer_key: str,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+        timeout: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"Authorization": f"ODFHIR {developer_key}/{customer_key}"}
+        self.page_size = page_size
+        self.concurrency = max(1, concurrency)
+        self.requests_per_second = requests_per_second
+        self.timeout = timeout
+        self.transport = transport
+
+    async def _get_page(self, client: httpx.AsyncClient, limiter: RateLimiter, since: Optional[str], offset: int) -> List[dict]:
+        params = {"Offset": offset, "Limit": self.page_size}
+        if since:
+            params["DateTStamp"] = since
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            await limiter.wait()
+            try:
+                response = await client.get("/claims", params=params)
+            except httpx.TransportError as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise OpenDentalAPIError(f"Open Dental API unreachable: {e}") from e
+                await asyncio.sleep(RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+                continue
+            if response.status_code in _RETRY_STATUSES and attempt < MAX_ATTEMPTS:
+                try:
+                    delay = float(response.headers["Retry-After"])
+                except (KeyError, ValueError):
+                    delay = RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                await asyncio.sleep(delay)
+                continue
+            if response.status_code != 200:
+                raise OpenDentalAPIError(
+                    f"Open Dental API returned {response.status_code} for offset {offset}: {response.text[:200]}",
+                    status_code=response.status_code,
+                )
+            page = response.json()
+            if not isinstance(page, list):
+                raise OpenDentalAPIError(f"Unexpected Open Dental API response for offset {offset}")
+            return page
+        raise OpenDentalAPIError(f"Open Dental API request for offset {offset} failed")  # pragma: no cover
+
+    async def iter_pages(self, since: Optional[str] = None, offset: int = 0) -> AsyncIterator[List[dict]]:
+        """Pages of raw claims changed at or after ``since``, starting at ``offset``, in order."""
+        limiter = RateLimiter(self.requests_per_second)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(
+            base_url=self.base_url, headers=self.headers, limits=limits, timeout=self.timeout, transport=self.transport,
+        ) as client:
+            pending = deque()
+            next_offset = offset
+            try:
+                while True:
+                    while len(pending) < self.concurrency:
+                        pending.append(asyncio.ensure_future(self._get_page(client, limiter, since, next_offset)))
+                        next_offset += self.page_size
+                    page = await pending.popleft()
+                    if page:
+                        yield page
+                    if len(page) < self.page_size:
+                        return
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+
+_DONE = object()
+
+
+def stream_pages(client: OpenDentalClient, since: Optional[str] = None, offset: int = 0, buffer: int = 0) -> Iterator[List[dict]]:
+    """Synchronous view of ``client.iter_pages``: the fetch loop runs in a thread, with backpressure.
+
+    At most ``buffer`` (default: the client's concurrency) pages wait in the
+    queue. Closing the iterator early stops the fetch loop; a fetch error is
+    raised from the iterator.
+    """
+    pages: queue.Queue = queue.Queue(maxsize=buffer or client.concurrency)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def produce():
+        async for page in client.iter_pages(since, offset):
+            # The blocking put runs off the loop so in-flight requests keep going.
+            if not await asyncio.to_thread(put, page):
+                return
+
+    def run():
+        try:
+            asyncio.run(produce())
+        except BaseException as e:
+            put(e)
+        else:
+            put(_DONE)
+
+    thread = threading.Thread(target=run, name="open-dental-fetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join(timeout=5)
@@ -0,0 +1,139 @@
+"""Local mock of the Open Dental API claims endpoint, for offline development and tests.
+
+Serves a deterministic synthetic practice of any size: claim ``n`` (``ClaimNum``
+1..N) is generated on request from a seeded RNG, with ``DateTStamp`` rising by
+one second per claim from ``BASE_STAMP``, so a million claims cost no memory.
+``POST /mock/touch`` edits claims (new fee, ``DateTStamp`` = now) to exercise
+incremental syncs, and ``rate_limit`` answers requests over the limit with
+429 + ``Retry-After``.
+
+    python -m app.integrations.open_dental.mock_server --claims 1000000 --port 8765
+
+then set the connection's ``config_json`` to the printed JSON.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
+
+BASE_STAMP = datetime(2026, 1, 1)
+DEVELOPER_KEY = "mock-developer-key"
+CUSTOMER_KEY = "mock-customer-key"
+PAYERS = ["Delta Dental", "Cigna Dental", "MetLife", "Aetna Dental", "Guardian", "United Concordia"]
+PROCEDURES = [
+    ("D0120", "Periodic oral evaluation", 65.00), ("D0274", "Bitewings - four films", 80.00),
+    ("D1110", "Prophylaxis - adult", 120.00), ("D2150", "Amalgam - two surfaces", 210.00),
+    ("D2391", "Resin composite - one surface", 195.00), ("D2740", "Crown - porcelain/ceramic", 1350.00),
+    ("D3330", "Endodontic therapy, molar", 1250.00), ("D4341", "Periodontal scaling and root planing", 260.00),
+    ("D7140", "Extraction, erupted tooth", 225.00),
+]
+
+
+def _stamp(num: int) -> datetime:
+    return BASE_STAMP + timedelta(seconds=num - 1)
+
+
+def synthetic_claim(num: int, seed: int = 0, stamp: Optional[datetime] = None, fee_bump: int = 0) -> Dict:
+    rng = random.Random(seed * 1_000_003 + num)
+    procedures = []
+    for j in range(rng.randint(1, 3)):
+        code, description, fee = rng.choice(PROCEDURES)
+        procedures.append({
+            "ProcNum": num * 10 + j,
+            "CodeNum": code,
+            "Descript": description,
+            "ProcFee": f"{fee + fee_bump:.2f}",
+            "ToothNum": str(rng.randint(1, 32)) if code.startswith(("D2", "D3", "D7")) else "",
+            "Surf": "MO" if code == "D2150" else "",
+        })
+    service_date = BASE_STAMP.date() - timedelta(days=rng.randint(1, 120))
+    return {
+        "ClaimNum": num,
+        "PatNum": rng.randint(1, max(1, num // 3)),
+        "CarrierName": rng.choice(PAYERS),
+        "ClaimFee": f"{sum(float(p['ProcFee']) for p in procedures):.2f}",
+        "DateService": service_date.isoformat(),
+        "DateSent": (service_date + timedelta(days=rng.randint(0, 10))).isoformat(),
+        "DateTStamp": (stamp or _stamp(num)).isoformat(timespec="seconds"),
+        "procedures": procedures,
+    }
+
+
+def create_mock_app(
+    claims: int = 10_000, seed: int = 0, rate_limit: Optional[float] = None, retry_after: float = 1.0,
+) -> FastAPI:
+    """Mock API over ``claims`` synthetic claims; over ``rate_limit`` requests/second it answers 429."""
+    app = FastAPI(title="Open Dental API (mock)")
+    edits: Dict[int, tuple] = {}  # ClaimNum -> (DateTStamp, fee bump)
+    requests: List[float] = []  # every request
+    accepted: List[float] = []  # requests within the rate limit
+    app.state.edits = edits
+    app.state.requests = requests
+
+    @app.get("/claims")
+    def list_claims(
+        Offset: int = Query(0, ge=0),
+        Limit: int = Query(100, ge=1, le=1000),
+        DateTStamp: Optional[str] = None,
+        authorization: str = Header(""),
+    ):
+        if authorization != f"ODFHIR {DEVELOPER_KEY}/{CUSTOMER_KEY}":
+            raise HTTPException(status_code=401, detail="Invalid developer or customer key")
+        now = time.monotonic()
+        requests.append(now)
+        if rate_limit and sum(1 for t in accepted[-int(rate_limit):] if now - t < 1.0) >= rate_limit:
+            return JSONResponse({"detail": "Too many requests"}, status_code=429, headers={"Retry-After": str(retry_after)})
+        accepted.append(now)
+
+        since = datetime.fromisoformat(DateTStamp) if DateTStamp else None
+        # Unedited claims with a stamp >= since are a ClaimNum suffix; edited
+        # claims below it are added back in ClaimNum order.
+        first = 1 if since is None else max(1, int((since - BASE_STAMP).total_seconds()) + 1)
+        if since is not None and _stamp(first) < since:
+            first += 1
+        extra = sorted(n for n, (stamp, _) in edits.items() if n < first and (since is None or stamp >= since))
+        selected = []
+        for i in range(Offset, Offset + Limit):
+            if i < len(extra):
+                selected.append(extra[i])
+            elif first + i - len(extra) <= claims:
+                selected.append(first + i - len(extra))
+        return [synthetic_claim(n, seed, *edits.get(n, (None, 0))) for n in selected]
+
+    @app.post("/mock/touch")
+    def touch(count: int = Query(1, ge=1), fee_bump: int = Query(10)):
+        """Edit ``count`` claims spread over the practice, as the practice staff would."""
+        stamp = datetime.utcnow().replace(microsecond=0)
+        step = max(1, claims // count)
+        touched = list(range(1, claims + 1, step))[:count]
+        for n in touched:
+            edits[n] = (stamp, edits.get(n, (None, 0))[1] + fee_bump)
+        return {"touched": touched, "DateTStamp": stamp.isoformat()}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the Open Dental API")
+    parser.add_argument("--claims", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests/second before 429s")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    print("config_json:", json.dumps({
+        "base_url": f"http://{args.host}:{args.port}", "developer_key": DEVELOPER_KEY, "customer_key": CUSTOMER_KEY,
+    }))
+    uvicorn.run(create_mock_app(args.claims, args.seed, args.rate_limit), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
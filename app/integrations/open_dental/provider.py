@@ -1,30 +1,43 @@
 import json
 import logging
-from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
 
 from ...schemas.integration import ExternalClaim, ExternalClaimLine
+from ..csv_parser import _row_error
+from .client import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_REQUESTS_PER_SECOND,
+    OpenDentalClient,
+    stream_pages,
+)
 
 logger = logging.getLogger(__name__)
 
+# The next sync re-reads this much before the current one started, so edits
+# racing the sync (or a skewed practice clock) are not missed; digests make
+# the re-read rows cheap.
+CURSOR_OVERLAP = timedelta(minutes=5)
+
 
 class OpenDentalNotConfigured(Exception):
     pass
 
 
 class OpenDentalProvider:
-    def __init__(self, config_json: Optional[str] = None, secrets_ref: Optional[str] = None):
+    def __init__(self, config_json: Optional[str] = None, secrets_ref: Optional[str] = None, transport=None):
         self.config = json.loads(config_json) if config_json else {}
         self.secrets_ref = secrets_ref
         self.base_url = self.config.get("base_url", "")
         self.developer_key = self.config.get("developer_key", "")
         self.customer_key = self.config.get("customer_key", "")
+        self.transport = transport  # httpx transport override (tests, local mock)
 
     def is_configured(self) -> bool:
         return bool(self.base_url and self.developer_key and self.customer_key)
 
-    def fetch_updated_claims(
-        self, cursor: Optional[str] = None
-    ) -> Tuple[List[ExternalClaim], Optional[str]]:
+    def ensure_configured(self) -> None:
         if not self.is_configured():
             raise OpenDentalNotConfigured(
                 "Open Dental API credentials not configured. "
@@ -32,12 +45,45 @@ class OpenDentalProvider:
                 "Use CSV upload as fallback."
             )
 
-        raise NotImplementedError(
-            "Open Dental Cloud API integration pending. "
-            "Endpoint scaffolding ready — implement when API docs and credentials are available. "
-            "Use CSV upload path for pilot."
+    def client(self) -> OpenDentalClient:
+        return OpenDentalClient(
+            self.base_url,
+            self.developer_key,
+            self.customer_key,
+            page_size=int(self.config.get("page_size", DEFAULT_PAGE_SIZE)),
+            concurrency=int(self.config.get("concurrency", DEFAULT_CONCURRENCY)),
+            requests_per_second=float(self.config.get("requests_per_second", DEFAULT_REQUESTS_PER_SECOND)),
+            transport=self.transport,
         )
 
+    @staticmethod
+    def next_cursor(now: Optional[datetime] = None) -> str:
+        """Cursor for the sync after one starting ``now``: its start, less CURSOR_OVERLAP."""
+        return ((now or datetime.utcnow()) - CURSOR_OVERLAP).isoformat(timespec="seconds")
+
+    def fetch_updated_claims(
+        self, cursor: Optional[str] = None, offset: int = 0
+    ) -> Iterator[Tuple[List[ExternalClaim], List[str]]]:
+        """Pages of claims changed at or after ``cursor`` (all claims without one), from ``offset``.
+
+        Yields ``(claims, errors)`` per API page as it arrives; a record that
+        does not map to a valid claim is an error, not a failure. Raises
+        ``OpenDentalAPIError`` if the API keeps failing. The caller keeps the
+        cursor for the next sync (``next_cursor``) and the offset to resume at.
+        """
+        self.ensure_configured()
+        return self._mapped_pages(stream_pages(self.client(), cursor, offset))
+
+    def _mapped_pages(self, pages: Iterator[List[dict]]) -> Iterator[Tuple[List[ExternalClaim], List[str]]]:
+        for page in pages:
+            claims, errors = [], []
+            for raw in page:
+                try:
+                    claims.append(self._map_od_claim(raw))
+                except (ValueError, TypeError) as e:
+                    errors.append(f"claim {raw.get('ClaimNum', '?')}: {_row_error(e)}")
+            yield claims, errors
+
     def _map_od_claim(self, raw: dict) -> ExternalClaim:
         lines = []
         for proc in raw.get("procedures", []):
@@ -47,8 +93,8 @@ class OpenDentalProvider:
                     cdt_code=proc.get("CodeNum", ""),
                     description=proc.get("Descript", ""),
                     line_amount_cents=int(float(proc.get("ProcFee", 0)) * 100),
-                    tooth_number=proc.get("ToothNum"),
-                    surface=proc.get("Surf"),
+                    tooth_number=proc.get("ToothNum") or None,
+                    surface=proc.get("Surf") or None,
                 )
             )
 
@@ -0,0 +1,228 @@
+"""Streaming parser for X12 835 (health care claim payment / ERA) files.
+
+``iter_segments`` takes the delimiters from the fixed-width ISA header and
+splits the byte stream into segments as chunks arrive, so a file is never
+held in memory whole. ``iter_remittances`` walks the segments and yields one
+remittance per ST/SE transaction set (one payment) as soon as its SE is
+read, as keyword arguments of ``RemittanceReconciliationService.ingest_remittance``:
+
+- BPR02 is the amount paid, BPR16 (else DTM*405) the payment date, TRN02 the
+  trace number and N1*PR the payer; ``era_reference`` is TRN03:TRN02, the
+  payer's unique id of the payment;
+- each SVC service line of a CLP claim becomes a line: ``cdt_code`` from the
+  procedure composite, ``paid_cents`` SVC03, ``allowed_cents`` AMT*B6 and
+  the adjustments of its CAS segments;
+- a claim without service lines becomes one line with the claim payment
+  (CLP04), and claim-level CAS adjustments of a claim with service lines an
+  extra line with no procedure and nothing paid.
+
+``external_claim_id`` is the patient control number (CLP01), the claim id
+the practice submitted. Transaction sets other than 835 are skipped.
+"""
+import codecs
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from ..models.remittance import RemittanceSourceType
+
+ISA_LENGTH = 106  # ISA segment including its terminator
+
+
+class X12Error(ValueError):
+    pass
+
+
+def iter_segments(chunks: Iterable[bytes]) -> Iterator[List[str]]:
+    """Segments of an X12 interchange as lists of elements (``seg[0]`` is the segment id)."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    separator = terminator = None
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        if terminator is None:
+            pending = pending.lstrip()
+            if len(pending) < ISA_LENGTH:
+                continue
+            if not pending.startswith("ISA"):
+                raise X12Error("Not an X12 interchange: the file does not start with an ISA segment")
+            separator, terminator = pending[3], pending[105]
+        *segments, pending = pending.split(terminator)
+        for segment in segments:
+            segment = segment.strip()
+            if segment:
+                yield segment.split(separator)
+    pending = (pending + decoder.decode(b"", final=True)).strip()
+    if terminator is None:
+        if pending:
+            raise X12Error("Not an X12 interchange: the ISA segment is incomplete")
+        return
+    if pending:
+        yield pending.split(separator)
+
+
+def _element(segment: List[str], position: int) -> str:
+    return segment[position].strip() if len(segment) > position else ""
+
+
+def _cents(value: str, segment: List[str]) -> int:
+    if not value:
+        return 0
+    try:
+        return int((Decimal(value) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise X12Error(f"{segment[0]}: invalid amount {value!r}")
+
+
+def _date(value: str, segment: List[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y%m%d").date()
+    except ValueError:
+        raise X12Error(f"{segment[0]}: invalid date {value!r}")
+
+
+def _adjustments(segment: List[str]) -> List[Dict[str, Any]]:
+    """CAS: a group code, then up to six (reason, amount, quantity) triples."""
+    group = _element(segment, 1)
+    return [
+        {"group": group, "reason": _element(segment, i), "amount_cents": _cents(_element(segment, i + 1), segment)}
+        for i in range(2, len(segment), 3)
+        if _element(segment, i)
+    ]
+
+
+def _line(external_claim_id: str, cdt_code: Optional[str], paid_cents: int) -> Dict[str, Any]:
+    return {
+        "external_claim_id": external_claim_id,
+        "cdt_code": cdt_code,
+        "paid_cents": paid_cents,
+        "allowed_cents": None,
+        "adjustment_cents": 0,
+        "adjustment_reason_codes": None,
+    }
+
+
+def _adjust(line: Dict[str, Any], adjustments: List[Dict[str, Any]]) -> None:
+    line["adjustment_cents"] += sum(a["amount_cents"] for a in adjustments)
+    line["adjustment_reason_codes"] = (line["adjustment_reason_codes"] or []) + adjustments
+
+
+class _Transaction:
+    """State of the ST/SE transaction set being read."""
+
+    def __init__(self, control_number: str, interchange: str):
+        self.control_number = control_number
+        self.interchange = interchange
+        self.segments = 1  # ST
+        self.fields: Dict[str, Any] = {
+            "payer_name": None,
+            "trace_number": None,
+            "payment_date": None,
+            "total_paid_cents": 0,
+            "source_type": RemittanceSourceType.ERA_835.value,
+            "era_reference": None,
+        }
+        self.production_date: Optional[date] = None
+        self.lines: List[Dict[str, Any]] = []
+        self.claim: Optional[Dict[str, Any]] = None  # CLP being read
+        self.line: Optional[Dict[str, Any]] = None  # SVC being read
+
+    def close_claim(self) -> None:
+        claim, self.claim, self.line = self.claim, None, None
+        if claim is None:
+            return
+        if not claim["lines"]:
+            line = _line(claim["id"], None, claim["paid_cents"])
+            _adjust(line, claim["adjustments"])
+            self.lines.append(line)
+            return
+        self.lines.extend(claim["lines"])
+        if claim["adjustments"]:
+            line = _line(claim["id"], None, 0)
+            _adjust(line, claim["adjustments"])
+            self.lines.append(line)
+
+    def remittance(self) -> Dict[str, Any]:
+        self.close_claim()
+        fields = self.fields
+        fields["payment_date"] = fields["payment_date"] or self.production_date
+        fields["era_reference"] = fields["era_reference"] or f"{self.interchange}:{self.control_number}"
+        fields["total_adjustments_cents"] = sum(line["adjustment_cents"] for line in self.lines)
+        fields["lines"] = self.lines
+        return fields
+
+
+def iter_remittances(segments: Iterable[List[str]]) -> Iterator[Dict[str, Any]]:
+    """One remittance per 835 transaction set, in file order.
+
+    Raises X12Error on malformed amounts or dates, an SE segment count that
+    does not match, or a file that ends inside a transaction set.
+    """
+    component = ":"
+    interchange = ""
+    txn: Optional[_Transaction] = None
+    skipping = False  # inside a transaction set that is not an 835
+    for segment in segments:
+        tag = segment[0].strip()
+        if tag == "ISA":
+            component = _element(segment, 16) or ":"
+            interchange = _element(segment, 13)
+            continue
+        if tag == "ST":
+            if txn is not None:
+                raise X12Error(f"ST {txn.control_number}: no SE segment before the next ST")
+            if _element(segment, 1) != "835":
+                skipping = True
+                continue
+            txn = _Transaction(_element(segment, 2), interchange)
+            continue
+        if skipping:
+            skipping = tag != "SE"
+            continue
+        if txn is None:
+            continue  # GS / GE / IEA envelope segments
+        txn.segments += 1
+
+        if tag == "SE":
+            count = _element(segment, 1)
+            if count.isdigit() and int(count) != txn.segments:
+                raise X12Error(f"ST {txn.control_number}: SE counts {count} segments, the transaction has {txn.segments}")
+            yield txn.remittance()
+            txn = None
+        elif tag == "BPR":
+            txn.fields["total_paid_cents"] = _cents(_element(segment, 2), segment)
+            txn.fields["payment_date"] = _date(_element(segment, 16), segment)
+        elif tag == "TRN":
+            txn.fields["trace_number"] = _element(segment, 2) or None
+            if _element(segment, 2):
+                txn.fields["era_reference"] = f"{_element(segment, 3)}:{_element(segment, 2)}"
+        elif tag == "DTM" and _element(segment, 1) == "405":
+            txn.production_date = _date(_element(segment, 2), segment)
+        elif tag == "N1" and _element(segment, 1) == "PR":
+            txn.fields["payer_name"] = _element(segment, 2) or None
+        elif tag == "CLP":
+            txn.close_claim()
+            txn.claim = {
+                "id": _element(segment, 1),
+                "paid_cents": _cents(_element(segment, 4), segment),
+                "adjustments": [],
+                "lines": [],
+            }
+        elif tag == "SVC" and txn.claim is not None:
+            procedure = _element(segment, 1).split(component)
+            code = procedure[1] if len(procedure) > 1 else procedure[0]
+            txn.line = _line(txn.claim["id"], code[:10] or None, _cents(_element(segment, 3), segment))
+            txn.claim["lines"].append(txn.line)
+        elif tag == "CAS" and txn.claim is not None:
+            if txn.line is not None:
+                _adjust(txn.line, _adjustments(segment))
+            else:
+                txn.claim["adjustments"].extend(_adjustments(segment))
+        elif tag == "AMT" and _element(segment, 1) == "B6" and txn.line is not None:
+            txn.line["allowed_cents"] = _cents(_element(segment, 2), segment)
+        elif tag == "PLB":
+            txn.close_claim()  # provider-level adjustments follow the last claim
+    if txn is not None:
+        raise X12Error(f"ST {txn.control_number}: the file ends before its SE segment")
@@ -1,5 +1,6 @@
 import logging
 import os
+import threading
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Depends
@@ -11,6 +12,9 @@ from .routers import auth_router, claims_router, users_router, practice_router,
 from .database import engine, get_db
 from .config import get_settings
 from .utils.migrations import run_migrations_if_enabled, get_migration_state
+from .services.ontology_brief import close_brief_client
+from .services.ingestion_jobs import IngestionJobService
+from .services.sync_scheduler import SyncSchedulerService
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +30,13 @@ async def lifespan(app: FastAPI):
     run_migrations_if_enabled(engine)
     state = get_migration_state(engine)
     print(f"[startup] Migration state: {state}")
+    IngestionJobService.resume_stale_runs_in_thread()
+    scheduler_stop = threading.Event()
+    if settings.sync_scheduler_enabled:
+        SyncSchedulerService.start_in_thread(scheduler_stop)
     yield
+    scheduler_stop.set()
+    await close_brief_client()
 
 
 app = FastAPI(
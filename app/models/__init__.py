@@ -8,7 +8,7 @@ from .payment import PaymentIntent, PaymentIntentStatus, PaymentProvider, PAYMEN
 from .ledger import LedgerAccount, LedgerAccountType, LedgerEntry, LedgerEntryDirection, LedgerEntryStatus, LedgerEntryRelatedType
 from .practice_application import PracticeApplication, ApplicationStatus, PracticeType, BillingModel, UrgencyLevel
 from .invite import PracticeManagerInvite
-from .ontology import OntologyObject, OntologyObjectType, OntologyLink, OntologyLinkType, KPIObservation
+from .ontology import OntologyObject, OntologyObjectType, OntologyLink, OntologyLinkType, KPIObservation, OntologyBrief
 from .integration import IntegrationConnection, IntegrationSyncRun, IntegrationProvider, IntegrationStatus, SyncRunStatus
 from .ops import OpsTask, TaskStatus, PlaybookType, ExternalBalanceSnapshot, ExternalPaymentConfirmation
 
@@ -21,6 +21,10 @@ from .claim_line import ClaimLine, ClaimLineStatus
 from .funding_decision import FundingDecision, FundingDecisionType
 from .remittance import Remittance, RemittanceLine, PostingStatus, RemittanceSourceType, RemittanceLineMatchStatus
 from .fee_schedule import FeeScheduleItem
+from .patient_dimension import PatientDimension
+from .metric_sketch import MetricSketch
+from .insight_rollup import PayerRollup, ProcedureRollup
+from .portfolio_risk import PortfolioRiskRun, PortfolioRisk, PortfolioRiskRunStatus
 
 __all__ = [
     "User",
@@ -69,4 +73,11 @@ __all__ = [
     "RemittanceSourceType",
     "RemittanceLineMatchStatus",
     "FeeScheduleItem",
+    "PatientDimension",
+    "MetricSketch",
+    "PayerRollup",
+    "ProcedureRollup",
+    "PortfolioRiskRun",
+    "PortfolioRisk",
+    "PortfolioRiskRunStatus",
 ]
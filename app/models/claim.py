@@ -1,9 +1,10 @@
 import secrets
 import base64
+import hashlib
 from datetime import datetime, date
 from enum import Enum
 from typing import Optional
-from sqlalchemy import Column, Integer, String, DateTime, Date, BigInteger, ForeignKey, Boolean, Text, Index
+from sqlalchemy import Column, Integer, String, DateTime, Date, BigInteger, ForeignKey, Boolean, Text, Index, event
 from sqlalchemy.orm import relationship
 
 from ..database import Base
@@ -41,6 +42,7 @@ class Claim(Base):
     
     practice_id = Column(Integer, ForeignKey("practices.id"), nullable=False, index=True)
     patient_name = Column(String(255), nullable=True)
+    patient_hash = Column(String(16), nullable=True)  # set on write, see compute_patient_hash
     payer = Column(String(255), nullable=False)  # kept for backward compat
     amount_cents = Column(BigInteger, nullable=False)  # = total_billed_cents
     procedure_date = Column(Date, nullable=True)
@@ -51,6 +53,7 @@ class Claim(Base):
     
     external_claim_id = Column(String(255), nullable=True, index=True)
     external_source = Column(String(50), nullable=True)
+    external_digest = Column(String(32), nullable=True)  # digest of the last ingested payload
     procedure_codes = Column(String(500), nullable=True)  # kept for backward compat
     
     claim_token = Column(String(20), unique=True, index=True, nullable=False)
@@ -92,6 +95,8 @@ class Claim(Base):
     __table_args__ = (
         Index("idx_claims_payer_id", "payer_id"),
         Index("idx_claims_status_practice", "status", "practice_id"),
+        Index("idx_claims_practice_patient_hash", "practice_id", "patient_hash"),
+        Index("idx_claims_practice_external_digest", "practice_id", "external_claim_id", "external_digest"),
     )
     
     @staticmethod
@@ -115,3 +120,16 @@ class Claim(Base):
             payer or "",
         ]
         return "|".join(parts)
+
+    @staticmethod
+    def compute_patient_hash(practice_id: Optional[int], patient_name: Optional[str]) -> str:
+        """Pseudonymous, practice-scoped patient key (case- and trailing-space-insensitive)."""
+        raw = f"{practice_id}:{patient_name or 'unknown'}".lower().strip()
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+@event.listens_for(Claim, "before_insert")
+@event.listens_for(Claim, "before_update")
+def _set_patient_hash(mapper, connection, target):
+    # Core bulk inserts bypass this and must supply patient_hash themselves.
+    target.patient_hash = Claim.compute_patient_hash(target.practice_id, target.patient_name)
@@ -22,6 +22,7 @@ class ClaimLine(Base):
     claim_id = Column(Integer, ForeignKey("claims.id"), nullable=False, index=True)
     procedure_code_id = Column(Integer, ForeignKey("procedure_codes.id"), nullable=True, index=True)
     provider_id = Column(Integer, ForeignKey("providers.id"), nullable=True, index=True)
+    external_line_id = Column(String(255), nullable=True)  # practice-system line id (ingested lines)
 
     cdt_code = Column(String(10), nullable=True)  # denormalized for convenience
     tooth = Column(String(10), nullable=True)
@@ -44,4 +45,5 @@ class ClaimLine(Base):
     __table_args__ = (
         Index("idx_claim_lines_claim", "claim_id"),
         Index("idx_claim_lines_procedure", "procedure_code_id"),
+        Index("uq_claim_lines_claim_external_line", "claim_id", "external_line_id", unique=True),
     )
@@ -0,0 +1,362 @@
+"""Insight rollups - per-practice totals behind the payer and procedure insights.
+
+``payer_rollups`` holds one row per (practice, payer): claim, denial and
+billed totals, confirmed payments and funding decision counts / risk-score
+sums. ``procedure_rollups`` holds one row per (practice, CDT code) of claim
+lines: line, denial, billed and allowed totals.
+
+Rows are maintained incrementally on every ORM flush: before the flush the
+contribution of the rows about to change is read from the database, after
+the flush it is read again and the difference is added to the rollups.
+Changing a claim's practice, payer or status re-attributes its lines,
+payments and decisions the same way. Bulk Core writes bypass the flush hooks
+and must either bracket the write with ``read_claim_contributions`` /
+``apply_claim_contributions`` (claims, and the lines of the given claims) or
+call ``rebuild_insight_rollups``, which recomputes a practice from scratch
+and reports how many rows had drifted; the ontology rebuild and
+``scripts/verify_insight_rollups.py`` use it as the periodic check.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Float, ForeignKey, UniqueConstraint, delete, event, func, inspect, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from ..database import Base
+from .claim import Claim, ClaimStatus
+from .claim_line import ClaimLine
+from .funding_decision import FundingDecision, FundingDecisionType
+from .metric_sketch import UNKNOWN_PAYER
+from .payment import PaymentIntent, PaymentIntentStatus
+
+UNKNOWN_CODE = "UNKNOWN"
+
+DECISION_COUNT_COLUMNS = {
+    FundingDecisionType.APPROVE.value: "approve_count",
+    FundingDecisionType.DENY.value: "deny_count",
+    FundingDecisionType.NEEDS_REVIEW.value: "needs_review_count",
+}
+PAYER_TOTALS = (
+    "claim_count", "denied_count", "billed_cents", "paid_cents", "decision_count",
+    *DECISION_COUNT_COLUMNS.values(), "risk_score_sum", "risk_score_count",
+)
+PROCEDURE_TOTALS = ("line_count", "denied_count", "billed_cents", "allowed_cents")
+
+# Columns feeding the rollups; writes touching only other columns skip them.
+_CLAIM_FIELDS = ("practice_id", "payer", "status", "amount_cents")
+_CLAIM_LINE_FIELDS = ("practice_id", "status")  # also re-attribute the claim's lines
+_CLAIM_PAYER_FIELDS = ("practice_id", "payer")  # also re-attribute its payments and decisions
+_PAYMENT_FIELDS = ("claim_id", "practice_id", "status", "amount_cents")
+_LINE_FIELDS = ("claim_id", "cdt_code", "billed_fee_cents", "allowed_fee_cents")
+_DECISION_FIELDS = ("claim_id", "decision", "risk_score")
+
+
+class PayerRollup(Base):
+    __tablename__ = "payer_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    practice_id = Column(Integer, ForeignKey("practices.id"), nullable=False)
+    payer = Column(String(255), nullable=False)
+    first_claim_id = Column(Integer, nullable=True)  # stable payer ordering
+
+    claim_count = Column(BigInteger, nullable=False, default=0)
+    denied_count = Column(BigInteger, nullable=False, default=0)
+    billed_cents = Column(BigInteger, nullable=False, default=0)
+    paid_cents = Column(BigInteger, nullable=False, default=0)  # confirmed payment intents
+    decision_count = Column(BigInteger, nullable=False, default=0)
+    approve_count = Column(BigInteger, nullable=False, default=0)
+    deny_count = Column(BigInteger, nullable=False, default=0)
+    needs_review_count = Column(BigInteger, nullable=False, default=0)
+    risk_score_sum = Column(Float, nullable=False, default=0.0)
+    risk_score_count = Column(BigInteger, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("practice_id", "payer", name="uq_payer_rollups_practice_payer"),
+    )
+
+
+class ProcedureRollup(Base):
+    __tablename__ = "procedure_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    practice_id = Column(Integer, ForeignKey("practices.id"), nullable=False)
+    cdt_code = Column(String(10), nullable=False)
+
+    line_count = Column(BigInteger, nullable=False, default=0)
+    denied_count = Column(BigInteger, nullable=False, default=0)  # lines of declined claims
+    billed_cents = Column(BigInteger, nullable=False, default=0)
+    allowed_cents = Column(BigInteger, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("practice_id", "cdt_code", name="uq_procedure_rollups_practice_code"),
+    )
+
+
+Totals = Dict[Tuple[int, str], Dict[str, float]]
+
+_payer_label = func.coalesce(func.nullif(Claim.payer, ""), UNKNOWN_PAYER)
+_code_label = func.coalesce(func.nullif(ClaimLine.cdt_code, ""), UNKNOWN_CODE)
+_declined = Claim.status == ClaimStatus.DECLINED.value
+
+
+def _payer_totals(conn, claims: Optional[list], payments: Optional[list], decisions: Optional[list]) -> Tuple[Totals, Dict]:
+    """Payer totals of the claims / payments / decisions matching each criteria list (None skips a source).
+
+    Returns (totals, first claim id per key).
+    """
+    totals: Totals = defaultdict(lambda: dict.fromkeys(PAYER_TOTALS, 0))
+    first_claim_ids = {}
+    if claims is not None:
+        for practice_id, payer, count, denied, billed, first_id in conn.execute(
+            select(
+                Claim.practice_id, _payer_label, func.count(Claim.id), func.count(Claim.id).filter(_declined),
+                func.coalesce(func.sum(Claim.amount_cents), 0), func.min(Claim.id),
+            ).where(*claims).group_by(Claim.practice_id, _payer_label)
+        ):
+            totals[(practice_id, payer)].update(claim_count=count, denied_count=denied, billed_cents=int(billed))
+            first_claim_ids[(practice_id, payer)] = first_id
+    if payments is not None:
+        for practice_id, payer, paid in conn.execute(
+            select(Claim.practice_id, _payer_label, func.sum(PaymentIntent.amount_cents))
+            .join(Claim, (Claim.id == PaymentIntent.claim_id) & (Claim.practice_id == PaymentIntent.practice_id))
+            .where(PaymentIntent.status == PaymentIntentStatus.CONFIRMED.value, *payments)
+            .group_by(Claim.practice_id, _payer_label)
+        ):
+            totals[(practice_id, payer)]["paid_cents"] = int(paid)
+    if decisions is not None:
+        decision_counts = [
+            func.count(FundingDecision.id).filter(FundingDecision.decision == decision)
+            for decision in DECISION_COUNT_COLUMNS
+        ]
+        for practice_id, payer, count, *counts, risk_sum, risk_count in conn.execute(
+            select(
+                Claim.practice_id, _payer_label, func.count(FundingDecision.id), *decision_counts,
+                func.coalesce(func.sum(FundingDecision.risk_score), 0.0), func.count(FundingDecision.risk_score),
+            ).join(Claim, Claim.id == FundingDecision.claim_id).where(*decisions)
+            .group_by(Claim.practice_id, _payer_label)
+        ):
+            row = totals[(practice_id, payer)]
+            row.update(zip(DECISION_COUNT_COLUMNS.values(), counts))
+            row.update(decision_count=count, risk_score_sum=float(risk_sum), risk_score_count=risk_count)
+    return totals, first_claim_ids
+
+
+def _procedure_totals(conn, lines: list) -> Totals:
+    totals: Totals = {}
+    for practice_id, code, count, denied, billed, allowed in conn.execute(
+        select(
+            Claim.practice_id, _code_label, func.count(ClaimLine.id), func.count(ClaimLine.id).filter(_declined),
+            func.coalesce(func.sum(ClaimLine.billed_fee_cents), 0), func.coalesce(func.sum(ClaimLine.allowed_fee_cents), 0),
+        ).join(Claim, Claim.id == ClaimLine.claim_id).where(*lines).group_by(Claim.practice_id, _code_label)
+    ):
+        totals[(practice_id, code)] = {
+            "line_count": count, "denied_count": denied, "billed_cents": int(billed), "allowed_cents": int(allowed),
+        }
+    return totals
+
+
+def _same(a: Dict[str, float], b: Dict[str, float]) -> bool:
+    return all(math.isclose(a[k], b[k], rel_tol=1e-9, abs_tol=1e-6) for k in a)
+
+
+def rebuild_insight_rollups(db: Session, practice_id: int) -> int:
+    """Recompute a practice's rollups from its claims, lines, payments and decisions.
+
+    Runs on the session's connection. Returns the number of rollup rows that
+    differed from the recomputed totals (0 when the incremental upkeep is
+    consistent).
+    """
+    conn = db.connection()
+    practice_claims = select(Claim.id).where(Claim.practice_id == practice_id)
+    payer, first_claim_ids = _payer_totals(
+        conn,
+        [Claim.practice_id == practice_id],
+        [PaymentIntent.practice_id == practice_id],
+        [FundingDecision.claim_id.in_(practice_claims)],
+    )
+    procedure = _procedure_totals(conn, [ClaimLine.claim_id.in_(practice_claims)])
+
+    drift = 0
+    now = datetime.utcnow()
+    for model, key_column, totals, columns, extra in (
+        (PayerRollup, "payer", payer, PAYER_TOTALS, lambda key: {"first_claim_id": first_claim_ids.get(key)}),
+        (ProcedureRollup, "cdt_code", procedure, PROCEDURE_TOTALS, lambda key: {}),
+    ):
+        table = model.__table__
+        current = {
+            (practice_id, row[0]): dict(zip(columns, row[1:]))
+            for row in conn.execute(
+                select(table.c[key_column], *(table.c[c] for c in columns)).where(table.c.practice_id == practice_id)
+            )
+        }
+        drift += sum(1 for key in set(current) | set(totals) if key not in current or key not in totals or not _same(totals[key], current[key]))
+        conn.execute(delete(table).where(table.c.practice_id == practice_id))
+        if totals:
+            conn.execute(insert(table), [
+                {"practice_id": key[0], key_column: key[1], **values, **extra(key), "updated_at": now}
+                for key, values in sorted(totals.items())
+            ])
+    return drift
+
+
+def _apply_deltas(conn, model, key_column: str, columns, before: Totals, after: Totals, first_claim_ids=None) -> None:
+    deltas = {}
+    for key in set(before) | set(after):
+        old, new = before.get(key, {}), after.get(key, {})
+        delta = {c: new.get(c, 0) - old.get(c, 0) for c in columns}
+        if any(delta.values()):
+            deltas[key] = delta
+    if not deltas:
+        return
+
+    table = model.__table__
+    now = datetime.utcnow()
+    stmt = insert(table)
+    set_ = {c: table.c[c] + stmt.excluded[c] for c in columns}
+    set_["updated_at"] = now
+    if first_claim_ids is not None:
+        set_["first_claim_id"] = func.least(table.c.first_claim_id, stmt.excluded.first_claim_id)
+    conn.execute(
+        stmt.on_conflict_do_update(index_elements=["practice_id", key_column], set_=set_),
+        [
+            {
+                "practice_id": key[0], key_column: key[1], **delta, "updated_at": now,
+                **({"first_claim_id": first_claim_ids.get(key)} if first_claim_ids is not None else {}),
+            }
+            for key, delta in sorted(deltas.items())
+        ],
+    )
+
+    count_column = columns[0]
+    shrunk = sorted(key for key, delta in deltas.items() if delta[count_column] < 0)
+    if not shrunk:
+        return
+    conn.execute(delete(table).where(
+        tuple_(table.c.practice_id, table.c[key_column]).in_(shrunk), table.c[count_column] <= 0,
+    ))
+    if first_claim_ids is not None:
+        # The first claim of a payer may have left it; least() only handles additions.
+        for practice_id, payer in shrunk:
+            conn.execute(
+                table.update()
+                .where(table.c.practice_id == practice_id, table.c.payer == payer)
+                .values(first_claim_id=select(func.min(Claim.id)).where(
+                    Claim.practice_id == practice_id, _payer_label == payer
+                ).scalar_subquery())
+            )
+
+
+def _new_ids() -> Dict[str, set]:
+    # "*_claims": claims whose children are re-attributed (lines follow the
+    # claim's practice and status, payments and decisions its practice and payer).
+    return {k: set() for k in ("claims", "payments", "lines", "decisions", "line_claims", "payer_claims")}
+
+
+def _scope(ids: set, column, claim_ids: set, claim_column) -> Optional[list]:
+    criteria = []
+    if ids:
+        criteria.append(column.in_(sorted(ids)))
+    if claim_ids:
+        criteria.append(claim_column.in_(sorted(claim_ids)))
+    return [or_(*criteria)] if criteria else None
+
+
+def _contributions(conn, ids: Dict[str, set]):
+    """Current payer and procedure contribution of the tracked rows."""
+    claims = [Claim.id.in_(sorted(ids["claims"]))] if ids["claims"] else None
+    payments = _scope(ids["payments"], PaymentIntent.id, ids["payer_claims"], PaymentIntent.claim_id)
+    decisions = _scope(ids["decisions"], FundingDecision.id, ids["payer_claims"], FundingDecision.claim_id)
+    lines = _scope(ids["lines"], ClaimLine.id, ids["line_claims"], ClaimLine.claim_id)
+    payer = ({}, {})
+    if claims or payments or decisions:
+        payer = _payer_totals(conn, claims, payments, decisions)
+    return payer, _procedure_totals(conn, lines) if lines else {}
+
+
+def _claim_ids(claim_ids, line_claim_ids=()) -> Dict[str, set]:
+    # Bulk claim writes may change payer and amount, never practice or status.
+    ids = _new_ids()
+    ids["claims"] = set(claim_ids)
+    ids["payer_claims"] = set(claim_ids)
+    ids["line_claims"] = set(line_claim_ids)
+    return ids
+
+
+def read_claim_contributions(db: Session, claim_ids, line_claim_ids=()):
+    """Before a bulk Core update of these claims (and of the lines of ``line_claim_ids``): their current contribution."""
+    return _contributions(db.connection(), _claim_ids(claim_ids, line_claim_ids))
+
+
+def apply_claim_contributions(db: Session, claim_ids, before, line_claim_ids=()) -> None:
+    """After a bulk Core insert / update of claims or lines: add the difference to the rollups.
+
+    ``claim_ids`` covers the updated and the inserted claims, ``line_claim_ids``
+    the claims whose lines were written; ``before`` is what
+    ``read_claim_contributions`` returned for the existing ones.
+    """
+    ids = _claim_ids(claim_ids, line_claim_ids)
+    if not ids["claims"] and not ids["line_claims"]:
+        return
+    conn = db.connection()
+    (payer_after, first_claim_ids), procedure_after = _contributions(conn, ids)
+    (payer_before, _), procedure_before = before
+    _apply_deltas(conn, PayerRollup, "payer", PAYER_TOTALS, payer_before, payer_after, first_claim_ids)
+    _apply_deltas(conn, ProcedureRollup, "cdt_code", PROCEDURE_TOTALS, procedure_before, procedure_after)
+
+
+def _changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[f].history.has_changes() for f in fields)
+
+
+_TRACKED = (
+    (Claim, "claims", _CLAIM_FIELDS),
+    (PaymentIntent, "payments", _PAYMENT_FIELDS),
+    (ClaimLine, "lines", _LINE_FIELDS),
+    (FundingDecision, "decisions", _DECISION_FIELDS),
+)
+
+
+@event.listens_for(Session, "before_flush")
+def _read_rollup_contributions(session, flush_context, instances):
+    # Contribution of the rows about to change, as currently stored; the
+    # post-flush contribution of the same rows is subtracted from it below.
+    ids = _new_ids()
+    for obj in list(session.dirty) + list(session.deleted):
+        deleted = obj in session.deleted
+        for model, kind, fields in _TRACKED:
+            if isinstance(obj, model) and (deleted or _changed(obj, fields)):
+                ids[kind].add(obj.id)
+        if isinstance(obj, Claim):
+            if deleted or _changed(obj, _CLAIM_LINE_FIELDS):
+                ids["line_claims"].add(obj.id)
+            if deleted or _changed(obj, _CLAIM_PAYER_FIELDS):
+                ids["payer_claims"].add(obj.id)
+    if not any(ids.values()):
+        session.info.pop("insight_rollup_pending", None)
+        return
+    session.info["insight_rollup_pending"] = (ids, _contributions(session.connection(), ids))
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_rollup_deltas_on_flush(session, flush_context):
+    ids, before = session.info.pop("insight_rollup_pending", None) or (_new_ids(), (({}, {}), {}))
+    for obj in session.new:
+        for model, kind, _ in _TRACKED:
+            if isinstance(obj, model):
+                ids[kind].add(obj.id)
+    if not any(ids.values()):
+        return
+
+    conn = session.connection()
+    (payer_after, first_claim_ids), procedure_after = _contributions(conn, ids)
+    (payer_before, _), procedure_before = before
+    _apply_deltas(conn, PayerRollup, "payer", PAYER_TOTALS, payer_before, payer_after, first_claim_ids)
+    _apply_deltas(conn, ProcedureRollup, "cdt_code", PROCEDURE_TOTALS, procedure_before, procedure_after)
@@ -18,6 +18,7 @@ class IntegrationStatus(str, Enum):
 
 
 class SyncRunStatus(str, Enum):
+    QUEUED = "QUEUED"
     RUNNING = "RUNNING"
     SUCCEEDED = "SUCCEEDED"
     FAILED = "FAILED"
@@ -34,6 +35,10 @@ class IntegrationConnection(Base):
     secrets_ref = Column(String(255), nullable=True)
     last_cursor = Column(String(255), nullable=True)
     last_synced_at = Column(DateTime, nullable=True)
+    # Scheduled API syncs, see services/sync_scheduler.py: when the next one is
+    # due (NULL = now), pushed back after each failure in a row
+    next_sync_at = Column(DateTime, nullable=True)
+    consecutive_failures = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -53,8 +58,18 @@ class IntegrationSyncRun(Base):
     status = Column(String(50), nullable=False, default=SyncRunStatus.RUNNING.value)
     pulled_count = Column(Integer, nullable=False, default=0)
     upserted_count = Column(Integer, nullable=False, default=0)
+    bytes_total = Column(BigInteger, nullable=True)
+    bytes_processed = Column(BigInteger, nullable=True)
+    rows_total = Column(Integer, nullable=True)  # known up front for API syncs only
     error_json = Column(Text, nullable=True)
     sync_type = Column(String(50), nullable=False, default="API")
 
+    # Background job state, see services/ingestion_jobs.py
+    triggered_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    payload_path = Column(String(500), nullable=True)  # spooled upload directory
+    checkpoint_json = Column(Text, nullable=True)  # rows consumed + running totals, committed with each chunk
+    heartbeat_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+
     connection = relationship("IntegrationConnection", back_populates="sync_runs")
     practice = relationship("Practice")
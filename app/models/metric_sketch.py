@@ -0,0 +1,221 @@
+"""MetricSketch model - per-practice, per-payer quantile sketches of payment timings.
+
+Each row holds a ``QuantileSketch`` (JSONB) of one timing metric for the
+payments of one (practice, payer). Sketches are updated when a payment
+intent is confirmed and rebuilt from scratch by the ontology rebuild;
+practice-wide and portfolio-wide distributions are merges of the rows.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, ForeignKey, UniqueConstraint, delete, event, inspect, select, tuple_
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.orm import Session
+
+from ..database import Base
+from ..utils.quantile_sketch import QuantileSketch
+from .claim import Claim
+from .payment import PaymentIntent
+
+REIMBURSEMENT_LAG = "reimbursement_lag_days"  # payment sent -> confirmed
+PAYMENT_CYCLE = "payment_cycle_days"  # payment created -> confirmed
+CLAIM_CYCLE = "claim_cycle_days"  # claim created -> payment confirmed
+SKETCH_METRICS = (REIMBURSEMENT_LAG, PAYMENT_CYCLE, CLAIM_CYCLE)
+
+UNKNOWN_PAYER = "Unknown"
+
+# Columns behind the samples; see _record_confirmations_on_flush.
+_PAYMENT_TIMING_FIELDS = ("practice_id", "claim_id", "sent_at", "created_at", "confirmed_at")
+_CLAIM_TIMING_FIELDS = ("payer", "created_at")
+
+
+class MetricSketch(Base):
+    __tablename__ = "metric_sketches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    practice_id = Column(Integer, ForeignKey("practices.id"), nullable=False)
+    metric = Column(String(50), nullable=False)
+    payer = Column(String(255), nullable=False)
+    sample_count = Column(BigInteger, nullable=False, default=0)
+    sketch = Column(JSONB, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("practice_id", "metric", "payer", name="uq_metric_sketches_practice_metric_payer"),
+    )
+
+
+def _days(later: Optional[datetime], earlier: Optional[datetime]) -> Optional[float]:
+    if later is None or earlier is None:
+        return None
+    return (later - earlier).total_seconds() / 86400.0
+
+
+def _payment_samples(rows) -> Dict[Tuple[int, str, str], list]:
+    """Group (practice_id, payer, sent, created, confirmed, claim created) rows into metric samples."""
+    samples = defaultdict(list)
+    for practice_id, payer, sent_at, created_at, confirmed_at, claim_created_at in rows:
+        payer = payer or UNKNOWN_PAYER
+        for metric, earlier in (
+            (REIMBURSEMENT_LAG, sent_at),
+            (PAYMENT_CYCLE, created_at),
+            (CLAIM_CYCLE, claim_created_at),
+        ):
+            days = _days(confirmed_at, earlier)
+            if days is not None:
+                samples[(practice_id, metric, payer)].append(days)
+    return samples
+
+
+def _payment_rows(*criteria):
+    return select(
+        PaymentIntent.practice_id, Claim.payer, PaymentIntent.sent_at, PaymentIntent.created_at,
+        PaymentIntent.confirmed_at, Claim.created_at,
+    ).join(Claim, Claim.id == PaymentIntent.claim_id).where(PaymentIntent.confirmed_at.isnot(None), *criteria)
+
+
+def _write(conn, sketches: Dict[Tuple[int, str, str], QuantileSketch]) -> None:
+    if not sketches:
+        return
+    stmt = insert(MetricSketch.__table__)
+    now = datetime.utcnow()
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["practice_id", "metric", "payer"],
+            set_={"sketch": stmt.excluded.sketch, "sample_count": stmt.excluded.sample_count, "updated_at": now},
+        ),
+        [
+            {
+                "practice_id": practice_id, "metric": metric, "payer": payer,
+                "sample_count": sketch.count, "sketch": sketch.to_dict(), "updated_at": now,
+            }
+            for (practice_id, metric, payer), sketch in sorted(sketches.items())
+        ],
+    )
+
+
+def rebuild_metric_sketches(db: Session, practice_id: int) -> int:
+    """Recompute every sketch of a practice from its confirmed payments."""
+    conn = db.connection()
+    conn.execute(delete(MetricSketch.__table__).where(MetricSketch.practice_id == practice_id))
+    sketches = {}
+    for key, values in _payment_samples(conn.execute(_payment_rows(PaymentIntent.practice_id == practice_id))).items():
+        sketches[key] = QuantileSketch()
+        sketches[key].add_many(values)
+    _write(conn, sketches)
+    return len(sketches)
+
+
+def record_confirmed_payments(db: Session, payment_ids: Iterable) -> None:
+    """Fold newly confirmed payments into their (practice, payer) sketches."""
+    payment_ids = list(payment_ids)
+    if not payment_ids:
+        return
+    conn = db.connection()
+    samples = _payment_samples(conn.execute(_payment_rows(PaymentIntent.id.in_(payment_ids))))
+    if not samples:
+        return
+    keys = sorted(samples)
+    # Create missing rows first so the row locks below serialize concurrent
+    # confirmations for the same payer.
+    conn.execute(
+        insert(MetricSketch.__table__).on_conflict_do_nothing(),
+        [
+            {"practice_id": p, "metric": m, "payer": payer, "sample_count": 0,
+             "sketch": QuantileSketch().to_dict(), "updated_at": datetime.utcnow()}
+            for p, m, payer in keys
+        ],
+    )
+    current = conn.execute(
+        select(MetricSketch.practice_id, MetricSketch.metric, MetricSketch.payer, MetricSketch.sketch)
+        .where(tuple_(MetricSketch.practice_id, MetricSketch.metric, MetricSketch.payer).in_(keys))
+        .with_for_update()
+    ).all()
+    sketches = {}
+    for practice_id, metric, payer, data in current:
+        sketch = QuantileSketch.from_dict(data)
+        sketch.add_many(samples[(practice_id, metric, payer)])
+        sketches[(practice_id, metric, payer)] = sketch
+    _write(conn, sketches)
+
+
+def load_metric_sketches(
+    db: Session, metric: str, practice_ids: Optional[Iterable[int]] = None
+) -> Dict[Tuple[int, str], QuantileSketch]:
+    """Sketches of one metric keyed by (practice_id, payer); all practices if ``practice_ids`` is None."""
+    query = db.query(MetricSketch.practice_id, MetricSketch.payer, MetricSketch.sketch).filter(
+        MetricSketch.metric == metric
+    )
+    if practice_ids is not None:
+        query = query.filter(MetricSketch.practice_id.in_(list(practice_ids)))
+    return {(practice_id, payer): QuantileSketch.from_dict(data) for practice_id, payer, data in query.all()}
+
+
+def merged_sketch(sketches: Iterable[QuantileSketch]) -> QuantileSketch:
+    merged = QuantileSketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+
+def practice_sketch(db: Session, practice_id: int, metric: str) -> QuantileSketch:
+    """Practice-wide sketch: the merge of the practice's per-payer sketches."""
+    return merged_sketch(load_metric_sketches(db, metric, [practice_id]).values())
+
+
+def sketch_summary(sketch: QuantileSketch, ndigits: int = 2) -> dict:
+    """Sample size, mean and p50/p90/p95 of a sketch, rounded for API responses."""
+    if not sketch.count:
+        return {"sample_size": 0, "avg_days": None, "p50_days": None, "p90_days": None, "p95_days": None}
+    return {
+        "sample_size": sketch.count,
+        "avg_days": round(sketch.mean, ndigits),
+        "p50_days": round(sketch.quantile(0.5), ndigits),
+        "p90_days": round(sketch.quantile(0.9), ndigits),
+        "p95_days": round(sketch.quantile(0.95), ndigits),
+    }
+
+
+def _newly_confirmed(obj) -> bool:
+    history = inspect(obj).attrs.confirmed_at.history
+    return bool(history.added) and history.added[0] is not None and not any(v is not None for v in history.deleted)
+
+
+def _committed(obj, field):
+    history = inspect(obj).attrs[field].history
+    return history.deleted[0] if history.deleted else getattr(obj, field)
+
+
+def _changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[f].history.has_changes() for f in fields)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_confirmations_on_flush(session, flush_context):
+    # New confirmations are folded into their sketches. Sketches cannot drop a
+    # sample, so rewriting the timings or payer behind an already-confirmed
+    # payment (rare: corrections, deletes) rebuilds that practice's sketches.
+    confirmed, stale, claim_ids = [], set(), set()
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, PaymentIntent):
+            if _newly_confirmed(obj):
+                confirmed.append(obj)
+            elif _committed(obj, "confirmed_at") is not None and _changed(obj, _PAYMENT_TIMING_FIELDS):
+                stale.update((_committed(obj, "practice_id"), obj.practice_id))
+        elif isinstance(obj, Claim) and obj not in session.new and _changed(obj, _CLAIM_TIMING_FIELDS):
+            claim_ids.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, PaymentIntent) and _committed(obj, "confirmed_at") is not None:
+            stale.add(_committed(obj, "practice_id"))
+    if claim_ids:
+        stale.update(session.connection().execute(
+            select(PaymentIntent.practice_id).distinct()
+            .where(PaymentIntent.claim_id.in_(sorted(claim_ids)), PaymentIntent.confirmed_at.isnot(None))
+        ).scalars())
+
+    stale.discard(None)
+    for practice_id in sorted(stale):
+        rebuild_metric_sketches(session, practice_id)
+    record_confirmed_payments(session, [obj.id for obj in confirmed if obj.practice_id not in stale])
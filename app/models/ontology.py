@@ -1,8 +1,9 @@
 import uuid
 from datetime import datetime, date
 from enum import Enum
+from typing import Optional
 
-from sqlalchemy import Column, Integer, String, DateTime, Date, Numeric, ForeignKey, Index, Text
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Date, Numeric, ForeignKey, Index, Text, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 
 from ..database import Base
@@ -38,14 +39,51 @@ class OntologyObject(Base):
     object_type = Column(String(50), nullable=False)
     object_key = Column(String(255), nullable=True)
     properties_json = Column(JSONB, nullable=True)
+    # Hot properties promoted out of properties_json for indexed graph filters.
+    event_date = Column(Date, nullable=True)
+    payer_key = Column(String(255), nullable=True)
+    status = Column(String(50), nullable=True)
+    amount_cents = Column(BigInteger, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     __table_args__ = (
         Index("idx_ontology_objects_practice_type", "practice_id", "object_type"),
         Index("idx_ontology_objects_practice_key", "practice_id", "object_key"),
+        Index("idx_ontology_objects_practice_event_date", "practice_id", "event_date"),
+        Index("idx_ontology_objects_practice_payer_key", "practice_id", "payer_key"),
+        Index("idx_ontology_objects_practice_type_status", "practice_id", "object_type", "status"),
+        Index("idx_ontology_objects_practice_type_amount", "practice_id", "object_type", "amount_cents"),
     )
 
+    @staticmethod
+    def typed_columns(object_type: str, properties: Optional[dict]) -> dict:
+        """Typed column values for an object's hot properties.
+
+        ``event_date`` is the date of ``created_at``; ``payer_key`` the
+        lower-cased payer name (Payer and Claim objects); ``amount_cents`` the
+        value graph trimming ranks by (claim/payment amount, patient lifetime
+        billed).
+        """
+        props = properties or {}
+        event_date = None
+        created = props.get("created_at")
+        if isinstance(created, str):
+            try:
+                event_date = datetime.fromisoformat(created).date()
+            except ValueError:
+                pass
+        payer = props.get("name") if object_type == OntologyObjectType.PAYER.value else (
+            props.get("payer") if object_type == OntologyObjectType.CLAIM.value else None
+        )
+        amount = props.get("lifetime_billed_cents") if object_type == OntologyObjectType.PATIENT.value else props.get("amount_cents")
+        return {
+            "event_date": event_date,
+            "payer_key": payer.lower() if isinstance(payer, str) else None,
+            "status": props.get("status") if isinstance(props.get("status"), str) else None,
+            "amount_cents": amount if isinstance(amount, int) else None,
+        }
+
 
 class OntologyLink(Base):
     __tablename__ = "ontology_links"
@@ -97,3 +135,38 @@ class MetricTimeseries(Base):
         Index("idx_metric_ts_practice_metric_date", "practice_id", "metric_name", "date"),
         Index("idx_metric_ts_practice_date", "practice_id", "date"),
     )
+
+
+class PracticeDailyAggregate(Base):
+    """Dense per-day totals for a practice, one row per day from first activity to today.
+
+    Rolling and cumulative series are derived from prefix sums over these rows,
+    so any window size can be served without re-reading claims.
+    """
+    __tablename__ = "practice_daily_aggregates"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    practice_id = Column(Integer, ForeignKey("practices.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    claim_count = Column(Integer, nullable=False, default=0)
+    declined_count = Column(Integer, nullable=False, default=0)
+    billed_cents = Column(BigInteger, nullable=False, default=0)
+    funded_cents = Column(BigInteger, nullable=False, default=0)
+    confirmed_cents = Column(BigInteger, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("practice_id", "date", name="uq_daily_agg_practice_date"),
+    )
+
+
+class OntologyBrief(Base):
+    """Latest generated brief of a practice, keyed by a hash of the context it was generated from."""
+    __tablename__ = "ontology_briefs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    practice_id = Column(Integer, ForeignKey("practices.id"), nullable=False, unique=True)
+    context_hash = Column(String(64), nullable=False)
+    source = Column(String(20), nullable=False)  # "llm" or "template"
+    brief_json = Column(JSONB, nullable=False)
+    generated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
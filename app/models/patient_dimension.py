@@ -0,0 +1,199 @@
+"""PatientDimension model - per-patient rollup of a practice's claims and payments.
+
+Rows are keyed by the claim's ``patient_hash`` and kept current on every ORM
+flush that writes claims or payment intents: the affected patients are
+re-aggregated from their claims in one grouped query and upserted. Bulk Core
+writes bypass the flush hooks and must call ``refresh_patient_dimensions``.
+"""
+import hashlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from sqlalchemy import Column, Integer, String, DateTime, Date, BigInteger, ForeignKey, Index, UniqueConstraint, cast, delete, event, func, inspect, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg, insert
+from sqlalchemy.orm import Session
+
+from ..database import Base
+from .claim import Claim
+from .payment import PaymentIntent, PaymentIntentStatus
+
+AGE_BUCKETS = ("0-18", "18-35", "35-55", "55+")
+
+# Claim / payment columns that feed the rollup; writes touching only other
+# columns (status transitions, exception flags, ...) skip the refresh.
+_CLAIM_FIELDS = ("practice_id", "patient_name", "amount_cents", "procedure_codes", "created_at")
+_PAYMENT_FIELDS = ("claim_id", "amount_cents", "status")
+
+
+class PatientDimension(Base):
+    __tablename__ = "patient_dimensions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    practice_id = Column(Integer, ForeignKey("practices.id"), nullable=False)
+    patient_hash = Column(String(16), nullable=False)
+    age_bucket = Column(String(10), nullable=False, default="unknown")
+
+    first_claim_id = Column(Integer, nullable=False)  # stable patient ordering
+    first_seen = Column(Date, nullable=False)
+    previous_seen = Column(Date, nullable=True)  # second most recent claim date
+    last_seen = Column(Date, nullable=False)
+    claim_count = Column(Integer, nullable=False, default=0)
+    lifetime_billed_cents = Column(BigInteger, nullable=False, default=0)
+    lifetime_reimbursed_cents = Column(BigInteger, nullable=False, default=0)
+    last_preventive_date = Column(Date, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("practice_id", "patient_hash", name="uq_patient_dimensions_practice_hash"),
+        Index("idx_patient_dimensions_practice_last_seen", "practice_id", "last_seen"),
+        Index("idx_patient_dimensions_practice_first_claim", "practice_id", "first_claim_id"),
+    )
+
+    @staticmethod
+    def age_bucket_for(patient_name: Optional[str]) -> str:
+        """Synthetic age bucket derived from the patient name (no DOB is stored)."""
+        if not patient_name:
+            return "unknown"
+        h = int(hashlib.md5(patient_name.encode()).hexdigest()[:8], 16)
+        return AGE_BUCKETS[h % len(AGE_BUCKETS)]
+
+
+@lru_cache(maxsize=1)
+def _preventive_pattern() -> str:
+    from ..services.cdt_families import PREVENTIVE_CODES
+    return r"(^|,)\s*(" + "|".join(sorted(PREVENTIVE_CODES)) + r")\s*(,|$)"
+
+
+def refresh_patient_dimensions(db: Session, practice_id: int, patient_hashes: Optional[Iterable[str]] = None) -> int:
+    """Re-aggregate the given patients (or the whole practice) from claims.
+
+    Runs on the session's connection, so it is safe inside flush events.
+    Returns the number of dimension rows written.
+    """
+    conn = db.connection()
+    hashes = None if patient_hashes is None else sorted({h for h in patient_hashes if h})
+    if hashes == []:
+        return 0
+
+    day = cast(Claim.created_at, Date)
+    scope = [Claim.practice_id == practice_id]
+    if hashes is not None:
+        scope.append(Claim.patient_hash.in_(hashes))
+    rows = conn.execute(
+        select(
+            Claim.patient_hash,
+            func.min(Claim.id),
+            array_agg(aggregate_order_by(Claim.patient_name, Claim.id))[1],
+            func.min(day),
+            array_agg(aggregate_order_by(day, Claim.created_at.desc()))[2],
+            func.max(day),
+            func.count(Claim.id),
+            func.coalesce(func.sum(Claim.amount_cents), 0),
+            func.coalesce(func.sum(PaymentIntent.amount_cents).filter(
+                PaymentIntent.status == PaymentIntentStatus.CONFIRMED.value
+            ), 0),
+            func.max(day).filter(Claim.procedure_codes.op("~*")(_preventive_pattern())),
+        )
+        .select_from(Claim)
+        .outerjoin(PaymentIntent, PaymentIntent.claim_id == Claim.id)
+        .where(*scope, Claim.patient_hash.isnot(None))
+        .group_by(Claim.patient_hash)
+    ).all()
+
+    now = datetime.utcnow()
+    values = [
+        {
+            "practice_id": practice_id,
+            "patient_hash": patient_hash,
+            "age_bucket": PatientDimension.age_bucket_for(first_name),
+            "first_claim_id": first_claim_id,
+            "first_seen": first_seen,
+            "previous_seen": previous_seen,
+            "last_seen": last_seen,
+            "claim_count": claim_count,
+            "lifetime_billed_cents": billed,
+            "lifetime_reimbursed_cents": reimbursed,
+            "last_preventive_date": last_preventive,
+            "updated_at": now,
+        }
+        for (patient_hash, first_claim_id, first_name, first_seen, previous_seen, last_seen,
+             claim_count, billed, reimbursed, last_preventive) in rows
+    ]
+
+    table = PatientDimension.__table__
+    stale = delete(table).where(table.c.practice_id == practice_id)
+    if hashes is not None:
+        stale = stale.where(table.c.patient_hash.in_(sorted(set(hashes) - {v["patient_hash"] for v in values})))
+    elif values:
+        stale = stale.where(table.c.patient_hash.notin_([v["patient_hash"] for v in values]))
+    conn.execute(stale)
+
+    if values:
+        stmt = insert(table)
+        conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[table.c.practice_id, table.c.patient_hash],
+                set_={
+                    col: stmt.excluded[col]
+                    for col in values[0]
+                    if col not in ("practice_id", "patient_hash")
+                },
+            ),
+            values,
+        )
+    return len(values)
+
+
+def _changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[f].history.has_changes() for f in fields)
+
+
+def _committed(obj, field):
+    history = inspect(obj).attrs[field].history
+    return history.deleted[0] if history.deleted else getattr(obj, field)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_stale_patients(session, flush_context, instances):
+    # Capture the pre-write (practice, patient) of changed or deleted claims and
+    # the claim ids of changed payments; the new values are added after flush.
+    pending = session.info.setdefault("patient_dimension_keys", set())
+    claim_ids = session.info.setdefault("patient_dimension_claim_ids", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Claim) and (obj in session.deleted or _changed(obj, _CLAIM_FIELDS)):
+            pending.add((_committed(obj, "practice_id"), _committed(obj, "patient_hash")))
+        elif isinstance(obj, PaymentIntent) and (obj in session.deleted or _changed(obj, _PAYMENT_FIELDS)):
+            claim_ids.add(_committed(obj, "claim_id"))
+            claim_ids.add(obj.claim_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_patient_dimensions_on_flush(session, flush_context):
+    keys = session.info.pop("patient_dimension_keys", set())
+    claim_ids = session.info.pop("patient_dimension_claim_ids", set())
+    for obj in session.new:
+        if isinstance(obj, Claim):
+            keys.add((obj.practice_id, obj.patient_hash))
+        elif isinstance(obj, PaymentIntent):
+            claim_ids.add(obj.claim_id)
+    for obj in session.dirty:
+        if isinstance(obj, Claim) and _changed(obj, _CLAIM_FIELDS):
+            keys.add((obj.practice_id, obj.patient_hash))
+
+    claim_ids.discard(None)
+    if claim_ids:
+        keys.update(
+            tuple(row) for row in session.connection().execute(
+                select(Claim.practice_id, Claim.patient_hash).where(Claim.id.in_(sorted(claim_ids)))
+            )
+        )
+
+    by_practice = {}
+    for practice_id, patient_hash in keys:
+        if practice_id is not None and patient_hash:
+            by_practice.setdefault(practice_id, set()).add(patient_hash)
+    for practice_id, patient_hashes in sorted(by_practice.items()):
+        refresh_patient_dimensions(session, practice_id, patient_hashes)
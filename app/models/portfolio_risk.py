@@ -0,0 +1,55 @@
+"""Portfolio risk runs - the ontology risk rules evaluated for every active practice.
+
+A ``PortfolioRiskRun`` records one refresh of the portfolio; its
+``PortfolioRisk`` rows are the risks ``OntologyBuilderV2.get_risks`` raised for
+each practice, with ``severity_rank`` (0 = high) so the ops list can be paged
+in severity order. Only the latest succeeded run keeps its rows.
+"""
+from datetime import datetime
+from enum import Enum
+
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, ForeignKey, Index
+
+from ..database import Base
+
+
+class PortfolioRiskRunStatus(str, Enum):
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
+
+SEVERITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+
+class PortfolioRiskRun(Base):
+    __tablename__ = "portfolio_risk_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(50), nullable=False, default=PortfolioRiskRunStatus.RUNNING.value)
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    ended_at = Column(DateTime, nullable=True)
+    workers = Column(Integer, nullable=False, default=1)
+    practice_count = Column(Integer, nullable=False, default=0)
+    failed_practice_count = Column(Integer, nullable=False, default=0)
+    risk_count = Column(Integer, nullable=False, default=0)
+    error_json = Column(Text, nullable=True)
+    triggered_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+
+class PortfolioRisk(Base):
+    __tablename__ = "portfolio_risks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("portfolio_risk_runs.id", ondelete="CASCADE"), nullable=False)
+    practice_id = Column(Integer, ForeignKey("practices.id"), nullable=False)
+    risk_type = Column(String(50), nullable=False)
+    severity = Column(String(20), nullable=False)
+    severity_rank = Column(Integer, nullable=False)
+    metric = Column(String(100), nullable=True)
+    value = Column(Float, nullable=True)
+    explanation = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("idx_portfolio_risks_run_rank", "run_id", "severity_rank", "practice_id"),
+    )
@@ -1,9 +1,9 @@
 from datetime import datetime
 from enum import Enum
 
-from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Text
+from sqlalchemy import Column, Integer, String, DateTime, Date, BigInteger, Text, Sequence, event, update
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session, relationship
 
 from app.database import Base
 
@@ -39,6 +39,13 @@ class Practice(Base):
     pms_type = Column(String(100), nullable=True)  # e.g. "Open Dental", "Dentrix"
     clearinghouse = Column(String(100), nullable=True)
 
+    # Bumped (from a global sequence) whenever the practice, its claims or
+    # its payment intents are written; read-side caches key on it.
+    data_version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # data_version / date of the last ontology build.
+    ontology_version = Column(BigInteger, nullable=True)
+    ontology_built_on = Column(Date, nullable=True)
+
     users = relationship("User", back_populates="practice")
     claims = relationship("Claim", back_populates="practice")
     documents = relationship("ClaimDocument", back_populates="practice")
@@ -48,3 +55,52 @@ class Practice(Base):
     providers = relationship("Provider", back_populates="practice")
     payer_contracts = relationship("PayerContract", back_populates="practice")
     remittances = relationship("Remittance", back_populates="practice")
+
+
+data_version_seq = Sequence("practice_data_version_seq", metadata=Base.metadata)
+
+# Tables whose rows feed the ontology analytics; ORM writes to them bump the
+# owning practice's data_version on flush.
+DATA_VERSIONED_TABLES = {"practices", "claims", "payment_intents"}
+
+
+def bump_data_version(db: Session, practice_ids) -> None:
+    """Move the practices to a fresh data version.
+
+    Called automatically for ORM flushes; bulk Core statements that touch
+    versioned tables must call it themselves. Versions come from a sequence,
+    so a rolled-back bump never reuses a number another transaction commits.
+    """
+    practice_ids = sorted({pid for pid in practice_ids if pid is not None})
+    if practice_ids:
+        db.connection().execute(
+            update(Practice.__table__)
+            .where(Practice.__table__.c.id.in_(practice_ids))
+            .values(data_version=data_version_seq.next_value())
+        )
+
+
+def _versioned_owner(obj):
+    table = getattr(obj, "__tablename__", None)
+    if table not in DATA_VERSIONED_TABLES:
+        return None
+    return obj.id if table == "practices" else obj.practice_id
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_deleted_versioned(session, flush_context, instances):
+    # Deleted rows are gone by after_flush, so read their owner up front.
+    pending = session.info.setdefault("data_version_practice_ids", set())
+    for obj in session.deleted:
+        pending.add(_versioned_owner(obj))
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_data_version_on_flush(session, flush_context):
+    practice_ids = session.info.pop("data_version_practice_ids", set())
+    for obj in session.new:
+        practice_ids.add(_versioned_owner(obj))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            practice_ids.add(_versioned_owner(obj))
+    bump_data_version(session, practice_ids)
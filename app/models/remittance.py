@@ -51,6 +51,7 @@ class Remittance(Base):
         Index("idx_remittances_practice", "practice_id"),
         Index("idx_remittances_payer", "payer_id"),
         Index("idx_remittances_status", "posting_status"),
+        Index("idx_remittances_practice_era", "practice_id", "era_reference"),
     )
 
 
@@ -2,7 +2,7 @@ import logging
 from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, status
 from sqlalchemy.orm import Session
 
 from ..database import get_db
@@ -17,12 +17,9 @@ from ..models.integration import (
 from ..schemas.integration import (
     IntegrationStatusResponse,
     IntegrationSyncRunResponse,
-    CSVUploadResponse,
-    IngestionSummary,
 )
-from ..integrations.csv_parser import parse_claims_csv, parse_lines_csv, build_external_claims
 from ..integrations.open_dental.provider import OpenDentalProvider, OpenDentalNotConfigured
-from ..services.ingestion import ingest_external_claims
+from ..services.ingestion_jobs import IngestionJobService
 from .auth import require_practice_manager, require_spoonbill_user
 
 logger = logging.getLogger(__name__)
@@ -74,99 +71,41 @@ def get_integration_status(
         status=conn.status,
         last_synced_at=conn.last_synced_at,
         last_cursor=conn.last_cursor,
-        recent_runs=[IntegrationSyncRunResponse.model_validate(r) for r in recent_runs],
+        next_sync_at=conn.next_sync_at,
+        recent_runs=[IngestionJobService.run_response(r) for r in recent_runs],
     )
 
 
-@router.post("/open-dental/upload", response_model=CSVUploadResponse)
-async def upload_csv(
+@router.post("/open-dental/upload", response_model=IntegrationSyncRunResponse, status_code=status.HTTP_202_ACCEPTED)
+def upload_csv(
+    background_tasks: BackgroundTasks,
     claims_file: UploadFile = File(...),
     lines_file: UploadFile = File(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_practice_manager),
 ):
+    """Queue a CSV import; progress and the final summary appear on /open-dental/runs."""
     practice_id = current_user.practice_id
-
-    claims_content = (await claims_file.read()).decode("utf-8")
-    try:
-        claim_rows = parse_claims_csv(claims_content)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-    line_rows = None
-    if lines_file:
-        lines_content = (await lines_file.read()).decode("utf-8")
-        try:
-            line_rows = parse_lines_csv(lines_content)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-
-    try:
-        external_claims = build_external_claims(claim_rows, line_rows)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to parse CSV data: {str(e)}")
-
     conn = _get_or_create_connection(db, practice_id)
-
-    run = IntegrationSyncRun(
-        connection_id=conn.id,
-        practice_id=practice_id,
-        provider=IntegrationProvider.OPEN_DENTAL.value,
-        status=SyncRunStatus.RUNNING.value,
-        sync_type="CSV_UPLOAD",
-        pulled_count=len(external_claims),
-    )
-    db.add(run)
-    db.flush()
-
-    import time as _time
-    _t0 = _time.monotonic()
     try:
-        summary = ingest_external_claims(
-            db=db,
-            practice_id=practice_id,
-            external_claims=external_claims,
-            source="OPEN_DENTAL",
-            actor_user_id=current_user.id,
+        run = IngestionJobService.queue_csv_upload(
+            db, conn, claims_file.file, lines_file.file if lines_file else None, actor_user_id=current_user.id,
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        run.status = SyncRunStatus.SUCCEEDED.value
-        run.ended_at = datetime.utcnow()
-        run.upserted_count = summary.created + summary.updated
-
-        conn.last_synced_at = datetime.utcnow()
-        if conn.status == IntegrationStatus.INACTIVE.value:
-            conn.status = IntegrationStatus.ACTIVE.value
-
-        db.commit()
+    background_tasks.add_task(IngestionJobService.run_in_background, run.id)
+    logger.info("[csv_upload] QUEUED practice_id=%s run_id=%s bytes=%s", practice_id, run.id, run.bytes_total)
+    return IngestionJobService.run_response(run)
 
-        _dur = _time.monotonic() - _t0
-        logger.info(
-            "[csv_upload] practice_id=%s run_id=%s duration=%.2fs pulled=%d created=%d updated=%d skipped=%d",
-            practice_id, run.id, _dur, len(external_claims), summary.created, summary.updated, summary.skipped,
-        )
-        return CSVUploadResponse(sync_run_id=run.id, summary=summary)
 
-    except Exception as e:
-        import json
-        _dur = _time.monotonic() - _t0
-        run.status = SyncRunStatus.FAILED.value
-        run.ended_at = datetime.utcnow()
-        run.error_json = json.dumps({"error": str(e)})
-        conn.status = IntegrationStatus.ERROR.value
-        db.commit()
-        logger.error(
-            "[csv_upload] FAILED practice_id=%s run_id=%s duration=%.2fs error=%s",
-            practice_id, run.id, _dur, str(e),
-        )
-        raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
-
-
-@router.post("/open-dental/sync", response_model=CSVUploadResponse)
+@router.post("/open-dental/sync", response_model=IntegrationSyncRunResponse, status_code=status.HTTP_202_ACCEPTED)
 def run_sync(
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_spoonbill_user),
 ):
+    """Queue an API sync from the connection's cursor; progress appears on /open-dental/runs."""
     practice_id = current_user.practice_id
     if not practice_id:
         raise HTTPException(status_code=400, detail="User not associated with a practice")
@@ -183,71 +122,29 @@ def run_sync(
         config_json=conn.config_json,
         secrets_ref=conn.secrets_ref,
     )
-
-    run = IntegrationSyncRun(
-        connection_id=conn.id,
-        practice_id=practice_id,
-        provider=IntegrationProvider.OPEN_DENTAL.value,
-        status=SyncRunStatus.RUNNING.value,
-        sync_type="API",
-    )
-    db.add(run)
-    db.flush()
-
-    import time as _time
-    _t0 = _time.monotonic()
     try:
-        claims, next_cursor = provider.fetch_updated_claims(cursor=conn.last_cursor)
-        run.pulled_count = len(claims)
-
-        summary = ingest_external_claims(
-            db=db,
-            practice_id=practice_id,
-            external_claims=claims,
-            source="OPEN_DENTAL",
-            actor_user_id=current_user.id,
-        )
-
-        run.status = SyncRunStatus.SUCCEEDED.value
-        run.ended_at = datetime.utcnow()
-        run.upserted_count = summary.created + summary.updated
-
-        if next_cursor:
-            conn.last_cursor = next_cursor
-        conn.last_synced_at = datetime.utcnow()
-        conn.status = IntegrationStatus.ACTIVE.value
-
-        db.commit()
-        _dur = _time.monotonic() - _t0
-        logger.info(
-            "[api_sync] practice_id=%s run_id=%s duration=%.2fs pulled=%d created=%d updated=%d skipped=%d",
-            practice_id, run.id, _dur, len(claims), summary.created, summary.updated, summary.skipped,
-        )
-        return CSVUploadResponse(sync_run_id=run.id, summary=summary)
-
+        # Fail in the request rather than queueing a job that cannot run.
+        provider.ensure_configured()
     except OpenDentalNotConfigured as e:
         import json
-        _dur = _time.monotonic() - _t0
-        run.status = SyncRunStatus.FAILED.value
-        run.ended_at = datetime.utcnow()
-        run.error_json = json.dumps({"error": str(e)})
+        run = IntegrationSyncRun(
+            connection_id=conn.id,
+            practice_id=practice_id,
+            provider=IntegrationProvider.OPEN_DENTAL.value,
+            status=SyncRunStatus.FAILED.value,
+            sync_type="API",
+            ended_at=datetime.utcnow(),
+            error_json=json.dumps({"error": str(e)}),
+        )
+        db.add(run)
         db.commit()
-        logger.warning("[api_sync] NOT_CONFIGURED practice_id=%s run_id=%s duration=%.2fs", practice_id, run.id, _dur)
+        logger.warning("[api_sync] NOT_CONFIGURED practice_id=%s run_id=%s", practice_id, run.id)
         raise HTTPException(status_code=422, detail=str(e))
 
-    except Exception as e:
-        import json
-        _dur = _time.monotonic() - _t0
-        run.status = SyncRunStatus.FAILED.value
-        run.ended_at = datetime.utcnow()
-        run.error_json = json.dumps({"error": str(e)})
-        conn.status = IntegrationStatus.ERROR.value
-        db.commit()
-        logger.error(
-            "[api_sync] FAILED practice_id=%s run_id=%s duration=%.2fs error=%s",
-            practice_id, run.id, _dur, str(e),
-        )
-        raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
+    run = IngestionJobService.queue_api_sync(db, conn, actor_user_id=current_user.id)
+    background_tasks.add_task(IngestionJobService.run_in_background, run.id)
+    logger.info("[api_sync] QUEUED practice_id=%s run_id=%s cursor=%s", practice_id, run.id, conn.last_cursor)
+    return IngestionJobService.run_response(run)
 
 
 @router.get("/open-dental/runs", response_model=List[IntegrationSyncRunResponse])
@@ -263,4 +160,5 @@ def list_sync_runs(
         .limit(20)
         .all()
     )
-    return runs
+    now = datetime.utcnow()
+    return [IngestionJobService.run_response(r, now) for r in runs]
@@ -1,7 +1,10 @@
+import asyncio
 import logging
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
@@ -9,7 +12,9 @@ from ..database import get_db
 from ..models.user import User
 from ..models.practice import Practice
 from ..services.ontology_v2 import OntologyBuilderV2
-from ..services.ontology_brief import generate_brief_from_context
+from ..services.ontology_brief import cached_brief_response, context_hash, get_or_generate_brief, load_cached_brief
+from ..services.ontology_cache import cached_response
+from ..services.ontology_export import stream_export
 from ..services.audit import AuditService
 from .auth import require_practice_manager, require_spoonbill_user
 
@@ -23,25 +28,44 @@ def _check_practice(current_user, practice_id):
         raise HTTPException(status_code=404, detail="Practice not found")
 
 
+def _render_json(content) -> bytes:
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+
+def _cached(request: Request, db: Session, practice_id: int, endpoint: str, compute, **params) -> Response:
+    """Serve a read through the versioned response cache, honouring If-None-Match."""
+    body, etag = cached_response(
+        db, practice_id, endpoint, params, compute, _render_json,
+        if_none_match=request.headers.get("if-none-match"),
+    )
+    headers = {"Cache-Control": "private, no-cache"}
+    if etag:
+        headers["ETag"] = etag
+    if body is None:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/{practice_id}/ontology/context")
 def get_ontology_context(
     practice_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_practice_manager),
 ):
     _check_practice(current_user, practice_id)
 
     try:
-        OntologyBuilderV2.build_practice_ontology(db, practice_id, actor_user_id=current_user.id)
-        db.commit()
+        if not OntologyBuilderV2.ontology_is_current(db, practice_id):
+            OntologyBuilderV2.build_practice_ontology(db, practice_id, actor_user_id=current_user.id)
+            db.commit()
     except Exception as e:
         db.rollback()
         logger.error("ontology build failed for practice %s: %s", practice_id, e)
         raise HTTPException(status_code=503, detail="Ontology data unavailable — migration may be pending; see /diag")
 
     try:
-        context = OntologyBuilderV2.get_practice_context(db, practice_id)
-        return context
+        return _cached(request, db, practice_id, "context", lambda: OntologyBuilderV2.get_practice_context(db, practice_id))
     except Exception as e:
         logger.error("ontology context read failed for practice %s: %s", practice_id, e)
         raise HTTPException(status_code=503, detail="Ontology data unavailable — migration may be pending; see /diag")
@@ -61,35 +85,59 @@ def rebuild_ontology(
 
 
 @router.post("/{practice_id}/ontology/brief")
-def generate_ontology_brief(
+async def generate_ontology_brief(
     practice_id: int,
+    refresh: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_practice_manager),
 ):
     _check_practice(current_user, practice_id)
 
-    context = OntologyBuilderV2.get_practice_context(db, practice_id)
-    brief = generate_brief_from_context(context)
+    context = await asyncio.to_thread(OntologyBuilderV2.get_practice_context, db, practice_id)
+    brief = await get_or_generate_brief(db, practice_id, context, refresh=refresh)
 
-    AuditService.log_event(
-        db, claim_id=None, action="ontology_brief_generated",
-        actor_user_id=current_user.id,
-        metadata={"practice_id": practice_id, "version": "v2", "has_risks": len(brief.get("risks", [])) > 0},
-    )
-    db.commit()
+    if not brief["meta"]["cached"]:
+        def record():
+            AuditService.log_event(
+                db, claim_id=None, action="ontology_brief_generated",
+                actor_user_id=current_user.id,
+                metadata={
+                    "practice_id": practice_id, "version": "v2", "source": brief["meta"]["source"],
+                    "has_risks": len(brief.get("risks", [])) > 0,
+                },
+            )
+            db.commit()
+
+        await asyncio.to_thread(record)
 
     return brief
 
 
+@router.get("/{practice_id}/ontology/brief")
+def get_ontology_brief(
+    practice_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_practice_manager),
+):
+    """The cached brief, with ``meta.stale`` set if the practice context has changed since."""
+    _check_practice(current_user, practice_id)
+
+    cached = load_cached_brief(db, practice_id)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="No brief generated yet")
+    return cached_brief_response(cached, context_hash(OntologyBuilderV2.get_practice_context(db, practice_id)))
+
+
 @router.get("/{practice_id}/ontology/cohorts")
 def get_ontology_cohorts(
     practice_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_practice_manager),
 ):
     _check_practice(current_user, practice_id)
     try:
-        return OntologyBuilderV2.get_cohorts(db, practice_id)
+        return _cached(request, db, practice_id, "cohorts", lambda: OntologyBuilderV2.get_cohorts(db, practice_id))
     except Exception as e:
         logger.error("ontology cohorts failed for practice %s: %s", practice_id, e)
         raise HTTPException(status_code=503, detail="Ontology data unavailable — migration may be pending; see /diag")
@@ -98,12 +146,13 @@ def get_ontology_cohorts(
 @router.get("/{practice_id}/ontology/cfo")
 def get_cfo_360(
     practice_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_practice_manager),
 ):
     _check_practice(current_user, practice_id)
     try:
-        return OntologyBuilderV2.get_cfo_360(db, practice_id)
+        return _cached(request, db, practice_id, "cfo", lambda: OntologyBuilderV2.get_cfo_360(db, practice_id))
     except Exception as e:
         logger.error("ontology cfo failed for practice %s: %s", practice_id, e)
         raise HTTPException(status_code=503, detail="Ontology data unavailable — migration may be pending; see /diag")
@@ -112,12 +161,13 @@ def get_cfo_360(
 @router.get("/{practice_id}/ontology/risks")
 def get_ontology_risks(
     practice_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_practice_manager),
 ):
     _check_practice(current_user, practice_id)
     try:
-        return OntologyBuilderV2.get_risks(db, practice_id)
+        return _cached(request, db, practice_id, "risks", lambda: OntologyBuilderV2.get_risks(db, practice_id))
     except Exception as e:
         logger.error("ontology risks failed for practice %s: %s", practice_id, e)
         raise HTTPException(status_code=503, detail="Ontology data unavailable — migration may be pending; see /diag")
@@ -126,6 +176,7 @@ def get_ontology_risks(
 @router.get("/{practice_id}/ontology/graph")
 def get_ontology_graph(
     practice_id: int,
+    request: Request,
     mode: str = "revenue_cycle",
     range: str = "90d",
     payer: Optional[str] = None,
@@ -139,11 +190,16 @@ def get_ontology_graph(
 ):
     _check_practice(current_user, practice_id)
     try:
-        return OntologyBuilderV2.get_graph(
-            db, practice_id,
-            mode=mode, range_key=range, payer_filter=payer,
-            state_filter=state, limit=limit,
-            focus_node_id=focus_node_id, hops=hops, search=search,
+        return _cached(
+            request, db, practice_id, "graph",
+            lambda: OntologyBuilderV2.get_graph(
+                db, practice_id,
+                mode=mode, range_key=range, payer_filter=payer,
+                state_filter=state, limit=limit,
+                focus_node_id=focus_node_id, hops=hops, search=search,
+            ),
+            mode=mode, range=range, payer=payer, state=state, search=search,
+            limit=limit, focus_node_id=focus_node_id, hops=hops,
         )
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
@@ -152,16 +208,63 @@ def get_ontology_graph(
         raise HTTPException(status_code=503, detail="Ontology data unavailable — migration may be pending; see /diag")
 
 
+@router.get("/{practice_id}/ontology/graph/stats")
+def get_ontology_graph_stats(
+    practice_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_practice_manager),
+):
+    _check_practice(current_user, practice_id)
+    try:
+        return _cached(request, db, practice_id, "graph_stats", lambda: OntologyBuilderV2.get_graph_stats(db, practice_id))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error("ontology graph stats failed for practice %s: %s", practice_id, e)
+        raise HTTPException(status_code=503, detail="Ontology data unavailable — migration may be pending; see /diag")
+
+
+@router.get("/{practice_id}/ontology/export")
+def export_ontology(
+    practice_id: int,
+    format: str = "ndjson",
+    cursor: Optional[str] = None,
+    current_user: User = Depends(require_practice_manager),
+):
+    """Stream every ontology object, link and KPI observation as NDJSON or Parquet.
+
+    Not capped like /graph. Pass the ``cursor`` of the last checkpoint (or
+    last record) received to resume an interrupted export.
+    """
+    _check_practice(current_user, practice_id)
+    try:
+        chunks = stream_export(practice_id, format, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    media_type = "application/vnd.apache.parquet" if format == "parquet" else "application/x-ndjson"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="ontology-{practice_id}.{format}"'},
+    )
+
+
 @router.get("/{practice_id}/ontology/retention")
 def get_patient_retention(
     practice_id: int,
+    request: Request,
     range: str = "90d",
     db: Session = Depends(get_db),
     current_user: User = Depends(require_practice_manager),
 ):
     _check_practice(current_user, practice_id)
     try:
-        return OntologyBuilderV2.get_patient_retention(db, practice_id, range_key=range)
+        return _cached(
+            request, db, practice_id, "retention",
+            lambda: OntologyBuilderV2.get_patient_retention(db, practice_id, range_key=range),
+            range=range,
+        )
     except Exception as e:
         logger.error("ontology retention failed for practice %s: %s", practice_id, e)
         raise HTTPException(status_code=503, detail="Ontology data unavailable — migration may be pending; see /diag")
@@ -170,12 +273,13 @@ def get_patient_retention(
 @router.get("/{practice_id}/ontology/reimbursement")
 def get_reimbursement_metrics(
     practice_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_practice_manager),
 ):
     _check_practice(current_user, practice_id)
     try:
-        return OntologyBuilderV2.get_reimbursement_metrics(db, practice_id)
+        return _cached(request, db, practice_id, "reimbursement", lambda: OntologyBuilderV2.get_reimbursement_metrics(db, practice_id))
     except Exception as e:
         logger.error("ontology reimbursement failed for practice %s: %s", practice_id, e)
         raise HTTPException(status_code=503, detail="Ontology data unavailable — migration may be pending; see /diag")
@@ -184,17 +288,40 @@ def get_reimbursement_metrics(
 @router.get("/{practice_id}/ontology/rcm")
 def get_rcm_ops(
     practice_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_practice_manager),
 ):
     _check_practice(current_user, practice_id)
     try:
-        return OntologyBuilderV2.get_rcm_ops(db, practice_id)
+        return _cached(request, db, practice_id, "rcm", lambda: OntologyBuilderV2.get_rcm_ops(db, practice_id))
     except Exception as e:
         logger.error("ontology rcm failed for practice %s: %s", practice_id, e)
         raise HTTPException(status_code=503, detail="Ontology data unavailable — migration may be pending; see /diag")
 
 
+@router.get("/{practice_id}/ontology/timeseries")
+def get_ontology_timeseries(
+    practice_id: int,
+    request: Request,
+    window: int = OntologyBuilderV2.DEFAULT_ROLLING_WINDOW,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_practice_manager),
+):
+    _check_practice(current_user, practice_id)
+    try:
+        return _cached(
+            request, db, practice_id, "timeseries",
+            lambda: OntologyBuilderV2.get_timeseries(db, practice_id, window=window),
+            window=window,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error("ontology timeseries failed for practice %s: %s", practice_id, e)
+        raise HTTPException(status_code=503, detail="Ontology data unavailable — migration may be pending; see /diag")
+
+
 class AdjustLimitRequest(BaseModel):
     new_limit: int
     reason: str
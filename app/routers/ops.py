@@ -3,7 +3,7 @@ import secrets
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 
 from ..config import get_settings
@@ -16,6 +16,7 @@ from ..models.claim import Claim, ClaimStatus
 from ..models.payment import PaymentIntent
 from ..models.integration import IntegrationConnection
 from ..models.invite import PracticeManagerInvite
+from ..models.metric_sketch import SKETCH_METRICS, load_metric_sketches, merged_sketch, sketch_summary
 from ..services.auth import AuthService
 from ..services.economics import EconomicsService
 from ..services.action_proposals import ActionProposalService
@@ -23,6 +24,10 @@ from ..services.control_tower import ControlTowerService
 from ..services.reconciliation import ReconciliationService
 from ..services.playbooks import PlaybookService, PLAYBOOK_TEMPLATES
 from ..services.audit import AuditService
+from ..services.ontology_cache import response_cache
+from ..services.portfolio_risk import PortfolioRiskService
+from ..services.sync_scheduler import SyncSchedulerService
+from ..models.portfolio_risk import PortfolioRiskRun
 from ..schemas.practice_application import PracticePatch, PracticeUserInviteRequest
 from sqlalchemy import func, desc
 
@@ -549,3 +554,76 @@ def get_playbook_templates(
             for k, v in PLAYBOOK_TEMPLATES.items()
         ]
     }
+
+
+@router.get("/metrics/ontology-cache")
+def get_ontology_cache_metrics(
+    current_user: User = Depends(require_spoonbill_user),
+):
+    return response_cache.stats()
+
+
+@router.get("/metrics/payment-timings")
+def get_payment_timing_metrics(
+    practice_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_spoonbill_user),
+):
+    """Portfolio (or single-practice) timing percentiles merged from the per-payer sketches."""
+    practice_ids = [practice_id] if practice_id is not None else None
+    metrics = {}
+    for metric in SKETCH_METRICS:
+        by_payer = {}
+        for (_, payer), sketch in load_metric_sketches(db, metric, practice_ids).items():
+            by_payer.setdefault(payer, []).append(sketch)
+        metrics[metric] = {
+            **sketch_summary(merged_sketch(s for sketches in by_payer.values() for s in sketches)),
+            "by_payer": {payer: sketch_summary(merged_sketch(sketches)) for payer, sketches in sorted(by_payer.items())},
+        }
+    return {"practice_id": practice_id, "metrics": metrics}
+
+
+@router.get("/metrics/integration-syncs")
+def get_integration_sync_metrics(
+    window_hours: int = Query(24, ge=1, le=24 * 30),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_spoonbill_user),
+):
+    """Sync queue depth and per-connection run durations and rows/sec over the window."""
+    return SyncSchedulerService.stats(db, window_hours=window_hours)
+
+
+@router.get("/portfolio/risks")
+def list_portfolio_risks(
+    severity: Optional[str] = Query(None, description="Filter by severity (high, medium, low)"),
+    risk_type: Optional[str] = Query(None, description="Filter by risk type"),
+    page: int = Query(1, ge=1, description="Page number"),
+    page_size: int = Query(50, ge=1, le=500, description="Items per page"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_spoonbill_user),
+):
+    """Ontology risks of every active practice from the latest portfolio run, most severe first."""
+    return PortfolioRiskService.list_risks(db, severity=severity, risk_type=risk_type, page=page, page_size=page_size)
+
+
+@router.post("/portfolio/risks/refresh", status_code=status.HTTP_202_ACCEPTED)
+def refresh_portfolio_risks(
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_spoonbill_user),
+):
+    run = PortfolioRiskService.start_run(db, actor_user_id=current_user.id)
+    background_tasks.add_task(PortfolioRiskService.refresh_in_background, run.id)
+    return PortfolioRiskService.run_to_dict(run)
+
+
+@router.get("/portfolio/risks/runs/{run_id}")
+def get_portfolio_risk_run(
+    run_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_spoonbill_user),
+):
+    run = db.query(PortfolioRiskRun).filter(PortfolioRiskRun.id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return PortfolioRiskService.run_to_dict(run)
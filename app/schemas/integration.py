@@ -1,15 +1,16 @@
 from datetime import datetime, date
 from typing import Optional, List
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 
 
 class ExternalClaimLine(BaseModel):
-    external_line_id: str
-    cdt_code: str
+    # Lengths match the claim_lines columns, so an oversized value is a row error.
+    external_line_id: str = Field(max_length=255)
+    cdt_code: str = Field(max_length=10)
     description: Optional[str] = None
     line_amount_cents: int
-    tooth_number: Optional[str] = None
-    surface: Optional[str] = None
+    tooth_number: Optional[str] = Field(default=None, max_length=10)
+    surface: Optional[str] = Field(default=None, max_length=20)
 
     @field_validator("line_amount_cents")
     @classmethod
@@ -59,6 +60,8 @@ class IntegrationConnectionResponse(BaseModel):
     status: str
     last_cursor: Optional[str]
     last_synced_at: Optional[datetime]
+    next_sync_at: Optional[datetime] = None
+    consecutive_failures: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -76,8 +79,16 @@ class IntegrationSyncRunResponse(BaseModel):
     status: str
     pulled_count: int
     upserted_count: int
+    bytes_total: Optional[int] = None
+    bytes_processed: Optional[int] = None
+    rows_total: Optional[int] = None
     error_json: Optional[str]
     sync_type: str
+    heartbeat_at: Optional[datetime] = None
+    attempts: int = 0
+    rows_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    summary: Optional[IngestionSummary] = None
 
     class Config:
         from_attributes = True
@@ -89,9 +100,5 @@ class IntegrationStatusResponse(BaseModel):
     status: Optional[str] = None
     last_synced_at: Optional[datetime] = None
     last_cursor: Optional[str] = None
+    next_sync_at: Optional[datetime] = None
     recent_runs: List[IntegrationSyncRunResponse] = []
-
-
-class CSVUploadResponse(BaseModel):
-    sync_run_id: int
-    summary: IngestionSummary
@@ -1,14 +1,56 @@
+import hashlib
+import json
 import logging
-from typing import List
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+from sqlalchemy import bindparam, delete, insert, select, update
 from sqlalchemy.orm import Session
 
+from ..models.audit import AuditEvent
 from ..models.claim import Claim, ClaimStatus
+from ..models.claim_line import ClaimLine
+from ..models.insight_rollup import apply_claim_contributions, read_claim_contributions
+from ..models.integration import IntegrationSyncRun
+from ..models.metric_sketch import rebuild_metric_sketches
+from ..models.patient_dimension import refresh_patient_dimensions
+from ..models.payment import PaymentIntent
+from ..models.practice import bump_data_version
+from ..models.procedure_code import ProcedureCode
+from ..models.remittance import RemittanceLine
 from ..schemas.integration import ExternalClaim, IngestionSummary
-from ..services.audit import AuditService
 
 logger = logging.getLogger(__name__)
 
+INGEST_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+# Claim columns an external record can change; anything else is Spoonbill's.
+_SYNCED_FIELDS = ("payer", "amount_cents", "procedure_date", "procedure_codes", "external_source")
+_LINE_FIELDS = ("cdt_code", "tooth", "surface", "billed_fee_cents")
+
+
+def external_digest(ext: ExternalClaim, source: str) -> str:
+    """Digest of everything a sync can write for this claim: synced fields and lines."""
+    payload = [
+        source, ext.external_claim_id, ext.payer, ext.total_billed_cents,
+        ext.procedure_date.isoformat() if ext.procedure_date else None, ext.procedure_codes,
+        [[l.external_line_id, l.cdt_code, l.line_amount_cents, l.tooth_number, l.surface] for l in ext.lines],
+    ]
+    return hashlib.blake2b(json.dumps(payload, separators=(",", ":")).encode(), digest_size=16).hexdigest()
+
+
+def stored_digests(db: Session, practice_id: int) -> Dict[str, Optional[str]]:
+    """``external_claim_id -> external_digest`` of the practice's ingested claims (one index-only scan)."""
+    table = Claim.__table__
+    rows = db.execute(
+        select(table.c.external_claim_id, table.c.external_digest)
+        .where(table.c.practice_id == practice_id, table.c.external_claim_id.isnot(None))
+        .order_by(table.c.id.desc())  # duplicates: the oldest claim wins
+    ).all()
+    return dict(rows)
+
 
 def ingest_external_claims(
     db: Session,
@@ -17,90 +59,344 @@ def ingest_external_claims(
     source: str = "OPEN_DENTAL",
     actor_user_id: int = None,
 ) -> IngestionSummary:
-    created = 0
-    updated = 0
-    skipped = 0
-    errors: List[str] = []
+    """Upsert a chunk of external claims with a fixed number of statements.
 
-    for ext in external_claims:
-        try:
-            existing = db.query(Claim).filter(
-                Claim.practice_id == practice_id,
-                Claim.external_claim_id == ext.external_claim_id,
-            ).first()
-
-            procedure_codes = ext.procedure_codes
-            if not procedure_codes and ext.lines:
-                procedure_codes = ",".join(line.cdt_code for line in ext.lines)
-
-            if existing:
-                changed = False
-                if existing.payer != ext.payer:
-                    changed = True
-                    existing.payer = ext.payer
-                if existing.amount_cents != ext.total_billed_cents:
-                    changed = True
-                    existing.amount_cents = ext.total_billed_cents
-                if ext.procedure_date and existing.procedure_date != ext.procedure_date:
-                    changed = True
-                    existing.procedure_date = ext.procedure_date
-                if procedure_codes and existing.procedure_codes != procedure_codes:
-                    changed = True
-                    existing.procedure_codes = procedure_codes
-                if existing.external_source != source:
-                    changed = True
-                    existing.external_source = source
-
-                if changed:
-                    AuditService.log_event(
-                        db,
-                        claim_id=existing.id,
-                        action="CLAIM_UPDATED_VIA_SYNC",
-                        actor_user_id=actor_user_id,
-                        metadata={
-                            "external_claim_id": ext.external_claim_id,
-                            "source": source,
-                        },
-                    )
-                    updated += 1
-                else:
-                    skipped += 1
-            else:
-                claim = Claim(
-                    practice_id=practice_id,
-                    payer=ext.payer,
-                    amount_cents=ext.total_billed_cents,
-                    procedure_date=ext.procedure_date,
-                    external_claim_id=ext.external_claim_id,
-                    external_source=source,
-                    procedure_codes=procedure_codes,
-                    claim_token=Claim.generate_claim_token(),
-                    status=ClaimStatus.NEW.value,
-                )
-                db.add(claim)
-                db.flush()
-
-                AuditService.log_event(
-                    db,
-                    claim_id=claim.id,
-                    action="CLAIM_IMPORTED",
-                    to_status=ClaimStatus.NEW.value,
-                    actor_user_id=actor_user_id,
-                    metadata={
-                        "external_claim_id": ext.external_claim_id,
-                        "source": source,
-                    },
-                )
-                created += 1
-
-        except Exception as e:
-            logger.error("Failed to ingest claim %s: %s", ext.external_claim_id, str(e))
-            errors.append(f"{ext.external_claim_id}: {str(e)}")
+    Existing claims are loaded in one query, the diff is computed in memory,
+    and new claims, changed claims and their audit events are written in bulk.
+    Claim lines are upserted the same way, keyed on (claim, external line id):
+    only new, changed and dropped lines are written, and a claim whose lines
+    changed counts as updated.
+    A claim repeated within the chunk is applied in order, exactly as one row
+    at a time would be. If the chunk cannot be written, it is rolled back to a
+    savepoint and every claim in it is reported as an error.
+    """
+    try:
+        with db.begin_nested():
+            created, updated, skipped = _upsert_claims(db, practice_id, external_claims, source, actor_user_id)
+    except Exception as e:
+        logger.error("Failed to ingest %d claims for practice %s: %s", len(external_claims), practice_id, str(e))
+        return IngestionSummary(
+            total_received=len(external_claims),
+            created=0,
+            updated=0,
+            skipped=0,
+            errors=[f"{ext.external_claim_id}: {str(e)}" for ext in external_claims],
+        )
 
     return IngestionSummary(
         total_received=len(external_claims),
         created=created,
         updated=updated,
         skipped=skipped,
+        errors=[],
+    )
+
+
+def _incoming_lines(ext: ExternalClaim) -> Dict[str, Dict]:
+    # A line id repeated within a claim: the last one wins.
+    return {
+        line.external_line_id: {
+            "cdt_code": line.cdt_code,
+            "tooth": line.tooth_number,
+            "surface": line.surface,
+            "billed_fee_cents": line.line_amount_cents,
+        }
+        for line in ext.lines
+    }
+
+
+def _existing_lines(db, claim_ids) -> Dict[int, Dict[str, Dict]]:
+    """Ingested lines (those with an external line id) of these claims, by claim and external line id."""
+    lines: Dict[int, Dict[str, Dict]] = {}
+    if not claim_ids:
+        return lines
+    table = ClaimLine.__table__
+    for row in db.execute(
+        select(table.c.id, table.c.claim_id, table.c.external_line_id, *(table.c[f] for f in _LINE_FIELDS))
+        .where(table.c.claim_id.in_(sorted(claim_ids)), table.c.external_line_id.isnot(None))
+    ).mappings().all():
+        lines.setdefault(row["claim_id"], {})[row["external_line_id"]] = dict(row)
+    return lines
+
+
+def _upsert_claims(db, practice_id, external_claims, source, actor_user_id) -> Tuple[int, int, int]:
+    table = Claim.__table__
+    current: Dict[str, Dict] = {}
+    if external_claims:
+        rows = db.execute(
+            select(
+                table.c.id, table.c.external_claim_id, table.c.patient_hash, table.c.external_digest,
+                *(table.c[f] for f in _SYNCED_FIELDS),
+            )
+            .where(
+                table.c.practice_id == practice_id,
+                table.c.external_claim_id.in_(sorted({ext.external_claim_id for ext in external_claims})),
+            )
+            .order_by(table.c.id.desc())  # duplicates: the oldest claim wins
+        ).mappings().all()
+        current = {row["external_claim_id"]: dict(row) for row in rows}
+    # Lines are synced only for claims that arrive with lines; an upload
+    # without a lines file leaves stored lines alone.
+    stored_lines = _existing_lines(db, {
+        current[ext.external_claim_id]["id"] for ext in external_claims
+        if ext.lines and ext.external_claim_id in current
+    })
+
+    new: Dict[str, Dict] = {}
+    updates: Dict[int, Dict] = {}
+    lines: Dict[str, Dict[str, Dict]] = {}  # external claim id -> desired lines, for claims whose lines changed
+    stamps: Dict[int, Dict] = {}  # unchanged claims whose stored digest is missing or stale
+    payer_changed = set()
+    audits = []
+    created = updated = skipped = 0
+
+    for ext in external_claims:
+        digest = external_digest(ext, source)
+        procedure_codes = ext.procedure_codes
+        if not procedure_codes and ext.lines:
+            procedure_codes = ",".join(line.cdt_code for line in ext.lines)
+
+        values = current.get(ext.external_claim_id) or new.get(ext.external_claim_id)
+        if values is None:
+            new[ext.external_claim_id] = {
+                "payer": ext.payer,
+                "amount_cents": ext.total_billed_cents,
+                "procedure_date": ext.procedure_date,
+                "procedure_codes": procedure_codes,
+                "external_source": source,
+                "external_digest": digest,
+            }
+            if ext.lines:
+                lines[ext.external_claim_id] = _incoming_lines(ext)
+            audits.append((ext.external_claim_id, "CLAIM_IMPORTED", ClaimStatus.NEW.value))
+            created += 1
+            continue
+
+        incoming = {"payer": ext.payer, "amount_cents": ext.total_billed_cents, "external_source": source}
+        if ext.procedure_date:
+            incoming["procedure_date"] = ext.procedure_date
+        if procedure_codes:
+            incoming["procedure_codes"] = procedure_codes
+        changes = {k: v for k, v in incoming.items() if values[k] != v}
+        lines_changed = False
+        if ext.lines:
+            desired = _incoming_lines(ext)
+            have = lines.get(ext.external_claim_id)
+            if have is None:
+                have = {
+                    line_id: {f: row[f] for f in _LINE_FIELDS}
+                    for line_id, row in stored_lines.get(values.get("id"), {}).items()
+                }
+            if desired != have:
+                lines[ext.external_claim_id] = desired
+                lines_changed = True
+        if values["external_digest"] != digest:
+            values["external_digest"] = digest
+            if "id" in values:
+                stamps[values["id"]] = values
+        if not changes and not lines_changed:
+            skipped += 1
+            continue
+
+        if changes:
+            values.update(changes)
+            if "id" in values:
+                updates[values["id"]] = values
+                if "payer" in changes:
+                    payer_changed.add(values["id"])
+        audits.append((ext.external_claim_id, "CLAIM_UPDATED_VIA_SYNC", None))
+        updated += 1
+
+    stamps = {claim_id: values for claim_id, values in stamps.items() if claim_id not in updates}
+    if stamps:
+        # Digest only: no synced field changed, so nothing derived does either.
+        db.execute(
+            update(table).where(table.c.id == bindparam("_id"))
+            .values(external_digest=bindparam("_digest"), updated_at=table.c.updated_at),
+            [{"_id": claim_id, "_digest": values["external_digest"]} for claim_id, values in sorted(stamps.items())],
+        )
+    if not new and not updates and not lines:
+        return created, updated, skipped
+
+    claim_ids = {ext_id: values["id"] for ext_id, values in current.items()}
+    rollups_before = read_claim_contributions(
+        db, updates, {claim_ids[ext_id] for ext_id in lines if ext_id in claim_ids},
+    )
+
+    new_patient_hash = Claim.compute_patient_hash(practice_id, None)
+    if new:
+        # Core insert: mapper events do not run, so patient_hash is set here.
+        inserted = db.execute(
+            insert(table).returning(table.c.id, table.c.external_claim_id),
+            [
+                {
+                    "practice_id": practice_id,
+                    "external_claim_id": ext_id,
+                    **values,
+                    "patient_hash": new_patient_hash,
+                    "claim_token": Claim.generate_claim_token(),
+                    "status": ClaimStatus.NEW.value,
+                }
+                for ext_id, values in new.items()
+            ],
+        ).all()
+        claim_ids.update({row.external_claim_id: row.id for row in inserted})
+
+    if updates:
+        db.execute(
+            update(table).where(table.c.id == bindparam("_id")),
+            [
+                {"_id": claim_id, **{f: values[f] for f in _SYNCED_FIELDS}, "external_digest": values["external_digest"]}
+                for claim_id, values in sorted(updates.items())
+            ],
+        )
+
+    line_claim_ids = {claim_ids[ext_id] for ext_id in lines}
+    if lines:
+        _write_lines(db, {claim_ids[ext_id]: desired for ext_id, desired in lines.items()}, stored_lines)
+
+    db.execute(insert(AuditEvent.__table__), [
+        {
+            "claim_id": claim_ids[ext_id],
+            "action": action,
+            "to_status": to_status,
+            "actor_user_id": actor_user_id,
+            "metadata_json": json.dumps({"external_claim_id": ext_id, "source": source}),
+        }
+        for ext_id, action, to_status in audits
+    ])
+
+    # The bulk statements bypass the flush hooks; keep the derived tables current.
+    written = set(updates) | {claim_ids[ext_id] for ext_id in new}
+    apply_claim_contributions(db, written, rollups_before, line_claim_ids)
+    patient_hashes = {values["patient_hash"] for values in updates.values()}
+    if new:
+        patient_hashes.add(new_patient_hash)
+    refresh_patient_dimensions(db, practice_id, patient_hashes)
+    if payer_changed and db.execute(
+        select(PaymentIntent.id)
+        .where(PaymentIntent.claim_id.in_(sorted(payer_changed)), PaymentIntent.confirmed_at.isnot(None))
+        .limit(1)
+    ).first():
+        rebuild_metric_sketches(db, practice_id)
+    bump_data_version(db, [practice_id])
+
+    return created, updated, skipped
+
+
+def _write_lines(db, desired: Dict[int, Dict[str, Dict]], stored: Dict[int, Dict[str, Dict]]) -> None:
+    """Bring each claim's ingested lines to ``desired``: insert new, update changed, delete dropped lines.
+
+    A dropped line that a remittance line was matched to is kept.
+    """
+    table = ClaimLine.__table__
+    codes = sorted({line["cdt_code"] for lines in desired.values() for line in lines.values()})
+    code_ids = dict(db.execute(
+        select(ProcedureCode.cdt_code, ProcedureCode.id).where(ProcedureCode.cdt_code.in_(codes))
+    ).all()) if codes else {}
+
+    inserts, changes, dropped = [], [], []
+    for claim_id, lines in desired.items():
+        have = stored.get(claim_id, {})
+        for line_id, values in lines.items():
+            row = {**values, "procedure_code_id": code_ids.get(values["cdt_code"])}
+            if line_id not in have:
+                inserts.append({"claim_id": claim_id, "external_line_id": line_id, **row})
+            elif any(have[line_id][f] != values[f] for f in _LINE_FIELDS):
+                changes.append({"_id": have[line_id]["id"], **row})
+        dropped.extend(old["id"] for line_id, old in have.items() if line_id not in lines)
+
+    if inserts:
+        db.execute(insert(table), inserts)
+    if changes:
+        db.execute(update(table).where(table.c.id == bindparam("_id")), changes)
+    if dropped:
+        db.execute(delete(table).where(
+            table.c.id.in_(sorted(dropped)),
+            ~select(RemittanceLine.id).where(RemittanceLine.claim_line_id == table.c.id).exists(),
+        ))
+
+
+def ingestion_checkpoint(run: IntegrationSyncRun) -> Dict:
+    """The run's committed progress: rows consumed so far and running totals."""
+    state = {"rows": 0, "created": 0, "updated": 0, "skipped": 0, "errors": [], "dropped_errors": 0}
+    if run.checkpoint_json:
+        state.update(json.loads(run.checkpoint_json))
+    return state
+
+
+def checkpoint_summary(state: Dict) -> IngestionSummary:
+    errors = list(state["errors"])
+    if state["dropped_errors"]:
+        errors.append(f"... {state['dropped_errors']} more errors not shown")
+    return IngestionSummary(
+        total_received=state["rows"],
+        created=state["created"],
+        updated=state["updated"],
+        skipped=state["skipped"],
         errors=errors,
     )
+
+
+def ingest_claim_chunks(
+    db: Session,
+    practice_id: int,
+    chunks: Iterable[Tuple[List[ExternalClaim], List[str]]],
+    run: IntegrationSyncRun,
+    source: str = "OPEN_DENTAL",
+    actor_user_id: int = None,
+    bytes_processed: Optional[Callable[[], int]] = None,
+) -> IngestionSummary:
+    """Ingest ``(claims, row errors)`` chunks, committing after each one.
+
+    Every commit also writes the run's counters, heartbeat and checkpoint
+    (rows consumed plus running totals), so a long run reports progress and a
+    run resumed after a crash continues from ``ingestion_checkpoint(run)``
+    with exact totals. Only the first MAX_REPORTED_ERRORS errors are kept;
+    the rest are counted.
+
+    The practice's stored digests are loaded once; a row whose digest is
+    unchanged is counted as skipped without touching the database, so a
+    mostly unchanged re-export costs little more than reading it.
+    """
+    state = ingestion_checkpoint(run)
+    digests = stored_digests(db, practice_id)
+
+    for external_claims, row_errors in chunks:
+        changed, unchanged = [], 0
+        for ext in external_claims:
+            digest = external_digest(ext, source)
+            if digests.get(ext.external_claim_id) == digest:
+                unchanged += 1
+            else:
+                changed.append((ext, digest))
+        summary = ingest_external_claims(
+            db=db,
+            practice_id=practice_id,
+            external_claims=[ext for ext, _ in changed],
+            source=source,
+            actor_user_id=actor_user_id,
+        ) if changed else IngestionSummary(total_received=0, created=0, updated=0, skipped=0, errors=[])
+        if not summary.errors:
+            digests.update((ext.external_claim_id, digest) for ext, digest in changed)
+        summary.total_received += unchanged
+        summary.skipped += unchanged
+        state["rows"] += summary.total_received + len(row_errors)
+        state["created"] += summary.created
+        state["updated"] += summary.updated
+        state["skipped"] += summary.skipped
+        for error in row_errors + summary.errors:
+            if len(state["errors"]) < MAX_REPORTED_ERRORS:
+                state["errors"].append(error)
+            else:
+                state["dropped_errors"] += 1
+
+        run.pulled_count = state["rows"]
+        run.upserted_count = state["created"] + state["updated"]
+        if bytes_processed is not None:
+            run.bytes_processed = bytes_processed()
+        run.checkpoint_json = json.dumps(state)
+        run.heartbeat_at = datetime.utcnow()
+        db.commit()
+
+    return checkpoint_summary(state)
@@ -0,0 +1,442 @@
+"""Background ingestion jobs for Open Dental CSV uploads and API syncs.
+
+The request only queues the work: uploads are spooled to disk and an
+``IntegrationSyncRun`` is created in QUEUED state, then a background task
+claims the run and ingests it in chunks. Each chunk commits together with the
+run's checkpoint (rows consumed, running totals) and heartbeat, so a job is
+resumable: a run whose heartbeat is older than ``ingestion_stale_after_seconds``
+is taken over by ``resume_stale_runs`` (on startup and from
+``scripts/resume_ingestion_jobs.py``) and continues after its last committed
+chunk. Claiming a run is one conditional UPDATE, so two workers never
+process the same run, and it is refused while another run of the same
+practice is RUNNING: a practice's runs are processed one at a time, the ones
+queued behind a running run by the worker that finishes it.
+
+A failed API sync pushes the connection's ``next_sync_at`` back by a delay
+that depends on the kind of failure and doubles with each failure in a row
+(see ``sync_backoff``); the scheduler (services/sync_scheduler.py) waits
+for it.
+"""
+import csv
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, case, exists, func, or_, text, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..integrations.csv_parser import (
+    ByteProgress,
+    LineIndex,
+    iter_claims_csv,
+    iter_external_claim_chunks,
+    iter_lines_csv,
+    iter_text_lines,
+    read_chunks,
+)
+from ..integrations.csv_parallel import PARALLEL_PARSE_MIN_BYTES, iter_parallel_claim_chunks
+from ..integrations.open_dental.client import OpenDentalAPIError
+from ..integrations.open_dental.provider import OpenDentalNotConfigured, OpenDentalProvider
+from ..models.integration import (
+    IntegrationConnection,
+    IntegrationProvider,
+    IntegrationStatus,
+    IntegrationSyncRun,
+    SyncRunStatus,
+)
+from ..schemas.integration import IngestionSummary, IntegrationSyncRunResponse
+from .ingestion import INGEST_CHUNK_SIZE, checkpoint_summary, ingest_claim_chunks, ingestion_checkpoint
+
+logger = logging.getLogger(__name__)
+
+CLAIMS_FILE = "claims.csv"
+LINES_FILE = "lines.csv"
+# Serializes claims of one practice's runs (pg_advisory_xact_lock(key, practice_id)).
+CLAIM_LOCK_KEY = 9142048
+
+# Delay before the scheduler retries a failed API sync, by kind of failure;
+# doubled for each further failure in a row, up to SYNC_BACKOFF_MAX.
+SYNC_BACKOFF = {
+    "auth": timedelta(hours=1),  # keys rejected: needs a human, don't hammer the API
+    "rate_limited": timedelta(minutes=15),  # still 429 after the client's own retries
+    "unavailable": timedelta(minutes=5),  # 5xx, timeouts, unreachable
+    "error": timedelta(minutes=15),
+}
+SYNC_BACKOFF_MAX = timedelta(hours=24)
+
+
+def sync_error_kind(error: Exception) -> str:
+    if isinstance(error, OpenDentalNotConfigured):
+        return "not_configured"
+    if isinstance(error, OpenDentalAPIError):
+        if error.status_code in (401, 403):
+            return "auth"
+        if error.status_code == 429:
+            return "rate_limited"
+        if error.status_code is None or error.status_code >= 500:
+            return "unavailable"
+    return "error"
+
+
+def sync_backoff(kind: str, failures: int) -> timedelta:
+    """Delay after the ``failures``-th failed API sync in a row."""
+    base = SYNC_BACKOFF.get(kind)
+    if base is None:
+        return SYNC_BACKOFF_MAX
+    return min(base * 2 ** max(failures - 1, 0), SYNC_BACKOFF_MAX)
+
+
+def _open_claim_rows(path: str, progress: Optional[ByteProgress] = None):
+    f = open(path, "rb")
+    try:
+        return f, iter_claims_csv(iter_text_lines(read_chunks(f, progress)))
+    except Exception:
+        f.close()
+        raise
+
+
+def _regroup(pages: Iterable[Tuple[List, List[str]]], size: int) -> Iterator[Tuple[List, List[str]]]:
+    """Merge API pages into chunks of about ``size`` records, one commit each."""
+    claims, errors = [], []
+    for page_claims, page_errors in pages:
+        claims.extend(page_claims)
+        errors.extend(page_errors)
+        if len(claims) + len(errors) >= size:
+            yield claims, errors
+            claims, errors = [], []
+    if claims or errors:
+        yield claims, errors
+
+
+class IngestionJobService:
+
+    @staticmethod
+    def spool_root() -> str:
+        return get_settings().ingestion_spool_dir or os.path.join(tempfile.gettempdir(), "spoonbill-ingestion")
+
+    @staticmethod
+    def queue_csv_upload(
+        db: Session,
+        conn: IntegrationConnection,
+        claims_file: BinaryIO,
+        lines_file: Optional[BinaryIO] = None,
+        actor_user_id: Optional[int] = None,
+    ) -> IntegrationSyncRun:
+        """Spool the upload, check both headers and queue a CSV_UPLOAD run.
+
+        Raises ValueError (nothing is queued) if a file is missing required
+        columns.
+        """
+        os.makedirs(IngestionJobService.spool_root(), exist_ok=True)
+        payload = tempfile.mkdtemp(prefix=f"practice-{conn.practice_id}-", dir=IngestionJobService.spool_root())
+        try:
+            with open(os.path.join(payload, CLAIMS_FILE), "wb") as out:
+                shutil.copyfileobj(claims_file, out)
+            if lines_file is not None:
+                with open(os.path.join(payload, LINES_FILE), "wb") as out:
+                    shutil.copyfileobj(lines_file, out)
+
+            f, _ = _open_claim_rows(os.path.join(payload, CLAIMS_FILE))
+            f.close()
+            if lines_file is not None:
+                with open(os.path.join(payload, LINES_FILE), "rb") as f:
+                    iter_lines_csv(iter_text_lines(read_chunks(f)))
+        except Exception:
+            shutil.rmtree(payload, ignore_errors=True)
+            raise
+
+        run = IntegrationSyncRun(
+            connection_id=conn.id,
+            practice_id=conn.practice_id,
+            provider=IntegrationProvider.OPEN_DENTAL.value,
+            status=SyncRunStatus.QUEUED.value,
+            sync_type="CSV_UPLOAD",
+            bytes_total=os.path.getsize(os.path.join(payload, CLAIMS_FILE)),
+            bytes_processed=0,
+            payload_path=payload,
+            triggered_by_user_id=actor_user_id,
+        )
+        db.add(run)
+        db.commit()
+        return run
+
+    @staticmethod
+    def queue_api_sync(db: Session, conn: IntegrationConnection, actor_user_id: Optional[int] = None) -> IntegrationSyncRun:
+        run = IngestionJobService.api_run(conn, actor_user_id)
+        db.add(run)
+        db.commit()
+        return run
+
+    @staticmethod
+    def api_run(conn: IntegrationConnection, actor_user_id: Optional[int] = None) -> IntegrationSyncRun:
+        """A QUEUED API sync run from the connection's cursor (not yet added to a session)."""
+        return IntegrationSyncRun(
+            connection_id=conn.id,
+            practice_id=conn.practice_id,
+            provider=IntegrationProvider.OPEN_DENTAL.value,
+            status=SyncRunStatus.QUEUED.value,
+            sync_type="API",
+            # A resumed sync re-reads from the same cursor and skips what it committed.
+            checkpoint_json=json.dumps({"cursor": conn.last_cursor}),
+            triggered_by_user_id=actor_user_id,
+        )
+
+    @staticmethod
+    def claim(db: Session, run_id: int, stale_before: Optional[datetime] = None) -> Optional[IntegrationSyncRun]:
+        """Atomically take a queued run (or, with ``stale_before``, an abandoned one).
+
+        Returns None if the run is taken or finished, or if another run of the
+        same practice is RUNNING with a fresh heartbeat.
+        """
+        table = IntegrationSyncRun.__table__
+        practice_id = db.query(IntegrationSyncRun.practice_id).filter(IntegrationSyncRun.id == run_id).scalar()
+        if practice_id is None:
+            db.rollback()
+            return None
+        claimable = table.c.status == SyncRunStatus.QUEUED.value
+        if stale_before is not None:
+            claimable = and_(
+                table.c.status.in_([SyncRunStatus.QUEUED.value, SyncRunStatus.RUNNING.value]),
+                func.coalesce(table.c.heartbeat_at, table.c.started_at) < stale_before,
+            )
+        # Held until the commit below, so a concurrent claim for the same
+        # practice runs its UPDATE after this one commits and sees the run RUNNING.
+        db.execute(text("SELECT pg_advisory_xact_lock(:k, :p)"), {"k": CLAIM_LOCK_KEY, "p": practice_id})
+        now = datetime.utcnow()
+        other = aliased(table)
+        busy = exists().where(
+            other.c.practice_id == practice_id,
+            other.c.id != run_id,
+            other.c.status == SyncRunStatus.RUNNING.value,
+            func.coalesce(other.c.heartbeat_at, other.c.started_at)
+            >= now - timedelta(seconds=get_settings().ingestion_stale_after_seconds),
+        )
+        claimed = db.execute(
+            update(table)
+            .where(table.c.id == run_id, claimable, ~busy)
+            .values(
+                status=SyncRunStatus.RUNNING.value,
+                # Durations and rates are measured from the first claim, not from queueing.
+                started_at=case((table.c.attempts == 0, now), else_=table.c.started_at),
+                heartbeat_at=now,
+                attempts=table.c.attempts + 1,
+            )
+            .returning(table.c.id)
+        ).first()
+        db.commit()
+        return db.get(IntegrationSyncRun, run_id, populate_existing=True) if claimed else None
+
+    @staticmethod
+    def next_queued_run(db: Session, practice_id: int) -> Optional[int]:
+        """Oldest QUEUED run of the practice, if any."""
+        run_id = db.query(func.min(IntegrationSyncRun.id)).filter(
+            IntegrationSyncRun.practice_id == practice_id,
+            IntegrationSyncRun.status == SyncRunStatus.QUEUED.value,
+        ).scalar()
+        db.commit()
+        return run_id
+
+    @staticmethod
+    def process(db: Session, run: IntegrationSyncRun) -> IngestionSummary:
+        """Ingest a claimed run from its checkpoint to the end and finish it."""
+        conn = db.get(IntegrationConnection, run.connection_id)
+        try:
+            if run.sync_type == "CSV_UPLOAD":
+                summary = IngestionJobService._process_csv(db, run)
+                conn.last_synced_at = datetime.utcnow()
+                if conn.status == IntegrationStatus.INACTIVE.value:
+                    conn.status = IntegrationStatus.ACTIVE.value
+            else:
+                summary, next_cursor = IngestionJobService._process_api(db, run, conn)
+                if next_cursor:
+                    conn.last_cursor = next_cursor
+                conn.last_synced_at = datetime.utcnow()
+                conn.status = IntegrationStatus.ACTIVE.value
+                conn.consecutive_failures = 0
+                conn.next_sync_at = conn.last_synced_at + timedelta(minutes=get_settings().sync_interval_minutes)
+        except Exception as e:
+            db.rollback()
+            run.status = SyncRunStatus.FAILED.value
+            run.ended_at = datetime.utcnow()
+            error = {"error": str(e)}
+            if not isinstance(e, (ValueError, csv.Error)):  # a malformed file is not a connection problem
+                conn.status = IntegrationStatus.ERROR.value
+            if run.sync_type == "API":
+                error["kind"] = sync_error_kind(e)
+                conn.consecutive_failures = (conn.consecutive_failures or 0) + 1
+                conn.next_sync_at = run.ended_at + sync_backoff(error["kind"], conn.consecutive_failures)
+            run.error_json = json.dumps(error)
+            db.commit()
+            IngestionJobService._drop_payload(run)
+            logger.error("[ingestion_job] FAILED run_id=%s practice_id=%s error=%s", run.id, run.practice_id, str(e))
+            raise
+
+        run.status = SyncRunStatus.SUCCEEDED.value
+        run.ended_at = datetime.utcnow()
+        db.commit()
+        IngestionJobService._drop_payload(run)
+        logger.info(
+            "[ingestion_job] run_id=%s practice_id=%s type=%s attempts=%d pulled=%d created=%d updated=%d skipped=%d errors=%d",
+            run.id, run.practice_id, run.sync_type, run.attempts, summary.total_received,
+            summary.created, summary.updated, summary.skipped, len(summary.errors),
+        )
+        return summary
+
+    @staticmethod
+    def _process_csv(db: Session, run: IntegrationSyncRun) -> IngestionSummary:
+        claims_path = os.path.join(run.payload_path, CLAIMS_FILE)
+        lines_path = os.path.join(run.payload_path, LINES_FILE)
+        if not os.path.exists(lines_path):
+            lines_path = None
+        skip = ingestion_checkpoint(run)["rows"]
+        progress = ByteProgress(total=run.bytes_total)
+        workers = get_settings().ingestion_parse_workers or os.cpu_count() or 1
+
+        if workers > 1 and (run.bytes_total or 0) >= PARALLEL_PARSE_MIN_BYTES:
+            return ingest_claim_chunks(
+                db=db,
+                practice_id=run.practice_id,
+                chunks=iter_parallel_claim_chunks(claims_path, lines_path, INGEST_CHUNK_SIZE, skip, workers, progress),
+                run=run,
+                source="OPEN_DENTAL",
+                actor_user_id=run.triggered_by_user_id,
+                bytes_processed=lambda: progress.read,
+            )
+
+        line_index = None
+        f, claim_rows = _open_claim_rows(claims_path, progress)
+        try:
+            if lines_path:
+                with open(lines_path, "rb") as lf:
+                    line_index = LineIndex(iter_lines_csv(iter_text_lines(read_chunks(lf))))
+            return ingest_claim_chunks(
+                db=db,
+                practice_id=run.practice_id,
+                chunks=iter_external_claim_chunks(claim_rows, line_index, INGEST_CHUNK_SIZE, skip=skip),
+                run=run,
+                source="OPEN_DENTAL",
+                actor_user_id=run.triggered_by_user_id,
+                bytes_processed=lambda: progress.read,
+            )
+        finally:
+            f.close()
+            if line_index is not None:
+                line_index.close()
+
+    @staticmethod
+    def _process_api(db: Session, run: IntegrationSyncRun, conn: IntegrationConnection):
+        state = ingestion_checkpoint(run)
+        provider = OpenDentalProvider(config_json=conn.config_json, secrets_ref=conn.secrets_ref)
+        if not state.get("next_cursor"):
+            # Fixed on the first attempt, so a resumed run ends at the same cursor.
+            state["next_cursor"] = provider.next_cursor()
+            run.checkpoint_json = json.dumps(state)
+            db.commit()
+        pages = provider.fetch_updated_claims(cursor=state.get("cursor"), offset=state["rows"])
+        summary = ingest_claim_chunks(
+            db=db,
+            practice_id=run.practice_id,
+            chunks=_regroup(pages, INGEST_CHUNK_SIZE),
+            run=run,
+            source="OPEN_DENTAL",
+            actor_user_id=run.triggered_by_user_id,
+        )
+        return summary, state["next_cursor"]
+
+    @staticmethod
+    def _drop_payload(run: IntegrationSyncRun) -> None:
+        if run.payload_path:
+            shutil.rmtree(run.payload_path, ignore_errors=True)
+
+    @staticmethod
+    def run_in_background(run_id: int, stale_before: Optional[datetime] = None) -> None:
+        """Background-task entry point: claim the run and process it, then the
+        runs of the same practice that queued up behind it."""
+        db = SessionLocal()
+        try:
+            while run_id is not None:
+                run = IngestionJobService.claim(db, run_id, stale_before)
+                if run is None:
+                    logger.info("[ingestion_job] run_id=%s already taken or its practice is busy", run_id)
+                    return
+                try:
+                    IngestionJobService.process(db, run)
+                except Exception as e:
+                    logger.error("Ingestion run %s failed: %s", run_id, str(e))
+                run_id, stale_before = IngestionJobService.next_queued_run(db, run.practice_id), None
+        except Exception as e:
+            logger.error("Ingestion run %s failed: %s", run_id, str(e))
+        finally:
+            db.close()
+
+    @staticmethod
+    def resume_stale_runs(db: Session, stale_after_seconds: Optional[int] = None) -> List[int]:
+        """Process every abandoned run, one after another; returns the run ids taken over."""
+        if stale_after_seconds is None:
+            stale_after_seconds = get_settings().ingestion_stale_after_seconds
+        stale_before = datetime.utcnow() - timedelta(seconds=stale_after_seconds)
+        run_ids = [
+            run_id for (run_id,) in db.query(IntegrationSyncRun.id).filter(
+                IntegrationSyncRun.status.in_([SyncRunStatus.QUEUED.value, SyncRunStatus.RUNNING.value]),
+                or_(
+                    IntegrationSyncRun.heartbeat_at < stale_before,
+                    and_(IntegrationSyncRun.heartbeat_at.is_(None), IntegrationSyncRun.started_at < stale_before),
+                ),
+            ).order_by(IntegrationSyncRun.id)
+        ]
+        db.commit()
+        resumed = []
+        for run_id in run_ids:
+            run = IngestionJobService.claim(db, run_id, stale_before)
+            if run is None:
+                continue
+            logger.warning("[ingestion_job] resuming run_id=%s attempt=%d from row %d", run_id, run.attempts, run.pulled_count)
+            resumed.append(run_id)
+            try:
+                IngestionJobService.process(db, run)
+            except Exception as e:
+                logger.error("Ingestion run %s failed on resume: %s", run_id, str(e))
+        return resumed
+
+    @staticmethod
+    def resume_stale_runs_in_thread() -> threading.Thread:
+        """Startup hook: resume abandoned runs without blocking the server."""
+        def target():
+            db = SessionLocal()
+            try:
+                IngestionJobService.resume_stale_runs(db)
+            except Exception as e:
+                logger.error("Resuming ingestion runs failed: %s", str(e))
+            finally:
+                db.close()
+
+        thread = threading.Thread(target=target, name="ingestion-resume", daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def run_response(run: IntegrationSyncRun, now: Optional[datetime] = None) -> IntegrationSyncRunResponse:
+        """API view of a run with its processing rate and, while running, an ETA."""
+        response = IntegrationSyncRunResponse.model_validate(run)
+        if run.checkpoint_json:
+            response.summary = checkpoint_summary(ingestion_checkpoint(run))
+        end = run.ended_at or (now or datetime.utcnow())
+        elapsed = (end - run.started_at).total_seconds()
+        if elapsed <= 0 or not run.pulled_count:
+            return response
+        rate = run.pulled_count / elapsed
+        eta = None
+        if run.status == SyncRunStatus.RUNNING.value:
+            if run.bytes_total and run.bytes_processed:
+                eta = elapsed * max(run.bytes_total - run.bytes_processed, 0) / run.bytes_processed
+            elif run.rows_total:
+                eta = max(run.rows_total - run.pulled_count, 0) / rate
+        return response.model_copy(update={"rows_per_second": round(rate, 1), "eta_seconds": None if eta is None else round(eta, 1)})
@@ -140,11 +140,13 @@ class OntologyBuilder:
 
     @staticmethod
     def _upsert_object(db, practice_id, object_type, object_key, properties):
+        object_type = object_type.value if isinstance(object_type, OntologyObjectType) else object_type
         obj = OntologyObject(
             practice_id=practice_id,
-            object_type=object_type.value if isinstance(object_type, OntologyObjectType) else object_type,
+            object_type=object_type,
             object_key=object_key,
             properties_json=properties,
+            **OntologyObject.typed_columns(object_type, properties),
         )
         db.add(obj)
         db.flush()
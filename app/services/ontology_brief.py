@@ -1,14 +1,34 @@
+"""Ontology briefs: an LLM-written (or template) summary of the practice context.
+
+Briefs are cached per practice in ``ontology_briefs`` under a hash of the
+context they were written from, so an unchanged practice is served from the
+cache. New briefs are generated asynchronously through one pooled
+``httpx.AsyncClient`` per process with at most ``brief_llm_concurrency``
+requests in flight; concurrent requests for the same context share one
+generation. A generation that fails or exceeds ``brief_llm_timeout_seconds``
+falls back to the previous cached brief (flagged ``stale``) or, if there is
+none, to the deterministic template brief.
+"""
+import asyncio
+import hashlib
 import json
 import logging
-from typing import Optional
+from datetime import datetime
+from typing import Any, Dict, Optional
 
+import httpx
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from ..config import get_settings
-from ..services.audit import AuditService
+from ..models.ontology import OntologyBrief
 
 logger = logging.getLogger(__name__)
 
+SOURCE_LLM = "llm"
+SOURCE_TEMPLATE = "template"
+LLM_MODEL = "gpt-4o-mini"
+
 BRIEF_SCHEMA_KEYS = {"summary", "key_drivers", "risks", "recommended_actions", "missing_data"}
 
 SYSTEM_PROMPT = """You are a financial analyst for Spoonbill, a dental claims underwriting platform.
@@ -33,32 +53,115 @@ Only recommend ADJUST_LIMIT if utilization > 0.85 or < 0.3.
 Only output valid JSON. No markdown, no explanation outside the JSON."""
 
 
-def generate_brief_from_context(context: dict) -> dict:
+def _user_message(context: dict) -> str:
+    return json.dumps(
+        {"practice": context.get("practice", {}), "snapshot": context.get("snapshot", {})},
+        default=str, sort_keys=True,
+    )
+
+
+def context_hash(context: dict) -> str:
+    """Hash of the part of the context a brief is written from."""
+    return hashlib.sha256(_user_message(context).encode()).hexdigest()
+
+
+class _LoopState:
+    """Pooled client, concurrency limit and in-flight generations of one event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, base_url: str, concurrency: int):
+        self.loop = loop
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.inflight: Dict[str, asyncio.Future] = {}
+
+
+_state: Optional[_LoopState] = None
+
+
+def _loop_state() -> _LoopState:
+    global _state
+    loop = asyncio.get_running_loop()
+    if _state is None or _state.loop is not loop:
+        settings = get_settings()
+        _state = _LoopState(loop, settings.openai_base_url, max(1, settings.brief_llm_concurrency))
+    return _state
+
+
+async def close_brief_client() -> None:
+    """Close the pooled LLM client (application shutdown)."""
+    global _state
+    if _state is not None and _state.loop is asyncio.get_running_loop():
+        await _state.client.aclose()
+    _state = None
+
+
+async def get_or_generate_brief(db: Session, practice_id: int, context: dict, refresh: bool = False) -> Dict[str, Any]:
+    """The practice's brief for ``context``: cached if it was written from the same context, else generated.
+
+    Database calls run in worker threads so the event loop only ever waits
+    on the LLM. Stores newly generated briefs; the caller commits.
+    """
     settings = get_settings()
+    digest = context_hash(context)
+    cached = await asyncio.to_thread(load_cached_brief, db, practice_id)
+    if cached is not None and cached.context_hash == digest and not refresh and (
+        cached.source == SOURCE_LLM or not settings.openai_api_key
+    ):
+        return cached_brief_response(cached, digest)
 
     if settings.openai_api_key:
-        try:
-            return _llm_generate(settings.openai_api_key, context)
-        except Exception as e:
-            logger.warning("LLM brief generation failed, falling back to template: %s", e)
+        brief, source = await _llm_brief(context, digest), SOURCE_LLM
+        if brief is None:
+            if cached is not None:
+                return cached_brief_response(cached, digest)
+            return brief_response(_template_generate(context), SOURCE_TEMPLATE, digest, datetime.utcnow(), cached=False, stale=False)
+    else:
+        brief, source = _template_generate(context), SOURCE_TEMPLATE
 
-    return _template_generate(context)
+    generated_at = datetime.utcnow()
+    await asyncio.to_thread(store_brief, db, practice_id, digest, brief, source, generated_at)
+    return brief_response(brief, source, digest, generated_at, cached=False, stale=False)
 
 
-def _llm_generate(api_key: str, context: dict) -> dict:
-    import httpx
+async def _llm_brief(context: dict, digest: str) -> Optional[dict]:
+    """LLM brief for a context, or None if the LLM fails or exceeds the time budget."""
+    settings = get_settings()
+    state = _loop_state()
+    task = state.inflight.get(digest)
+    if task is None:
+        task = asyncio.ensure_future(asyncio.wait_for(
+            _llm_generate_bounded(state, settings.openai_api_key, context, settings.brief_llm_timeout_seconds),
+            timeout=settings.brief_llm_timeout_seconds,
+        ))
+        state.inflight[digest] = task
+        task.add_done_callback(lambda _: state.inflight.pop(digest, None))
+    try:
+        # Shielded: one caller going away must not cancel a generation others await.
+        return await asyncio.shield(task)
+    except asyncio.TimeoutError:
+        logger.warning("LLM brief generation timed out after %ss, falling back", settings.brief_llm_timeout_seconds)
+    except Exception as e:
+        logger.warning("LLM brief generation failed, falling back: %s", e)
+    return None
 
-    snapshot = context.get("snapshot", {})
-    practice = context.get("practice", {})
 
-    user_message = json.dumps({"practice": practice, "snapshot": snapshot}, default=str)
+async def _llm_generate_bounded(state: _LoopState, api_key: str, context: dict, timeout: float) -> dict:
+    async with state.semaphore:
+        return await _llm_generate(state.client, api_key, context, timeout)
+
+
+async def _llm_generate(client: httpx.AsyncClient, api_key: str, context: dict, timeout: float) -> dict:
+    user_message = _user_message(context)
 
     for attempt in range(2):
-        resp = httpx.post(
-            "https://api.openai.com/v1/chat/completions",
+        resp = await client.post(
+            "/chat/completions",
             headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
             json={
-                "model": "gpt-4o-mini",
+                "model": LLM_MODEL,
                 "messages": [
                     {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": user_message},
@@ -66,7 +169,7 @@ def _llm_generate(api_key: str, context: dict) -> dict:
                 "temperature": 0.3,
                 "max_tokens": 1000,
             },
-            timeout=30.0,
+            timeout=timeout,
         )
         resp.raise_for_status()
         content = resp.json()["choices"][0]["message"]["content"]
@@ -85,6 +188,41 @@ def _llm_generate(api_key: str, context: dict) -> dict:
     raise ValueError("LLM produced invalid brief after retries")
 
 
+def load_cached_brief(db: Session, practice_id: int) -> Optional[OntologyBrief]:
+    return db.query(OntologyBrief).filter(OntologyBrief.practice_id == practice_id).first()
+
+
+def store_brief(db: Session, practice_id: int, digest: str, brief: dict, source: str, generated_at: datetime) -> None:
+    stmt = insert(OntologyBrief.__table__).values(
+        practice_id=practice_id, context_hash=digest, source=source, brief_json=brief, generated_at=generated_at,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["practice_id"],
+        set_={c: stmt.excluded[c] for c in ("context_hash", "source", "brief_json", "generated_at")},
+    ))
+
+
+def brief_response(brief: dict, source: str, digest: str, generated_at: Optional[datetime], cached: bool, stale: bool) -> Dict[str, Any]:
+    """The brief plus a ``meta`` block describing where it came from."""
+    return {
+        **brief,
+        "meta": {
+            "source": source,
+            "context_hash": digest,
+            "generated_at": generated_at.isoformat() if generated_at else None,
+            "cached": cached,
+            "stale": stale,
+        },
+    }
+
+
+def cached_brief_response(cached: OntologyBrief, current_digest: str) -> Dict[str, Any]:
+    return brief_response(
+        cached.brief_json, cached.source, cached.context_hash, cached.generated_at,
+        cached=True, stale=cached.context_hash != current_digest,
+    )
+
+
 def _validate_brief(brief: dict) -> bool:
     if not isinstance(brief, dict):
         return False
@@ -0,0 +1,134 @@
+"""Versioned response cache for the ontology read endpoints.
+
+Responses are stored as rendered JSON bytes under (practice, endpoint,
+params), each tagged with the practice's ``data_version`` and the day they
+were computed for (several metrics are relative to today). A lookup with a
+different version or day is a miss. The cache is a bounded LRU, limited by
+both entry count and total body bytes, and keeps hit/miss/304 counters for
+the ops metrics endpoint.
+
+The ETag is derived from the same (practice, endpoint, params, version, day)
+key, so If-None-Match can be answered with a 304 before anything is computed.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import date
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .ontology_snapshot import get_data_version
+
+RESPONSE_CACHE_MAX_ENTRIES = 1024
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class OntologyResponseCache:
+    """Byte-bounded LRU of rendered ontology responses."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[str, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+        self._counters = {"hits": 0, "misses": 0, "not_modified": 0, "evictions": 0, "uncacheable": 0}
+
+    @staticmethod
+    def key(practice_id: int, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Tuple:
+        return (practice_id, endpoint, tuple(sorted((params or {}).items())))
+
+    @staticmethod
+    def etag(key: Tuple, version: int, today: date) -> str:
+        digest = hashlib.sha1(json.dumps([key, version, today.isoformat()], default=str).encode()).hexdigest()[:20]
+        return f'W/"{key[0]}-{version}-{digest}"'
+
+    def get(self, key: Tuple, etag: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key: Tuple, etag: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (etag, body)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._counters["evictions"] += 1
+
+    def record(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def invalidate(self, practice_id: Optional[int] = None) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if practice_id is None or k[0] == practice_id]:
+                self._bytes -= len(self._entries.pop(key)[1])
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else None,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+
+response_cache = OntologyResponseCache()
+
+
+def cached_response(
+    db: Session,
+    practice_id: int,
+    endpoint: str,
+    params: Optional[Dict[str, Any]],
+    compute: Callable[[], Any],
+    render: Callable[[Any], bytes],
+    if_none_match: Optional[str] = None,
+) -> Tuple[Optional[bytes], Optional[str]]:
+    """Serve an ontology read from the cache, computing and storing it on a miss.
+
+    Returns ``(body, etag)``; ``body`` is None when ``if_none_match`` already
+    names the current version (the caller answers 304). Responses computed
+    while the version moved (e.g. the read itself triggered a rebuild) are
+    returned without an ETag and not stored.
+    """
+    version = get_data_version(db, practice_id)
+    if version is None:
+        response_cache.record("uncacheable")
+        return render(compute()), None
+
+    today = date.today()
+    key = response_cache.key(practice_id, endpoint, params)
+    etag = response_cache.etag(key, version, today)
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        response_cache.record("not_modified")
+        return None, etag
+
+    body = response_cache.get(key, etag)
+    if body is not None:
+        return body, etag
+
+    body = render(compute())
+    if get_data_version(db, practice_id) != version or date.today() != today:
+        response_cache.record("uncacheable")
+        return body, None
+    response_cache.put(key, etag, body)
+    return body, etag
@@ -9,7 +9,7 @@ from typing import Optional, List, Dict, Any
 from collections import defaultdict
 from decimal import Decimal
 
-from sqlalchemy import func, desc, case
+from sqlalchemy import func, desc, case, distinct, select, union_all
 from sqlalchemy.orm import Session
 
 from ..models.provider import Provider
@@ -23,6 +23,9 @@ from ..models.payment import PaymentIntent, PaymentIntentStatus
 from ..models.remittance import Remittance, RemittanceLine, RemittanceLineMatchStatus
 from ..models.fee_schedule import FeeScheduleItem
 from ..models.practice import Practice
+from ..models.insight_rollup import DECISION_COUNT_COLUMNS, PayerRollup, ProcedureRollup
+from ..models.metric_sketch import CLAIM_CYCLE, PAYMENT_CYCLE, load_metric_sketches, practice_sketch
+from .ontology_sql import AGING_BUCKETS, aging_bucket, day_span
 
 logger = logging.getLogger(__name__)
 
@@ -222,89 +225,107 @@ class OntologyInsightsService:
     @staticmethod
     def get_payer_performance(db: Session, practice_id: int) -> Dict[str, Any]:
         """Payer performance summary: denial rates, cycle times, reimbursement."""
-        claims = db.query(Claim).filter(Claim.practice_id == practice_id).all()
-        payments = {
-            pi.claim_id: pi
-            for pi in db.query(PaymentIntent).filter(PaymentIntent.practice_id == practice_id).all()
-        }
+        rows = db.query(
+            PayerRollup.payer, PayerRollup.claim_count, PayerRollup.denied_count,
+            PayerRollup.billed_cents, PayerRollup.paid_cents,
+        ).filter(PayerRollup.practice_id == practice_id).order_by(
+            PayerRollup.first_claim_id, PayerRollup.id
+        ).all()
 
-        payer_stats: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
-            "total_claims": 0,
-            "denied_claims": 0,
-            "total_billed_cents": 0,
-            "total_paid_cents": 0,
-            "cycle_times_days": [],
-        })
-
-        for claim in claims:
-            payer = claim.payer or "Unknown"
-            stats = payer_stats[payer]
-            stats["total_claims"] += 1
-            stats["total_billed_cents"] += claim.amount_cents or 0
-            if claim.status == ClaimStatus.DECLINED.value:
-                stats["denied_claims"] += 1
-            pi = payments.get(claim.id)
-            if pi and pi.status == PaymentIntentStatus.CONFIRMED.value:
-                stats["total_paid_cents"] += pi.amount_cents or 0
-                if pi.confirmed_at and pi.created_at:
-                    days = (pi.confirmed_at - pi.created_at).total_seconds() / 86400
-                    stats["cycle_times_days"].append(days)
+        cycle_times = load_metric_sketches(db, PAYMENT_CYCLE, [practice_id])
 
         result = {}
-        for payer_name, stats in payer_stats.items():
-            ct = sorted(stats["cycle_times_days"])
+        for payer_name, total_claims, denied_claims, billed, paid in rows:
+            billed, paid = int(billed), int(paid)
+            sketch = cycle_times.get((practice_id, payer_name))
+            avg_days = p50_days = p90_days = None
+            if sketch is not None and sketch.count:
+                avg_days, p50_days, p90_days = sketch.mean, sketch.quantile(0.5), sketch.quantile(0.9)
             result[payer_name] = {
-                "total_claims": stats["total_claims"],
-                "denial_rate": round(stats["denied_claims"] / stats["total_claims"], 4) if stats["total_claims"] > 0 else 0,
-                "total_billed_cents": stats["total_billed_cents"],
-                "total_paid_cents": stats["total_paid_cents"],
-                "realized_rate": round(stats["total_paid_cents"] / stats["total_billed_cents"], 4) if stats["total_billed_cents"] > 0 else None,
-                "avg_cycle_days": round(sum(ct) / len(ct), 1) if ct else None,
-                "p50_cycle_days": round(ct[len(ct) // 2], 1) if ct else None,
-                "p90_cycle_days": round(ct[min(int(len(ct) * 0.9), len(ct) - 1)], 1) if ct else None,
+                "total_claims": total_claims,
+                "denial_rate": round(denied_claims / total_claims, 4) if total_claims > 0 else 0,
+                "total_billed_cents": billed,
+                "total_paid_cents": paid,
+                "realized_rate": round(paid / billed, 4) if billed > 0 else None,
+                "avg_cycle_days": round(avg_days, 1) if avg_days is not None else None,
+                "p50_cycle_days": round(p50_days, 1) if p50_days is not None else None,
+                "p90_cycle_days": round(p90_days, 1) if p90_days is not None else None,
             }
 
         return {"payers": result, "total_payers": len(result)}
 
     @staticmethod
     def get_provider_productivity(db: Session, practice_id: int) -> Dict[str, Any]:
-        """Provider productivity: claim volume, procedure mix, reimbursement."""
+        """Provider productivity: claim volume, procedure mix, reimbursement.
+
+        Three queries for the whole practice, whatever the number of
+        providers: the providers, their claim/billed totals and their top
+        procedures (ranked per provider with a window function).
+        """
         providers = db.query(Provider).filter(
             Provider.practice_id == practice_id
-        ).all()
+        ).order_by(Provider.id).all()
+        if not providers:
+            return {"providers": []}
+
+        provider_ids = select(Provider.id).where(Provider.practice_id == practice_id).scalar_subquery()
+
+        # A provider's claims are those with one of their lines plus those
+        # attributed to them directly; billed sums line fees and direct claim amounts.
+        attributions = union_all(
+            select(
+                ClaimLine.provider_id.label("provider_id"),
+                ClaimLine.claim_id.label("claim_id"),
+                func.coalesce(ClaimLine.billed_fee_cents, 0).label("billed"),
+            ).where(ClaimLine.provider_id.in_(provider_ids)),
+            select(
+                Claim.provider_id, Claim.id, func.coalesce(Claim.amount_cents, 0),
+            ).where(Claim.practice_id == practice_id, Claim.provider_id.in_(provider_ids)),
+        ).subquery()
+        totals = {
+            provider_id: (claim_count, int(billed))
+            for provider_id, claim_count, billed in db.query(
+                attributions.c.provider_id,
+                func.count(distinct(attributions.c.claim_id)),
+                func.sum(attributions.c.billed),
+            ).group_by(attributions.c.provider_id)
+        }
+
+        code_counts = select(
+            ClaimLine.provider_id,
+            ClaimLine.cdt_code,
+            func.count(ClaimLine.id).label("n"),
+            func.min(ClaimLine.id).label("first_line_id"),
+        ).where(
+            ClaimLine.provider_id.in_(provider_ids),
+            ClaimLine.cdt_code.isnot(None),
+            ClaimLine.cdt_code != "",
+        ).group_by(ClaimLine.provider_id, ClaimLine.cdt_code).subquery()
+        ranked = select(
+            code_counts,
+            func.row_number().over(
+                partition_by=code_counts.c.provider_id,
+                order_by=(code_counts.c.n.desc(), code_counts.c.first_line_id),
+            ).label("rank"),
+        ).subquery()
+        top_procedures = defaultdict(list)
+        for provider_id, code, count in db.query(ranked.c.provider_id, ranked.c.cdt_code, ranked.c.n).filter(
+            ranked.c.rank <= 5
+        ).order_by(ranked.c.provider_id, ranked.c.rank):
+            top_procedures[provider_id].append({"code": code, "count": count})
 
         result = []
         for provider in providers:
-            lines = db.query(ClaimLine).filter(ClaimLine.provider_id == provider.id).all()
-            claim_ids = set()
-            procedure_counts: Dict[str, int] = defaultdict(int)
-            total_billed = 0
-            for line in lines:
-                claim_ids.add(line.claim_id)
-                if line.cdt_code:
-                    procedure_counts[line.cdt_code] += 1
-                total_billed += line.billed_fee_cents or 0
-
-            # Also count claims directly attributed to provider
-            direct_claims = db.query(Claim).filter(
-                Claim.practice_id == practice_id,
-                Claim.provider_id == provider.id
-            ).all()
-            for c in direct_claims:
-                claim_ids.add(c.id)
-                total_billed += c.amount_cents or 0
-
-            top_procedures = sorted(procedure_counts.items(), key=lambda x: -x[1])[:5]
-
+            claim_count, total_billed = totals.get(provider.id, (0, 0))
             result.append({
                 "id": provider.id,
                 "full_name": provider.full_name,
                 "specialty": provider.specialty,
                 "role": provider.role,
                 "is_active": provider.is_active,
-                "claim_count": len(claim_ids),
+                "claim_count": claim_count,
                 "total_billed_cents": total_billed,
-                "top_procedures": [{"code": code, "count": cnt} for code, cnt in top_procedures],
+                "top_procedures": top_procedures.get(provider.id, []),
             })
 
         return {"providers": result}
@@ -312,40 +333,27 @@ class OntologyInsightsService:
     @staticmethod
     def get_procedure_risk_summary(db: Session, practice_id: int) -> Dict[str, Any]:
         """Procedure risk and denial trends by CDT code."""
-        claims = db.query(Claim).filter(Claim.practice_id == practice_id).all()
-        claim_ids = [c.id for c in claims]
-
-        if not claim_ids:
-            return {"procedures": {}, "categories": {}}
-
-        lines = db.query(ClaimLine).filter(ClaimLine.claim_id.in_(claim_ids)).all()
-        claim_status_map = {c.id: c.status for c in claims}
-
-        code_stats: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
-            "count": 0, "denied": 0, "total_billed_cents": 0, "total_allowed_cents": 0
-        })
-
-        for line in lines:
-            code = line.cdt_code or "UNKNOWN"
-            stats = code_stats[code]
-            stats["count"] += 1
-            stats["total_billed_cents"] += line.billed_fee_cents or 0
-            if line.allowed_fee_cents:
-                stats["total_allowed_cents"] += line.allowed_fee_cents
-            if claim_status_map.get(line.claim_id) == ClaimStatus.DECLINED.value:
-                stats["denied"] += 1
+        rollups = db.query(ProcedureRollup).filter(
+            ProcedureRollup.practice_id == practice_id
+        ).order_by(ProcedureRollup.cdt_code).all()
+        reference = {
+            pc.cdt_code: pc for pc in db.query(ProcedureCode).filter(
+                ProcedureCode.cdt_code.in_([r.cdt_code for r in rollups])
+            )
+        } if rollups else {}
 
         procedures = {}
-        for code, stats in code_stats.items():
-            pc = db.query(ProcedureCode).filter(ProcedureCode.cdt_code == code).first()
+        for rollup in rollups:
+            code, count = rollup.cdt_code, rollup.line_count
+            pc = reference.get(code)
             procedures[code] = {
                 "cdt_code": code,
                 "description": pc.short_description if pc else None,
                 "category": pc.category if pc else None,
-                "count": stats["count"],
-                "denial_rate": round(stats["denied"] / stats["count"], 4) if stats["count"] > 0 else 0,
-                "total_billed_cents": stats["total_billed_cents"],
-                "avg_billed_cents": round(stats["total_billed_cents"] / stats["count"]) if stats["count"] > 0 else 0,
+                "count": count,
+                "denial_rate": round(rollup.denied_count / count, 4) if count > 0 else 0,
+                "total_billed_cents": rollup.billed_cents,
+                "avg_billed_cents": round(rollup.billed_cents / count) if count > 0 else 0,
                 "risk_notes": pc.risk_notes if pc else None,
                 "common_denial_reasons": pc.common_denial_reasons if pc else None,
             }
@@ -371,44 +379,26 @@ class OntologyInsightsService:
     @staticmethod
     def get_claim_cycle_times(db: Session, practice_id: int) -> Dict[str, Any]:
         """Claim cycle time analytics."""
-        claims = db.query(Claim).filter(Claim.practice_id == practice_id).all()
-        payments = {
-            pi.claim_id: pi
-            for pi in db.query(PaymentIntent).filter(PaymentIntent.practice_id == practice_id).all()
-        }
-
         now = datetime.utcnow()
-        aging_buckets = {"0_30": 0, "30_60": 0, "60_90": 0, "90_plus": 0}
-        cycle_times = []
-        open_claims = 0
-
-        for claim in claims:
-            age_days = (now - claim.created_at).days if claim.created_at else 0
-            if claim.status not in (ClaimStatus.CLOSED.value, ClaimStatus.DECLINED.value):
-                open_claims += 1
-                if age_days <= 30:
-                    aging_buckets["0_30"] += 1
-                elif age_days <= 60:
-                    aging_buckets["30_60"] += 1
-                elif age_days <= 90:
-                    aging_buckets["60_90"] += 1
-                else:
-                    aging_buckets["90_plus"] += 1
-
-            pi = payments.get(claim.id)
-            if pi and pi.confirmed_at and claim.created_at:
-                days = (pi.confirmed_at - claim.created_at).total_seconds() / 86400
-                cycle_times.append(days)
-
-        sorted_ct = sorted(cycle_times)
+        age_days = func.floor(day_span(now, Claim.created_at))
+        bucket = aging_bucket(func.coalesce(age_days, 0))
+        bucket_rows = db.query(bucket, func.count(Claim.id)).filter(
+            Claim.practice_id == practice_id,
+            Claim.status.notin_([ClaimStatus.CLOSED.value, ClaimStatus.DECLINED.value]),
+        ).group_by(bucket).all()
+        aging_buckets = {key: 0 for key in AGING_BUCKETS}
+        aging_buckets.update(bucket_rows)
+
+        cycle_times = practice_sketch(db, practice_id, CLAIM_CYCLE)
+        resolved = cycle_times.count
 
         return {
-            "open_claims": open_claims,
+            "open_claims": sum(aging_buckets.values()),
             "aging_buckets": aging_buckets,
-            "avg_cycle_days": round(sum(sorted_ct) / len(sorted_ct), 1) if sorted_ct else None,
-            "p50_cycle_days": round(sorted_ct[len(sorted_ct) // 2], 1) if sorted_ct else None,
-            "p90_cycle_days": round(sorted_ct[min(int(len(sorted_ct) * 0.9), len(sorted_ct) - 1)], 1) if sorted_ct else None,
-            "total_resolved": len(sorted_ct),
+            "avg_cycle_days": round(cycle_times.mean, 1) if resolved else None,
+            "p50_cycle_days": round(cycle_times.quantile(0.5), 1) if resolved else None,
+            "p90_cycle_days": round(cycle_times.quantile(0.9), 1) if resolved else None,
+            "total_resolved": resolved,
         }
 
     @staticmethod
@@ -459,21 +449,22 @@ class OntologyInsightsService:
     @staticmethod
     def get_funding_decisions_summary(db: Session, practice_id: int) -> Dict[str, Any]:
         """Funding decision summary for a practice."""
-        claim_ids_q = db.query(Claim.id).filter(Claim.practice_id == practice_id).subquery()
-        decisions = db.query(FundingDecision).filter(
-            FundingDecision.claim_id.in_(claim_ids_q)
-        ).order_by(desc(FundingDecision.created_at)).all()
+        totals = db.query(
+            func.coalesce(func.sum(PayerRollup.decision_count), 0),
+            *(func.coalesce(func.sum(getattr(PayerRollup, column)), 0) for column in DECISION_COUNT_COLUMNS.values()),
+            func.coalesce(func.sum(PayerRollup.risk_score_sum), 0.0),
+            func.coalesce(func.sum(PayerRollup.risk_score_count), 0),
+        ).filter(PayerRollup.practice_id == practice_id).one()
+        total_decisions, *decision_counts, risk_score_sum, risk_score_count = totals
+
+        recent_decisions = db.query(FundingDecision).join(
+            Claim, Claim.id == FundingDecision.claim_id
+        ).filter(Claim.practice_id == practice_id).order_by(
+            desc(FundingDecision.created_at)
+        ).limit(10).all()
 
-        counts = defaultdict(int)
-        risk_scores = []
         recent = []
-
-        for fd in decisions:
-            counts[fd.decision] += 1
-            if fd.risk_score is not None:
-                risk_scores.append(fd.risk_score)
-
-        for fd in decisions[:10]:
+        for fd in recent_decisions:
             recent.append({
                 "id": fd.id,
                 "claim_id": fd.claim_id,
@@ -487,8 +478,11 @@ class OntologyInsightsService:
             })
 
         return {
-            "total_decisions": len(decisions),
-            "decision_counts": dict(counts),
-            "avg_risk_score": round(sum(risk_scores) / len(risk_scores), 4) if risk_scores else None,
+            "total_decisions": int(total_decisions),
+            "decision_counts": {
+                decision: int(count)
+                for decision, count in zip(DECISION_COUNT_COLUMNS, decision_counts) if count
+            },
+            "avg_risk_score": round(float(risk_score_sum) / int(risk_score_count), 4) if risk_score_count else None,
             "recent_decisions": recent,
         }
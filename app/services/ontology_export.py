@@ -0,0 +1,230 @@
+"""Streaming export of a practice's full ontology (objects, links, KPI observations).
+
+Unlike ``get_graph`` there is no node cap: rows are read through a
+server-side cursor (``yield_per``) in primary-key order and written out
+batch by batch, so memory stays bounded by ``EXPORT_BATCH_SIZE`` whatever the
+size of the graph.
+
+Records are exported kind by kind (objects, then links, then KPIs). A cursor
+is ``"<kind>:<id>"`` of the last record written; passing it back resumes
+right after that record. NDJSON output carries a checkpoint line with the
+current cursor every ``checkpoint_every`` records and an ``end`` line; a
+Parquet row's cursor is its ``type`` and ``id`` columns.
+"""
+import importlib.util
+import io
+import json
+import uuid
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.ontology import OntologyObject, OntologyLink, KPIObservation
+
+EXPORT_BATCH_SIZE = 2000
+EXPORT_CHECKPOINT_EVERY = 10_000
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+EXPORT_FORMATS = ("ndjson", "parquet")
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _number(value) -> Optional[float]:
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _object_record(o) -> Dict[str, Any]:
+    return {
+        "type": "object", "id": str(o.id), "object_type": o.object_type, "object_key": o.object_key,
+        "properties": o.properties_json, "created_at": _iso(o.created_at),
+    }
+
+
+def _link_record(link) -> Dict[str, Any]:
+    return {
+        "type": "link", "id": str(link.id), "link_type": link.link_type,
+        "from": str(link.from_object_id), "to": str(link.to_object_id),
+        "properties": link.properties_json, "created_at": _iso(link.created_at),
+    }
+
+
+def _kpi_record(k) -> Dict[str, Any]:
+    return {
+        "type": "kpi", "id": str(k.id), "metric_name": k.metric_name, "metric_value": _number(k.metric_value),
+        "as_of_date": _iso(k.as_of_date), "provenance": k.provenance_json, "created_at": _iso(k.created_at),
+    }
+
+
+EXPORT_KINDS: Tuple[Tuple[str, Any, Callable[[Any], Dict[str, Any]]], ...] = (
+    ("object", OntologyObject, _object_record),
+    ("link", OntologyLink, _link_record),
+    ("kpi", KPIObservation, _kpi_record),
+)
+_KIND_NAMES = [name for name, _, _ in EXPORT_KINDS]
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[int, uuid.UUID]]:
+    """``"<kind>:<uuid>"`` -> (kind index, id). Raises ValueError if malformed."""
+    if not cursor:
+        return None
+    kind, _, raw_id = cursor.partition(":")
+    if kind not in _KIND_NAMES:
+        raise ValueError(f"Invalid export cursor: {cursor!r}")
+    try:
+        return _KIND_NAMES.index(kind), uuid.UUID(raw_id)
+    except ValueError:
+        raise ValueError(f"Invalid export cursor: {cursor!r}")
+
+
+def iter_export_records(
+    db: Session, practice_id: int, cursor: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """Every ontology record of the practice after ``cursor``, streamed in cursor order."""
+    start = parse_cursor(cursor)
+    for index, (_, model, to_record) in enumerate(EXPORT_KINDS):
+        if start is not None and index < start[0]:
+            continue
+        # Plain table rows, not ORM entities, so nothing accumulates in the
+        # session's identity map while streaming.
+        table = model.__table__
+        stmt = select(table).where(table.c.practice_id == practice_id)
+        if start is not None and index == start[0]:
+            stmt = stmt.where(table.c.id > start[1])
+        result = db.execute(stmt.order_by(table.c.id).execution_options(yield_per=batch_size))
+        for row in result:
+            yield to_record(row)
+
+
+def record_cursor(record: Dict[str, Any]) -> str:
+    return f"{record['type']}:{record['id']}"
+
+
+def stream_ndjson(
+    db: Session, practice_id: int, cursor: Optional[str] = None,
+    checkpoint_every: int = EXPORT_CHECKPOINT_EVERY, batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    """NDJSON byte chunks: one line per record, checkpoint lines, then an end line."""
+    buf = io.StringIO()
+    count = 0
+    last = cursor
+    for record in iter_export_records(db, practice_id, cursor, batch_size):
+        buf.write(json.dumps(record, default=str, separators=(",", ":")))
+        buf.write("\n")
+        count += 1
+        last = record_cursor(record)
+        if count % checkpoint_every == 0:
+            buf.write(json.dumps({"type": "checkpoint", "cursor": last, "records": count}))
+            buf.write("\n")
+        if buf.tell() >= NDJSON_CHUNK_BYTES:
+            yield buf.getvalue().encode()
+            buf = io.StringIO()
+    buf.write(json.dumps({"type": "end", "cursor": last, "records": count}))
+    buf.write("\n")
+    yield buf.getvalue().encode()
+
+
+PARQUET_COLUMNS = (
+    "type", "id", "subtype", "object_key", "from_id", "to_id",
+    "metric_value", "as_of_date", "properties", "created_at",
+)
+
+
+def _parquet_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": record["type"],
+        "id": record["id"],
+        "subtype": record.get("object_type") or record.get("link_type") or record.get("metric_name"),
+        "object_key": record.get("object_key"),
+        "from_id": record.get("from"),
+        "to_id": record.get("to"),
+        "metric_value": record.get("metric_value"),
+        "as_of_date": record.get("as_of_date"),
+        "properties": json.dumps(record.get("properties") or record.get("provenance"), default=str),
+        "created_at": record.get("created_at"),
+    }
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only sink whose buffered bytes are handed out after each row group."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(
+    db: Session, practice_id: int, cursor: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE,
+    compression: str = "zstd",
+) -> Iterator[bytes]:
+    """Parquet bytes, one row group per ``batch_size`` records. Needs the optional pyarrow package."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (name, pa.float64() if name == "metric_value" else pa.string()) for name in PARQUET_COLUMNS
+    ])
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression=compression)
+    try:
+        rows = []
+        for record in iter_export_records(db, practice_id, cursor, batch_size):
+            rows.append(_parquet_row(record))
+            if len(rows) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                rows = []
+                yield sink.drain()
+        if rows:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(
+    practice_id: int, fmt: str = "ndjson", cursor: Optional[str] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> Iterator[bytes]:
+    """Validate the request, then stream it from a session of its own.
+
+    Validation is eager so a bad format or cursor fails before any bytes are
+    sent. The session is owned by the generator because a streamed response
+    outlives the request's ``get_db`` session.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    parse_cursor(cursor)
+    if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise ValueError("Parquet export requires the optional pyarrow package (pip install pyarrow)")
+    stream = stream_parquet if fmt == "parquet" else stream_ndjson
+
+    def chunks() -> Iterator[bytes]:
+        db = session_factory()
+        try:
+            yield from stream(db, practice_id, cursor)
+        finally:
+            db.rollback()
+            db.close()
+
+    return chunks()
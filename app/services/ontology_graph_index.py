@@ -0,0 +1,171 @@
+"""Per-practice adjacency index over the ontology graph.
+
+Object UUIDs are mapped to dense integer node ids and the (undirected) link
+set is stored in CSR form: ``neighbors[offsets[i]:offsets[i + 1]]`` are the
+nodes adjacent to node ``i``. The index is built when an ontology build
+finishes and cached in-process keyed by build version, so focus expansion,
+neighborhood and degree queries run on the arrays without touching the DB.
+
+Every build deletes and recreates the practice's objects, so the UUID of the
+practice root object (``practice:<id>``) identifies a build and serves as the
+version token.
+"""
+import logging
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..models.ontology import OntologyLink, OntologyObject
+from .ontology_snapshot import PracticeVersionCache
+
+logger = logging.getLogger(__name__)
+
+
+class GraphAdjacencyIndex:
+    """CSR adjacency of one ontology build.
+
+    ``node_ids[i]`` is the object UUID (as str) of node ``i`` and
+    ``node_type[i]`` indexes ``types``. Parallel links are collapsed, so
+    ``degree(i)`` counts distinct neighbors.
+    """
+
+    __slots__ = ("practice_id", "version", "node_ids", "node_index", "types", "node_type", "offsets", "neighbors")
+
+    def __init__(self, practice_id: int, version: str, node_ids: List[str], node_types: List[str], links: List[tuple]):
+        self.practice_id = practice_id
+        self.version = version
+        self.node_ids = list(node_ids)
+        self.node_index: Dict[str, int] = {nid: i for i, nid in enumerate(self.node_ids)}
+        self.types: List[str] = []
+        type_index = {}
+        codes = []
+        for object_type in node_types:
+            if object_type not in type_index:
+                type_index[object_type] = len(self.types)
+                self.types.append(object_type)
+            codes.append(type_index[object_type])
+
+        src = np.empty(len(links), dtype=np.int64)
+        dst = np.empty(len(links), dtype=np.int64)
+        for i, (from_id, to_id) in enumerate(links):
+            src[i] = self._node(from_id, codes)
+            dst[i] = self._node(to_id, codes)
+        self.node_type = np.array(codes, dtype=np.int64)
+
+        n = len(self.node_ids)
+        pairs = np.unique(np.concatenate([src * n + dst, dst * n + src]))
+        heads, self.neighbors = np.divmod(pairs, n) if n else (pairs, pairs)
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=n), out=self.offsets[1:])
+
+    def _node(self, object_id: str, codes: list) -> int:
+        # Links should only reference the practice's own objects; keep any
+        # stray endpoint reachable rather than dropping the edge.
+        idx = self.node_index.get(object_id)
+        if idx is None:
+            idx = self.node_index[object_id] = len(self.node_ids)
+            self.node_ids.append(object_id)
+            codes.append(-1)
+        return idx
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        """Distinct undirected edges (self-links count once)."""
+        heads = np.repeat(np.arange(self.node_count), np.diff(self.offsets))
+        return int((heads < self.neighbors).sum() + (heads == self.neighbors).sum())
+
+    def degree(self, object_id: str) -> int:
+        idx = self.node_index.get(object_id)
+        return int(self.offsets[idx + 1] - self.offsets[idx]) if idx is not None else 0
+
+    def neighborhood(self, object_id: str, hops: int) -> Set[str]:
+        """Object ids within ``hops`` links of ``object_id`` (itself included)."""
+        start = self.node_index.get(object_id)
+        if start is None:
+            return {object_id}
+        visited = np.zeros(self.node_count, dtype=bool)
+        visited[start] = True
+        frontier = np.array([start], dtype=np.int64)
+        for _ in range(max(hops, 0)):
+            lengths = self.offsets[frontier + 1] - self.offsets[frontier]
+            if not lengths.sum():
+                break
+            starts = np.repeat(self.offsets[frontier] - np.cumsum(lengths) + lengths, lengths)
+            reached = np.unique(self.neighbors[starts + np.arange(lengths.sum())])
+            frontier = reached[~visited[reached]]
+            if not len(frontier):
+                break
+            visited[frontier] = True
+        return {self.node_ids[i] for i in np.flatnonzero(visited)}
+
+    def degree_stats(self) -> dict:
+        degrees = np.diff(self.offsets)
+        by_type = {}
+        for code, object_type in enumerate(self.types):
+            type_degrees = degrees[self.node_type == code]
+            by_type[object_type] = {
+                "nodes": int(len(type_degrees)),
+                "avg_degree": round(float(type_degrees.mean()), 2) if len(type_degrees) else 0,
+                "max_degree": int(type_degrees.max()) if len(type_degrees) else 0,
+            }
+        return {
+            "node_count": self.node_count,
+            "edge_count": self.edge_count,
+            "avg_degree": round(float(degrees.mean()), 2) if len(degrees) else 0,
+            "max_degree": int(degrees.max()) if len(degrees) else 0,
+            "isolated_nodes": int((degrees == 0).sum()),
+            "by_type": by_type,
+        }
+
+
+_index_cache = PracticeVersionCache()
+
+
+def _build_version(db: Session, practice_id: int) -> Optional[str]:
+    root_id = db.query(OntologyObject.id).filter(
+        OntologyObject.practice_id == practice_id,
+        OntologyObject.object_key == f"practice:{practice_id}",
+    ).scalar()
+    return str(root_id) if root_id else None
+
+
+def _load_index(db: Session, practice_id: int, version: str) -> GraphAdjacencyIndex:
+    objects = db.query(OntologyObject.id, OntologyObject.object_type).filter(
+        OntologyObject.practice_id == practice_id
+    ).all()
+    links = db.query(OntologyLink.from_object_id, OntologyLink.to_object_id).filter(
+        OntologyLink.practice_id == practice_id
+    ).all()
+    index = GraphAdjacencyIndex(
+        practice_id, version,
+        [str(object_id) for object_id, _ in objects],
+        [object_type for _, object_type in objects],
+        [(str(f), str(t)) for f, t in links],
+    )
+    logger.info(
+        "ontology graph index built practice_id=%s nodes=%d edges=%d",
+        practice_id, index.node_count, index.edge_count,
+    )
+    return index
+
+
+def get_graph_index(db: Session, practice_id: int) -> Optional[GraphAdjacencyIndex]:
+    """Adjacency index of the practice's current ontology build, or None if never built."""
+    version = _build_version(db, practice_id)
+    if version is None:
+        return None
+    index = _index_cache.get(practice_id, version)
+    if index is None:
+        index = _load_index(db, practice_id, version)
+        _index_cache.put(index)
+    return index
+
+
+def invalidate_graph_index(practice_id: Optional[int] = None) -> None:
+    """Drop the cached index for one practice (or all practices)."""
+    _index_cache.invalidate(practice_id)
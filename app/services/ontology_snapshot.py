@@ -0,0 +1,255 @@
+"""Per-practice analytics snapshot shared by the ontology read endpoints.
+
+Claims and payment intents for a practice are loaded once into NumPy column
+arrays (amounts, status codes, epoch days/microseconds, payer and patient ids)
+and cached in-process. Every read re-checks the practice's ``data_version``
+(a primary-key lookup) and reloads only when the practice's claims or
+payments changed, so `/risks` -> context + CFO 360 + cohorts shares a
+single load and each metric is a handful of vectorized passes.
+"""
+import logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..models.claim import Claim
+from ..models.patient_dimension import PatientDimension
+from ..models.payment import PaymentIntent
+from ..models.practice import Practice
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_CACHE_MAX_PRACTICES = 32
+
+
+def _encode(values: list, index: Dict, labels: list) -> np.ndarray:
+    """Dictionary-encode values in first-appearance order (None -> -1)."""
+    codes = np.empty(len(values), dtype=np.int64)
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = -1
+            continue
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(labels)
+            labels.append(value)
+        codes[i] = code
+    return codes
+
+
+def _timestamps(values: list, unit: str = "D") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Naive datetimes -> (microseconds since epoch, epoch ``unit`` number, present mask)."""
+    stamps = np.array(values, dtype="datetime64[us]").reshape(-1)
+    present = ~np.isnat(stamps)
+    micros = np.where(present, stamps.astype(np.int64), 0)
+    periods = np.where(present, stamps.astype(f"datetime64[{unit}]").astype(np.int64), 0)
+    return micros, periods, present
+
+
+def epoch_day(d) -> int:
+    """Epoch day number for a date, comparable with the snapshot day columns."""
+    return int(np.datetime64(d, "D").astype(np.int64))
+
+
+def month_label(month_index: int) -> str:
+    """'YYYY-MM' for a months-since-1970 index."""
+    return f"{1970 + month_index // 12:04d}-{month_index % 12 + 1:02d}"
+
+
+class PracticeSnapshot:
+    """Columnar view of one practice's claims and payment intents.
+
+    Claim columns are aligned by position, in load order. Statuses, payers,
+    patients and procedure code tokens are dictionary-encoded in
+    first-appearance order: ``claim_status`` indexes ``statuses``,
+    ``claim_payer_idx`` indexes ``payers`` (-1 meaning "no payer") and
+    ``claim_patient_idx`` indexes ``patient_hashes``; per-patient columns
+    (age bucket, payer) come from the patient's first claim. Timestamps are stored as
+    epoch microseconds and epoch days with a ``*_dated`` presence mask.
+    Procedure codes are flattened into one row per comma-separated token
+    (``token_claim_pos`` / ``token_code_idx`` into ``code_tokens``, raw and
+    unstripped). Payment columns are aligned by payment position;
+    ``payment_claim_pos`` points back into the claim columns (-1 if the claim
+    is not part of this practice) and ``claim_payment_pos`` is the inverse.
+    """
+
+    __slots__ = (
+        "practice_id", "version",
+        "claim_ids", "claim_amount", "claim_status", "claim_created_us",
+        "claim_day", "claim_month", "claim_dated", "claim_payer_idx",
+        "claim_patient_idx", "claim_payment_pos",
+        "statuses", "payers", "patient_hashes", "age_buckets", "patient_age_bucket",
+        "patient_payer_idx",
+        "code_tokens", "token_claim_pos", "token_code_idx",
+        "payment_amount", "payment_status", "payment_sent_us", "payment_has_sent",
+        "payment_confirmed_us", "payment_confirmed_day", "payment_has_confirmed",
+        "payment_claim_pos",
+    )
+
+    def __init__(self, practice_id: int, version: tuple):
+        self.practice_id = practice_id
+        self.version = version
+        self.statuses: List[str] = []
+        self.payers: List[str] = []
+        self.patient_hashes: List[str] = []
+        self.age_buckets: List[str] = []
+        self.code_tokens: List[str] = []
+
+    @property
+    def claim_count(self) -> int:
+        return len(self.claim_ids)
+
+    @property
+    def patient_count(self) -> int:
+        return len(self.patient_hashes)
+
+    def payer_name(self, idx: int) -> Optional[str]:
+        return self.payers[idx] if idx >= 0 else None
+
+    def status_code(self, status: str) -> int:
+        """Code for a status value, or -2 (matches nothing) if it never occurs."""
+        try:
+            return self.statuses.index(status)
+        except ValueError:
+            return -2
+
+    def claim_status_in(self, *statuses: str) -> np.ndarray:
+        return np.isin(self.claim_status, [self.status_code(s) for s in statuses])
+
+    def payment_status_in(self, *statuses: str) -> np.ndarray:
+        return np.isin(self.payment_status, [self.status_code(s) for s in statuses])
+
+    def reimbursement_lags(self, where: Optional[np.ndarray] = None) -> np.ndarray:
+        """Sent -> confirmed lag in days per payment with both timestamps, in payment order.
+
+        ``where`` optionally restricts the payments considered.
+        """
+        both = self.payment_has_sent & self.payment_has_confirmed
+        if where is not None:
+            both &= where
+        return (self.payment_confirmed_us[both] - self.payment_sent_us[both]) / 1e6 / 86400.0
+
+
+class PracticeVersionCache:
+    """Small thread-safe LRU of per-practice structures, validated by version.
+
+    Entries are any object exposing ``practice_id`` and ``version``; a lookup
+    with a different version is a miss.
+    """
+
+    def __init__(self, max_entries: int = SNAPSHOT_CACHE_MAX_PRACTICES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Any]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, practice_id: int, version: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(practice_id)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(practice_id)
+            return entry
+
+    def put(self, entry: Any) -> None:
+        with self._lock:
+            self._entries[entry.practice_id] = entry
+            self._entries.move_to_end(entry.practice_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, practice_id: Optional[int] = None) -> None:
+        with self._lock:
+            if practice_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(practice_id, None)
+
+
+_snapshot_cache = PracticeVersionCache()
+
+
+def get_data_version(db: Session, practice_id: int) -> Optional[int]:
+    """Current data version of a practice (None if it does not exist)."""
+    return db.query(Practice.data_version).filter(Practice.id == practice_id).scalar()
+
+
+def _load_snapshot(db: Session, practice_id: int, version: tuple) -> PracticeSnapshot:
+    snap = PracticeSnapshot(practice_id, version)
+    status_index = {}
+
+    claim_rows = db.query(
+        Claim.id, Claim.amount_cents, Claim.status, Claim.created_at,
+        Claim.payer, Claim.patient_hash, Claim.procedure_codes,
+    ).filter(Claim.practice_id == practice_id).all()
+    ids, amounts, statuses, created, payers, hashes, codes = (
+        (list(col) for col in zip(*claim_rows)) if claim_rows else ([] for _ in range(7))
+    )
+
+    snap.claim_ids = np.array(ids, dtype=np.int64)
+    snap.claim_amount = np.array([a or 0 for a in amounts], dtype=np.int64)
+    snap.claim_status = _encode(statuses, status_index, snap.statuses)
+    snap.claim_created_us, snap.claim_day, snap.claim_dated = _timestamps(created)
+    snap.claim_month = _timestamps(created, unit="M")[1]
+    snap.claim_payer_idx = _encode([p or None for p in payers], {}, snap.payers)
+
+    snap.claim_patient_idx = _encode(hashes, {}, snap.patient_hashes)
+    first_pos = np.unique(snap.claim_patient_idx, return_index=True)[1]
+    age_bucket_by_hash = dict(db.query(PatientDimension.patient_hash, PatientDimension.age_bucket).filter(
+        PatientDimension.practice_id == practice_id
+    ).all())
+    snap.patient_age_bucket = _encode(
+        [age_bucket_by_hash.get(h, "unknown") for h in snap.patient_hashes], {}, snap.age_buckets
+    )
+    snap.patient_payer_idx = snap.claim_payer_idx[first_pos]
+
+    token_claim_pos = []
+    tokens = []
+    for pos, raw in enumerate(codes):
+        if raw:
+            for token in raw.split(","):
+                token_claim_pos.append(pos)
+                tokens.append(token)
+    snap.token_claim_pos = np.array(token_claim_pos, dtype=np.int64)
+    snap.token_code_idx = _encode(tokens, {}, snap.code_tokens)
+
+    payment_rows = db.query(
+        PaymentIntent.claim_id, PaymentIntent.amount_cents, PaymentIntent.status,
+        PaymentIntent.sent_at, PaymentIntent.confirmed_at,
+    ).filter(PaymentIntent.practice_id == practice_id).all()
+    p_claims, p_amounts, p_statuses, p_sent, p_confirmed = (
+        (list(col) for col in zip(*payment_rows)) if payment_rows else ([] for _ in range(5))
+    )
+
+    claim_pos_by_id = {claim_id: pos for pos, claim_id in enumerate(ids)}
+    snap.payment_amount = np.array([a or 0 for a in p_amounts], dtype=np.int64)
+    snap.payment_status = _encode(p_statuses, status_index, snap.statuses)
+    snap.payment_sent_us, _, snap.payment_has_sent = _timestamps(p_sent)
+    snap.payment_confirmed_us, snap.payment_confirmed_day, snap.payment_has_confirmed = _timestamps(p_confirmed)
+    snap.payment_claim_pos = np.array([claim_pos_by_id.get(c, -1) for c in p_claims], dtype=np.int64)
+    snap.claim_payment_pos = np.full(len(ids), -1, dtype=np.int64)
+    linked = snap.payment_claim_pos >= 0
+    snap.claim_payment_pos[snap.payment_claim_pos[linked]] = np.flatnonzero(linked)
+
+    logger.info(
+        "ontology snapshot loaded practice_id=%s claims=%d payments=%d patients=%d",
+        practice_id, snap.claim_count, len(payment_rows), snap.patient_count,
+    )
+    return snap
+
+
+def get_practice_snapshot(db: Session, practice_id: int) -> PracticeSnapshot:
+    """Return the cached snapshot for a practice, reloading it if the data changed."""
+    version = get_data_version(db, practice_id)
+    snap = _snapshot_cache.get(practice_id, version)
+    if snap is None:
+        snap = _load_snapshot(db, practice_id, version)
+        _snapshot_cache.put(snap)
+    return snap
+
+
+def invalidate_practice_snapshot(practice_id: Optional[int] = None) -> None:
+    """Drop the cached snapshot for one practice (or all practices)."""
+    _snapshot_cache.invalidate(practice_id)
@@ -0,0 +1,25 @@
+"""SQL aggregate building blocks shared by the ontology services.
+
+Aging buckets and day spans are computed in Postgres so the app server only
+receives one row per bucket or group instead of every claim and payment
+intent of the practice.
+"""
+from sqlalchemy import Float, case, cast, func
+
+AGING_BUCKETS = ("0_30", "30_60", "60_90", "90_plus")
+
+
+def day_span(later, earlier):
+    """``later - earlier`` in fractional days, equal to ``timedelta.total_seconds() / 86400``."""
+    return cast(func.extract("epoch", later - earlier), Float) / 86400.0
+
+
+def aging_bucket(age_days):
+    """CASE expression mapping an age in whole days onto AGING_BUCKETS."""
+    return case(
+        (age_days <= 30, AGING_BUCKETS[0]),
+        (age_days <= 60, AGING_BUCKETS[1]),
+        (age_days <= 90, AGING_BUCKETS[2]),
+        else_=AGING_BUCKETS[3],
+    )
+
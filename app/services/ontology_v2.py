@@ -1,16 +1,28 @@
-import hashlib
+import logging
 import uuid
 from collections import defaultdict
 from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import Optional
+from typing import Optional, Tuple
 
-from sqlalchemy import func
+import numpy as np
+
+from sqlalchemy import BigInteger, Date, cast, func, insert, or_, true
+from sqlalchemy.dialects.postgresql import array
 from sqlalchemy.orm import Session
 
 from ..models.claim import Claim, ClaimStatus
 from ..models.payment import PaymentIntent, PaymentIntentStatus
-from ..models.practice import Practice
+from ..models.metric_sketch import (
+    REIMBURSEMENT_LAG,
+    UNKNOWN_PAYER,
+    load_metric_sketches,
+    practice_sketch,
+    rebuild_metric_sketches,
+)
+from ..models.insight_rollup import rebuild_insight_rollups
+from ..models.patient_dimension import PatientDimension
+from ..models.practice import Practice, bump_data_version
 from ..models.ontology import (
     OntologyObject,
     OntologyObjectType,
@@ -18,21 +30,14 @@ from ..models.ontology import (
     OntologyLinkType,
     KPIObservation,
     MetricTimeseries,
+    PracticeDailyAggregate,
 )
 from ..services.audit import AuditService
+from .ontology_snapshot import epoch_day, get_practice_snapshot, month_label
+from .ontology_graph_index import get_graph_index
+from .ontology_sql import AGING_BUCKETS, aging_bucket, day_span
 
-
-def _patient_hash(patient_name: str, practice_id: int) -> str:
-    raw = f"{practice_id}:{patient_name or 'unknown'}".lower().strip()
-    return hashlib.sha256(raw.encode()).hexdigest()[:16]
-
-
-def _age_bucket_from_name(patient_name: str) -> str:
-    if not patient_name:
-        return "unknown"
-    h = int(hashlib.md5(patient_name.encode()).hexdigest()[:8], 16)
-    idx = h % 4
-    return ["0-18", "18-35", "35-55", "55+"][idx]
+logger = logging.getLogger(__name__)
 
 
 def _insurance_type_from_payer(payer: str) -> str:
@@ -46,6 +51,103 @@ def _insurance_type_from_payer(payer: str) -> str:
     return "PPO"
 
 
+_FUNDED_STATUSES = (PaymentIntentStatus.CONFIRMED.value, PaymentIntentStatus.SENT.value)
+
+RETENTION_LIST_LIMIT = 20
+
+
+def _ordered_groups(codes: np.ndarray, labels: list, positions: Optional[np.ndarray] = None) -> Tuple[list, np.ndarray]:
+    """Group non-negative codes by ``labels[code]``.
+
+    Returns the distinct labels in order of first appearance (smallest
+    ``positions`` value, row index by default) -- the order a dict filled row
+    by row would have -- and the group id of every row.
+    """
+    if positions is None:
+        positions = np.arange(codes.size)
+    unseen = np.iinfo(np.int64).max
+    first = np.full(len(labels), unseen, dtype=np.int64)
+    np.minimum.at(first, codes, positions)
+    present = np.flatnonzero(first != unseen)
+    group_of_code = np.zeros(len(labels), dtype=np.int64)
+    names, index = [], {}
+    for code in present[np.argsort(first[present], kind="stable")].tolist():
+        label = labels[code]
+        gid = index.get(label)
+        if gid is None:
+            gid = index[label] = len(names)
+            names.append(label)
+        group_of_code[code] = gid
+    return names, group_of_code[codes]
+
+
+def _group_sum(groups: np.ndarray, size: int, values: Optional[np.ndarray] = None) -> np.ndarray:
+    """Per-group row count, or exact integer sum of ``values``."""
+    if values is None:
+        return np.bincount(groups, minlength=size)
+    out = np.zeros(size, dtype=np.int64)
+    np.add.at(out, groups, values)
+    return out
+
+
+def _top_n(values: np.ndarray, candidates: np.ndarray, n: int) -> np.ndarray:
+    """The ``n`` candidates with the largest values, ties kept in candidate order.
+
+    Partitions out the n-th largest value first, so only candidates at or
+    above it are sorted.
+    """
+    if candidates.size > n:
+        kth = np.partition(values[candidates], candidates.size - n)[candidates.size - n]
+        candidates = candidates[values[candidates] >= kth]
+    return candidates[np.argsort(-values[candidates], kind="stable")[:n]]
+
+
+def _seq_sum(values: np.ndarray) -> float:
+    """Left-to-right float sum (same rounding as the builtin ``sum``)."""
+    return float(np.cumsum(values)[-1]) if values.size else 0.0
+
+
+_DAILY_COLUMNS = ("claim_count", "declined_count", "billed_cents", "funded_cents", "confirmed_cents")
+
+
+def _daily_series(first_day: date, daily: dict, today: date, window: int) -> dict:
+    """Cumulative and rolling series from dense daily totals starting at ``first_day``.
+
+    Cumulative totals are emitted for days up to ``today`` with any billed,
+    funded or confirmed amount. Rolling ``window``-day sums cover
+    ``[d - window, d]`` and are emitted for every day with claims, provided
+    there are at least two such days. All sums come from prefix sums.
+    """
+    billed, funded, confirmed = daily["billed_cents"], daily["funded_cents"], daily["confirmed_cents"]
+    cum = {"billed": np.cumsum(billed), "funded": np.cumsum(funded), "confirmed": np.cumsum(confirmed)}
+    series = {}
+
+    active = np.flatnonzero((billed > 0) | (funded > 0) | (confirmed > 0))
+    active = active[active <= (today - first_day).days].tolist()
+    for name in ("billed", "funded", "confirmed"):
+        values = cum[name].tolist()
+        series[f"{name}_cumulative"] = [(first_day + timedelta(days=i), values[i]) for i in active]
+
+    claim_days = np.flatnonzero(daily["claim_count"] > 0)
+    if claim_days.size >= 2:
+        before = claim_days - window - 1
+        for name in ("billed", "funded"):
+            sums = cum[name][claim_days] - np.where(before >= 0, cum[name][np.maximum(before, 0)], 0)
+            series[f"{name}_{window}d"] = [
+                (first_day + timedelta(days=i), v) for i, v in zip(claim_days.tolist(), sums.tolist())
+            ]
+    return series
+
+
+def _claim_payment_amount(snap, payment_mask: np.ndarray) -> np.ndarray:
+    """Per-claim amount of the claim's payment intent where ``payment_mask`` holds, else 0."""
+    out = np.zeros(snap.claim_count, dtype=np.int64)
+    has_payment = snap.claim_payment_pos >= 0
+    pay_pos = snap.claim_payment_pos[has_payment]
+    out[has_payment] = np.where(payment_mask[pay_pos], snap.payment_amount[pay_pos], 0)
+    return out
+
+
 class OntologyBuilderV2:
 
     @staticmethod
@@ -54,7 +156,12 @@ class OntologyBuilderV2:
         db.query(KPIObservation).filter(KPIObservation.practice_id == practice_id).delete()
         db.query(OntologyObject).filter(OntologyObject.practice_id == practice_id).delete()
         db.query(MetricTimeseries).filter(MetricTimeseries.practice_id == practice_id).delete()
+        db.query(PracticeDailyAggregate).filter(PracticeDailyAggregate.practice_id == practice_id).delete()
         db.flush()
+        rebuild_metric_sketches(db, practice_id)
+        rollup_drift = rebuild_insight_rollups(db, practice_id)
+        if rollup_drift:
+            logger.warning("Insight rollups of practice %s had drifted: %d rows rebuilt", practice_id, rollup_drift)
 
         practice = db.query(Practice).filter(Practice.id == practice_id).first()
         if not practice:
@@ -68,6 +175,9 @@ class OntologyBuilderV2:
 
         claims = db.query(Claim).filter(Claim.practice_id == practice_id).all()
         payments = db.query(PaymentIntent).filter(PaymentIntent.practice_id == practice_id).all()
+        age_bucket_by_hash = dict(db.query(PatientDimension.patient_hash, PatientDimension.age_bucket).filter(
+            PatientDimension.practice_id == practice_id
+        ).all())
 
         payer_objects = {}
         procedure_objects = {}
@@ -121,10 +231,11 @@ class OntologyBuilderV2:
                         claim_obj.id, procedure_objects[code].id,
                     )
 
-            p_hash = _patient_hash(claim.patient_name, practice_id)
+            p_hash = claim.patient_hash
             if p_hash not in patient_objects:
                 patient_objects[p_hash] = {
                     "obj": None,
+                    "age_bucket": age_bucket_by_hash.get(p_hash, "unknown"),
                     "claims": [],
                     "billed": 0,
                     "reimbursed": 0,
@@ -168,7 +279,7 @@ class OntologyBuilderV2:
                 f"patient:{p_hash}",
                 {
                     "patient_hash": p_hash,
-                    "age_bucket": _age_bucket_from_name(pdata["claims"][0].patient_name if pdata["claims"] else ""),
+                    "age_bucket": pdata["age_bucket"],
                     "insurance_type": _insurance_type_from_payer(pdata["payer"]),
                     "first_seen_date": pdata["first_seen"].isoformat() if pdata["first_seen"] else None,
                     "lifetime_billed_cents": pdata["billed"],
@@ -185,7 +296,7 @@ class OntologyBuilderV2:
                     )
 
         today = date.today()
-        metrics = OntologyBuilderV2._compute_kpis(db, practice_id, claims, payments, patient_objects)
+        metrics = OntologyBuilderV2._compute_kpis(db, practice_id, patient_objects)
         for metric_name, metric_data in metrics.items():
             kpi = KPIObservation(
                 practice_id=practice_id,
@@ -205,22 +316,41 @@ class OntologyBuilderV2:
                 "practice_id": practice_id,
                 "version": "ontology-v2",
                 "object_count": len(claim_objects) + len(payer_objects) + len(procedure_objects) + len(patient_objects) + 1,
+                "rollup_drift": rollup_drift,
             },
         )
 
         db.flush()
+        # Object ids, KPIs and timeseries all changed: move cached reads to a
+        # new version and record which version this build reflects.
+        bump_data_version(db, [practice_id])
+        db.query(Practice).filter(Practice.id == practice_id).update(
+            {Practice.ontology_version: Practice.data_version, Practice.ontology_built_on: today},
+            synchronize_session=False,
+        )
+        get_graph_index(db, practice_id)
         return {
             "objects": len(claim_objects) + len(payer_objects) + len(procedure_objects) + len(patient_objects) + 1,
             "metrics": len(metrics),
         }
 
+    @staticmethod
+    def ontology_is_current(db: Session, practice_id: int) -> bool:
+        """True if the last build reflects the practice's current data and was made today."""
+        row = db.query(Practice.data_version, Practice.ontology_version, Practice.ontology_built_on).filter(
+            Practice.id == practice_id
+        ).first()
+        return bool(row) and row.ontology_version == row.data_version and row.ontology_built_on == date.today()
+
     @staticmethod
     def _upsert_object(db, practice_id, object_type, object_key, properties):
+        object_type = object_type.value if isinstance(object_type, OntologyObjectType) else object_type
         obj = OntologyObject(
             practice_id=practice_id,
-            object_type=object_type.value if isinstance(object_type, OntologyObjectType) else object_type,
+            object_type=object_type,
             object_key=object_key,
             properties_json=properties,
+            **OntologyObject.typed_columns(object_type, properties),
         )
         db.add(obj)
         db.flush()
@@ -240,56 +370,65 @@ class OntologyBuilderV2:
         return link
 
     @staticmethod
-    def _compute_kpis(db, practice_id, claims, payments, patient_objects):
+    def _compute_kpis(db, practice_id, patient_objects):
         metrics = {}
-        total_claims = len(claims)
         missing_data = []
 
-        total_billed_cents = sum(c.amount_cents for c in claims)
+        total_claims, total_billed_cents, declined_count, exception_count = db.query(
+            func.count(Claim.id),
+            func.coalesce(func.sum(Claim.amount_cents), 0),
+            func.count(Claim.id).filter(Claim.status == ClaimStatus.DECLINED.value),
+            func.count(Claim.id).filter(Claim.status == ClaimStatus.PAYMENT_EXCEPTION.value),
+        ).filter(Claim.practice_id == practice_id).one()
+        total_billed_cents = int(total_billed_cents)
 
-        payer_totals = {}
-        for c in claims:
-            if c.payer:
-                payer_totals[c.payer] = payer_totals.get(c.payer, 0) + c.amount_cents
+        payer_totals = db.query(Claim.payer, func.sum(Claim.amount_cents)).filter(
+            Claim.practice_id == practice_id, Claim.payer.isnot(None), Claim.payer != "",
+        ).group_by(Claim.payer).order_by(func.sum(Claim.amount_cents).desc(), func.min(Claim.id)).limit(10).all()
 
         if payer_totals and total_billed_cents > 0:
             payer_mix = []
-            for payer, amount in sorted(payer_totals.items(), key=lambda x: -x[1]):
-                payer_mix.append({"payer": payer, "amount_cents": amount, "share": round(amount / total_billed_cents, 4)})
-            metrics["payer_mix"] = {"value": None, "provenance": {"payer_mix": payer_mix[:10]}}
+            for payer, amount in payer_totals:
+                payer_mix.append({"payer": payer, "amount_cents": int(amount), "share": round(int(amount) / total_billed_cents, 4)})
+            metrics["payer_mix"] = {"value": None, "provenance": {"payer_mix": payer_mix}}
             top_payer_share = payer_mix[0]["share"] if payer_mix else 0
             metrics["payer_concentration"] = {"value": Decimal(str(top_payer_share)), "provenance": {"top_payer": payer_mix[0]["payer"] if payer_mix else None}}
         else:
             missing_data.append("payer_mix")
 
-        procedure_counts = {}
-        for c in claims:
-            if c.procedure_codes:
-                for code in c.procedure_codes.split(","):
-                    code = code.strip()
-                    if code:
-                        procedure_counts[code] = procedure_counts.get(code, 0) + 1
+        tokens = func.unnest(func.string_to_array(Claim.procedure_codes, ",")).table_valued("raw", with_ordinality="ord").render_derived().lateral()
+        cdt_code = func.btrim(tokens.c.raw, " \t\n\r\f\v")
+        procedure_counts = db.query(cdt_code, func.count()).select_from(Claim).join(tokens, true()).filter(
+            Claim.practice_id == practice_id, cdt_code != "",
+        ).group_by(cdt_code).order_by(
+            func.count().desc(), func.min(array([cast(Claim.id, BigInteger), tokens.c.ord])),
+        ).limit(10).all()
 
         if procedure_counts and total_claims > 0:
             proc_mix = []
-            for code, count in sorted(procedure_counts.items(), key=lambda x: -x[1]):
+            for code, count in procedure_counts:
                 proc_mix.append({"cdt_code": code, "count": count, "share": round(count / total_claims, 4)})
-            metrics["procedure_mix"] = {"value": None, "provenance": {"procedure_mix": proc_mix[:10]}}
+            metrics["procedure_mix"] = {"value": None, "provenance": {"procedure_mix": proc_mix}}
         else:
             missing_data.append("procedure_mix")
 
-        declined_claims = [c for c in claims if c.status == ClaimStatus.DECLINED.value]
         if total_claims > 0:
-            denial_rate = len(declined_claims) / total_claims
+            denial_rate = declined_count / total_claims
             metrics["denial_rate"] = {
                 "value": Decimal(str(round(denial_rate, 4))),
-                "provenance": {"declined": len(declined_claims), "total": total_claims},
+                "provenance": {"declined": declined_count, "total": total_claims},
             }
         else:
             missing_data.append("denial_rate")
 
-        funded_cents = sum(p.amount_cents for p in payments if p.status in (PaymentIntentStatus.CONFIRMED.value, PaymentIntentStatus.SENT.value))
-        metrics["total_funded_cents"] = {"value": Decimal(str(funded_cents)), "provenance": {"payment_count": len(payments)}}
+        payment_count, funded_cents = db.query(
+            func.count(PaymentIntent.id),
+            func.coalesce(func.sum(PaymentIntent.amount_cents).filter(
+                PaymentIntent.status.in_([PaymentIntentStatus.CONFIRMED.value, PaymentIntentStatus.SENT.value])
+            ), 0),
+        ).filter(PaymentIntent.practice_id == practice_id).one()
+        funded_cents = int(funded_cents)
+        metrics["total_funded_cents"] = {"value": Decimal(str(funded_cents)), "provenance": {"payment_count": payment_count}}
 
         practice = db.query(Practice).filter(Practice.id == practice_id).first()
         if practice and practice.funding_limit_cents and practice.funding_limit_cents > 0:
@@ -301,27 +440,21 @@ class OntologyBuilderV2:
         else:
             missing_data.append("funded_utilization")
 
-        exception_claims = [c for c in claims if c.status == ClaimStatus.PAYMENT_EXCEPTION.value]
         if total_claims > 0:
-            exception_rate = len(exception_claims) / total_claims
+            exception_rate = exception_count / total_claims
             metrics["exception_rate"] = {
                 "value": Decimal(str(round(exception_rate, 4))),
-                "provenance": {"exceptions": len(exception_claims), "total": total_claims},
+                "provenance": {"exceptions": exception_count, "total": total_claims},
             }
         else:
             missing_data.append("exception_rate")
 
-        confirmed_payments = [p for p in payments if p.confirmed_at and p.sent_at]
-        if confirmed_payments:
-            lags = [(p.confirmed_at - p.sent_at).total_seconds() / 86400.0 for p in confirmed_payments]
-            lags.sort()
-            avg_lag = sum(lags) / len(lags)
-            p50 = lags[len(lags) // 2]
-            p90_idx = min(int(len(lags) * 0.9), len(lags) - 1)
-            p90 = lags[p90_idx]
+        lags = practice_sketch(db, practice_id, REIMBURSEMENT_LAG)
+        if lags.count:
+            sample_size, avg_lag, p50, p90 = lags.count, lags.mean, lags.quantile(0.5), lags.quantile(0.9)
             metrics["reimbursement_lag_proxy"] = {
                 "value": Decimal(str(round(avg_lag, 2))),
-                "provenance": {"avg_days": round(avg_lag, 2), "p50_days": round(p50, 2), "p90_days": round(p90, 2), "sample_size": len(confirmed_payments)},
+                "provenance": {"avg_days": round(avg_lag, 2), "p50_days": round(p50, 2), "p90_days": round(p90, 2), "sample_size": sample_size},
             }
         else:
             missing_data.append("reimbursement_lag_proxy")
@@ -342,8 +475,7 @@ class OntologyBuilderV2:
             for p_hash, pdata in patient_objects.items():
                 props = pdata.get("claims", [])
                 if props:
-                    bucket = _age_bucket_from_name(props[0].patient_name if props else "")
-                    age_buckets[bucket] += 1
+                    age_buckets[pdata["age_bucket"]] += 1
                     ins_type = _insurance_type_from_payer(pdata.get("payer", ""))
                     insurance_buckets[ins_type] += 1
                     if len(props) > 1:
@@ -363,118 +495,132 @@ class OntologyBuilderV2:
 
         return metrics
 
+    DEFAULT_ROLLING_WINDOW = 30
+    MAX_ROLLING_WINDOW = 365
+
     @staticmethod
     def _compute_timeseries(db, practice_id, claims, payments):
         today = date.today()
         billed_by_date = defaultdict(int)
+        claims_by_date = defaultdict(lambda: {"declined": 0, "total": 0})
         for c in claims:
             d = c.created_at.date() if c.created_at else today
             billed_by_date[d] += c.amount_cents
+            claims_by_date[d]["total"] += 1
+            if c.status == ClaimStatus.DECLINED.value:
+                claims_by_date[d]["declined"] += 1
 
         funded_by_date = defaultdict(int)
         confirmed_by_date = defaultdict(int)
         for p in payments:
-            if p.status in (PaymentIntentStatus.CONFIRMED.value, PaymentIntentStatus.SENT.value) and p.sent_at:
+            if p.status in _FUNDED_STATUSES and p.sent_at:
                 funded_by_date[p.sent_at.date()] += p.amount_cents
             if p.status == PaymentIntentStatus.CONFIRMED.value and p.confirmed_at:
                 confirmed_by_date[p.confirmed_at.date()] += p.amount_cents
 
-        declined_by_date = defaultdict(lambda: {"declined": 0, "total": 0})
-        for c in claims:
-            d = c.created_at.date() if c.created_at else today
-            declined_by_date[d]["total"] += 1
-            if c.status == ClaimStatus.DECLINED.value:
-                declined_by_date[d]["declined"] += 1
-
-        all_dates = sorted(set(list(billed_by_date.keys()) + list(funded_by_date.keys()) + list(confirmed_by_date.keys())))
+        all_dates = set(billed_by_date) | set(funded_by_date) | set(confirmed_by_date)
         if not all_dates:
             return
 
-        start = all_dates[0]
-        end = today
-        current = start
-        cum_billed = 0
-        cum_funded = 0
-        cum_confirmed = 0
-
-        while current <= end:
-            cum_billed += billed_by_date.get(current, 0)
-            cum_funded += funded_by_date.get(current, 0)
-            cum_confirmed += confirmed_by_date.get(current, 0)
-
-            if billed_by_date.get(current, 0) > 0 or funded_by_date.get(current, 0) > 0 or confirmed_by_date.get(current, 0) > 0:
-                for name, val in [("billed_cumulative", cum_billed), ("funded_cumulative", cum_funded), ("confirmed_cumulative", cum_confirmed)]:
-                    db.add(MetricTimeseries(
-                        practice_id=practice_id,
-                        metric_name=name,
-                        date=current,
-                        value=Decimal(str(val)),
-                    ))
-
-            current += timedelta(days=1)
-
-        window = 30
-        dates_sorted = sorted(billed_by_date.keys())
-        if len(dates_sorted) >= 2:
-            for d in dates_sorted:
-                w_start = d - timedelta(days=window)
-                billed_30d = sum(v for k, v in billed_by_date.items() if w_start <= k <= d)
-                funded_30d = sum(v for k, v in funded_by_date.items() if w_start <= k <= d)
-                db.add(MetricTimeseries(practice_id=practice_id, metric_name="billed_30d", date=d, value=Decimal(str(billed_30d))))
-                db.add(MetricTimeseries(practice_id=practice_id, metric_name="funded_30d", date=d, value=Decimal(str(funded_30d))))
-
+        first_day = min(all_dates)
+        num_days = (max(max(all_dates), today) - first_day).days + 1
+        daily = {name: np.zeros(num_days, dtype=np.int64) for name in _DAILY_COLUMNS}
+        for d, v in billed_by_date.items():
+            daily["billed_cents"][(d - first_day).days] = v
+        for d, v in funded_by_date.items():
+            daily["funded_cents"][(d - first_day).days] = v
+        for d, v in confirmed_by_date.items():
+            daily["confirmed_cents"][(d - first_day).days] = v
+        for d, counts in claims_by_date.items():
+            daily["claim_count"][(d - first_day).days] = counts["total"]
+            daily["declined_count"][(d - first_day).days] = counts["declined"]
+
+        columns = {name: values.tolist() for name, values in daily.items()}
+        db.execute(insert(PracticeDailyAggregate), [
+            {"practice_id": practice_id, "date": first_day + timedelta(days=i), **{name: columns[name][i] for name in columns}}
+            for i in range(num_days)
+        ])
+
+        series = _daily_series(first_day, daily, today, OntologyBuilderV2.DEFAULT_ROLLING_WINDOW)
+        ts_rows = [
+            {"practice_id": practice_id, "metric_name": name, "date": d, "value": Decimal(str(v))}
+            for name, points in series.items()
+            for d, v in points
+        ]
+        if ts_rows:
+            db.execute(insert(MetricTimeseries), ts_rows)
         db.flush()
 
+    @staticmethod
+    def get_timeseries(db: Session, practice_id: int, window: int = DEFAULT_ROLLING_WINDOW) -> dict:
+        if not 1 <= window <= OntologyBuilderV2.MAX_ROLLING_WINDOW:
+            raise ValueError(f"Invalid window {window}. Must be between 1 and {OntologyBuilderV2.MAX_ROLLING_WINDOW} days")
+
+        rows = db.query(PracticeDailyAggregate).filter(
+            PracticeDailyAggregate.practice_id == practice_id
+        ).order_by(PracticeDailyAggregate.date).all()
+
+        timeseries = {}
+        if rows:
+            first_day = rows[0].date
+            num_days = (rows[-1].date - first_day).days + 1
+            daily = {name: np.zeros(num_days, dtype=np.int64) for name in _DAILY_COLUMNS}
+            for row in rows:
+                i = (row.date - first_day).days
+                for name in _DAILY_COLUMNS:
+                    daily[name][i] = getattr(row, name) or 0
+            for name, points in _daily_series(first_day, daily, date.today(), window).items():
+                timeseries[name] = [{"date": d.isoformat(), "value": float(v)} for d, v in points]
+
+        return {"window_days": window, "timeseries": timeseries}
+
     @staticmethod
     def get_practice_context(db: Session, practice_id: int) -> dict:
         practice = db.query(Practice).filter(Practice.id == practice_id).first()
         if not practice:
             raise ValueError(f"Practice {practice_id} not found")
 
-        claims = db.query(Claim).filter(Claim.practice_id == practice_id).all()
-        payments = db.query(PaymentIntent).filter(PaymentIntent.practice_id == practice_id).all()
+        snap = get_practice_snapshot(db, practice_id)
+        confirmed_mask = snap.payment_status_in(PaymentIntentStatus.CONFIRMED.value)
 
-        total_claims = len(claims)
-        total_billed_cents = sum(c.amount_cents for c in claims)
-        funded_cents = sum(p.amount_cents for p in payments if p.status in (PaymentIntentStatus.CONFIRMED.value, PaymentIntentStatus.SENT.value))
-        confirmed_cents = sum(p.amount_cents for p in payments if p.status == PaymentIntentStatus.CONFIRMED.value)
+        total_claims = snap.claim_count
+        total_billed_cents = int(snap.claim_amount.sum())
+        funded_cents = int(snap.payment_amount[snap.payment_status_in(*_FUNDED_STATUSES)].sum())
+        confirmed_cents = int(snap.payment_amount[confirmed_mask].sum())
 
         status_counts = {}
         for s in ClaimStatus:
             status_counts[s.value] = 0
-        for c in claims:
-            status_counts[c.status] = status_counts.get(c.status, 0) + 1
+        statuses, status_groups = _ordered_groups(snap.claim_status, snap.statuses)
+        for status, count in zip(statuses, _group_sum(status_groups, len(statuses)).tolist()):
+            status_counts[status] = status_counts.get(status, 0) + count
 
-        payer_totals = {}
-        for c in claims:
-            if c.payer:
-                payer_totals[c.payer] = payer_totals.get(c.payer, 0) + c.amount_cents
+        has_payer = snap.claim_payer_idx >= 0
+        payer_billed = _group_sum(snap.claim_payer_idx[has_payer], len(snap.payers), snap.claim_amount[has_payer])
+        payer_totals = dict(zip(snap.payers, payer_billed.tolist()))
 
         payer_mix = []
         if total_billed_cents > 0:
             for payer, amount in sorted(payer_totals.items(), key=lambda x: -x[1])[:5]:
                 payer_mix.append({"payer": payer, "billed_cents": amount, "share": round(amount / total_billed_cents, 4)})
 
+        token_counts = np.bincount(snap.token_code_idx, minlength=len(snap.code_tokens))
         procedure_counts = {}
-        for c in claims:
-            if c.procedure_codes:
-                for code in c.procedure_codes.split(","):
-                    code = code.strip()
-                    if code:
-                        procedure_counts[code] = procedure_counts.get(code, 0) + 1
+        for token, count in zip(snap.code_tokens, token_counts.tolist()):
+            code = token.strip()
+            if code:
+                procedure_counts[code] = procedure_counts.get(code, 0) + count
         proc_mix = []
         if total_claims > 0:
             for code, count in sorted(procedure_counts.items(), key=lambda x: -x[1])[:5]:
                 proc_mix.append({"cdt_code": code, "count": count, "share": round(count / total_claims, 4)})
 
-        confirmed_payments = [p for p in payments if p.confirmed_at and p.sent_at]
-        cohorts = {"avg_lag_days": None, "p50_lag_days": None, "p90_lag_days": None, "sample_size": len(confirmed_payments)}
-        if confirmed_payments:
-            lags = sorted([(p.confirmed_at - p.sent_at).total_seconds() / 86400.0 for p in confirmed_payments])
-            cohorts["avg_lag_days"] = round(sum(lags) / len(lags), 2)
-            cohorts["p50_lag_days"] = round(lags[len(lags) // 2], 2)
-            p90_idx = min(int(len(lags) * 0.9), len(lags) - 1)
-            cohorts["p90_lag_days"] = round(lags[p90_idx], 2)
+        lags = practice_sketch(db, practice_id, REIMBURSEMENT_LAG)
+        cohorts = {"avg_lag_days": None, "p50_lag_days": None, "p90_lag_days": None, "sample_size": lags.count}
+        if lags.count:
+            cohorts["avg_lag_days"] = round(lags.mean, 2)
+            cohorts["p50_lag_days"] = round(lags.quantile(0.5), 2)
+            cohorts["p90_lag_days"] = round(lags.quantile(0.9), 2)
 
         declined = status_counts.get(ClaimStatus.DECLINED.value, 0)
         denial_rate = round(declined / total_claims, 4) if total_claims > 0 else 0
@@ -501,20 +647,12 @@ class OntologyBuilderV2:
             missing_data.append("payer_mix")
         if not proc_mix:
             missing_data.append("procedure_mix")
-        if not confirmed_payments:
+        if not lags.count:
             missing_data.append("reimbursement_lag")
         if utilization is None:
             missing_data.append("funded_utilization (no funding limit set)")
 
-        patient_hashes = {}
-        for c in claims:
-            p_hash = _patient_hash(c.patient_name, practice_id)
-            if p_hash not in patient_hashes:
-                patient_hashes[p_hash] = {"claims": [], "billed": 0, "payer": c.payer, "first_seen": c.created_at}
-            patient_hashes[p_hash]["claims"].append(c)
-            patient_hashes[p_hash]["billed"] += c.amount_cents
-
-        num_patients = len(patient_hashes)
+        num_patients = snap.patient_count
         patient_dynamics = {
             "total_patients": num_patients,
             "avg_claims_per_patient": round(total_claims / num_patients, 2) if num_patients else 0,
@@ -524,19 +662,13 @@ class OntologyBuilderV2:
             "repeat_visit_rate": 0,
         }
         if num_patients > 0:
-            age_buckets = defaultdict(int)
-            insurance_buckets = defaultdict(int)
-            multi = 0
-            for p_hash, pdata in patient_hashes.items():
-                bucket = _age_bucket_from_name(pdata["claims"][0].patient_name if pdata["claims"] else "")
-                age_buckets[bucket] += 1
-                ins_type = _insurance_type_from_payer(pdata.get("payer", ""))
-                insurance_buckets[ins_type] += 1
-                if len(pdata["claims"]) > 1:
-                    multi += 1
-            patient_dynamics["age_mix"] = dict(age_buckets)
-            patient_dynamics["insurance_mix"] = dict(insurance_buckets)
-            patient_dynamics["repeat_visit_rate"] = round(multi / num_patients, 4)
+            claims_per_patient = np.bincount(snap.claim_patient_idx, minlength=num_patients)
+            ages, age_groups = _ordered_groups(snap.patient_age_bucket, snap.age_buckets)
+            insurance_labels = [_insurance_type_from_payer(p) for p in [None] + snap.payers]
+            insurance, insurance_groups = _ordered_groups(snap.patient_payer_idx + 1, insurance_labels)
+            patient_dynamics["age_mix"] = dict(zip(ages, _group_sum(age_groups, len(ages)).tolist()))
+            patient_dynamics["insurance_mix"] = dict(zip(insurance, _group_sum(insurance_groups, len(insurance)).tolist()))
+            patient_dynamics["repeat_visit_rate"] = round(int((claims_per_patient > 1).sum()) / num_patients, 4)
 
         return {
             "version": "ontology-v2",
@@ -575,60 +707,48 @@ class OntologyBuilderV2:
 
     @staticmethod
     def get_cohorts(db: Session, practice_id: int) -> dict:
-        claims = db.query(Claim).filter(Claim.practice_id == practice_id).all()
-        payments = db.query(PaymentIntent).filter(PaymentIntent.practice_id == practice_id).all()
+        snap = get_practice_snapshot(db, practice_id)
 
         today = date.today()
-
-        by_month = defaultdict(lambda: {"count": 0, "billed": 0, "funded": 0, "reimbursed": 0})
-        for c in claims:
-            month_key = c.created_at.strftime("%Y-%m") if c.created_at else today.strftime("%Y-%m")
-            by_month[month_key]["count"] += 1
-            by_month[month_key]["billed"] += c.amount_cents
-
-        payment_map = {p.claim_id: p for p in payments}
-        for c in claims:
-            month_key = c.created_at.strftime("%Y-%m") if c.created_at else today.strftime("%Y-%m")
-            p = payment_map.get(c.id)
-            if p and p.status in (PaymentIntentStatus.SENT.value, PaymentIntentStatus.CONFIRMED.value):
-                by_month[month_key]["funded"] += p.amount_cents
-            if p and p.status == PaymentIntentStatus.CONFIRMED.value:
-                by_month[month_key]["reimbursed"] += p.amount_cents
+        today_day = epoch_day(today)
+        today_month = (today.year - 1970) * 12 + today.month - 1
+
+        months = np.where(snap.claim_dated, snap.claim_month, today_month)
+        first_month = int(months.min()) if months.size else today_month
+        month_groups = months - first_month
+        size = int(month_groups.max()) + 1 if months.size else 0
+        counts = _group_sum(month_groups, size)
+        billed = _group_sum(month_groups, size, snap.claim_amount)
+        funded = _group_sum(month_groups, size, _claim_payment_amount(snap, snap.payment_status_in(*_FUNDED_STATUSES)))
+        reimbursed = _group_sum(month_groups, size, _claim_payment_amount(snap, snap.payment_status_in(PaymentIntentStatus.CONFIRMED.value)))
 
         submission_cohorts = []
-        for month in sorted(by_month.keys()):
-            d = by_month[month]
+        for offset in np.flatnonzero(counts).tolist():
+            count, billed_cents = int(counts[offset]), int(billed[offset])
+            funded_cents, reimbursed_cents = int(funded[offset]), int(reimbursed[offset])
             submission_cohorts.append({
-                "month": month,
-                "claims": d["count"],
-                "billed_cents": d["billed"],
-                "funded_cents": d["funded"],
-                "reimbursed_cents": d["reimbursed"],
-                "reimbursement_pct": round(d["reimbursed"] / d["funded"], 4) if d["funded"] > 0 else 0,
+                "month": month_label(first_month + offset),
+                "claims": count,
+                "billed_cents": billed_cents,
+                "funded_cents": funded_cents,
+                "reimbursed_cents": reimbursed_cents,
+                "reimbursement_pct": round(reimbursed_cents / funded_cents, 4) if funded_cents > 0 else 0,
             })
 
-        aging = {"0_30": 0, "30_60": 0, "60_90": 0, "90_plus": 0}
-        for c in claims:
-            if c.status in (ClaimStatus.CLOSED.value, ClaimStatus.DECLINED.value):
-                continue
-            age_days = (today - c.created_at.date()).days if c.created_at else 0
-            if age_days <= 30:
-                aging["0_30"] += 1
-            elif age_days <= 60:
-                aging["30_60"] += 1
-            elif age_days <= 90:
-                aging["60_90"] += 1
-            else:
-                aging["90_plus"] += 1
+        open_claims = ~snap.claim_status_in(ClaimStatus.CLOSED.value, ClaimStatus.DECLINED.value)
+        age_days = np.where(snap.claim_dated, today_day - snap.claim_day, 0)[open_claims]
+        aging = {
+            "0_30": int((age_days <= 30).sum()),
+            "30_60": int(((age_days > 30) & (age_days <= 60)).sum()),
+            "60_90": int(((age_days > 60) & (age_days <= 90)).sum()),
+            "90_plus": int((age_days > 90).sum()),
+        }
 
         lag_curve = []
-        confirmed_payments = [p for p in payments if p.confirmed_at and p.sent_at]
-        if confirmed_payments:
-            lags = sorted([(p.confirmed_at - p.sent_at).total_seconds() / 86400.0 for p in confirmed_payments])
-            total = len(lags)
+        lags = practice_sketch(db, practice_id, REIMBURSEMENT_LAG)
+        if lags.count:
             for pctl in [10, 25, 50, 75, 90, 95]:
-                idx = min(int(total * pctl / 100), total - 1)
-                lag_curve.append({"percentile": pctl, "days": round(lags[idx], 2)})
+                lag_curve.append({"percentile": pctl, "days": round(lags.quantile(pctl / 100), 2)})
 
         ts_rows = db.query(MetricTimeseries).filter(
             MetricTimeseries.practice_id == practice_id
@@ -654,89 +774,90 @@ class OntologyBuilderV2:
         if not practice:
             raise ValueError(f"Practice {practice_id} not found")
 
-        claims = db.query(Claim).filter(Claim.practice_id == practice_id).all()
-        payments = db.query(PaymentIntent).filter(PaymentIntent.practice_id == practice_id).all()
+        snap = get_practice_snapshot(db, practice_id)
         today = date.today()
+        confirmed_mask = snap.payment_status_in(PaymentIntentStatus.CONFIRMED.value)
 
-        total_billed = sum(c.amount_cents for c in claims)
-        funded = sum(p.amount_cents for p in payments if p.status in (PaymentIntentStatus.CONFIRMED.value, PaymentIntentStatus.SENT.value))
-        confirmed = sum(p.amount_cents for p in payments if p.status == PaymentIntentStatus.CONFIRMED.value)
+        total_billed = int(snap.claim_amount.sum())
+        funded = int(snap.payment_amount[snap.payment_status_in(*_FUNDED_STATUSES)].sum())
+        confirmed = int(snap.payment_amount[confirmed_mask].sum())
         limit = practice.funding_limit_cents or 0
         utilization = round(funded / limit, 4) if limit > 0 else None
         available = max(0, limit - funded)
 
+        def since(d):
+            return snap.claim_dated & (snap.claim_day >= epoch_day(d))
+
         mtd_start = today.replace(day=1)
-        billed_mtd = sum(c.amount_cents for c in claims if c.created_at and c.created_at.date() >= mtd_start)
-        reimbursed_mtd = sum(p.amount_cents for p in payments if p.status == PaymentIntentStatus.CONFIRMED.value and p.confirmed_at and p.confirmed_at.date() >= mtd_start)
+        billed_mtd = int(snap.claim_amount[since(mtd_start)].sum())
+        reimbursed_mtd = int(snap.payment_amount[
+            confirmed_mask & snap.payment_has_confirmed & (snap.payment_confirmed_day >= epoch_day(mtd_start))
+        ].sum())
 
         trailing_90d = today - timedelta(days=90)
-        billed_90d = sum(c.amount_cents for c in claims if c.created_at and c.created_at.date() >= trailing_90d)
+        billed_90d = int(snap.claim_amount[since(trailing_90d)].sum())
         avg_monthly_90d = round(billed_90d / 3) if billed_90d > 0 else 0
 
         recent_30d = today - timedelta(days=30)
-        projected_30d = sum(c.amount_cents for c in claims if c.created_at and c.created_at.date() >= recent_30d)
+        curr_30d = since(recent_30d)
+        projected_30d = int(snap.claim_amount[curr_30d].sum())
 
-        payer_totals = defaultdict(int)
-        for c in claims:
-            if c.payer:
-                payer_totals[c.payer] += c.amount_cents
-        sorted_payers = sorted(payer_totals.items(), key=lambda x: -x[1])
+        has_payer = snap.claim_payer_idx >= 0
+        payer_billed = _group_sum(snap.claim_payer_idx[has_payer], len(snap.payers), snap.claim_amount[has_payer])
+        sorted_payers = sorted(zip(snap.payers, payer_billed.tolist()), key=lambda x: -x[1])
         top_share = sorted_payers[0][1] / total_billed if sorted_payers and total_billed > 0 else 0
 
         payer_lag_variance = {}
-        payer_payments = defaultdict(list)
-        for p in payments:
-            if p.confirmed_at and p.sent_at:
-                claim = next((c for c in claims if c.id == p.claim_id), None)
-                if claim and claim.payer:
-                    payer_payments[claim.payer].append((p.confirmed_at - p.sent_at).total_seconds() / 86400.0)
-        for payer, lags in payer_payments.items():
-            if len(lags) >= 2:
-                avg = sum(lags) / len(lags)
-                variance = sum((l - avg) ** 2 for l in lags) / len(lags)
+        linked = snap.payment_claim_pos >= 0
+        linked[linked] = snap.claim_payer_idx[snap.payment_claim_pos[linked]] >= 0
+        lags = snap.reimbursement_lags(linked)
+        lag_payer = snap.claim_payer_idx[snap.payment_claim_pos[linked & snap.payment_has_sent & snap.payment_has_confirmed]]
+        lag_payers, lag_groups = _ordered_groups(lag_payer, snap.payers)
+        order = np.argsort(lag_groups, kind="stable")
+        bounds = np.cumsum(np.bincount(lag_groups, minlength=len(lag_payers)))
+        for payer, group_lags in zip(lag_payers, np.split(lags[order], bounds[:-1])):
+            if group_lags.size >= 2:
+                avg = _seq_sum(group_lags) / group_lags.size
+                variance = _seq_sum((group_lags - avg) ** 2) / group_lags.size
                 payer_lag_variance[payer] = round(variance, 2)
 
-        patient_hashes = set()
-        for c in claims:
-            patient_hashes.add(_patient_hash(c.patient_name, practice_id))
-        num_patients = len(patient_hashes)
-
-        new_30d = set()
-        returning_30d = set()
-        all_before_30d = set()
-        for c in claims:
-            p_hash = _patient_hash(c.patient_name, practice_id)
-            if c.created_at and c.created_at.date() >= recent_30d:
-                if p_hash in all_before_30d:
-                    returning_30d.add(p_hash)
-                else:
-                    new_30d.add(p_hash)
-            if c.created_at and c.created_at.date() < recent_30d:
-                all_before_30d.add(p_hash)
-
-        insurance_mix = defaultdict(int)
-        for c in claims:
-            insurance_mix[_insurance_type_from_payer(c.payer)] += 1
-
-        total_claims = len(claims)
-        declined = sum(1 for c in claims if c.status == ClaimStatus.DECLINED.value)
-        exceptions = sum(1 for c in claims if c.status == ClaimStatus.PAYMENT_EXCEPTION.value)
+        num_patients = snap.patient_count
+        positions = np.arange(snap.claim_count)
+
+        # A recent claim counts its patient as returning only if an older claim
+        # of the same patient was seen earlier in the claim scan.
+        before_30d = snap.claim_dated & (snap.claim_day < epoch_day(recent_30d))
+        first_before = np.full(num_patients, snap.claim_count, dtype=np.int64)
+        np.minimum.at(first_before, snap.claim_patient_idx[before_30d], positions[before_30d])
+        recent_patients = snap.claim_patient_idx[curr_30d]
+        is_returning = first_before[recent_patients] < positions[curr_30d]
+        new_30d = np.unique(recent_patients[~is_returning]).size
+        returning_30d = np.unique(recent_patients[is_returning]).size
+
+        insurance_labels = [_insurance_type_from_payer(p) for p in [None] + snap.payers]
+        insurance, insurance_groups = _ordered_groups(snap.claim_payer_idx + 1, insurance_labels)
+        insurance_mix = dict(zip(insurance, _group_sum(insurance_groups, len(insurance)).tolist()))
+
+        total_claims = snap.claim_count
+        declined_mask = snap.claim_status_in(ClaimStatus.DECLINED.value)
+        declined = int(declined_mask.sum())
+        exceptions = int(snap.claim_status_in(ClaimStatus.PAYMENT_EXCEPTION.value).sum())
         denial_rate = round(declined / total_claims, 4) if total_claims > 0 else 0
         exception_rate = round(exceptions / total_claims, 4) if total_claims > 0 else 0
 
-        declined_30d = sum(1 for c in claims if c.status == ClaimStatus.DECLINED.value and c.created_at and c.created_at.date() >= recent_30d)
-        total_30d = sum(1 for c in claims if c.created_at and c.created_at.date() >= recent_30d)
+        declined_30d = int((declined_mask & curr_30d).sum())
+        total_30d = int(curr_30d.sum())
         denial_rate_30d = round(declined_30d / total_30d, 4) if total_30d > 0 else 0
 
-        prev_30d_claims = [c for c in claims if c.created_at and recent_30d - timedelta(days=30) <= c.created_at.date() < recent_30d]
-        curr_30d_claims = [c for c in claims if c.created_at and c.created_at.date() >= recent_30d]
+        prev_30d = since(recent_30d - timedelta(days=30)) & ~curr_30d
+        prev_30d_count = int(prev_30d.sum())
         growth_rate = None
-        if prev_30d_claims:
-            growth_rate = round((len(curr_30d_claims) - len(prev_30d_claims)) / len(prev_30d_claims), 4)
+        if prev_30d_count:
+            growth_rate = round((total_30d - prev_30d_count) / prev_30d_count, 4)
 
-        payer_count_30d = len(set(c.payer for c in curr_30d_claims if c.payer))
-        payer_count_prev = len(set(c.payer for c in prev_30d_claims if c.payer))
-        diversification_trend = payer_count_30d - payer_count_prev if prev_30d_claims else None
+        payer_count_30d = np.unique(snap.claim_payer_idx[curr_30d & has_payer]).size
+        payer_count_prev = np.unique(snap.claim_payer_idx[prev_30d & has_payer]).size
+        diversification_trend = payer_count_30d - payer_count_prev if prev_30d_count else None
 
         return {
             "capital": {
@@ -757,15 +878,15 @@ class OntologyBuilderV2:
                 "concentration": round(top_share, 4),
                 "top_payer": sorted_payers[0][0] if sorted_payers else None,
                 "lag_variance_by_payer": payer_lag_variance,
-                "payer_count": len(payer_totals),
+                "payer_count": len(snap.payers),
             },
             "patient_dynamics": {
                 "total_patients": num_patients,
                 "revenue_per_patient_cents": round(total_billed / num_patients) if num_patients else 0,
                 "insurance_mix": dict(insurance_mix),
-                "new_patients_30d": len(new_30d),
-                "returning_patients_30d": len(returning_30d),
-                "new_vs_returning_ratio": round(len(new_30d) / max(len(returning_30d), 1), 2),
+                "new_patients_30d": new_30d,
+                "returning_patients_30d": returning_30d,
+                "new_vs_returning_ratio": round(new_30d / max(returning_30d, 1), 2),
             },
             "operational_risk": {
                 "denial_rate": denial_rate,
@@ -777,8 +898,8 @@ class OntologyBuilderV2:
             "growth": {
                 "claim_volume_growth_rate": growth_rate,
                 "payer_diversification_trend": diversification_trend,
-                "total_claims_30d": len(curr_30d_claims),
-                "total_claims_prev_30d": len(prev_30d_claims),
+                "total_claims_30d": total_30d,
+                "total_claims_prev_30d": prev_30d_count,
             },
         }
 
@@ -872,164 +993,129 @@ class OntologyBuilderV2:
 
     @staticmethod
     def get_patient_retention(db: Session, practice_id: int, range_key: str = "90d") -> dict:
-        from .cdt_families import PREVENTIVE_CODES
-        claims = db.query(Claim).filter(Claim.practice_id == practice_id).all()
+        """Retention, repeat-visit and recall metrics from the patient dimension rows."""
         today = date.today()
-
-        range_days = {"30d": 30, "90d": 90, "12m": 365}.get(range_key, 90)
-        cutoff = today - timedelta(days=range_days)
         cutoff_12m = today - timedelta(days=365)
-
-        patient_claims = defaultdict(list)
-        for c in claims:
-            p_hash = _patient_hash(c.patient_name, practice_id)
-            patient_claims[p_hash].append(c)
-
-        active_12m = set()
-        for p_hash, p_claims in patient_claims.items():
-            for c in p_claims:
-                if c.created_at and c.created_at.date() >= cutoff_12m:
-                    active_12m.add(p_hash)
-                    break
-
-        new_patients = set()
-        returning_patients = set()
-        for p_hash in active_12m:
-            dates = sorted([c.created_at for c in patient_claims[p_hash] if c.created_at])
-            if dates and (today - dates[0].date()).days <= 90:
-                new_patients.add(p_hash)
-            else:
-                returning_patients.add(p_hash)
-
-        repeat_90d = 0
-        repeat_180d = 0
         cutoff_90 = today - timedelta(days=90)
         cutoff_180 = today - timedelta(days=180)
-        for p_hash in active_12m:
-            c90 = [c for c in patient_claims[p_hash] if c.created_at and c.created_at.date() >= cutoff_90]
-            if len(c90) >= 2:
-                repeat_90d += 1
-            c180 = [c for c in patient_claims[p_hash] if c.created_at and c.created_at.date() >= cutoff_180]
-            if len(c180) >= 2:
-                repeat_180d += 1
-
-        reactivated = set()
         cutoff_30d = today - timedelta(days=30)
         gap_cutoff = today - timedelta(days=180)
-        for p_hash, p_claims in patient_claims.items():
-            dates = sorted([c.created_at for c in p_claims if c.created_at])
-            if len(dates) < 2:
-                continue
-            recent = [d for d in dates if d.date() >= cutoff_30d]
-            old = [d for d in dates if d.date() < gap_cutoff]
-            if recent and old:
-                reactivated.add(p_hash)
-
-        overdue_recall = []
-        for p_hash, p_claims in patient_claims.items():
-            has_preventive = False
-            last_preventive_date = None
-            for c in p_claims:
-                if c.procedure_codes:
-                    for code in c.procedure_codes.split(","):
-                        code = code.strip().upper()
-                        if code in PREVENTIVE_CODES:
-                            has_preventive = True
-                            if c.created_at:
-                                if last_preventive_date is None or c.created_at > last_preventive_date:
-                                    last_preventive_date = c.created_at
-            if has_preventive and last_preventive_date:
-                months_since = (today - last_preventive_date.date()).days / 30.0
-                if months_since >= 6:
-                    overdue_recall.append({
-                        "patient_hash": p_hash,
-                        "months_since_last_preventive": round(months_since, 1),
-                    })
-
-        patient_value = []
-        for p_hash in active_12m:
-            billed_12m = sum(
-                c.amount_cents for c in patient_claims[p_hash]
-                if c.created_at and c.created_at.date() >= cutoff_12m
-            )
-            patient_value.append({"patient_hash": p_hash, "billed_12m_cents": billed_12m})
-        patient_value.sort(key=lambda x: -x["billed_12m_cents"])
 
-        active_count = len(active_12m)
+        dims = PatientDimension
+        in_practice = dims.practice_id == practice_id
+        active = dims.last_seen >= cutoff_12m
+        # Every count comes from one scan of the practice's dimension rows.
+        active_count, new_patients, repeat_90d, repeat_180d, reactivated = db.query(
+            func.count(dims.id).filter(active),
+            func.count(dims.id).filter(active, dims.first_seen >= cutoff_90),
+            # Two visits within a window <=> the second most recent one is inside it.
+            func.count(dims.id).filter(active, dims.previous_seen >= cutoff_90),
+            func.count(dims.id).filter(active, dims.previous_seen >= cutoff_180),
+            func.count(dims.id).filter(
+                dims.claim_count >= 2, dims.last_seen >= cutoff_30d, dims.first_seen < gap_cutoff
+            ),
+        ).filter(in_practice).one()
+        returning_patients = active_count - new_patients
+
+        # ORDER BY ... LIMIT lets Postgres keep a bounded top-N heap instead of
+        # sorting every overdue patient.
+        overdue = db.query(dims.patient_hash, dims.last_preventive_date).filter(
+            in_practice, dims.last_preventive_date <= today - timedelta(days=180)
+        ).order_by(dims.first_claim_id).limit(RETENTION_LIST_LIMIT).all()
+        overdue_recall = [
+            {
+                "patient_hash": patient_hash,
+                "months_since_last_preventive": round((today - last_preventive).days / 30.0, 1),
+            }
+            for patient_hash, last_preventive in overdue
+        ]
+
+        # Trailing-year billed totals are a claim-level window, so they come
+        # from the cached snapshot rather than the dimension rows.
+        snap = get_practice_snapshot(db, practice_id)
+        in_12m = snap.claim_dated & (snap.claim_day >= epoch_day(cutoff_12m))
+        patients_12m = snap.claim_patient_idx[in_12m]
+        billed_12m = _group_sum(patients_12m, snap.patient_count, snap.claim_amount[in_12m])
+        active_idx = np.flatnonzero(_group_sum(patients_12m, snap.patient_count) > 0)
+        top = _top_n(billed_12m, active_idx, RETENTION_LIST_LIMIT)
+        patient_value = [
+            {"patient_hash": snap.patient_hashes[patient_idx], "billed_12m_cents": int(billed_12m[patient_idx])}
+            for patient_idx in top.tolist()
+        ]
+
         return {
             "active_patients_12mo": active_count,
-            "new_patients": len(new_patients),
-            "returning_patients": len(returning_patients),
+            "new_patients": new_patients,
+            "returning_patients": returning_patients,
             "repeat_visit_rate_90d": round(repeat_90d / active_count, 4) if active_count else 0,
             "repeat_visit_rate_180d": round(repeat_180d / active_count, 4) if active_count else 0,
-            "reactivation_rate": round(len(reactivated) / active_count, 4) if active_count else 0,
-            "overdue_recall_cohorts": overdue_recall[:20],
-            "patient_value_proxy": patient_value[:20],
+            "reactivation_rate": round(reactivated / active_count, 4) if active_count else 0,
+            "overdue_recall_cohorts": overdue_recall,
+            "patient_value_proxy": patient_value,
         }
 
     @staticmethod
     def get_reimbursement_metrics(db: Session, practice_id: int) -> dict:
         from .cdt_families import get_cdt_family
-        claims = db.query(Claim).filter(Claim.practice_id == practice_id).all()
-        payments = db.query(PaymentIntent).filter(PaymentIntent.practice_id == practice_id).all()
-        payment_map = {p.claim_id: p for p in payments}
+        snap = get_practice_snapshot(db, practice_id)
 
-        by_payer = defaultdict(lambda: {"billed": 0, "paid": 0, "denied": 0, "total": 0})
-        by_family = defaultdict(lambda: {"billed": 0, "paid": 0, "denied": 0, "total": 0})
-        adjudication_lags_by_payer = defaultdict(list)
+        declined = snap.claim_status_in(ClaimStatus.DECLINED.value)
+        confirmed_mask = snap.payment_status_in(PaymentIntentStatus.CONFIRMED.value)
+        paid = _claim_payment_amount(snap, confirmed_mask)
 
-        for c in claims:
-            payer = c.payer or "Unknown"
-            by_payer[payer]["total"] += 1
-            by_payer[payer]["billed"] += c.amount_cents
-            if c.status == ClaimStatus.DECLINED.value:
-                by_payer[payer]["denied"] += 1
-
-            p = payment_map.get(c.id)
-            if p and p.status == PaymentIntentStatus.CONFIRMED.value:
-                by_payer[payer]["paid"] += p.amount_cents
-                if p.confirmed_at and p.sent_at:
-                    lag = (p.confirmed_at - p.sent_at).total_seconds() / 86400.0
-                    adjudication_lags_by_payer[payer].append(lag)
-
-            if c.procedure_codes:
-                for code in c.procedure_codes.split(","):
-                    family = get_cdt_family(code.strip())
-                    by_family[family]["total"] += 1
-                    by_family[family]["billed"] += c.amount_cents
-                    if c.status == ClaimStatus.DECLINED.value:
-                        by_family[family]["denied"] += 1
-                    if p and p.status == PaymentIntentStatus.CONFIRMED.value:
-                        by_family[family]["paid"] += p.amount_cents
+        payers, payer_groups = _ordered_groups(snap.claim_payer_idx + 1, ["Unknown"] + snap.payers)
+        size = len(payers)
+        payer_total = _group_sum(payer_groups, size).tolist()
+        payer_billed = _group_sum(payer_groups, size, snap.claim_amount).tolist()
+        payer_denied = _group_sum(payer_groups[declined], size).tolist()
+        payer_paid = _group_sum(payer_groups, size, paid).tolist()
 
         reimbursement_by_payer = {}
-        for payer, d in by_payer.items():
+        for i, payer in enumerate(payers):
             reimbursement_by_payer[payer] = {
-                "realized_rate": round(d["paid"] / d["billed"], 4) if d["billed"] else "missing_data",
-                "denial_rate": round(d["denied"] / d["total"], 4) if d["total"] else 0,
-                "billed_cents": d["billed"],
-                "paid_cents": d["paid"],
-                "claim_count": d["total"],
+                "realized_rate": round(payer_paid[i] / payer_billed[i], 4) if payer_billed[i] else "missing_data",
+                "denial_rate": round(payer_denied[i] / payer_total[i], 4) if payer_total[i] else 0,
+                "billed_cents": payer_billed[i],
+                "paid_cents": payer_paid[i],
+                "claim_count": payer_total[i],
             }
 
+        families, family_groups = _ordered_groups(
+            snap.token_code_idx, [get_cdt_family(token.strip()) for token in snap.code_tokens]
+        )
+        size = len(families)
+        token_claims = snap.token_claim_pos
+        family_total = _group_sum(family_groups, size).tolist()
+        family_billed = _group_sum(family_groups, size, snap.claim_amount[token_claims]).tolist()
+        family_denied = _group_sum(family_groups[declined[token_claims]], size).tolist()
+        family_paid = _group_sum(family_groups, size, paid[token_claims]).tolist()
+
         reimbursement_by_family = {}
-        for family, d in by_family.items():
+        for i, family in enumerate(families):
             reimbursement_by_family[family] = {
-                "realized_rate": round(d["paid"] / d["billed"], 4) if d["billed"] else "missing_data",
-                "denial_rate": round(d["denied"] / d["total"], 4) if d["total"] else 0,
-                "billed_cents": d["billed"],
-                "paid_cents": d["paid"],
+                "realized_rate": round(family_paid[i] / family_billed[i], 4) if family_billed[i] else "missing_data",
+                "denial_rate": round(family_denied[i] / family_total[i], 4) if family_total[i] else 0,
+                "billed_cents": family_billed[i],
+                "paid_cents": family_paid[i],
             }
 
+        # Adjudication lags are keyed in claim order, like the payer rows; the
+        # percentiles come from the per-payer sketches.
+        lag_payments = confirmed_mask & (snap.payment_claim_pos >= 0)
+        lag_claims = snap.payment_claim_pos[lag_payments & snap.payment_has_sent & snap.payment_has_confirmed]
+        lag_payers, _ = _ordered_groups(
+            snap.claim_payer_idx[lag_claims] + 1, [UNKNOWN_PAYER] + snap.payers, positions=lag_claims
+        )
+        payer_sketches = load_metric_sketches(db, REIMBURSEMENT_LAG, [practice_id])
+
         time_to_adjudication = {}
-        for payer, lags in adjudication_lags_by_payer.items():
-            if not lags:
-                time_to_adjudication[payer] = "missing_data"
-                continue
-            lags.sort()
-            p50 = lags[len(lags) // 2]
-            p90_idx = min(int(len(lags) * 0.9), len(lags) - 1)
-            time_to_adjudication[payer] = {"p50_days": round(p50, 2), "p90_days": round(lags[p90_idx], 2)}
+        for payer in lag_payers:
+            sketch = payer_sketches.get((practice_id, payer))
+            if sketch is not None and sketch.count:
+                time_to_adjudication[payer] = {
+                    "p50_days": round(sketch.quantile(0.5), 2),
+                    "p90_days": round(sketch.quantile(0.9), 2),
+                }
 
         return {
             "by_payer": reimbursement_by_payer,
@@ -1039,29 +1125,30 @@ class OntologyBuilderV2:
 
     @staticmethod
     def get_rcm_ops(db: Session, practice_id: int) -> dict:
-        claims = db.query(Claim).filter(Claim.practice_id == practice_id).all()
-        today = date.today()
-
-        aging = {"0_30": [], "30_60": [], "60_90": [], "90_plus": []}
-        for c in claims:
-            if c.status in (ClaimStatus.CLOSED.value, ClaimStatus.DECLINED.value):
-                continue
-            age_days = (today - c.created_at.date()).days if c.created_at else 0
-            bucket = "0_30" if age_days <= 30 else "30_60" if age_days <= 60 else "60_90" if age_days <= 90 else "90_plus"
-            aging[bucket].append({"claim_token": c.claim_token, "status": c.status, "amount_cents": c.amount_cents, "age_days": age_days})
-
-        aging_summary = {k: {"count": len(v), "total_cents": sum(i["amount_cents"] for i in v)} for k, v in aging.items()}
-
-        total = len(claims)
-        exceptions = [c for c in claims if c.status == ClaimStatus.PAYMENT_EXCEPTION.value]
-        declined = [c for c in claims if c.status == ClaimStatus.DECLINED.value]
-        exception_rate = round((len(exceptions) + len(declined)) / total, 4) if total else 0
+        age_days = cast(date.today(), Date) - cast(Claim.created_at, Date)
+        bucket = aging_bucket(func.coalesce(age_days, 0))
+        bucket_rows = db.query(
+            bucket, func.count(Claim.id), func.coalesce(func.sum(Claim.amount_cents), 0),
+        ).filter(
+            Claim.practice_id == practice_id,
+            Claim.status.notin_([ClaimStatus.CLOSED.value, ClaimStatus.DECLINED.value]),
+        ).group_by(bucket).all()
+        aging_summary = {k: {"count": 0, "total_cents": 0} for k in AGING_BUCKETS}
+        for key, count, total_cents in bucket_rows:
+            aging_summary[key] = {"count": count, "total_cents": int(total_cents)}
+
+        total, exception_count, declined_count = db.query(
+            func.count(Claim.id),
+            func.count(Claim.id).filter(Claim.status == ClaimStatus.PAYMENT_EXCEPTION.value),
+            func.count(Claim.id).filter(Claim.status == ClaimStatus.DECLINED.value),
+        ).filter(Claim.practice_id == practice_id).one()
+        exception_rate = round((exception_count + declined_count) / total, 4) if total else 0
 
         return {
             "claims_aging_buckets": aging_summary,
             "exception_rate": exception_rate,
-            "exception_count": len(exceptions),
-            "declined_count": len(declined),
+            "exception_count": exception_count,
+            "declined_count": declined_count,
             "total_claims": total,
             "forecasted_cash_in_7d": "missing_data",
             "forecasted_cash_in_14d": "missing_data",
@@ -1091,15 +1178,9 @@ class OntologyBuilderV2:
 
         limit = max(1, min(limit, OntologyBuilderV2.MAX_GRAPH_LIMIT))
 
-        objects = db.query(OntologyObject).filter(OntologyObject.practice_id == practice_id).all()
-        if not objects:
+        if not db.query(OntologyObject.id).filter(OntologyObject.practice_id == practice_id).first():
             OntologyBuilderV2.build_practice_ontology(db, practice_id)
             db.flush()
-            objects = db.query(OntologyObject).filter(OntologyObject.practice_id == practice_id).all()
-        links = db.query(OntologyLink).filter(OntologyLink.practice_id == practice_id).all()
-
-        obj_map = {str(o.id): o for o in objects}
-        link_list = links
 
         EDGE_LABELS = {
             OntologyLinkType.CLAIM_BILLED_TO_PAYER.value: "billed to",
@@ -1139,66 +1220,49 @@ class OntologyBuilderV2:
         range_days = {"30d": 30, "90d": 90, "12m": 365}.get(range_key, 90)
         range_cutoff = date.today() - timedelta(days=range_days)
 
-        def _in_range(o):
-            if o.object_type == OntologyObjectType.PRACTICE.value:
-                return True
-            props = o.properties_json or {}
-            created = props.get("created_at")
-            if created:
-                try:
-                    d = datetime.fromisoformat(created).date() if isinstance(created, str) else created
-                    return d >= range_cutoff
-                except (ValueError, TypeError):
-                    pass
-            return True
-
-        def _payer_match(o):
-            if not payer_filter:
-                return True
-            if o.object_type == OntologyObjectType.PAYER.value:
-                return (o.properties_json or {}).get("name", "").lower() == payer_filter.lower()
-            if o.object_type == OntologyObjectType.CLAIM.value:
-                return (o.properties_json or {}).get("payer", "").lower() == payer_filter.lower()
-            return True
-
-        def _state_match(o):
-            if not state_filter:
-                return True
-            if o.object_type == OntologyObjectType.CLAIM.value:
-                return (o.properties_json or {}).get("status", "") == state_filter
-            return True
-
-        def _search_match(o):
-            if not search:
-                return True
-            q = search.lower()
-            props = o.properties_json or {}
-            label_str = (props.get("name", "") or props.get("claim_token", "") or props.get("cdt_code", "") or props.get("patient_hash", "") or "").lower()
-            type_str = (o.object_type or "").lower()
-            key_str = (o.object_key or "").lower()
-            return q in label_str or q in type_str or q in key_str
-
-        filtered_objs = [
-            o for o in objects
-            if o.object_type in allowed_types and _in_range(o) and _payer_match(o) and _state_match(o) and _search_match(o)
+        criteria = [
+            OntologyObject.practice_id == practice_id,
+            OntologyObject.object_type.in_(allowed_types),
+            or_(OntologyObject.event_date.is_(None), OntologyObject.event_date >= range_cutoff),
         ]
+        if payer_filter:
+            criteria.append(or_(
+                OntologyObject.object_type.notin_([OntologyObjectType.PAYER.value, OntologyObjectType.CLAIM.value]),
+                OntologyObject.payer_key == payer_filter.lower(),
+            ))
+        if state_filter:
+            criteria.append(or_(
+                OntologyObject.object_type != OntologyObjectType.CLAIM.value,
+                OntologyObject.status == state_filter,
+            ))
+        if search:
+            q = search.lower()
+            props = OntologyObject.properties_json
+            label_str = func.coalesce(*(func.nullif(props[k].astext, "") for k in ("name", "claim_token", "cdt_code", "patient_hash")), "")
+            criteria.append(or_(*(
+                func.strpos(func.lower(col), q) > 0
+                for col in (label_str, OntologyObject.object_type, func.coalesce(OntologyObject.object_key, ""))
+            )))
 
         if focus_node_id:
-            focus_ids = {focus_node_id}
-            adj = defaultdict(set)
-            for link in link_list:
-                f = str(link.from_object_id)
-                t = str(link.to_object_id)
-                adj[f].add(t)
-                adj[t].add(f)
-            frontier = {focus_node_id}
-            for _ in range(hops):
-                next_frontier = set()
-                for nid in frontier:
-                    next_frontier |= adj.get(nid, set())
-                focus_ids |= next_frontier
-                frontier = next_frontier - focus_ids
-            filtered_objs = [o for o in filtered_objs if str(o.id) in focus_ids]
+            index = get_graph_index(db, practice_id)
+            focus_ids = []
+            for nid in (index.neighborhood(focus_node_id, hops) if index else {focus_node_id}):
+                try:
+                    focus_ids.append(uuid.UUID(nid))
+                except ValueError:
+                    continue
+            criteria.append(OntologyObject.id.in_(focus_ids))
+
+        def _matching(*object_types, exclude=False):
+            query = db.query(OntologyObject).filter(*criteria)
+            if object_types:
+                type_filter = OntologyObject.object_type.notin_(object_types) if exclude else OntologyObject.object_type.in_(object_types)
+                query = query.filter(type_filter)
+            return query
+
+        creation_order = (OntologyObject.created_at, OntologyObject.id)
+        match_count = db.query(func.count(OntologyObject.id)).filter(*criteria).scalar()
 
         def _node_label(o):
             props = o.properties_json or {}
@@ -1231,9 +1295,9 @@ class OntologyBuilderV2:
             return None
 
         procedure_family_aggregation = {}
-        if len(filtered_objs) > limit:
-            proc_objs = [o for o in filtered_objs if o.object_type == OntologyObjectType.PROCEDURE.value]
-            non_proc = [o for o in filtered_objs if o.object_type != OntologyObjectType.PROCEDURE.value]
+        family_members = []
+        if match_count > limit:
+            proc_objs = _matching(OntologyObjectType.PROCEDURE.value).order_by(*creation_order).all()
 
             family_groups = defaultdict(list)
             for o in proc_objs:
@@ -1241,43 +1305,32 @@ class OntologyBuilderV2:
                 fam = get_cdt_family(code)
                 family_groups[fam].append(o)
 
-            aggregated_proc_nodes = []
             for fam, members in family_groups.items():
                 agg_id = f"family:{fam}"
                 procedure_family_aggregation[agg_id] = [str(m.id) for m in members]
-                agg_node_data = {
-                    "id": agg_id,
-                    "type": "ProcedureFamily",
-                    "label": fam,
-                    "subtitle_stat": f"{len(members)} codes",
-                    "properties": {"family": fam, "code_count": len(members), "codes": [((m.properties_json or {}).get("cdt_code", "")) for m in members[:10]]},
-                    "provenance": {"source": "aggregation", "version": "ontology-v2.1"},
-                }
-                aggregated_proc_nodes.append(agg_node_data)
+                family_members.extend(m.id for m in members)
 
-            claim_objs_sorted = sorted(
-                [o for o in non_proc if o.object_type == OntologyObjectType.CLAIM.value],
-                key=lambda o: (o.properties_json or {}).get("amount_cents", 0), reverse=True,
-            )
-            patient_objs_sorted = sorted(
-                [o for o in non_proc if o.object_type == OntologyObjectType.PATIENT.value],
-                key=lambda o: (o.properties_json or {}).get("lifetime_billed_cents", 0), reverse=True,
-            )
-            pi_objs_sorted = sorted(
-                [o for o in non_proc if o.object_type == OntologyObjectType.PAYMENT_INTENT.value],
-                key=lambda o: (o.properties_json or {}).get("amount_cents", 0), reverse=True,
-            )
-            other = [o for o in non_proc if o.object_type not in (OntologyObjectType.CLAIM.value, OntologyObjectType.PATIENT.value, OntologyObjectType.PAYMENT_INTENT.value)]
+            ranked_types = (OntologyObjectType.CLAIM.value, OntologyObjectType.PATIENT.value, OntologyObjectType.PAYMENT_INTENT.value)
+            other = _matching(OntologyObjectType.PROCEDURE.value, *ranked_types, exclude=True).order_by(*creation_order).all()
 
-            budget = max(limit - len(other) - len(aggregated_proc_nodes), 10)
+            budget = max(limit - len(other) - len(family_groups), 10)
             claim_budget = int(budget * 0.5)
             patient_budget = int(budget * 0.3)
             pi_budget = budget - claim_budget - patient_budget
 
-            trimmed = other + claim_objs_sorted[:claim_budget] + patient_objs_sorted[:patient_budget] + pi_objs_sorted[:pi_budget]
-            filtered_objs = trimmed
+            def _top(object_type, n):
+                return _matching(object_type).order_by(
+                    func.coalesce(OntologyObject.amount_cents, 0).desc(), *creation_order,
+                ).limit(n).all()
+
+            filtered_objs = (
+                other
+                + _top(OntologyObjectType.CLAIM.value, claim_budget)
+                + _top(OntologyObjectType.PATIENT.value, patient_budget)
+                + _top(OntologyObjectType.PAYMENT_INTENT.value, pi_budget)
+            )
         else:
-            procedure_family_aggregation = {}
+            filtered_objs = _matching().order_by(*creation_order).all()
 
         included_ids = set()
         nodes = []
@@ -1311,9 +1364,16 @@ class OntologyBuilderV2:
             for mid in member_ids:
                 member_to_family[mid] = agg_id
 
+        linked_ids = [o.id for o in filtered_objs] + family_members
+        links = db.query(OntologyLink).filter(
+            OntologyLink.practice_id == practice_id,
+            OntologyLink.from_object_id.in_(linked_ids),
+            OntologyLink.to_object_id.in_(linked_ids),
+        ).order_by(OntologyLink.created_at, OntologyLink.id).all()
+
         edges = []
         seen_edges = set()
-        for link in link_list:
+        for link in links:
             from_id = str(link.from_object_id)
             to_id = str(link.to_object_id)
 
@@ -1345,3 +1405,12 @@ class OntologyBuilderV2:
             "edges": edges,
             "aggregations": {k: len(v) for k, v in procedure_family_aggregation.items()} if procedure_family_aggregation else None,
         }
+
+    @staticmethod
+    def get_graph_stats(db: Session, practice_id: int) -> dict:
+        index = get_graph_index(db, practice_id)
+        if index is None:
+            OntologyBuilderV2.build_practice_ontology(db, practice_id)
+            db.flush()
+            index = get_graph_index(db, practice_id)
+        return {"version": "ontology-v2.1", **index.degree_stats()}
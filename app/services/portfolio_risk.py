@@ -0,0 +1,234 @@
+"""Portfolio risk job: ``OntologyBuilderV2.get_risks`` for every active practice.
+
+Practices are evaluated in a pool of worker processes, each with its own
+database connections and per-process practice snapshots, so a refresh costs
+roughly ``practices / workers`` risk evaluations instead of one sequential
+pass. Workers only read; the parent writes a run's rows in one transaction
+and drops the rows of older runs. A practice whose evaluation fails is
+recorded on the run and skipped, it does not fail the run.
+
+Only one refresh runs at a time (Postgres advisory lock).
+"""
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models.portfolio_risk import PortfolioRisk, PortfolioRiskRun, PortfolioRiskRunStatus, SEVERITY_RANK
+from ..models.practice import Practice, PracticeStatus
+from .ontology_v2 import OntologyBuilderV2
+
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_RISK_LOCK_KEY = 9142027
+# Practices handed to a worker per task; large enough to amortize IPC, small
+# enough that one slow practice does not hold back a whole slice.
+PRACTICES_PER_TASK = 8
+MAX_RECORDED_ERRORS = 50
+
+
+def _evaluate_practices(practice_ids: List[int]) -> List[Tuple[int, list, Optional[str]]]:
+    """Worker entry point: ``(practice_id, risks, error)`` for each practice."""
+    results = []
+    db = SessionLocal()
+    try:
+        for practice_id in practice_ids:
+            try:
+                results.append((practice_id, OntologyBuilderV2.get_risks(db, practice_id), None))
+            except Exception as e:
+                logger.error("Portfolio risk evaluation failed for practice %s: %s", practice_id, str(e))
+                results.append((practice_id, [], f"{type(e).__name__}: {e}"))
+            finally:
+                db.rollback()
+    finally:
+        db.close()
+    return results
+
+
+def _chunks(ids: List[int], size: int) -> Iterable[List[int]]:
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+class PortfolioRiskService:
+
+    @staticmethod
+    def default_workers() -> int:
+        return get_settings().portfolio_risk_workers or os.cpu_count() or 1
+
+    @staticmethod
+    def start_run(db: Session, workers: Optional[int] = None, actor_user_id: Optional[int] = None) -> PortfolioRiskRun:
+        run = PortfolioRiskRun(
+            status=PortfolioRiskRunStatus.RUNNING.value,
+            workers=workers or PortfolioRiskService.default_workers(),
+            triggered_by_user_id=actor_user_id,
+        )
+        db.add(run)
+        db.commit()
+        return run
+
+    @staticmethod
+    def refresh(db: Session, run: Optional[PortfolioRiskRun] = None, workers: Optional[int] = None) -> PortfolioRiskRun:
+        """Evaluate every active practice and replace the stored portfolio risks.
+
+        Raises RuntimeError if another refresh holds the lock.
+        """
+        run = run or PortfolioRiskService.start_run(db, workers)
+        lock = db.get_bind().connect()
+        try:
+            if not lock.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": PORTFOLIO_RISK_LOCK_KEY}).scalar():
+                PortfolioRiskService._finish(db, run, PortfolioRiskRunStatus.FAILED, {"error": "refresh already running"})
+                raise RuntimeError("A portfolio risk refresh is already running")
+            try:
+                PortfolioRiskService._refresh(db, run)
+            except Exception as e:
+                db.rollback()
+                PortfolioRiskService._finish(db, run, PortfolioRiskRunStatus.FAILED, {"error": f"{type(e).__name__}: {e}"})
+                raise
+            finally:
+                lock.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": PORTFOLIO_RISK_LOCK_KEY})
+        finally:
+            lock.close()
+        return run
+
+    @staticmethod
+    def refresh_in_background(run_id: int) -> None:
+        """Background-task entry point: refresh into an already started run."""
+        db = SessionLocal()
+        try:
+            PortfolioRiskService.refresh(db, db.get(PortfolioRiskRun, run_id))
+        except Exception as e:
+            logger.error("Portfolio risk run %s failed: %s", run_id, str(e))
+        finally:
+            db.close()
+
+    @staticmethod
+    def _refresh(db: Session, run: PortfolioRiskRun) -> None:
+        practice_ids = [
+            pid for (pid,) in db.query(Practice.id).filter(
+                Practice.status == PracticeStatus.ACTIVE.value
+            ).order_by(Practice.id)
+        ]
+        db.commit()
+
+        tasks = list(_chunks(practice_ids, PRACTICES_PER_TASK))
+        workers = max(1, min(run.workers, len(tasks)))
+        if workers == 1:
+            results = [r for task in tasks for r in _evaluate_practices(task)]
+        else:
+            # spawn: workers must not inherit the parent's pooled connections
+            # (or the API server's threads).
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                results = [r for batch in pool.map(_evaluate_practices, tasks) for r in batch]
+
+        rows, errors = [], []
+        for practice_id, risks, error in results:
+            if error:
+                errors.append({"practice_id": practice_id, "error": error})
+            for risk in risks:
+                rows.append({
+                    "run_id": run.id,
+                    "practice_id": practice_id,
+                    "risk_type": risk["type"],
+                    "severity": risk["severity"],
+                    "severity_rank": SEVERITY_RANK.get(risk["severity"], len(SEVERITY_RANK)),
+                    "metric": risk.get("metric"),
+                    "value": risk.get("value"),
+                    "explanation": risk.get("explanation"),
+                })
+        if rows:
+            db.execute(insert(PortfolioRisk), rows)
+        db.query(PortfolioRisk).filter(PortfolioRisk.run_id != run.id).delete(synchronize_session=False)
+
+        run.practice_count = len(practice_ids)
+        run.failed_practice_count = len(errors)
+        run.risk_count = len(rows)
+        PortfolioRiskService._finish(
+            db, run, PortfolioRiskRunStatus.SUCCEEDED,
+            {"practice_errors": errors[:MAX_RECORDED_ERRORS]} if errors else None,
+        )
+        logger.info(
+            "Portfolio risk run %s: %d practices, %d risks, %d failed, %d workers",
+            run.id, run.practice_count, run.risk_count, run.failed_practice_count, workers,
+        )
+
+    @staticmethod
+    def _finish(db: Session, run: PortfolioRiskRun, status: PortfolioRiskRunStatus, error: Optional[dict]) -> None:
+        run.status = status.value
+        run.ended_at = datetime.utcnow()
+        run.error_json = json.dumps(error) if error else None
+        db.commit()
+
+    @staticmethod
+    def latest_run(db: Session) -> Optional[PortfolioRiskRun]:
+        return db.query(PortfolioRiskRun).filter(
+            PortfolioRiskRun.status == PortfolioRiskRunStatus.SUCCEEDED.value
+        ).order_by(PortfolioRiskRun.id.desc()).first()
+
+    @staticmethod
+    def run_to_dict(run: Optional[PortfolioRiskRun]) -> Optional[Dict[str, Any]]:
+        if run is None:
+            return None
+        return {
+            "id": run.id,
+            "status": run.status,
+            "started_at": run.started_at.isoformat() if run.started_at else None,
+            "ended_at": run.ended_at.isoformat() if run.ended_at else None,
+            "workers": run.workers,
+            "practice_count": run.practice_count,
+            "failed_practice_count": run.failed_practice_count,
+            "risk_count": run.risk_count,
+            "error": json.loads(run.error_json) if run.error_json else None,
+        }
+
+    @staticmethod
+    def list_risks(
+        db: Session,
+        severity: Optional[str] = None,
+        risk_type: Optional[str] = None,
+        page: int = 1,
+        page_size: int = 50,
+    ) -> Dict[str, Any]:
+        """Risks of the latest succeeded run, most severe first."""
+        run = PortfolioRiskService.latest_run(db)
+        if run is None:
+            return {"run": None, "total": 0, "page": page, "page_size": page_size, "risks": []}
+
+        query = db.query(PortfolioRisk, Practice.name).join(
+            Practice, Practice.id == PortfolioRisk.practice_id
+        ).filter(PortfolioRisk.run_id == run.id)
+        if severity:
+            query = query.filter(PortfolioRisk.severity == severity)
+        if risk_type:
+            query = query.filter(PortfolioRisk.risk_type == risk_type)
+
+        total = query.count()
+        rows = query.order_by(
+            PortfolioRisk.severity_rank, PortfolioRisk.practice_id, PortfolioRisk.id
+        ).offset((page - 1) * page_size).limit(page_size).all()
+        return {
+            "run": PortfolioRiskService.run_to_dict(run),
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "risks": [
+                {
+                    "practice_id": risk.practice_id,
+                    "practice_name": practice_name,
+                    "type": risk.risk_type,
+                    "severity": risk.severity,
+                    "metric": risk.metric,
+                    "value": risk.value,
+                    "explanation": risk.explanation,
+                }
+                for risk, practice_name in rows
+            ],
+        }
@@ -1,11 +1,15 @@
 """Remittance ingestion and reconciliation service.
 
 Handles ingestion of remittance/ERA data and matching to claims and claim lines.
+``ingest_remittances`` is the bulk path for parsed ERA files
+(``app/integrations/x12_835.py``).
 """
+import itertools
 import logging
 from datetime import datetime, date
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterable, List
 
+from sqlalchemy import bindparam, func, insert, select, tuple_, update
 from sqlalchemy.orm import Session
 
 from ..models.claim import Claim
@@ -15,9 +19,23 @@ from ..models.remittance import (
     RemittanceSourceType, RemittanceLineMatchStatus,
 )
 from ..models.payer import Payer
+from ..models.practice import bump_data_version
 
 logger = logging.getLogger(__name__)
 
+# Remittances written (and committed) per batch by ingest_remittances and
+# reconciled per batch by reconcile_many
+REMITTANCE_BATCH_SIZE = 500
+_LINE_KEYS = ("external_claim_id", "cdt_code", "paid_cents", "allowed_cents", "adjustment_cents", "adjustment_reason_codes")
+
+
+def _expire(db: Session, model, ids) -> None:
+    """Expire loaded instances whose rows a Core statement just changed."""
+    # Identity keys, not obj.id: reading an expired instance would reload it.
+    for (cls, identity, _), obj in list(db.identity_map.items()):
+        if issubclass(cls, model) and identity[0] in ids:
+            db.expire(obj)
+
 
 class RemittanceReconciliationService:
     """Ingests remittances and reconciles against claims."""
@@ -93,96 +111,250 @@ class RemittanceReconciliationService:
         )
         return remittance
 
+    @staticmethod
+    def ingest_remittances(
+        db: Session,
+        practice_id: int,
+        remittances: Iterable[Dict[str, Any]],
+        batch_size: int = REMITTANCE_BATCH_SIZE,
+    ) -> Dict[str, int]:
+        """Bulk ``ingest_remittance`` for a stream of remittances (``ingest_remittance`` kwargs).
+
+        Consumes the stream ``batch_size`` remittances at a time: one
+        multi-row insert of the remittances, one of their lines, then a commit,
+        so memory stays bounded and a failure keeps the committed batches.
+        Remittances whose ``era_reference`` the practice already has are
+        skipped, so posting the same ERA file twice is harmless. Payers are
+        linked by name (case-insensitive).
+
+        Returns:
+            Counts of remittances and lines written and remittances skipped
+        """
+        rem_table, line_table = Remittance.__table__, RemittanceLine.__table__
+        summary = {"remittances": 0, "lines": 0, "skipped": 0}
+        payer_ids: Dict[str, Optional[int]] = {}
+        remittances = iter(remittances)
+        while True:
+            batch = list(itertools.islice(remittances, batch_size))
+            if not batch:
+                break
+            refs = {r["era_reference"] for r in batch if r.get("era_reference")}
+            seen = set(db.execute(
+                select(rem_table.c.era_reference).where(
+                    rem_table.c.practice_id == practice_id, rem_table.c.era_reference.in_(refs),
+                )
+            ).scalars()) if refs else set()
+            new = []
+            for r in batch:
+                ref = r.get("era_reference")
+                if ref in seen:
+                    summary["skipped"] += 1
+                    continue
+                if ref:
+                    seen.add(ref)
+                new.append(r)
+            if not new:
+                continue
+
+            names = {r["payer_name"].lower() for r in new if r.get("payer_name")} - payer_ids.keys()
+            if names:
+                found = dict(db.execute(
+                    select(func.lower(Payer.name), func.min(Payer.id)).where(func.lower(Payer.name).in_(names)).group_by(func.lower(Payer.name))
+                ).all())
+                payer_ids.update({name: found.get(name) for name in names})
+
+            ids = db.execute(
+                insert(rem_table).returning(rem_table.c.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "practice_id": practice_id,
+                        "payer_id": r.get("payer_id") or payer_ids.get((r.get("payer_name") or "").lower()),
+                        "payer_name": r.get("payer_name"),
+                        "trace_number": r.get("trace_number"),
+                        "payment_date": r.get("payment_date"),
+                        "total_paid_cents": r.get("total_paid_cents", 0),
+                        "total_adjustments_cents": r.get("total_adjustments_cents", 0),
+                        "posting_status": PostingStatus.RECEIVED.value,
+                        "source_type": r.get("source_type") or RemittanceSourceType.ERA_835.value,
+                        "era_reference": r.get("era_reference"),
+                    }
+                    for r in new
+                ],
+            ).scalars().all()
+            lines = [
+                {
+                    "remittance_id": remittance_id,
+                    **{key: line.get(key) for key in _LINE_KEYS},
+                    "paid_cents": line.get("paid_cents", 0),
+                    "adjustment_cents": line.get("adjustment_cents", 0),
+                    "match_status": RemittanceLineMatchStatus.UNMATCHED.value,
+                }
+                for remittance_id, r in zip(ids, new)
+                for line in r.get("lines") or ()
+            ]
+            if lines:
+                db.execute(insert(line_table), lines)
+            db.commit()
+            summary["remittances"] += len(ids)
+            summary["lines"] += len(lines)
+
+        logger.info(
+            "Remittances ingested: practice=%s remittances=%d lines=%d skipped=%d",
+            practice_id, summary["remittances"], summary["lines"], summary["skipped"],
+        )
+        return summary
+
     @staticmethod
     def reconcile_remittance(db: Session, remittance_id: int) -> Dict[str, Any]:
         """Attempt to match RemittanceLines to Claims and ClaimLines.
 
         Matching strategy:
         1. Match by external_claim_id -> Claim.external_claim_id
-        2. Match by claim_token if available
-        3. Match by cdt_code to ClaimLine if claim matched
+        2. Match by cdt_code to ClaimLine if claim matched
+
+        A line paying more than 50% off the claim amount is a MISMATCH.
+        Newly matched lines add their payment to the claim's total_paid_cents.
+        Flushes; the caller commits.
 
         Returns:
             Summary of reconciliation results
         """
-        remittance = db.query(Remittance).filter(Remittance.id == remittance_id).first()
-        if not remittance:
-            return {"error": "Remittance not found"}
-
-        lines = db.query(RemittanceLine).filter(
-            RemittanceLine.remittance_id == remittance_id
-        ).all()
+        return RemittanceReconciliationService._reconcile(db, [remittance_id])[0]
 
-        results = {
-            "remittance_id": remittance_id,
-            "total_lines": len(lines),
-            "matched": 0,
-            "unmatched": 0,
-            "mismatches": 0,
-        }
+    @staticmethod
+    def reconcile_many(
+        db: Session,
+        remittance_ids: Iterable[int],
+        batch_size: int = REMITTANCE_BATCH_SIZE,
+    ) -> List[Dict[str, Any]]:
+        """``reconcile_remittance`` for a backlog, ``batch_size`` remittances per
+        set of queries, committing after each batch.
 
-        remittance.posting_status = PostingStatus.POSTING.value
-
-        for line in lines:
-            matched = False
-
-            # Strategy 1: Match by external_claim_id
-            if line.external_claim_id:
-                claim = db.query(Claim).filter(
-                    Claim.practice_id == remittance.practice_id,
-                    Claim.external_claim_id == line.external_claim_id,
-                ).first()
-                if claim:
-                    line.claim_id = claim.id
-                    matched = True
-
-                    # Try to match to a specific ClaimLine by cdt_code
-                    if line.cdt_code:
-                        claim_line = db.query(ClaimLine).filter(
-                            ClaimLine.claim_id == claim.id,
-                            ClaimLine.cdt_code == line.cdt_code,
-                        ).first()
-                        if claim_line:
-                            line.claim_line_id = claim_line.id
-
-                    # Check for amount mismatch
-                    if claim.amount_cents and line.paid_cents:
-                        # Allow some variance (adjustments are normal)
-                        if abs(claim.amount_cents - line.paid_cents) > claim.amount_cents * 0.5:
-                            line.match_status = RemittanceLineMatchStatus.MISMATCH.value
-                            results["mismatches"] += 1
-                            matched = False  # Still a mismatch
-                        else:
-                            line.match_status = RemittanceLineMatchStatus.MATCHED.value
-                            results["matched"] += 1
-
-                            # Update claim with paid info
-                            if claim.total_paid_cents is None:
-                                claim.total_paid_cents = 0
-                            claim.total_paid_cents += line.paid_cents
-                            if line.allowed_cents and claim.total_allowed_cents is None:
-                                claim.total_allowed_cents = line.allowed_cents
-                    else:
-                        line.match_status = RemittanceLineMatchStatus.MATCHED.value
-                        results["matched"] += 1
-
-            if not matched:
-                line.match_status = RemittanceLineMatchStatus.UNMATCHED.value
-                results["unmatched"] += 1
-
-        # Determine final posting status
-        if results["unmatched"] == 0 and results["mismatches"] == 0:
-            remittance.posting_status = PostingStatus.POSTED.value
-        elif results["mismatches"] > 0:
-            remittance.posting_status = PostingStatus.EXCEPTION.value
-        else:
-            remittance.posting_status = PostingStatus.POSTED.value
+        Returns:
+            One summary per remittance id, in order
+        """
+        remittance_ids = list(remittance_ids)
+        results = []
+        for start in range(0, len(remittance_ids), batch_size):
+            results.extend(RemittanceReconciliationService._reconcile(db, remittance_ids[start:start + batch_size]))
+            db.commit()
+        return results
 
+    @staticmethod
+    def _reconcile(db: Session, remittance_ids: List[int]) -> List[Dict[str, Any]]:
+        """Match the lines of the remittances with a fixed number of queries:
+        one each for remittances, their lines, candidate claims and candidate
+        claim lines (joined in memory), then bulk updates."""
+        rem_table, line_table = Remittance.__table__, RemittanceLine.__table__
+        claim_table, claim_line_table = Claim.__table__, ClaimLine.__table__
         db.flush()
 
-        logger.info(
-            "Reconciliation complete: remittance=%s matched=%d unmatched=%d mismatches=%d",
-            remittance_id, results["matched"], results["unmatched"], results["mismatches"],
-        )
+        practice_of = dict(db.execute(
+            select(rem_table.c.id, rem_table.c.practice_id).where(rem_table.c.id.in_(remittance_ids))
+        ).all())
+        lines = db.execute(
+            select(
+                line_table.c.id, line_table.c.remittance_id, line_table.c.claim_id, line_table.c.claim_line_id,
+                line_table.c.external_claim_id, line_table.c.cdt_code, line_table.c.paid_cents,
+                line_table.c.allowed_cents, line_table.c.match_status,
+            ).where(line_table.c.remittance_id.in_(list(practice_of))).order_by(line_table.c.remittance_id, line_table.c.id)
+        ).all() if practice_of else []
 
-        return results
+        # First claim (lowest id) per (practice, external_claim_id)
+        keys = {(practice_of[l.remittance_id], l.external_claim_id) for l in lines if l.external_claim_id}
+        claims: Dict[tuple, Any] = {}
+        if keys:
+            for claim in db.execute(
+                select(
+                    claim_table.c.id, claim_table.c.practice_id, claim_table.c.external_claim_id,
+                    claim_table.c.amount_cents, claim_table.c.total_allowed_cents,
+                ).where(tuple_(claim_table.c.practice_id, claim_table.c.external_claim_id).in_(keys)).order_by(claim_table.c.id)
+            ):
+                claims.setdefault((claim.practice_id, claim.external_claim_id), claim)
+
+        # First claim line (lowest id) per (claim, cdt_code)
+        line_keys = {
+            (claims[key].id, l.cdt_code) for l in lines
+            if l.cdt_code and (key := (practice_of[l.remittance_id], l.external_claim_id)) in claims
+        }
+        claim_lines: Dict[tuple, int] = {}
+        if line_keys:
+            for claim_line_id, claim_id, cdt_code in db.execute(
+                select(claim_line_table.c.id, claim_line_table.c.claim_id, claim_line_table.c.cdt_code)
+                .where(tuple_(claim_line_table.c.claim_id, claim_line_table.c.cdt_code).in_(line_keys))
+                .order_by(claim_line_table.c.id)
+            ):
+                claim_lines.setdefault((claim_id, cdt_code), claim_line_id)
+
+        results = {
+            rid: {"remittance_id": rid, "total_lines": 0, "matched": 0, "unmatched": 0, "mismatches": 0}
+            for rid in practice_of
+        }
+        line_updates = []
+        paid: Dict[int, int] = {}  # claim id -> payments of newly matched lines
+        allowed: Dict[int, int] = {}  # claim id -> first allowed amount, for claims without one
+        for l in lines:
+            result = results[l.remittance_id]
+            result["total_lines"] += 1
+            claim = claims.get((practice_of[l.remittance_id], l.external_claim_id)) if l.external_claim_id else None
+            claim_id, claim_line_id = l.claim_id, l.claim_line_id
+            if claim is None:
+                status = RemittanceLineMatchStatus.UNMATCHED.value
+                result["unmatched"] += 1
+            else:
+                claim_id = claim.id
+                if l.cdt_code:
+                    claim_line_id = claim_lines.get((claim.id, l.cdt_code), claim_line_id)
+                if claim.amount_cents and l.paid_cents and abs(claim.amount_cents - l.paid_cents) > claim.amount_cents * 0.5:
+                    # Allow some variance (adjustments are normal)
+                    status = RemittanceLineMatchStatus.MISMATCH.value
+                    result["mismatches"] += 1
+                else:
+                    status = RemittanceLineMatchStatus.MATCHED.value
+                    result["matched"] += 1
+                    if claim.amount_cents and l.paid_cents and l.match_status != RemittanceLineMatchStatus.MATCHED.value:
+                        paid[claim.id] = paid.get(claim.id, 0) + l.paid_cents
+                        if l.allowed_cents and claim.total_allowed_cents is None:
+                            allowed.setdefault(claim.id, l.allowed_cents)
+            if (claim_id, claim_line_id, status) != (l.claim_id, l.claim_line_id, l.match_status):
+                line_updates.append({"_id": l.id, "_claim_id": claim_id, "_claim_line_id": claim_line_id, "_status": status})
+
+        if line_updates:
+            db.execute(
+                update(line_table).where(line_table.c.id == bindparam("_id")).values(
+                    claim_id=bindparam("_claim_id"), claim_line_id=bindparam("_claim_line_id"), match_status=bindparam("_status"),
+                ),
+                line_updates,
+            )
+        if paid:
+            db.execute(
+                update(claim_table).where(claim_table.c.id == bindparam("_id")).values(
+                    total_paid_cents=func.coalesce(claim_table.c.total_paid_cents, 0) + bindparam("_paid"),
+                    total_allowed_cents=func.coalesce(claim_table.c.total_allowed_cents, bindparam("_allowed")),
+                ),
+                [{"_id": cid, "_paid": cents, "_allowed": allowed.get(cid)} for cid, cents in sorted(paid.items())],
+            )
+            # Core writes skip the flush hooks that move the data version.
+            bump_data_version(db, {practice_id for (practice_id, _), claim in claims.items() if claim.id in paid})
+        if results:
+            db.execute(
+                update(rem_table).where(rem_table.c.id == bindparam("_id")).values(posting_status=bindparam("_status")),
+                [
+                    {
+                        "_id": rid,
+                        # Determine final posting status
+                        "_status": PostingStatus.EXCEPTION.value if result["mismatches"] else PostingStatus.POSTED.value,
+                    }
+                    for rid, result in results.items()
+                ],
+            )
+        _expire(db, Remittance, results)
+        _expire(db, RemittanceLine, {u["_id"] for u in line_updates})
+        _expire(db, Claim, paid)
+
+        for result in results.values():
+            logger.info(
+                "Reconciliation complete: remittance=%s matched=%d unmatched=%d mismatches=%d",
+                result["remittance_id"], result["matched"], result["unmatched"], result["mismatches"],
+            )
+        return [results.get(rid) or {"error": "Remittance not found"} for rid in remittance_ids]
@@ -0,0 +1,261 @@
+"""Scheduled Open Dental API syncs across all practices.
+
+Every ``sync_scheduler_poll_seconds`` a tick
+
+1. queues an API sync for each ACTIVE or ERROR connection with API
+   credentials whose ``next_sync_at`` has passed (a success schedules the
+   next sync ``sync_interval_minutes`` later, a failure backs off, see
+   ``ingestion_jobs.sync_backoff``) and which has no unfinished run;
+2. hands QUEUED runs, and RUNNING runs abandoned by a crashed worker, to a
+   thread pool while fewer than ``sync_max_concurrency`` runs are RUNNING,
+   oldest first and at most one per practice.
+
+The cap is counted in the database, so uploads and manual syncs (which start
+right away) use up slots too, and several scheduler processes share it: their
+ticks are serialized by an advisory lock. ``IngestionJobService.claim``
+guarantees one RUNNING run per practice whatever started it.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, case, exists, func, or_, text
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..integrations.open_dental.provider import OpenDentalProvider
+from ..models.integration import (
+    IntegrationConnection,
+    IntegrationProvider,
+    IntegrationStatus,
+    IntegrationSyncRun,
+    SyncRunStatus,
+)
+from .ingestion_jobs import IngestionJobService
+
+logger = logging.getLogger(__name__)
+
+SYNC_SCHEDULER_LOCK_KEY = 9142049
+SCHEDULED_STATUSES = [IntegrationStatus.ACTIVE.value, IntegrationStatus.ERROR.value]
+UNFINISHED_STATUSES = [SyncRunStatus.QUEUED.value, SyncRunStatus.RUNNING.value]
+
+# (run_id, practice_id, stale_before): stale_before is set for abandoned RUNNING runs
+Dispatch = Tuple[int, int, Optional[datetime]]
+
+
+def _pick_runs(
+    candidates: Iterable[Tuple[int, int, bool]],
+    running: Dict[int, int],
+    slots: int,
+) -> List[Tuple[int, int, bool]]:
+    """Runs to start from ``(run_id, practice_id, abandoned)`` candidates in
+    priority order: at most ``slots``, none of a practice in ``running``
+    (run_id -> practice_id) and at most one per practice."""
+    busy = set(running.values())
+    picked = []
+    for run_id, practice_id, abandoned in candidates:
+        if len(picked) >= slots:
+            break
+        if run_id in running or practice_id in busy:
+            continue
+        busy.add(practice_id)
+        picked.append((run_id, practice_id, abandoned))
+    return picked
+
+
+class SyncSchedulerService:
+
+    @staticmethod
+    def due_connections(db: Session, now: Optional[datetime] = None) -> List[IntegrationConnection]:
+        """Connections with API credentials due for a sync and with no unfinished run."""
+        now = now or datetime.utcnow()
+        unfinished = exists().where(
+            IntegrationSyncRun.connection_id == IntegrationConnection.id,
+            IntegrationSyncRun.status.in_(UNFINISHED_STATUSES),
+        )
+        connections = db.query(IntegrationConnection).filter(
+            IntegrationConnection.provider == IntegrationProvider.OPEN_DENTAL.value,
+            IntegrationConnection.status.in_(SCHEDULED_STATUSES),
+            IntegrationConnection.config_json.isnot(None),
+            or_(IntegrationConnection.next_sync_at.is_(None), IntegrationConnection.next_sync_at <= now),
+            ~unfinished,
+        ).order_by(IntegrationConnection.next_sync_at.asc().nullsfirst(), IntegrationConnection.id).all()
+        # CSV-only practices are ACTIVE too; credentials live in config_json.
+        return [
+            conn for conn in connections
+            if OpenDentalProvider(config_json=conn.config_json, secrets_ref=conn.secrets_ref).is_configured()
+        ]
+
+    @staticmethod
+    def tick(
+        db: Session,
+        inflight: Optional[Dict[int, int]] = None,
+        max_concurrency: Optional[int] = None,
+        now: Optional[datetime] = None,
+    ) -> Tuple[List[int], List[Dispatch]]:
+        """Queue due syncs and pick the runs to start now.
+
+        ``inflight`` maps runs this scheduler already started (run_id ->
+        practice_id) that may not be RUNNING yet. Returns the queued run ids
+        and the runs to start; both empty if another scheduler is mid-tick.
+        """
+        settings = get_settings()
+        now = now or datetime.utcnow()
+        max_concurrency = max_concurrency or settings.sync_max_concurrency
+        if not db.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": SYNC_SCHEDULER_LOCK_KEY}).scalar():
+            db.rollback()
+            return [], []
+
+        runs = [IngestionJobService.api_run(conn) for conn in SyncSchedulerService.due_connections(db, now)]
+        db.add_all(runs)
+        db.flush()
+        queued = [(run.id, run.practice_id) for run in runs]
+
+        stale_before = now - timedelta(seconds=settings.ingestion_stale_after_seconds)
+        fresh = func.coalesce(IntegrationSyncRun.heartbeat_at, IntegrationSyncRun.started_at) >= stale_before
+        running = dict(inflight or {})
+        running.update(db.query(IntegrationSyncRun.id, IntegrationSyncRun.practice_id).filter(
+            IntegrationSyncRun.status == SyncRunStatus.RUNNING.value, fresh,
+        ).all())
+        candidates = db.query(
+            IntegrationSyncRun.id,
+            IntegrationSyncRun.practice_id,
+            IntegrationSyncRun.status == SyncRunStatus.RUNNING.value,
+        ).filter(or_(
+            IntegrationSyncRun.status == SyncRunStatus.QUEUED.value,
+            and_(IntegrationSyncRun.status == SyncRunStatus.RUNNING.value, ~fresh),
+        )).order_by(IntegrationSyncRun.id)
+        picked = _pick_runs(candidates, running, max_concurrency - len(running))
+        db.commit()  # releases the tick lock
+
+        for run_id, practice_id in queued:
+            logger.info("[sync_scheduler] QUEUED practice_id=%s run_id=%s", practice_id, run_id)
+        return [run_id for run_id, _ in queued], [
+            (run_id, practice_id, stale_before if abandoned else None) for run_id, practice_id, abandoned in picked
+        ]
+
+    @staticmethod
+    def run(
+        stop: Optional[threading.Event] = None,
+        max_concurrency: Optional[int] = None,
+        poll_seconds: Optional[int] = None,
+        once: bool = False,
+    ) -> None:
+        """Tick every ``poll_seconds`` until ``stop`` is set (or, with ``once``,
+        tick once and wait for the runs it started)."""
+        settings = get_settings()
+        max_concurrency = max_concurrency or settings.sync_max_concurrency
+        poll_seconds = poll_seconds or settings.sync_scheduler_poll_seconds
+        stop = stop or threading.Event()
+        inflight: Dict[int, int] = {}
+        lock = threading.Lock()
+
+        def finished(run_id: int) -> None:
+            with lock:
+                inflight.pop(run_id, None)
+
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="sync-run") as pool:
+            while not stop.is_set():
+                db = SessionLocal()
+                try:
+                    with lock:
+                        started = dict(inflight)
+                    _, dispatch = SyncSchedulerService.tick(db, started, max_concurrency)
+                except Exception as e:
+                    logger.error("Sync scheduler tick failed: %s", str(e))
+                    dispatch = []
+                finally:
+                    db.close()
+                for run_id, practice_id, stale_before in dispatch:
+                    with lock:
+                        inflight[run_id] = practice_id
+                    future = pool.submit(IngestionJobService.run_in_background, run_id, stale_before)
+                    future.add_done_callback(lambda _, run_id=run_id: finished(run_id))
+                if once:
+                    return
+                stop.wait(poll_seconds)
+
+    @staticmethod
+    def start_in_thread(stop: threading.Event) -> threading.Thread:
+        """Startup hook: run the scheduler in the API process until ``stop`` is set."""
+        thread = threading.Thread(target=SyncSchedulerService.run, args=(stop,), name="sync-scheduler", daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def stats(db: Session, window_hours: int = 24, now: Optional[datetime] = None) -> dict:
+        """Queue depth and, per connection, run durations and rows/sec of the
+        runs that ended in the last ``window_hours``."""
+        settings = get_settings()
+        now = now or datetime.utcnow()
+        stale_before = now - timedelta(seconds=settings.ingestion_stale_after_seconds)
+        fresh = func.coalesce(IntegrationSyncRun.heartbeat_at, IntegrationSyncRun.started_at) >= stale_before
+        queued, running, abandoned = db.query(
+            func.count().filter(IntegrationSyncRun.status == SyncRunStatus.QUEUED.value),
+            func.count().filter(IntegrationSyncRun.status == SyncRunStatus.RUNNING.value, fresh),
+            func.count().filter(IntegrationSyncRun.status == SyncRunStatus.RUNNING.value, ~fresh),
+        ).filter(IntegrationSyncRun.status.in_(UNFINISHED_STATUSES)).one()
+        due = len(SyncSchedulerService.due_connections(db, now))
+
+        duration = func.extract("epoch", IntegrationSyncRun.ended_at - IntegrationSyncRun.started_at)
+        succeeded = IntegrationSyncRun.status == SyncRunStatus.SUCCEEDED.value
+        window = {
+            connection_id: row for connection_id, *row in db.query(
+                IntegrationSyncRun.connection_id,
+                func.count(),
+                func.count().filter(IntegrationSyncRun.status == SyncRunStatus.FAILED.value),
+                func.avg(duration),
+                func.max(duration),
+                func.sum(case((succeeded, IntegrationSyncRun.pulled_count), else_=0)),
+                func.sum(case((succeeded, duration), else_=0)),
+            ).filter(
+                IntegrationSyncRun.ended_at >= now - timedelta(hours=window_hours),
+            ).group_by(IntegrationSyncRun.connection_id)
+        }
+        last_runs = {
+            run.connection_id: run for run in db.query(IntegrationSyncRun)
+            .filter(IntegrationSyncRun.ended_at.isnot(None))
+            .distinct(IntegrationSyncRun.connection_id)
+            .order_by(IntegrationSyncRun.connection_id, IntegrationSyncRun.ended_at.desc())
+        }
+        connections = db.query(IntegrationConnection).filter(or_(
+            IntegrationConnection.status.in_(SCHEDULED_STATUSES),
+            IntegrationConnection.id.in_(list(window)),
+        )).order_by(IntegrationConnection.practice_id, IntegrationConnection.id).all()
+        db.commit()
+
+        items = []
+        for conn in connections:
+            runs, failed, avg_seconds, max_seconds, rows, seconds = window.get(conn.id, (0, 0, None, None, 0, 0))
+            last = last_runs.get(conn.id)
+            items.append({
+                "connection_id": conn.id,
+                "practice_id": conn.practice_id,
+                "status": conn.status,
+                "last_synced_at": conn.last_synced_at.isoformat() if conn.last_synced_at else None,
+                "next_sync_at": conn.next_sync_at.isoformat() if conn.next_sync_at else None,
+                "consecutive_failures": conn.consecutive_failures,
+                "runs": runs,
+                "failed_runs": failed,
+                "avg_duration_seconds": round(float(avg_seconds), 1) if avg_seconds is not None else None,
+                "max_duration_seconds": round(float(max_seconds), 1) if max_seconds is not None else None,
+                "rows_per_second": round(float(rows) / float(seconds), 1) if seconds else None,
+                "last_run": {
+                    "id": last.id,
+                    "sync_type": last.sync_type,
+                    "status": last.status,
+                    "ended_at": last.ended_at.isoformat(),
+                    "duration_seconds": round((last.ended_at - last.started_at).total_seconds(), 1),
+                    "error_json": last.error_json,
+                } if last else None,
+            })
+        return {
+            "window_hours": window_hours,
+            "max_concurrency": settings.sync_max_concurrency,
+            "interval_minutes": settings.sync_interval_minutes,
+            "queue": {"queued": queued, "running": running, "abandoned": abandoned, "due": due},
+            "connections": items,
+        }
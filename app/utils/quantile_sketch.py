@@ -0,0 +1,152 @@
+"""Mergeable quantile sketch with bounded relative error.
+
+Values are counted in logarithmic buckets: a positive value ``v`` lands in
+bucket ``ceil(log(v) / log(gamma))`` with ``gamma = (1 + alpha) / (1 - alpha)``,
+and every value in a bucket is reported as the bucket's midpoint, so any
+quantile is within ``alpha`` (relative) of the exact order statistic.
+Negative values use a mirrored set of buckets and values within
+``ZERO_THRESHOLD`` of zero are counted separately. Count, sum, min and max
+are tracked exactly, so the extreme ranks are exact.
+
+Two sketches with the same ``alpha`` merge by adding bucket counts, which is
+what makes per-payer sketches combinable into practice-wide and
+portfolio-wide ones. The bucket count grows with log(max / min), not with
+the number of values.
+"""
+import math
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+ZERO_THRESHOLD = 1e-9
+
+
+class QuantileSketch:
+
+    __slots__ = ("alpha", "gamma", "_log_gamma", "positive", "negative", "zero_count", "count", "total", "min", "max")
+
+    def __init__(self, alpha: float = DEFAULT_RELATIVE_ACCURACY):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def _index(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value: float) -> None:
+        if value > ZERO_THRESHOLD:
+            idx = self._index(value)
+            self.positive[idx] = self.positive.get(idx, 0) + 1
+        elif value < -ZERO_THRESHOLD:
+            idx = self._index(-value)
+            self.negative[idx] = self.negative.get(idx, 0) + 1
+        else:
+            self.zero_count += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def add_many(self, values: Iterable[float]) -> None:
+        """Vectorized ``add`` for a batch of values."""
+        values = np.asarray(values, dtype=np.float64)
+        if not values.size:
+            return
+        for store, magnitudes in (
+            (self.positive, values[values > ZERO_THRESHOLD]),
+            (self.negative, -values[values < -ZERO_THRESHOLD]),
+        ):
+            if magnitudes.size:
+                idx, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64), return_counts=True)
+                for i, c in zip(idx.tolist(), counts.tolist()):
+                    store[i] = store.get(i, 0) + c
+        self.zero_count += int((np.abs(values) <= ZERO_THRESHOLD).sum())
+        self.count += int(values.size)
+        self.total += float(values.sum())
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for store, incoming in ((self.positive, other.positive), (self.negative, other.negative)):
+            for idx, c in incoming.items():
+                store[idx] = store.get(idx, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at rank ``min(int(count * q), count - 1)`` of the sorted values.
+
+        Same rank convention as indexing a sorted list, so p50 is
+        ``values[n // 2]`` and p90 is ``values[min(int(n * 0.9), n - 1)]``.
+        The first and last ranks are the exact min and max.
+        """
+        if not self.count:
+            return None
+        rank = min(int(self.count * q), self.count - 1)
+        if rank == 0:
+            return self.min
+        if rank == self.count - 1:
+            return self.max
+        seen = 0
+        for idx in sorted(self.negative, reverse=True):
+            seen += self.negative[idx]
+            if seen > rank:
+                return self._clamp(-self._value(idx))
+        seen += self.zero_count
+        if seen > rank:
+            return self._clamp(0.0)
+        for idx in sorted(self.positive):
+            seen += self.positive[idx]
+            if seen > rank:
+                return self._clamp(self._value(idx))
+        return self.max
+
+    def _clamp(self, value: float) -> float:
+        return min(max(value, self.min), self.max)
+
+    def to_dict(self) -> dict:
+        return {
+            "alpha": self.alpha,
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+            "zero": self.zero_count,
+            "pos": {str(k): v for k, v in self.positive.items()},
+            "neg": {str(k): v for k, v in self.negative.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(data.get("alpha", DEFAULT_RELATIVE_ACCURACY))
+        sketch.count = int(data.get("count", 0))
+        sketch.total = float(data.get("sum", 0.0))
+        sketch.min = data.get("min")
+        sketch.max = data.get("max")
+        sketch.zero_count = int(data.get("zero", 0))
+        sketch.positive = {int(k): int(v) for k, v in (data.get("pos") or {}).items()}
+        sketch.negative = {int(k): int(v) for k, v in (data.get("neg") or {}).items()}
+        return sketch
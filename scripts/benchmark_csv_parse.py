@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Benchmark parsing and validating a large Open Dental CSV export.
+
+Writes a synthetic claims file of N rows (plus a lines file with about
+--lines-per-claim lines per claim, and a few invalid rows), then times the
+serial streaming parser (SQLite line index) against the process-pool parser
+(hash join) for each --workers count. Only parsing, validation and the
+claims/lines join are timed; nothing is written to the database. The files
+are deleted afterwards unless --keep.
+
+Usage:
+    python scripts/benchmark_csv_parse.py [--rows 1000000] [--lines-per-claim 2] [--workers 2,4,8] [--keep]
+"""
+import argparse
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.integrations.csv_parallel import iter_parallel_claim_chunks
+from app.integrations.csv_parser import (
+    LineIndex,
+    iter_claims_csv,
+    iter_external_claim_chunks,
+    iter_lines_csv,
+    iter_text_lines,
+    read_chunks,
+)
+
+PAYERS = ["Delta Dental", "Cigna Dental", "MetLife", "Aetna Dental", "Guardian", "\"United Concordia, Inc.\""]
+CDT_CODES = ["D0120", "D0150", "D0274", "D1110", "D1206", "D2150", "D2391", "D2740", "D3330", "D4341", "D7140"]
+CHUNK = 1000
+
+
+def write_files(directory: str, rows: int, lines_per_claim: float, rng: random.Random):
+    claims_path = os.path.join(directory, "claims.csv")
+    lines_path = os.path.join(directory, "lines.csv")
+    with open(claims_path, "w", newline="") as claims, open(lines_path, "w", newline="") as lines:
+        claims.write("external_claim_id,external_patient_id,payer,total_billed_cents,procedure_date,submitted_date,procedure_codes\n")
+        lines.write("external_claim_id,external_line_id,cdt_code,description,line_amount_cents,tooth_number,surface\n")
+        line_id = 0
+        for i in range(rows):
+            amount = rng.randint(5_000, 300_000) if i % 10_000 else -1  # a few invalid rows
+            claims.write(
+                f"OD-{i},PT-{rng.randrange(rows // 4 + 1)},{rng.choice(PAYERS)},{amount},"
+                f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},,\n"
+            )
+            for _ in range(int(lines_per_claim + rng.random())):
+                line_id += 1
+                lines.write(f"OD-{i},LN-{line_id},{rng.choice(CDT_CODES)},Procedure,{rng.randint(1_000, 100_000)},{rng.randint(1, 32)},O\n")
+    return claims_path, lines_path, line_id
+
+
+def drain(chunks):
+    claims = errors = lines = 0
+    for batch, batch_errors in chunks:
+        claims += len(batch)
+        errors += len(batch_errors)
+        lines += sum(len(c.lines) for c in batch)
+    return claims, errors, lines
+
+
+def serial(claims_path: str, lines_path: str):
+    with open(lines_path, "rb") as lf:
+        index = LineIndex(iter_lines_csv(iter_text_lines(read_chunks(lf))))
+    try:
+        with open(claims_path, "rb") as f:
+            return drain(iter_external_claim_chunks(iter_claims_csv(iter_text_lines(read_chunks(f))), index, CHUNK))
+    finally:
+        index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Open Dental CSV parsing")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lines-per-claim", type=float, default=2.0)
+    parser.add_argument("--workers", default=str(os.cpu_count() or 1), help="Comma-separated worker counts")
+    parser.add_argument("--skip-serial", action="store_true")
+    parser.add_argument("--keep", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="spoonbill-csv-bench-")
+    try:
+        t0 = time.perf_counter()
+        claims_path, lines_path, line_count = write_files(directory, args.rows, args.lines_per_claim, random.Random(args.seed))
+        size_mb = (os.path.getsize(claims_path) + os.path.getsize(lines_path)) / 1e6
+        print(f"Wrote {args.rows} claims and {line_count} lines ({size_mb:.0f} MB) in {time.perf_counter() - t0:.1f}s")
+
+        results = []
+        if not args.skip_serial:
+            t0 = time.perf_counter()
+            results.append(("serial", serial(claims_path, lines_path), time.perf_counter() - t0))
+        for workers in (int(w) for w in args.workers.split(",")):
+            t0 = time.perf_counter()
+            counts = drain(iter_parallel_claim_chunks(claims_path, lines_path, CHUNK, workers=workers))
+            results.append((f"{workers} workers", counts, time.perf_counter() - t0))
+
+        for label, (claims, errors, lines), seconds in results:
+            print(
+                f"{label:>12}: {seconds:7.1f}s  {args.rows / seconds:9,.0f} rows/s  "
+                f"claims={claims} errors={errors} lines={lines}"
+            )
+        if len({counts for _, counts, _ in results}) > 1:
+            print("MISMATCH between parsers")
+        print(f"Peak RSS (parent): {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    finally:
+        if args.keep:
+            print(f"Kept {directory}")
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Benchmark streaming X12 835 (ERA) parsing and bulk remittance ingestion.
+
+Writes a synthetic 835 corpus (--payments transaction sets of --claims-per-payment
+claims, each with 1-3 service lines and CAS adjustments) and times the
+streaming parser alone. With --ingest it also posts the corpus as remittances
+of a throwaway practice, in batches (``ingest_remittances``) and, for
+--baseline payments, one ``ingest_remittance`` call each; the practice and
+its remittances are deleted afterwards. The file is deleted unless --keep.
+
+Usage:
+    python scripts/benchmark_era_835.py [--payments 2000] [--claims-per-payment 50] [--ingest] [--baseline 200] [--keep]
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.integrations.csv_parser import read_chunks
+from app.integrations.x12_835 import iter_remittances, iter_segments
+
+PAYERS = ["DELTA DENTAL", "CIGNA DENTAL", "METLIFE", "AETNA DENTAL", "GUARDIAN", "UNITED CONCORDIA"]
+CDT_CODES = ["D0120", "D0150", "D0274", "D1110", "D1206", "D2150", "D2391", "D2740", "D3330", "D4341", "D7140"]
+REASONS = [("CO", "45"), ("CO", "97"), ("PR", "1"), ("PR", "2"), ("PR", "3"), ("OA", "23")]
+
+
+def _amount(cents: int) -> str:
+    return f"{cents / 100:.2f}"
+
+
+def write_corpus(path: str, payments: int, claims_per_payment: int, rng: random.Random) -> int:
+    """Write the corpus; returns the number of service lines."""
+    service_lines = 0
+    with open(path, "w") as out:
+        out.write(
+            "ISA*00*          *00*          *ZZ*PAYERSENDER    *ZZ*SPOONBILL      *261019*1200*^*00501*000000001*0*P*:~\n"
+            "GS*HP*PAYERSENDER*SPOONBILL*20261019*1200*1*X*005010X221A1~\n"
+        )
+        for n in range(1, payments + 1):
+            payer = rng.choice(PAYERS)
+            paid_date = date(2026, 1, 1) + timedelta(days=rng.randint(0, 280))
+            claims, total = [], 0
+            for c in range(claims_per_payment):
+                segments = []
+                claim_paid = claim_billed = 0
+                for _ in range(rng.randint(1, 3)):
+                    billed = rng.randint(5_000, 150_000)
+                    adjustment = int(billed * rng.uniform(0.05, 0.4))
+                    paid = billed - adjustment
+                    group, reason = rng.choice(REASONS)
+                    segments += [
+                        f"SVC*AD:{rng.choice(CDT_CODES)}*{_amount(billed)}*{_amount(paid)}**1",
+                        f"DTM*472*{paid_date - timedelta(days=rng.randint(10, 60)):%Y%m%d}",
+                        f"CAS*{group}*{reason}*{_amount(adjustment)}",
+                        f"AMT*B6*{_amount(paid)}",
+                    ]
+                    claim_paid += paid
+                    claim_billed += billed
+                    service_lines += 1
+                claims.append([
+                    f"CLP*OD-{n * claims_per_payment + c}*1*{_amount(claim_billed)}*{_amount(claim_paid)}**12*{rng.randint(10**9, 10**10)}",
+                    f"NM1*QC*1*PATIENT*TEST****MI*{rng.randint(10**6, 10**7)}",
+                    *segments,
+                ])
+                total += claim_paid
+            body = [
+                f"ST*835*{n:04d}",
+                f"BPR*I*{_amount(total)}*C*ACH*CCP*01*999999999*DA*123456*1512345678**01*999988880*DA*98765*{paid_date:%Y%m%d}",
+                f"TRN*1*EFT{n:09d}*1512345678",
+                f"DTM*405*{paid_date:%Y%m%d}",
+                f"N1*PR*{payer}",
+                "N1*PE*SPOONBILL DENTAL*XX*1234567893",
+                "LX*1",
+                *(segment for claim in claims for segment in claim),
+            ]
+            body.append(f"SE*{len(body) + 1}*{n:04d}")
+            out.write("~\n".join(body) + "~\n")
+        out.write("GE*%d*1~\nIEA*1*000000001~\n" % payments)
+    return service_lines
+
+
+def parse(path: str):
+    with open(path, "rb") as f:
+        yield from iter_remittances(iter_segments(read_chunks(f)))
+
+
+def ingest(path: str, baseline: int):
+    from sqlalchemy import text
+
+    from app.database import SessionLocal
+    from app.models.practice import Practice
+    from app.services.remittance_reconciliation import RemittanceReconciliationService
+
+    db = SessionLocal()
+    practice = Practice(name="ERA benchmark", status="ACTIVE", funding_limit_cents=0)
+    db.add(practice)
+    db.commit()
+    try:
+        t0 = time.perf_counter()
+        summary = RemittanceReconciliationService.ingest_remittances(db, practice.id, parse(path))
+        seconds = time.perf_counter() - t0
+        print(
+            f"    batched: {seconds:7.1f}s  {summary['remittances'] / seconds:9,.0f} remittances/s  "
+            f"{summary['lines'] / seconds:9,.0f} lines/s"
+        )
+        t0 = time.perf_counter()
+        summary = RemittanceReconciliationService.ingest_remittances(db, practice.id, parse(path))
+        print(f"   re-post: {time.perf_counter() - t0:7.1f}s  skipped={summary['skipped']}")
+
+        if baseline:
+            count = lines = 0
+            t0 = time.perf_counter()
+            for remittance in parse(path):
+                if count == baseline:
+                    break
+                remittance["era_reference"] = f"baseline:{remittance['era_reference']}"
+                RemittanceReconciliationService.ingest_remittance(db, practice.id, **remittance)
+                db.commit()
+                count += 1
+                lines += len(remittance["lines"])
+            seconds = time.perf_counter() - t0
+            print(f"  one by one: {seconds:5.1f}s  {count / seconds:9,.0f} remittances/s  {lines / seconds:9,.0f} lines/s ({count} payments)")
+    finally:
+        db.rollback()
+        params = {"p": practice.id}
+        db.execute(text("DELETE FROM remittance_lines WHERE remittance_id IN (SELECT id FROM remittances WHERE practice_id = :p)"), params)
+        db.execute(text("DELETE FROM remittances WHERE practice_id = :p"), params)
+        db.execute(text("DELETE FROM practices WHERE id = :p"), params)
+        db.commit()
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark X12 835 parsing and remittance ingestion")
+    parser.add_argument("--payments", type=int, default=2_000)
+    parser.add_argument("--claims-per-payment", type=int, default=50)
+    parser.add_argument("--ingest", action="store_true", help="Also post the corpus to the database")
+    parser.add_argument("--baseline", type=int, default=200, help="Payments posted one at a time for comparison (0 = skip)")
+    parser.add_argument("--keep", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(prefix="spoonbill-era-bench-", suffix=".835")
+    os.close(fd)
+    try:
+        t0 = time.perf_counter()
+        service_lines = write_corpus(path, args.payments, args.claims_per_payment, random.Random(args.seed))
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"Wrote {args.payments} payments, {args.payments * args.claims_per_payment} claims, {service_lines} service lines ({size_mb:.0f} MB) in {time.perf_counter() - t0:.1f}s")
+
+        t0 = time.perf_counter()
+        remittances = lines = 0
+        for remittance in parse(path):
+            remittances += 1
+            lines += len(remittance["lines"])
+        seconds = time.perf_counter() - t0
+        print(f"     parse: {seconds:7.1f}s  {size_mb / seconds:6.1f} MB/s  {lines / seconds:9,.0f} lines/s  remittances={remittances} lines={lines}")
+        print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+        if args.ingest:
+            ingest(path, args.baseline)
+    finally:
+        if args.keep:
+            print(f"Kept {path}")
+        else:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Benchmark the ontology analytics reads on a large synthetic practice.
+
+Bulk-inserts a throwaway practice with N claims (about half with a payment
+intent), then times each analytics read once cold (snapshot load included)
+and a few times warm. The practice is deleted afterwards unless --keep.
+
+Usage:
+    python scripts/benchmark_ontology_analytics.py [--claims 500000] [--repeat 3] [--keep] [--reads retention,rcm]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+
+from app.database import SessionLocal
+from app.models.practice import Practice, bump_data_version
+from app.models.claim import Claim, ClaimStatus
+from app.models.insight_rollup import PayerRollup, rebuild_insight_rollups
+from app.models.metric_sketch import MetricSketch, rebuild_metric_sketches
+from app.models.patient_dimension import PatientDimension, refresh_patient_dimensions
+from app.models.payment import PaymentIntent, PaymentIntentStatus, PaymentProvider
+from app.services.ontology_crud import OntologyInsightsService
+from app.services.ontology_v2 import OntologyBuilderV2
+
+PAYERS = ["Delta Dental", "Cigna Dental", "MetLife", "Aetna Dental", "Guardian", "Medicaid State", "Self Pay", "United Concordia"]
+CDT_CODES = ["D0120", "D0150", "D0274", "D1110", "D1206", "D2150", "D2391", "D2740", "D3330", "D4341", "D7140", "D8080"]
+STATUSES = [s.value for s in ClaimStatus]
+PAYMENT_STATUSES = [PaymentIntentStatus.CONFIRMED.value] * 3 + [PaymentIntentStatus.SENT.value, PaymentIntentStatus.FAILED.value]
+BATCH = 20_000
+
+READS = [
+    ("context", lambda db, pid: OntologyBuilderV2.get_practice_context(db, pid)),
+    ("cfo", lambda db, pid: OntologyBuilderV2.get_cfo_360(db, pid)),
+    ("cohorts", lambda db, pid: OntologyBuilderV2.get_cohorts(db, pid)),
+    ("risks", lambda db, pid: OntologyBuilderV2.get_risks(db, pid)),
+    ("retention", lambda db, pid: OntologyBuilderV2.get_patient_retention(db, pid, range_key="12m")),
+    ("reimbursement", lambda db, pid: OntologyBuilderV2.get_reimbursement_metrics(db, pid)),
+    ("rcm", lambda db, pid: OntologyBuilderV2.get_rcm_ops(db, pid)),
+    ("payers", lambda db, pid: OntologyInsightsService.get_payer_performance(db, pid)),
+]
+
+
+def seed(db, n_claims: int, rng: random.Random) -> int:
+    now = datetime.utcnow()
+    practice = Practice(name=f"Benchmark {now.isoformat()}", status="ACTIVE", funding_limit_cents=50_000_000_00)
+    db.add(practice)
+    db.flush()
+    patients = [f"Patient {i}" for i in range(max(1, n_claims // 8))]
+
+    for start in range(0, n_claims, BATCH):
+        rows = []
+        for i in range(start, min(start + BATCH, n_claims)):
+            created = now - timedelta(days=rng.randint(0, 720), seconds=rng.randint(0, 86399))
+            patient = rng.choice(patients)
+            rows.append({
+                "practice_id": practice.id,
+                "patient_name": patient,
+                "patient_hash": Claim.compute_patient_hash(practice.id, patient),
+                "payer": rng.choice(PAYERS),
+                "amount_cents": rng.randint(50, 5000) * 100,
+                "procedure_codes": ",".join(rng.sample(CDT_CODES, rng.randint(1, 3))),
+                "status": rng.choice(STATUSES),
+                "claim_token": f"BENCH{practice.id}-{i}",
+                "fingerprint": f"bench-{practice.id}-{i}",
+                "created_at": created,
+                "updated_at": created,
+            })
+        db.execute(insert(Claim), rows)
+
+    claims = db.query(Claim.id, Claim.amount_cents, Claim.created_at).filter(Claim.practice_id == practice.id).all()
+    for start in range(0, len(claims), BATCH):
+        rows = []
+        for claim_id, amount, created in claims[start:start + BATCH]:
+            if rng.random() >= 0.5:
+                continue
+            status = rng.choice(PAYMENT_STATUSES)
+            sent = created + timedelta(hours=rng.randint(1, 200))
+            rows.append({
+                "claim_id": claim_id,
+                "practice_id": practice.id,
+                "amount_cents": amount,
+                "currency": "USD",
+                "status": status,
+                "idempotency_key": f"bench-{claim_id}",
+                "provider": PaymentProvider.SIMULATED.value,
+                "sent_at": sent,
+                "confirmed_at": sent + timedelta(hours=rng.randint(1, 400)) if status == PaymentIntentStatus.CONFIRMED.value else None,
+                "created_at": created,
+                "updated_at": sent,
+            })
+        if rows:
+            db.execute(insert(PaymentIntent), rows)
+    refresh_patient_dimensions(db, practice.id)
+    rebuild_metric_sketches(db, practice.id)
+    rebuild_insight_rollups(db, practice.id)
+    bump_data_version(db, [practice.id])
+    db.commit()
+    return practice.id
+
+
+def cleanup(db, practice_id: int) -> None:
+    db.query(PaymentIntent).filter(PaymentIntent.practice_id == practice_id).delete(synchronize_session=False)
+    db.query(PatientDimension).filter(PatientDimension.practice_id == practice_id).delete(synchronize_session=False)
+    db.query(MetricSketch).filter(MetricSketch.practice_id == practice_id).delete(synchronize_session=False)
+    db.query(PayerRollup).filter(PayerRollup.practice_id == practice_id).delete(synchronize_session=False)
+    db.query(Claim).filter(Claim.practice_id == practice_id).delete(synchronize_session=False)
+    db.query(Practice).filter(Practice.id == practice_id).delete(synchronize_session=False)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ontology analytics reads")
+    parser.add_argument("--claims", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark practice afterwards")
+    parser.add_argument("--reads", help="Comma-separated subset of reads to time (default: all)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        practice_id = seed(db, args.claims, random.Random(args.seed))
+        print(f"Seeded practice {practice_id} with {args.claims} claims in {time.perf_counter() - t0:.1f}s")
+
+        print(f"{'read':<16}{'cold (s)':>10}{'warm (s)':>10}")
+        selected = set(args.reads.split(",")) if args.reads else None
+        for name, read in READS:
+            if selected is not None and name not in selected:
+                continue
+            t0 = time.perf_counter()
+            read(db, practice_id)
+            cold = time.perf_counter() - t0
+            warm = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                read(db, practice_id)
+                warm.append(time.perf_counter() - t0)
+            print(f"{name:<16}{cold:>10.3f}{min(warm):>10.3f}")
+    finally:
+        db.rollback()
+        if not args.keep and "practice_id" in locals():
+            cleanup(db, practice_id)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
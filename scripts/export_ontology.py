@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Export a practice's full ontology (objects, links, KPI observations) for offline analysis.
+
+Streams through a server-side cursor, so memory stays flat for any graph
+size. NDJSON exports can be resumed: --resume truncates the output file back
+to its last checkpoint line and continues from that cursor. Parquet needs the
+optional pyarrow package.
+
+Usage:
+    python scripts/export_ontology.py --practice-id 12 --output ontology-12.ndjson [--resume]
+    python scripts/export_ontology.py --practice-id 12 --format parquet --output ontology-12.parquet
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ontology_export import stream_export
+
+
+def _last_checkpoint(path: str):
+    """(byte offset just past the last checkpoint line, its cursor), or (0, None)."""
+    offset, cursor, position = 0, None, 0
+    with open(path, "rb") as f:
+        for line in f:
+            position += len(line)
+            if line.startswith(b'{"type": "checkpoint"'):
+                offset, cursor = position, json.loads(line)["cursor"]
+            elif line.startswith(b'{"type": "end"'):
+                return None, None
+    return offset, cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a practice ontology as NDJSON or Parquet")
+    parser.add_argument("--practice-id", type=int, required=True)
+    parser.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--cursor", help="Start after this cursor (\"<kind>:<id>\")")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted NDJSON export in --output")
+    args = parser.parse_args()
+
+    cursor, mode = args.cursor, "wb"
+    if args.resume:
+        if args.format != "ndjson":
+            parser.error("--resume is only supported for NDJSON exports")
+        if os.path.exists(args.output):
+            offset, cursor = _last_checkpoint(args.output)
+            if offset is None:
+                print(f"{args.output} is already complete")
+                return
+            with open(args.output, "r+b") as f:
+                f.truncate(offset)
+            mode = "ab"
+            print(f"Resuming after {cursor or 'the start'}")
+
+    t0 = time.perf_counter()
+    written = 0
+    with open(args.output, mode) as out:
+        for chunk in stream_export(args.practice_id, args.format, cursor):
+            out.write(chunk)
+            written += len(chunk)
+    print(f"Wrote {written} bytes to {args.output} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Post X12 835 (ERA) files as remittances of a practice.
+
+Files are parsed as they are read (app/integrations/x12_835.py) and written
+in batches; payments the practice already has (same payer trace number) are
+skipped, so a file can be posted again after a failure. Run
+reconciliation separately.
+
+Usage:
+    python scripts/ingest_era_835.py --practice-id 12 payments.835 [more.835 ...]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.integrations.csv_parser import read_chunks
+from app.integrations.x12_835 import X12Error, iter_remittances, iter_segments
+from app.services.remittance_reconciliation import REMITTANCE_BATCH_SIZE, RemittanceReconciliationService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest X12 835 ERA files as remittances")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--practice-id", type=int, required=True)
+    parser.add_argument("--batch-size", type=int, default=REMITTANCE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    failed = False
+    try:
+        for path in args.files:
+            with open(path, "rb") as f:
+                try:
+                    summary = RemittanceReconciliationService.ingest_remittances(
+                        db, args.practice_id, iter_remittances(iter_segments(read_chunks(f))), args.batch_size,
+                    )
+                except X12Error as e:
+                    db.rollback()
+                    failed = True
+                    print(f"{path}: {e} (earlier payments of the file were kept)")
+                    continue
+            print(f"{path}: {summary['remittances']} remittances, {summary['lines']} lines, {summary['skipped']} already posted")
+    finally:
+        db.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
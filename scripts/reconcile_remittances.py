@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Match posted remittances (e.g. from scripts/ingest_era_835.py) to claims.
+
+Reconciles every RECEIVED remittance, optionally of one practice, a batch at
+a time (RemittanceReconciliationService.reconcile_many). ``--retry-exceptions``
+also re-runs EXCEPTION remittances, e.g. after claim ids were corrected;
+payments already applied to a claim are not counted twice.
+
+Usage:
+    python scripts/reconcile_remittances.py [--practice-id 12] [--retry-exceptions]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.models.remittance import PostingStatus, Remittance
+from app.services.remittance_reconciliation import REMITTANCE_BATCH_SIZE, RemittanceReconciliationService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile received remittances against claims")
+    parser.add_argument("--practice-id", type=int, default=None)
+    parser.add_argument("--retry-exceptions", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=REMITTANCE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    statuses = [PostingStatus.RECEIVED.value]
+    if args.retry_exceptions:
+        statuses.append(PostingStatus.EXCEPTION.value)
+
+    db = SessionLocal()
+    try:
+        query = db.query(Remittance.id).filter(Remittance.posting_status.in_(statuses))
+        if args.practice_id is not None:
+            query = query.filter(Remittance.practice_id == args.practice_id)
+        remittance_ids = [remittance_id for remittance_id, in query.order_by(Remittance.id)]
+        results = RemittanceReconciliationService.reconcile_many(db, remittance_ids, args.batch_size)
+    finally:
+        db.close()
+
+    print(
+        f"{len(results)} remittances: "
+        f"{sum(r.get('matched', 0) for r in results)} lines matched, "
+        f"{sum(r.get('unmatched', 0) for r in results)} unmatched, "
+        f"{sum(r.get('mismatches', 0) for r in results)} mismatches"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Refresh the portfolio risk table (the /ontology/risks rules for every active practice).
+
+Meant for cron; ops can also trigger a run with POST /ops/portfolio/risks/refresh.
+With --benchmark-practices N, first bulk-inserts N throwaway practices of
+--claims claims each, times the refresh and deletes them afterwards.
+
+Usage:
+    python scripts/refresh_portfolio_risks.py [--workers 8]
+    python scripts/refresh_portfolio_risks.py --benchmark-practices 2000 --claims 2000 [--workers 8]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.services.portfolio_risk import PortfolioRiskService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh portfolio risks")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: settings / CPU count)")
+    parser.add_argument("--benchmark-practices", type=int, default=0)
+    parser.add_argument("--claims", type=int, default=2000, help="Claims per benchmark practice")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    seeded = []
+    try:
+        if args.benchmark_practices:
+            from benchmark_ontology_analytics import seed
+
+            rng = random.Random(args.seed)
+            t0 = time.perf_counter()
+            for _ in range(args.benchmark_practices):
+                seeded.append(seed(db, args.claims, rng))
+            print(f"Seeded {len(seeded)} practices with {args.claims} claims each in {time.perf_counter() - t0:.1f}s")
+
+        t0 = time.perf_counter()
+        run = PortfolioRiskService.refresh(db, workers=args.workers)
+        print(
+            f"Run {run.id}: {run.practice_count} practices, {run.risk_count} risks, "
+            f"{run.failed_practice_count} failed, {run.workers} workers in {time.perf_counter() - t0:.1f}s"
+        )
+    finally:
+        db.rollback()
+        if seeded:
+            from benchmark_ontology_analytics import cleanup
+            from app.models.portfolio_risk import PortfolioRisk
+
+            db.query(PortfolioRisk).filter(PortfolioRisk.practice_id.in_(seeded)).delete(synchronize_session=False)
+            for practice_id in seeded:
+                cleanup(db, practice_id)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""Resume Open Dental ingestion runs abandoned by a crashed worker.
+
+A QUEUED or RUNNING run whose last checkpoint is older than
+INGESTION_STALE_AFTER_SECONDS is claimed and continued after its last
+committed chunk. The API server does the same on startup; this is for cron.
+
+Usage:
+    python scripts/resume_ingestion_jobs.py [--stale-after 300]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.ingestion_jobs import IngestionJobService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resume abandoned ingestion runs")
+    parser.add_argument("--stale-after", type=int, default=None, help="Seconds without a checkpoint (default: settings)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        resumed = IngestionJobService.resume_stale_runs(db, args.stale_after)
+    finally:
+        db.close()
+    print(f"Resumed {len(resumed)} runs" + (f": {', '.join(map(str, resumed))}" if resumed else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Run scheduled Open Dental API syncs for every connected practice.
+
+Queues a sync for each connection whose next sync is due and runs up to
+SYNC_MAX_CONCURRENCY of them at once, one per practice; see
+app/services/sync_scheduler.py. Use this as a long-running worker, or
+--once from cron. Several schedulers may run side by side.
+
+Usage:
+    python scripts/run_sync_scheduler.py [--once] [--concurrency 4] [--poll 30]
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.sync_scheduler import SyncSchedulerService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scheduled Open Dental API syncs")
+    parser.add_argument("--once", action="store_true", help="Tick once and wait for the started syncs")
+    parser.add_argument("--concurrency", type=int, default=None, help="Syncs running at once (default: settings)")
+    parser.add_argument("--poll", type=int, default=None, help="Seconds between ticks (default: settings)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        SyncSchedulerService.run(max_concurrency=args.concurrency, poll_seconds=args.poll, once=args.once)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
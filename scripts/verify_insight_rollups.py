@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Verify (and repair) the payer / procedure insight rollups against a full recompute.
+
+Meant for cron: each practice is rebuilt in its own transaction and practices
+whose rollups had drifted from the source tables are reported. Exits non-zero
+when any drift was found. With --dry-run nothing is written.
+
+Usage:
+    python scripts/verify_insight_rollups.py [--practice-id 12] [--dry-run]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.models.insight_rollup import rebuild_insight_rollups
+from app.models.practice import Practice
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify insight rollups")
+    parser.add_argument("--practice-id", type=int, action="append", help="Only these practices (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without rewriting the rollups")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        practice_ids = args.practice_id or [pid for (pid,) in db.query(Practice.id).order_by(Practice.id)]
+        t0 = time.perf_counter()
+        drifted = 0
+        for practice_id in practice_ids:
+            drift = rebuild_insight_rollups(db, practice_id)
+            if args.dry_run:
+                db.rollback()
+            else:
+                db.commit()
+            if drift:
+                drifted += 1
+                print(f"Practice {practice_id}: {drift} rollup rows drifted")
+        print(f"Checked {len(practice_ids)} practices in {time.perf_counter() - t0:.1f}s, {drifted} drifted")
+    finally:
+        db.rollback()
+        db.close()
+    sys.exit(1 if drifted else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -235,8 +235,9 @@ export const getOntologyContext = async (practiceId) => {
   return response.json();
 };
 
-export const generateOntologyBrief = async (practiceId) => {
-  const response = await fetch(`${API_BASE_URL}/practices/${practiceId}/ontology/brief`, {
+export const generateOntologyBrief = async (practiceId, refresh = false) => {
+  const query = refresh ? '?refresh=true' : '';
+  const response = await fetch(`${API_BASE_URL}/practices/${practiceId}/ontology/brief${query}`, {
     method: 'POST',
     headers: headers(),
   });
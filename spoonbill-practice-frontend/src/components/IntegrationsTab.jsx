@@ -28,6 +28,15 @@ const runStatusColors = {
   SUCCEEDED: '#059669',
   FAILED: '#dc2626',
   RUNNING: '#2563eb',
+  QUEUED: '#6b7280',
+};
+
+const isActiveRun = (run) => run.status === 'RUNNING' || run.status === 'QUEUED';
+
+const formatEta = (seconds) => {
+  if (seconds == null) return '';
+  if (seconds < 60) return `${Math.ceil(seconds)}s left`;
+  return `${Math.ceil(seconds / 60)}m left`;
 };
 
 function IntegrationsTab() {
@@ -49,11 +58,14 @@ function IntegrationsTab() {
     }
   }, []);
 
+  const hasActiveRun = Boolean(status?.recent_runs?.some(isActiveRun));
+
   useEffect(() => {
     fetchStatus();
-    const interval = setInterval(fetchStatus, 10000);
+    // Poll faster while an import is queued or running to show its progress.
+    const interval = setInterval(fetchStatus, hasActiveRun ? 2000 : 10000);
     return () => clearInterval(interval);
-  }, [fetchStatus]);
+  }, [fetchStatus, hasActiveRun]);
 
   const handleCSVUpload = async (e) => {
     const files = e.target.files;
@@ -80,12 +92,8 @@ function IntegrationsTab() {
         claimsFile = files[0];
       }
 
-      const result = await uploadIntegrationCSV(claimsFile, linesFile);
-      const s = result.summary;
-      setSuccess(
-        `Upload complete: ${s.created} created, ${s.updated} updated, ${s.skipped} unchanged` +
-        (s.errors.length > 0 ? `, ${s.errors.length} errors` : '')
-      );
+      await uploadIntegrationCSV(claimsFile, linesFile);
+      setSuccess('Upload received. Import is running; progress is shown under Recent Sync Runs.');
       fetchStatus();
     } catch (err) {
       setError(err.message || 'Upload failed');
@@ -101,11 +109,8 @@ function IntegrationsTab() {
     setSuccess(null);
 
     try {
-      const result = await runIntegrationSync();
-      const s = result.summary;
-      setSuccess(
-        `Sync complete: ${s.created} created, ${s.updated} updated, ${s.skipped} unchanged`
-      );
+      await runIntegrationSync();
+      setSuccess('Sync started. Progress is shown under Recent Sync Runs.');
       fetchStatus();
     } catch (err) {
       setError(err.message || 'Sync failed');
@@ -230,7 +235,18 @@ function IntegrationsTab() {
                     </TableCell>
                     <TableCell>
                       <Chip
-                        label={run.status}
+                        label={
+                          run.status === 'RUNNING' && run.bytes_total
+                            ? `${run.status} ${Math.floor((100 * (run.bytes_processed || 0)) / run.bytes_total)}%`
+                            : run.status
+                        }
+                        title={
+                          isActiveRun(run) && run.rows_per_second
+                            ? `${run.rows_per_second} rows/s ${formatEta(run.eta_seconds)}`
+                            : run.summary?.errors?.length
+                              ? `${run.summary.errors.length} row errors`
+                              : undefined
+                        }
                         size="small"
                         sx={{
                           bgcolor: (runStatusColors[run.status] || '#6b7280') + '20',
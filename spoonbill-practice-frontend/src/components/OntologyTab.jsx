@@ -694,7 +694,7 @@ function BriefPanel({ practiceId, brief, onBriefGenerated, onLimitAdjusted }) {
     setLoading(true);
     setError(null);
     try {
-      const data = await generateOntologyBrief(practiceId);
+      const data = await generateOntologyBrief(practiceId, Boolean(brief));
       onBriefGenerated(data);
     } catch (err) {
       setError(err.message);
@@ -718,7 +718,12 @@ function BriefPanel({ practiceId, brief, onBriefGenerated, onLimitAdjusted }) {
   return (
     <Paper elevation={0} sx={{ p: 2, border: '1px solid #e5e7eb', mb: 2 }}>
       <Box sx={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', mb: 1 }}>
-        <Typography variant="subtitle2" sx={{ fontWeight: 600 }}>Ontology Brief</Typography>
+        <Box sx={{ display: 'flex', alignItems: 'center', gap: 1 }}>
+          <Typography variant="subtitle2" sx={{ fontWeight: 600 }}>Ontology Brief</Typography>
+          {brief?.meta?.stale && (
+            <Chip label="Out of date" size="small" variant="outlined" sx={{ fontSize: '0.65rem', height: 20, borderColor: '#d97706', color: '#92400e' }} />
+          )}
+        </Box>
         <Button variant="outlined" size="small" onClick={handleGenerate} disabled={loading} sx={{ textTransform: 'none' }}>
           {loading ? <CircularProgress size={16} sx={{ mr: 1 }} /> : null}
           {brief ? 'Regenerate Brief' : 'Generate Brief'}
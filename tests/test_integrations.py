@@ -3,7 +3,22 @@ from unittest.mock import MagicMock, patch
 from datetime import date
 
 from app.schemas.integration import ExternalClaim, ExternalClaimLine, IngestionSummary
-from app.integrations.csv_parser import parse_claims_csv, parse_lines_csv, build_external_claims
+import io
+
+from app.integrations.csv_parser import (
+    parse_claims_csv,
+    parse_lines_csv,
+    build_external_claims,
+    ByteProgress,
+    LineIndex,
+    iter_claims_csv,
+    iter_external_claim_chunks,
+    iter_lines_csv,
+    iter_text_lines,
+    read_chunks,
+)
+from app.integrations import csv_parallel
+from app.integrations.csv_parallel import csv_row_spans, iter_parallel_claim_chunks
 from app.integrations.open_dental.provider import OpenDentalProvider, OpenDentalNotConfigured
 from app.models.integration import IntegrationProvider, IntegrationStatus, SyncRunStatus
 
@@ -133,6 +148,199 @@ class TestCSVParser:
         assert claims[1].lines[0].external_line_id == "LN-2"
 
 
+class TestStreamingCSV:
+    def _rows(self, content: bytes, size: int):
+        progress = ByteProgress(total=len(content))
+        rows = list(iter_claims_csv(iter_text_lines(read_chunks(io.BytesIO(content), progress, size))))
+        return rows, progress
+
+    def test_decode_across_chunk_boundaries(self):
+        content = (
+            "external_claim_id,payer,total_billed_cents\n"
+            "OD-1001,Sécurité Dentaire,45000\n"
+            'OD-1002,"Multi\nLine, Payer",120000'
+        ).encode("utf-8")
+        for size in (1, 2, 7, 1024):
+            rows, progress = self._rows(content, size)
+            assert [r["external_claim_id"] for r in rows] == ["OD-1001", "OD-1002"]
+            assert rows[0]["payer"] == "Sécurité Dentaire"
+            assert rows[1]["payer"] == "Multi\nLine, Payer"
+            assert progress.read == progress.total
+
+    def test_missing_column_raises_before_rows(self):
+        with pytest.raises(ValueError, match="payer"):
+            iter_claims_csv(iter_text_lines([b"external_claim_id,total_billed_cents\n"]))
+
+    def test_chunks_report_invalid_rows_without_failing(self):
+        rows = [
+            {"external_claim_id": f"OD-{i}", "payer": "Delta", "total_billed_cents": "100"} for i in range(5)
+        ]
+        rows[3]["total_billed_cents"] = "-1"
+        chunks = list(iter_external_claim_chunks(iter(rows), chunk_size=2))
+        assert [len(claims) for claims, _ in chunks] == [2, 1, 1]
+        errors = [e for _, errs in chunks for e in errs]
+        assert len(errors) == 1
+        assert errors[0].startswith("row 5 (OD-3)")
+
+    def test_chunks_skip_already_ingested_rows(self):
+        rows = [
+            {"external_claim_id": f"OD-{i}", "payer": "Delta", "total_billed_cents": "100" if i != 4 else "x"}
+            for i in range(6)
+        ]
+        chunks = list(iter_external_claim_chunks(iter(rows), chunk_size=2, skip=3))
+        assert [[c.external_claim_id for c in claims] for claims, _ in chunks] == [["OD-3"], ["OD-5"]]
+        assert chunks[0][1][0].startswith("row 6 (OD-4)")
+
+    def test_line_index_joins_per_chunk(self):
+        lines_csv = (
+            "external_claim_id,external_line_id,cdt_code,line_amount_cents\n"
+            "OD-2,LN-3,D2740,900\n"
+            "OD-1,LN-1,D0120,100\n"
+            "OD-1,LN-2,D1110,200\n"
+        )
+        index = LineIndex(iter_lines_csv(io.StringIO(lines_csv)))
+        try:
+            rows = [
+                {"external_claim_id": "OD-1", "payer": "Delta", "total_billed_cents": "300"},
+                {"external_claim_id": "OD-2", "payer": "Delta", "total_billed_cents": "900"},
+                {"external_claim_id": "OD-3", "payer": "Delta", "total_billed_cents": "50"},
+            ]
+            chunks = list(iter_external_claim_chunks(iter(rows), index, chunk_size=2))
+        finally:
+            index.close()
+        claims = [c for chunk, _ in chunks for c in chunk]
+        assert [line.external_line_id for line in claims[0].lines] == ["LN-1", "LN-2"]
+        assert [line.cdt_code for line in claims[1].lines] == ["D2740"]
+        assert claims[2].lines == []
+
+
+class TestParallelCSV:
+    CLAIMS = (
+        "external_claim_id,payer,total_billed_cents\n"
+        + "".join(f"OD-{i},Delta,{100 + i}\n" for i in range(8))
+        + 'OD-8,"Quoted\nPayer, Inc.",500\n'
+        + "OD-9,Delta,-1\n"
+        + "OD-10,Delta,700\n"
+    )
+    LINES = (
+        "external_claim_id,external_line_id,cdt_code,line_amount_cents\n"
+        "OD-1,LN-1,D0120,100\n"
+        "OD-1,LN-2,D1110,200\n"
+        "OD-10,LN-3,D2740,-5\n"
+    )
+
+    def _files(self, tmp_path):
+        claims_path, lines_path = tmp_path / "claims.csv", tmp_path / "lines.csv"
+        claims_path.write_text(self.CLAIMS, encoding="utf-8")
+        lines_path.write_text(self.LINES, encoding="utf-8")
+        return str(claims_path), str(lines_path)
+
+    def test_spans_cut_on_row_boundaries_outside_quotes(self, tmp_path):
+        claims_path, _ = self._files(tmp_path)
+        header_end, spans = csv_row_spans(claims_path, span_bytes=1)
+        data = self.CLAIMS.encode("utf-8")
+        assert data[:header_end].endswith(b"total_billed_cents\n")
+        assert spans[0][0] == header_end and spans[-1][1] == len(data)
+        assert all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
+        assert b"OD-8,\"Quoted\nPayer, Inc.\",500\n" in [data[s:e] for s, e in spans]
+
+    def test_matches_serial_chunks(self, tmp_path, monkeypatch):
+        claims_path, lines_path = self._files(tmp_path)
+        monkeypatch.setattr(csv_parallel, "SPAN_BYTES", 40)
+        for skip in (0, 3):
+            index = LineIndex(iter_lines_csv(io.StringIO(self.LINES)))
+            try:
+                rows = iter_claims_csv(io.StringIO(self.CLAIMS, newline=""))
+                serial = list(iter_external_claim_chunks(rows, index, chunk_size=3, skip=skip))
+            finally:
+                index.close()
+            parallel = list(iter_parallel_claim_chunks(claims_path, lines_path, chunk_size=3, skip=skip, workers=2))
+            assert [errors for _, errors in parallel] == [errors for _, errors in serial]
+            assert [[c.model_dump() for c in claims] for claims, _ in serial] == [
+                [{**c._asdict(), "lines": [line._asdict() for line in c.lines]} for c in claims]
+                for claims, _ in parallel
+            ]
+
+    def test_missing_column_raises(self, tmp_path):
+        path = tmp_path / "claims.csv"
+        path.write_text("external_claim_id,total_billed_cents\nOD-1,100\n")
+        with pytest.raises(ValueError, match="payer"):
+            next(iter_parallel_claim_chunks(str(path), workers=2))
+
+
+ERA_835 = (
+    "ISA*00*          *00*          *ZZ*PAYERSENDER    *ZZ*SPOONBILL      *261019*1200*^*00501*000000001*0*P*:~\n"
+    "GS*HP*PAYERSENDER*SPOONBILL*20261019*1200*1*X*005010X221A1~\n"
+    "ST*835*0001~BPR*I*310.50*C*ACH*CCP*01*999999999*DA*123456*1512345678**01*999988880*DA*98765*20261015~"
+    "TRN*1*EFT000000001*1512345678~DTM*405*20261014~N1*PR*DELTA DENTAL~N1*PE*SMILE DENTAL*XX*1234567893~LX*1~"
+    "CLP*OD-1*1*400.00*250.50**12*PCN1~CAS*PR*1*20.00~"
+    "SVC*AD:D1110*150.00*120.00**1~CAS*CO*45*30.00~AMT*B6*120.00~"
+    "SVC*AD:D0274*100.00*80.00**1~CAS*CO*45*10.00**253*10.00~"
+    "CLP*OD-2*4*60.00*0**12*PCN2~CAS*CO*97*60.00~"
+    "CLP*OD-3*1*60.00*60.00**12*PCN3~"
+    "SE*18*0001~\n"
+    "ST*999*0002~AK1*HP*1~SE*3*0002~\n"
+    "ST*835*0003~BPR*I*0*C*NON************20261016~TRN*1*CHK2*1999999999~N1*PR*METLIFE~SE*5*0003~\n"
+    "GE*3*1~IEA*1*000000001~"
+)
+
+
+class TestX12835:
+    def _remittances(self, text, chunk=7):
+        from app.integrations.x12_835 import iter_remittances, iter_segments
+
+        data = text.encode()
+        return list(iter_remittances(iter_segments(data[i:i + chunk] for i in range(0, len(data), chunk))))
+
+    def test_segments_split_across_chunks(self):
+        from app.integrations.x12_835 import iter_segments
+
+        segments = list(iter_segments([ERA_835[:50].encode(), ERA_835[50:].encode()]))
+        assert segments[0][0] == "ISA" and segments[0][16] == ":"
+        assert segments[2][:3] == ["ST", "835", "0001"]
+        assert segments[-1] == ["IEA", "1", "000000001"]
+
+    def test_parses_payments_claims_and_service_lines(self):
+        first, second = self._remittances(ERA_835)
+
+        assert first["payer_name"] == "DELTA DENTAL"
+        assert first["trace_number"] == "EFT000000001"
+        assert first["era_reference"] == "1512345678:EFT000000001"
+        assert first["payment_date"] == date(2026, 10, 15)
+        assert first["total_paid_cents"] == 31050
+        assert first["total_adjustments_cents"] == 3000 + 2000 + 2000 + 6000
+        assert [(l["external_claim_id"], l["cdt_code"], l["paid_cents"], l["adjustment_cents"]) for l in first["lines"]] == [
+            ("OD-1", "D1110", 12000, 3000),
+            ("OD-1", "D0274", 8000, 2000),
+            ("OD-1", None, 0, 2000),  # claim-level patient responsibility
+            ("OD-2", None, 0, 6000),  # denied claim without service lines
+            ("OD-3", None, 6000, 0),
+        ]
+        assert first["lines"][0]["allowed_cents"] == 12000
+        assert first["lines"][1]["adjustment_reason_codes"] == [
+            {"group": "CO", "reason": "45", "amount_cents": 1000},
+            {"group": "CO", "reason": "253", "amount_cents": 1000},
+        ]
+        # The 999 acknowledgement in between is skipped.
+        assert (second["payer_name"], second["payment_date"], second["lines"]) == ("METLIFE", date(2026, 10, 16), [])
+
+    def test_custom_delimiters(self):
+        text = ERA_835.replace("*", "|").replace("~", "\\").replace(":", ">")
+        assert self._remittances(text)[0]["lines"][0]["cdt_code"] == "D1110"
+
+    def test_malformed_files_raise(self):
+        from app.integrations.x12_835 import X12Error
+
+        with pytest.raises(X12Error, match="ISA"):
+            self._remittances("NOT*AN*X12*FILE" * 10)
+        with pytest.raises(X12Error, match="SE counts"):
+            self._remittances(ERA_835.replace("SE*18*0001", "SE*17*0001"))
+        with pytest.raises(X12Error, match="ends before"):
+            self._remittances(ERA_835[:ERA_835.index("SE*18")])
+        with pytest.raises(X12Error, match="invalid amount"):
+            self._remittances(ERA_835.replace("SVC*AD:D1110*150.00*120.00", "SVC*AD:D1110*150.00*12O.00"))
+
+
 class TestOpenDentalProvider:
     def test_not_configured_raises(self):
         provider = OpenDentalProvider()
@@ -140,17 +348,53 @@ class TestOpenDentalProvider:
         with pytest.raises(OpenDentalNotConfigured):
             provider.fetch_updated_claims()
 
-    def test_configured_but_not_implemented(self):
+    def _mock_provider(self, claims=250, rate_limit=None, retry_after=1.0, **config):
         import json
-        config = json.dumps({
-            "base_url": "https://api.opendental.com",
-            "developer_key": "test-dev-key",
-            "customer_key": "test-cust-key",
-        })
-        provider = OpenDentalProvider(config_json=config)
+        import httpx
+        from app.integrations.open_dental.mock_server import CUSTOMER_KEY, DEVELOPER_KEY, create_mock_app
+
+        app = create_mock_app(claims=claims, seed=7, rate_limit=rate_limit, retry_after=retry_after)
+        config = {
+            "base_url": "http://opendental.mock", "developer_key": DEVELOPER_KEY, "customer_key": CUSTOMER_KEY,
+            "page_size": 40, "concurrency": 3, "requests_per_second": 0, **config,
+        }
+        return app, OpenDentalProvider(config_json=json.dumps(config), transport=httpx.ASGITransport(app=app))
+
+    def test_fetch_pages_in_order_from_mock(self):
+        _, provider = self._mock_provider()
         assert provider.is_configured()
-        with pytest.raises(NotImplementedError):
-            provider.fetch_updated_claims()
+        pages = list(provider.fetch_updated_claims())
+        assert [len(claims) for claims, _ in pages] == [40] * 6 + [10]
+        ids = [int(c.external_claim_id) for claims, _ in pages for c in claims]
+        assert ids == list(range(1, 251))
+        assert all(claim.lines and claim.total_billed_cents > 0 for claims, _ in pages for claim in claims)
+
+    def test_fetch_resumes_at_offset_and_since_cursor(self):
+        from app.integrations.open_dental.mock_server import BASE_STAMP
+
+        app, provider = self._mock_provider()
+        resumed = [int(c.external_claim_id) for claims, _ in provider.fetch_updated_claims(offset=230) for c in claims]
+        assert resumed == list(range(231, 251))
+
+        app.state.edits[3] = (BASE_STAMP.replace(year=2027), 10)
+        since = BASE_STAMP.replace(minute=4).isoformat()  # unedited claims 241+ are newer
+        changed = [c for claims, _ in provider.fetch_updated_claims(cursor=since) for c in claims]
+        assert [int(c.external_claim_id) for c in changed] == [3] + list(range(241, 251))
+
+    def test_fetch_reports_unmappable_claims_as_errors(self):
+        app, provider = self._mock_provider(claims=5)
+        from app.integrations.open_dental import mock_server
+
+        with patch.object(mock_server, "PAYERS", [""]):
+            [(claims, errors)] = list(provider.fetch_updated_claims())
+        assert claims == []
+        assert len(errors) == 5 and errors[0].startswith("claim 1: ")
+
+    def test_fetch_retries_rate_limited_requests(self):
+        app, provider = self._mock_provider(claims=100, rate_limit=3, retry_after=0.3, page_size=25, concurrency=2)
+        ids = [int(c.external_claim_id) for claims, _ in provider.fetch_updated_claims() for c in claims]
+        assert ids == list(range(1, 101))
+        assert len(app.state.requests) > 6  # some requests were answered with 429 and retried
 
     def test_map_od_claim(self):
         provider = OpenDentalProvider()
@@ -174,13 +418,65 @@ class TestOpenDentalProvider:
         assert len(claim.lines) == 2
 
 
+def _mock_db(existing=(), existing_lines=()):
+    """MagicMock session for the set-based upsert.
+
+    The existing-claims SELECT returns ``existing`` and the claim-lines SELECT
+    ``existing_lines``; the claims INSERT returns ids for the new rows. Every
+    statement is recorded in ``db.executed``.
+    """
+    from types import SimpleNamespace
+    from sqlalchemy.sql import Insert, Select
+
+    db = MagicMock()
+    db.executed = []
+    selected = {"claims": existing, "claim_lines": existing_lines}
+
+    def execute(stmt, params=None):
+        db.executed.append((stmt, params))
+        result = MagicMock()
+        if isinstance(stmt, Select):
+            rows = selected.get(stmt.get_final_froms()[0].name, ())
+            result.mappings.return_value.all.return_value = [dict(row) for row in rows]
+            result.all.return_value = []
+            result.first.return_value = None
+        elif isinstance(stmt, Insert) and stmt.table.name == "claims":
+            result.all.return_value = [
+                SimpleNamespace(id=100 + i, external_claim_id=row["external_claim_id"]) for i, row in enumerate(params)
+            ]
+        return result
+
+    db.execute.side_effect = execute
+    return db
+
+
+def _written(db, table_name, kind):
+    from sqlalchemy.sql import Delete, Insert, Update
+    kinds = {"insert": Insert, "update": Update, "delete": Delete}
+    return [params for stmt, params in db.executed if isinstance(stmt, kinds[kind]) and stmt.table.name == table_name]
+
+
+def _existing_claim(**overrides):
+    row = {
+        "id": 1,
+        "external_claim_id": "OD-1001",
+        "patient_hash": "abc",
+        "payer": "Delta Dental",
+        "amount_cents": 45000,
+        "procedure_date": date(2026, 1, 15),
+        "procedure_codes": None,
+        "external_source": "OPEN_DENTAL",
+        "external_digest": None,
+    }
+    row.update(overrides)
+    return row
+
+
 class TestIngestionIdempotency:
     def test_ingest_creates_new_claims(self):
         from app.services.ingestion import ingest_external_claims
-        from app.models.claim import Claim, ClaimStatus
 
-        mock_db = MagicMock()
-        mock_db.query.return_value.filter.return_value.first.return_value = None
+        mock_db = _mock_db()
 
         claims = [
             ExternalClaim(
@@ -196,21 +492,16 @@ class TestIngestionIdempotency:
         assert summary.created == 1
         assert summary.updated == 0
         assert summary.skipped == 0
+        [inserted] = _written(mock_db, "claims", "insert")
+        assert inserted[0]["payer"] == "Delta Dental"
+        assert inserted[0]["patient_hash"]
+        [audits] = _written(mock_db, "audit_events", "insert")
+        assert [(a["claim_id"], a["action"]) for a in audits] == [(100, "CLAIM_IMPORTED")]
 
     def test_ingest_updates_existing_claim(self):
         from app.services.ingestion import ingest_external_claims
-        from app.models.claim import Claim, ClaimStatus
-
-        existing_claim = MagicMock()
-        existing_claim.id = 1
-        existing_claim.payer = "Old Payer"
-        existing_claim.amount_cents = 10000
-        existing_claim.procedure_date = date(2026, 1, 1)
-        existing_claim.procedure_codes = None
-        existing_claim.external_source = None
 
-        mock_db = MagicMock()
-        mock_db.query.return_value.filter.return_value.first.return_value = existing_claim
+        mock_db = _mock_db([_existing_claim(payer="Old Payer", amount_cents=10000, procedure_date=date(2026, 1, 1), external_source=None)])
 
         claims = [
             ExternalClaim(
@@ -225,22 +516,16 @@ class TestIngestionIdempotency:
         assert summary.total_received == 1
         assert summary.created == 0
         assert summary.updated == 1
-        assert existing_claim.payer == "New Payer"
-        assert existing_claim.amount_cents == 50000
+        assert _written(mock_db, "claims", "insert") == []
+        [updates] = _written(mock_db, "claims", "update")
+        assert updates[0]["_id"] == 1
+        assert updates[0]["payer"] == "New Payer"
+        assert updates[0]["amount_cents"] == 50000
+        [audits] = _written(mock_db, "audit_events", "insert")
+        assert [(a["claim_id"], a["action"]) for a in audits] == [(1, "CLAIM_UPDATED_VIA_SYNC")]
 
     def test_ingest_skips_unchanged_claim(self):
-        from app.services.ingestion import ingest_external_claims
-
-        existing_claim = MagicMock()
-        existing_claim.id = 1
-        existing_claim.payer = "Delta Dental"
-        existing_claim.amount_cents = 45000
-        existing_claim.procedure_date = date(2026, 1, 15)
-        existing_claim.procedure_codes = None
-        existing_claim.external_source = "OPEN_DENTAL"
-
-        mock_db = MagicMock()
-        mock_db.query.return_value.filter.return_value.first.return_value = existing_claim
+        from app.services.ingestion import external_digest, ingest_external_claims
 
         claims = [
             ExternalClaim(
@@ -250,18 +535,124 @@ class TestIngestionIdempotency:
                 procedure_date=date(2026, 1, 15),
             ),
         ]
+        mock_db = _mock_db([_existing_claim(external_digest=external_digest(claims[0], "OPEN_DENTAL"))])
 
         summary = ingest_external_claims(mock_db, practice_id=1, external_claims=claims)
         assert summary.total_received == 1
         assert summary.created == 0
         assert summary.updated == 0
         assert summary.skipped == 1
+        assert len(mock_db.executed) == 1  # just the lookup
+
+    def test_ingest_stamps_digest_of_unchanged_claim(self):
+        from app.services.ingestion import external_digest, ingest_external_claims
+
+        mock_db = _mock_db([_existing_claim()])  # ingested before digests were stored
+        claims = [
+            ExternalClaim(
+                external_claim_id="OD-1001", payer="Delta Dental", total_billed_cents=45000, procedure_date=date(2026, 1, 15),
+            ),
+        ]
+
+        summary = ingest_external_claims(mock_db, practice_id=1, external_claims=claims)
+        assert summary.skipped == 1
+        [stamped] = _written(mock_db, "claims", "update")
+        assert stamped == [{"_id": 1, "_digest": external_digest(claims[0], "OPEN_DENTAL")}]
+        assert _written(mock_db, "audit_events", "insert") == []
+
+    def test_ingest_repeated_claim_in_chunk_counts_exactly(self):
+        from app.services.ingestion import ingest_external_claims
+
+        mock_db = _mock_db()
+
+        claims = [
+            ExternalClaim(external_claim_id="OD-1", payer="Delta", total_billed_cents=100),
+            ExternalClaim(external_claim_id="OD-1", payer="Delta", total_billed_cents=100),
+            ExternalClaim(external_claim_id="OD-1", payer="MetLife", total_billed_cents=100),
+        ]
+
+        summary = ingest_external_claims(mock_db, practice_id=1, external_claims=claims)
+        assert (summary.created, summary.updated, summary.skipped) == (1, 1, 1)
+        [inserted] = _written(mock_db, "claims", "insert")
+        assert [row["payer"] for row in inserted] == ["MetLife"]
+        [audits] = _written(mock_db, "audit_events", "insert")
+        assert [a["action"] for a in audits] == ["CLAIM_IMPORTED", "CLAIM_UPDATED_VIA_SYNC"]
+
+    def test_ingest_inserts_lines_of_new_claims(self):
+        from app.services.ingestion import ingest_external_claims
+
+        mock_db = _mock_db()
+        claims = [
+            ExternalClaim(
+                external_claim_id="OD-1", payer="Delta", total_billed_cents=300,
+                lines=[
+                    ExternalClaimLine(external_line_id="LN-1", cdt_code="D0120", line_amount_cents=100, tooth_number="3"),
+                    ExternalClaimLine(external_line_id="LN-2", cdt_code="D1110", line_amount_cents=200),
+                ],
+            ),
+        ]
+
+        summary = ingest_external_claims(mock_db, practice_id=1, external_claims=claims)
+        assert summary.created == 1
+        [lines] = _written(mock_db, "claim_lines", "insert")
+        assert [(l["claim_id"], l["external_line_id"], l["cdt_code"], l["billed_fee_cents"], l["tooth"]) for l in lines] == [
+            (100, "LN-1", "D0120", 100, "3"),
+            (100, "LN-2", "D1110", 200, None),
+        ]
+
+    def test_ingest_rewrites_only_changed_lines(self):
+        from app.services.ingestion import ingest_external_claims
+
+        stored = [
+            {"id": 11, "claim_id": 1, "external_line_id": "LN-1", "cdt_code": "D0120", "tooth": None, "surface": None, "billed_fee_cents": 100},
+            {"id": 12, "claim_id": 1, "external_line_id": "LN-2", "cdt_code": "D1110", "tooth": None, "surface": None, "billed_fee_cents": 200},
+            {"id": 13, "claim_id": 1, "external_line_id": "LN-3", "cdt_code": "D2740", "tooth": "8", "surface": None, "billed_fee_cents": 900},
+        ]
+        mock_db = _mock_db([_existing_claim(procedure_codes="D0120,D1110,D4341")], stored)
+        claims = [
+            ExternalClaim(
+                external_claim_id="OD-1001", payer="Delta Dental", total_billed_cents=45000,
+                procedure_date=date(2026, 1, 15), procedure_codes="D0120,D1110,D4341",
+                lines=[
+                    ExternalClaimLine(external_line_id="LN-1", cdt_code="D0120", line_amount_cents=100),
+                    ExternalClaimLine(external_line_id="LN-2", cdt_code="D1110", line_amount_cents=250),
+                    ExternalClaimLine(external_line_id="LN-4", cdt_code="D4341", line_amount_cents=400),
+                ],
+            ),
+        ]
+
+        summary = ingest_external_claims(mock_db, practice_id=1, external_claims=claims)
+        assert (summary.created, summary.updated, summary.skipped) == (0, 1, 0)
+        [stamped] = _written(mock_db, "claims", "update")  # digest only
+        assert set(stamped[0]) == {"_id", "_digest"}
+        [inserted] = _written(mock_db, "claim_lines", "insert")
+        assert [(l["claim_id"], l["external_line_id"]) for l in inserted] == [(1, "LN-4")]
+        [changed] = _written(mock_db, "claim_lines", "update")
+        assert [(l["_id"], l["billed_fee_cents"]) for l in changed] == [(12, 250)]
+        assert len(_written(mock_db, "claim_lines", "delete")) == 1
+
+    def test_ingest_skips_claim_with_unchanged_lines(self):
+        from app.services.ingestion import ingest_external_claims
+
+        stored = [{"id": 11, "claim_id": 1, "external_line_id": "LN-1", "cdt_code": "D0120", "tooth": None, "surface": None, "billed_fee_cents": 100}]
+        mock_db = _mock_db([_existing_claim(procedure_codes="D0120")], stored)
+        claims = [
+            ExternalClaim(
+                external_claim_id="OD-1001", payer="Delta Dental", total_billed_cents=45000,
+                procedure_date=date(2026, 1, 15),
+                lines=[ExternalClaimLine(external_line_id="LN-1", cdt_code="D0120", line_amount_cents=100)],
+            ),
+        ]
+
+        summary = ingest_external_claims(mock_db, practice_id=1, external_claims=claims)
+        assert summary.skipped == 1
+        assert not any(stmt.table.name == "claim_lines" for stmt, _ in mock_db.executed if hasattr(stmt, "table"))
 
     def test_ingest_handles_errors_gracefully(self):
         from app.services.ingestion import ingest_external_claims
 
         mock_db = MagicMock()
-        mock_db.query.return_value.filter.return_value.first.side_effect = Exception("DB error")
+        mock_db.execute.side_effect = Exception("DB error")
 
         claims = [
             ExternalClaim(
@@ -275,6 +666,142 @@ class TestIngestionIdempotency:
         assert summary.total_received == 1
         assert summary.errors == ["OD-1001: DB error"]
 
+    def test_ingest_chunks_commits_and_reports_progress(self):
+        from app.services.ingestion import ingest_claim_chunks
+
+        mock_db = _mock_db()
+        run = MagicMock(checkpoint_json=None)
+        chunks = [
+            ([ExternalClaim(external_claim_id=f"OD-{i}", payer="Delta", total_billed_cents=100) for i in range(2)], []),
+            ([ExternalClaim(external_claim_id="OD-2", payer="Delta", total_billed_cents=100)], ["row 5 (OD-3): bad amount"]),
+        ]
+
+        summary = ingest_claim_chunks(mock_db, 1, iter(chunks), run, bytes_processed=lambda: 42)
+        assert summary.total_received == 4
+        assert summary.created == 3
+        assert summary.errors == ["row 5 (OD-3): bad amount"]
+        assert mock_db.commit.call_count == 2
+        assert run.pulled_count == 4
+        assert run.upserted_count == 3
+        assert run.bytes_processed == 42
+
+    def test_ingest_chunks_skips_rows_with_stored_digest(self):
+        from app.services.ingestion import external_digest, ingest_claim_chunks
+
+        claims = [ExternalClaim(external_claim_id=f"OD-{i}", payer="Delta", total_billed_cents=100) for i in range(3)]
+        stored = {"OD-0": external_digest(claims[0], "OPEN_DENTAL"), "OD-1": "stale"}
+        mock_db = _mock_db()
+        run = MagicMock(checkpoint_json=None)
+
+        with patch("app.services.ingestion.stored_digests", return_value=stored):
+            summary = ingest_claim_chunks(mock_db, 1, iter([(claims, []), (claims[:1], [])]), run)
+        assert (summary.total_received, summary.created, summary.skipped) == (4, 2, 2)
+        [inserted] = _written(mock_db, "claims", "insert")
+        assert [row["external_claim_id"] for row in inserted] == ["OD-1", "OD-2"]
+
+class TestIngestionJobs:
+    def test_queue_csv_upload_rejects_bad_header_without_spooling(self, tmp_path, monkeypatch):
+        from app.config import get_settings
+        from app.services.ingestion_jobs import IngestionJobService
+
+        monkeypatch.setattr(get_settings(), "ingestion_spool_dir", str(tmp_path))
+        mock_db = MagicMock()
+        conn = MagicMock(id=1, practice_id=7)
+
+        with pytest.raises(ValueError, match="payer"):
+            IngestionJobService.queue_csv_upload(mock_db, conn, io.BytesIO(b"external_claim_id,total_billed_cents\n"))
+        assert list(tmp_path.iterdir()) == []
+        mock_db.add.assert_not_called()
+
+    def test_queue_csv_upload_spools_and_queues(self, tmp_path, monkeypatch):
+        from app.config import get_settings
+        from app.services.ingestion_jobs import IngestionJobService, CLAIMS_FILE
+
+        monkeypatch.setattr(get_settings(), "ingestion_spool_dir", str(tmp_path))
+        mock_db = MagicMock()
+        conn = MagicMock(id=1, practice_id=7)
+        content = b"external_claim_id,payer,total_billed_cents\nOD-1,Delta,100\n"
+
+        run = IngestionJobService.queue_csv_upload(mock_db, conn, io.BytesIO(content))
+        assert run.status == SyncRunStatus.QUEUED.value
+        assert run.bytes_total == len(content)
+        with open(f"{run.payload_path}/{CLAIMS_FILE}", "rb") as f:
+            assert f.read() == content
+        mock_db.commit.assert_called_once()
+
+    def test_run_response_rate_and_eta(self):
+        import json
+        from datetime import datetime, timedelta
+        from app.models.integration import IntegrationSyncRun
+        from app.services.ingestion_jobs import IngestionJobService
+
+        started = datetime(2026, 1, 1, 12, 0, 0)
+        run = IntegrationSyncRun(
+            id=1, connection_id=1, practice_id=1, provider="OPEN_DENTAL", started_at=started,
+            status=SyncRunStatus.RUNNING.value, sync_type="CSV_UPLOAD", pulled_count=1000, upserted_count=900,
+            bytes_total=4000, bytes_processed=1000, attempts=1,
+            checkpoint_json=json.dumps({"rows": 1000, "created": 900, "updated": 0, "skipped": 100, "errors": [], "dropped_errors": 0}),
+        )
+        response = IngestionJobService.run_response(run, now=started + timedelta(seconds=10))
+        assert response.rows_per_second == 100.0
+        assert response.eta_seconds == 30.0
+        assert response.summary.created == 900
+
+    def test_failed_api_sync_backs_off_by_error_kind(self):
+        import json
+        from datetime import timedelta
+        from app.integrations.open_dental.client import OpenDentalAPIError
+        from app.models.integration import IntegrationConnection, IntegrationSyncRun
+        from app.services.ingestion_jobs import IngestionJobService
+
+        conn = IntegrationConnection(id=1, practice_id=7, status=IntegrationStatus.ACTIVE.value, consecutive_failures=1)
+        run = IntegrationSyncRun(id=1, connection_id=1, practice_id=7, status=SyncRunStatus.RUNNING.value, sync_type="API")
+        mock_db = MagicMock()
+        mock_db.get.return_value = conn
+
+        with patch.object(IngestionJobService, "_process_api", side_effect=OpenDentalAPIError("slow down", status_code=429)):
+            with pytest.raises(OpenDentalAPIError):
+                IngestionJobService.process(mock_db, run)
+        assert conn.status == IntegrationStatus.ERROR.value
+        assert conn.consecutive_failures == 2
+        assert conn.next_sync_at - run.ended_at == timedelta(minutes=30)
+        assert json.loads(run.error_json)["kind"] == "rate_limited"
+
+
+class TestSyncScheduler:
+    def test_error_kinds(self):
+        import httpx
+        from app.integrations.open_dental.client import OpenDentalAPIError
+        from app.services.ingestion_jobs import sync_error_kind
+
+        assert sync_error_kind(OpenDentalAPIError("denied", status_code=401)) == "auth"
+        assert sync_error_kind(OpenDentalAPIError("busy", status_code=429)) == "rate_limited"
+        assert sync_error_kind(OpenDentalAPIError("down", status_code=503)) == "unavailable"
+        assert sync_error_kind(OpenDentalAPIError("unreachable")) == "unavailable"
+        assert sync_error_kind(OpenDentalNotConfigured("no keys")) == "not_configured"
+        assert sync_error_kind(httpx.ReadTimeout("t")) == "error"
+
+    def test_backoff_doubles_up_to_max(self):
+        from datetime import timedelta
+        from app.services.ingestion_jobs import SYNC_BACKOFF_MAX, sync_backoff
+
+        assert sync_backoff("unavailable", 1) == timedelta(minutes=5)
+        assert sync_backoff("unavailable", 3) == timedelta(minutes=20)
+        assert sync_backoff("auth", 1) == timedelta(hours=1)
+        assert sync_backoff("auth", 20) == SYNC_BACKOFF_MAX
+        assert sync_backoff("not_configured", 1) == SYNC_BACKOFF_MAX
+
+    def test_pick_runs_caps_and_excludes_busy_practices(self):
+        from app.services.sync_scheduler import _pick_runs
+
+        # run_id, practice_id, abandoned
+        candidates = [(1, 10, False), (2, 10, False), (3, 11, True), (4, 12, False), (5, 13, False), (6, 14, False)]
+        running = {90: 12}  # practice 12 is busy
+
+        assert _pick_runs(candidates, running, 3) == [(1, 10, False), (3, 11, True), (5, 13, False)]
+        assert _pick_runs(candidates, running, 0) == []
+        assert _pick_runs(candidates, {1: 10}, 1) == [(3, 11, True)]  # run 1 already started here
+
 
 class TestIntegrationEnums:
     def test_provider_values(self):
@@ -286,6 +813,7 @@ class TestIntegrationEnums:
         assert IntegrationStatus.ERROR.value == "ERROR"
 
     def test_sync_run_status_values(self):
+        assert SyncRunStatus.QUEUED.value == "QUEUED"
         assert SyncRunStatus.RUNNING.value == "RUNNING"
         assert SyncRunStatus.SUCCEEDED.value == "SUCCEEDED"
         assert SyncRunStatus.FAILED.value == "FAILED"
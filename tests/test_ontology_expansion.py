@@ -425,6 +425,33 @@ class TestOntologyInsightsService:
         summary = OntologyInsightsService.get_practice_summary(db, practice.id)
         assert summary["total_claims"] == 0
 
+    def test_provider_productivity(self, db):
+        practice = _make_practice(db)
+        dentist = _make_provider(db, practice.id, name="Dr. Lines")
+        idle = _make_provider(db, practice.id, name="Dr. Idle", role="ASSOCIATE")
+        with_lines = _make_claim(db, practice.id, provider_id=dentist.id, amount=20000)
+        other = _make_claim(db, practice.id, amount=30000)
+        _make_claim(db, practice.id, provider_id=dentist.id, amount=10000)
+        codes = ["D2740", "D0120", "D2740", "D0120", "D1110", "D0150", "D0220", "D0330", ""]
+        for i, code in enumerate(codes):
+            db.add(ClaimLine(
+                claim_id=with_lines.id if i % 2 else other.id, provider_id=dentist.id,
+                cdt_code=code, billed_fee_cents=1000, units=1,
+            ))
+        db.flush()
+
+        result = OntologyInsightsService.get_provider_productivity(db, practice.id)["providers"]
+        assert [p["full_name"] for p in result] == ["Dr. Lines", "Dr. Idle"]
+        lines, idle_row = result
+        assert lines["claim_count"] == 3
+        assert lines["total_billed_cents"] == 20000 + 10000 + 9 * 1000
+        # Ties keep the order codes were first seen in.
+        assert lines["top_procedures"] == [
+            {"code": "D2740", "count": 2}, {"code": "D0120", "count": 2},
+            {"code": "D1110", "count": 1}, {"code": "D0150", "count": 1}, {"code": "D0220", "count": 1},
+        ]
+        assert (idle_row["claim_count"], idle_row["total_billed_cents"], idle_row["top_procedures"]) == (0, 0, [])
+
     def test_claim_cycle_times(self, db):
         practice = _make_practice(db)
         _make_claim(db, practice.id, status=ClaimStatus.NEEDS_REVIEW.value)
@@ -435,6 +462,61 @@ class TestOntologyInsightsService:
         assert "aging_buckets" in cycle
         assert cycle["open_claims"] >= 1
 
+    def test_claim_cycle_times_percentiles(self, db):
+        practice = _make_practice(db)
+        now = datetime.utcnow()
+        for days in (2, 4, 6, 8):
+            claim = _make_claim(db, practice.id, status=ClaimStatus.CLOSED.value)
+            claim.created_at = now - timedelta(days=days)
+            pi = PaymentIntent(
+                claim_id=claim.id,
+                practice_id=practice.id,
+                amount_cents=40000,
+                status=PaymentIntentStatus.CONFIRMED.value,
+                confirmed_at=now,
+            )
+            pi.idempotency_key = PaymentIntent.generate_idempotency_key(claim.id)
+            db.add(pi)
+        db.flush()
+
+        cycle = OntologyInsightsService.get_claim_cycle_times(db, practice.id)
+        assert cycle["open_claims"] == 0
+        assert cycle["aging_buckets"] == {"0_30": 0, "30_60": 0, "60_90": 0, "90_plus": 0}
+        assert cycle["total_resolved"] == 4
+        assert cycle["avg_cycle_days"] == 5.0
+        assert cycle["p50_cycle_days"] == 6.0
+        assert cycle["p90_cycle_days"] == 8.0
+
+    def test_payer_performance(self, db):
+        practice = _make_practice(db)
+        paid = _make_claim(db, practice.id, amount=10000)
+        _make_claim(db, practice.id, amount=30000, status=ClaimStatus.DECLINED.value)
+        unknown = _make_claim(db, practice.id, amount=5000)
+        unknown.payer = ""
+        pi = PaymentIntent(
+            claim_id=paid.id,
+            practice_id=practice.id,
+            amount_cents=8000,
+            status=PaymentIntentStatus.CONFIRMED.value,
+            confirmed_at=datetime.utcnow(),
+        )
+        pi.idempotency_key = PaymentIntent.generate_idempotency_key(paid.id)
+        db.add(pi)
+        db.flush()
+        pi.created_at = pi.confirmed_at - timedelta(days=3)
+        db.flush()
+
+        perf = OntologyInsightsService.get_payer_performance(db, practice.id)
+        assert perf["total_payers"] == 2
+        test_payer = perf["payers"]["Test Payer"]
+        assert test_payer["total_claims"] == 2
+        assert test_payer["denial_rate"] == 0.5
+        assert test_payer["total_billed_cents"] == 40000
+        assert test_payer["total_paid_cents"] == 8000
+        assert test_payer["realized_rate"] == 0.2
+        assert test_payer["p50_cycle_days"] == 3.0
+        assert perf["payers"]["Unknown"]["avg_cycle_days"] is None
+
     def test_funding_decisions_summary(self, db):
         practice = _make_practice(db)
         claim = _make_claim(db, practice.id)
@@ -451,6 +533,65 @@ class TestOntologyInsightsService:
         result = OntologyInsightsService.get_funding_decisions_summary(db, practice.id)
         assert result["total_decisions"] >= 1
 
+    def test_procedure_risk_summary(self, db):
+        practice = _make_practice(db)
+        _make_procedure_code(db, "D0120", "Periodic oral evaluation", "PREVENTIVE")
+        approved = _make_claim(db, practice.id)
+        declined = _make_claim(db, practice.id, status=ClaimStatus.DECLINED.value)
+        for claim, code, billed in ((approved, "D0120", 6000), (declined, "D0120", 5000), (declined, None, 900)):
+            db.add(ClaimLine(claim_id=claim.id, cdt_code=code, billed_fee_cents=billed, allowed_fee_cents=billed // 2))
+        db.flush()
+
+        result = OntologyInsightsService.get_procedure_risk_summary(db, practice.id)
+        d0120 = result["procedures"]["D0120"]
+        assert d0120["count"] == 2
+        assert d0120["denial_rate"] == 0.5
+        assert d0120["total_billed_cents"] == 11000
+        assert d0120["avg_billed_cents"] == 5500
+        assert d0120["category"] == "PREVENTIVE"
+        assert result["procedures"]["UNKNOWN"]["denial_rate"] == 1.0
+        assert result["categories"]["PREVENTIVE"] == {"count": 2, "denial_rate": 0.5, "total_billed_cents": 11000}
+        assert result["categories"]["OTHER"]["count"] == 1
+
+    def test_insight_rollups_follow_writes(self, db):
+        from app.models.insight_rollup import PayerRollup, ProcedureRollup, rebuild_insight_rollups
+
+        practice = _make_practice(db)
+        first = _make_claim(db, practice.id, amount=10000)
+        second = _make_claim(db, practice.id, amount=20000)
+        line = ClaimLine(claim_id=second.id, cdt_code="D1110", billed_fee_cents=20000)
+        pi = PaymentIntent(
+            claim_id=second.id, practice_id=practice.id, amount_cents=15000,
+            status=PaymentIntentStatus.SENT.value,
+        )
+        pi.idempotency_key = PaymentIntent.generate_idempotency_key(second.id)
+        db.add_all([line, pi, FundingDecision(claim_id=second.id, decision=FundingDecisionType.DENY.value, risk_score=0.9)])
+        db.flush()
+
+        # Re-attribute the second claim and everything hanging off it.
+        second.payer = "Other Payer"
+        second.status = ClaimStatus.DECLINED.value
+        pi.status = PaymentIntentStatus.CONFIRMED.value
+        line.cdt_code = "D1206"
+        db.flush()
+        db.delete(first)
+        db.flush()
+
+        rollups = {r.payer: r for r in db.query(PayerRollup).filter(PayerRollup.practice_id == practice.id)}
+        assert set(rollups) == {"Other Payer"}
+        other = rollups["Other Payer"]
+        assert (other.claim_count, other.denied_count, other.billed_cents, other.paid_cents) == (1, 1, 20000, 15000)
+        assert (other.decision_count, other.deny_count, other.risk_score_count) == (1, 1, 1)
+        assert other.first_claim_id == second.id
+        codes = {r.cdt_code: r for r in db.query(ProcedureRollup).filter(ProcedureRollup.practice_id == practice.id)}
+        assert set(codes) == {"D1206"}
+        assert codes["D1206"].denied_count == 1
+
+        assert rebuild_insight_rollups(db, practice.id) == 0
+        summary = OntologyInsightsService.get_funding_decisions_summary(db, practice.id)
+        assert summary["decision_counts"] == {"DENY": 1}
+        assert summary["avg_risk_score"] == 0.9
+
     def test_reconciliation_summary(self, db):
         practice = _make_practice(db)
         result = OntologyInsightsService.get_reconciliation_summary(db, practice.id)
@@ -563,6 +704,78 @@ class TestRemittanceReconciliation:
         result = RemittanceReconciliationService.reconcile_remittance(db, 999999)
         assert "error" in result
 
+    def test_reconcile_many_matches_in_batches(self, db, monkeypatch):
+        monkeypatch.setattr(db, "commit", db.flush)  # keep the fixture's rollback
+        practice = _make_practice(db)
+        claims = []
+        for n in range(3):
+            claim = _make_claim(db, practice.id, amount=30000)
+            claim.external_claim_id = f"EXT-MANY-{claim.id}"
+            claim.total_paid_cents = None
+            claims.append(claim)
+        claim_line = ClaimLine(claim_id=claims[0].id, cdt_code="D1110", billed_fee_cents=30000)
+        db.add(claim_line)
+        db.flush()
+        rems = [
+            RemittanceReconciliationService.ingest_remittance(
+                db, practice.id, "Test Payer", f"TRC-MANY-{n}", date.today(), 0, lines=lines,
+            )
+            for n, lines in enumerate([
+                [{"external_claim_id": claims[0].external_claim_id, "cdt_code": "D1110", "paid_cents": 25000, "allowed_cents": 26000},
+                 {"external_claim_id": claims[1].external_claim_id, "paid_cents": 1000}],  # paid far off the claim amount
+                [{"external_claim_id": claims[2].external_claim_id, "paid_cents": 30000},
+                 {"external_claim_id": "EXT-UNKNOWN", "paid_cents": 500}],
+            ])
+        ]
+
+        results = RemittanceReconciliationService.reconcile_many(db, [r.id for r in rems] + [999999], batch_size=2)
+        assert [(r["matched"], r["unmatched"], r["mismatches"]) for r in results[:2]] == [(1, 0, 1), (1, 1, 0)]
+        assert "error" in results[2]
+        assert [r.posting_status for r in rems] == [PostingStatus.EXCEPTION.value, PostingStatus.POSTED.value]
+        first = db.query(RemittanceLine).filter(RemittanceLine.remittance_id == rems[0].id).order_by(RemittanceLine.id).all()
+        assert [(l.claim_id, l.match_status) for l in first] == [
+            (claims[0].id, RemittanceLineMatchStatus.MATCHED.value),
+            (claims[1].id, RemittanceLineMatchStatus.MISMATCH.value),
+        ]
+        assert first[0].claim_line_id == claim_line.id
+        assert [c.total_paid_cents for c in claims] == [25000, None, 30000]
+
+        # Reconciling again does not count payments twice.
+        RemittanceReconciliationService.reconcile_many(db, [r.id for r in rems])
+        assert [c.total_paid_cents for c in claims] == [25000, None, 30000]
+
+    def test_ingest_remittances_in_batches_skips_posted(self, db, monkeypatch):
+        monkeypatch.setattr(db, "commit", db.flush)  # keep the fixture's rollback
+        practice = _make_practice(db)
+        payer = _make_payer(db, code="REM-BULK", name="Bulk ERA Payer")
+        remittances = [
+            {
+                "payer_name": "BULK ERA PAYER",
+                "trace_number": f"EFT-{n}",
+                "payment_date": date.today(),
+                "total_paid_cents": 1000 * n,
+                "total_adjustments_cents": 100,
+                "source_type": RemittanceSourceType.ERA_835.value,
+                "era_reference": f"1512345678:EFT-{n}",
+                "lines": [
+                    {"external_claim_id": f"EXT-{n}", "cdt_code": "D1110", "paid_cents": 1000 * n,
+                     "adjustment_cents": 100, "adjustment_reason_codes": [{"group": "CO", "reason": "45", "amount_cents": 100}]},
+                ],
+            }
+            for n in range(1, 6)
+        ]
+
+        summary = RemittanceReconciliationService.ingest_remittances(db, practice.id, remittances, batch_size=2)
+        assert summary == {"remittances": 5, "lines": 5, "skipped": 0}
+        rems = db.query(Remittance).filter(Remittance.practice_id == practice.id).order_by(Remittance.id).all()
+        assert [r.trace_number for r in rems] == [f"EFT-{n}" for n in range(1, 6)]
+        assert {r.payer_id for r in rems} == {payer.id}
+        line = db.query(RemittanceLine).filter(RemittanceLine.remittance_id == rems[2].id).one()
+        assert (line.external_claim_id, line.paid_cents, line.adjustment_reason_codes[0]["reason"]) == ("EXT-3", 3000, "45")
+
+        summary = RemittanceReconciliationService.ingest_remittances(db, practice.id, remittances[3:] + remittances[3:])
+        assert summary == {"remittances": 0, "lines": 0, "skipped": 4}
+
 
 # ─── Backward Compatibility Tests ───
 